@@ -1,3 +1,6 @@
+import asyncio
+import bisect
+import gzip
 import json
 import logging
 import os
@@ -7,13 +10,24 @@ import time
 
 from datetime import datetime
 from threading import Lock
-from functools import cmp_to_key
 
 import boto3
 
 from job_requester import Message
+from job_requester.ticket_index import TicketIndex
 
 MAX_TIMEOUT_IN_SEC = 5000
+# wait_for_status polls the ticket folders every MIN_POLL_INTERVAL_IN_SEC while statuses change, and backs off
+# exponentially up to MAX_POLL_INTERVAL_IN_SEC while they do not
+MIN_POLL_INTERVAL_IN_SEC = 5
+MAX_POLL_INTERVAL_IN_SEC = 60
+# number of consecutive polls a ticket may be missing from all folders, e.g. while it is moved between folders
+MAX_TICKET_NOT_FOUND_POLLS = 3
+FINAL_STATUSES = ("completed", "runtimeError", "failed")
+# folder the executors stream the logs of the test jobs to, see log_return.LogStreamer
+LOG_STREAMS_FOLDER = "log_streams"
+# seconds between two checks for new log chunks in follow_logs
+LOG_FOLLOW_INTERVAL_IN_SEC = 30
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
@@ -32,6 +46,12 @@ class JobRequester:
         self.ticket_name_counter = 0
         self.request_lock = Lock()
 
+        self.ticket_index = TicketIndex()
+        self.ticket_index_lock = Lock()
+        # ticket name -> (identifier, asyncio Future of the final query response), see wait_for_status
+        self.status_waiters = {}
+        self.status_poll_task = None
+
     def create_ticket_content(self, image, context, num_of_instances, request_time):
         """
         Create content of the ticket to be sent to S3
@@ -119,27 +139,6 @@ class JobRequester:
             else "ml.c5.4xlarge" if "tensorflow" in image else "ml.c5.9xlarge"
         )
 
-    def extract_timestamp(self, ticket_key):
-        """
-        extract the timestamp string from S3 request ticket key
-        :param ticket_key: <string> key of the request ticket
-        :return: <string> timestamp in format "%Y-%m-%d-%H-%M-%S" that is encoded in the ticket name
-        """
-        return re.match(r".*_(\d{4}(-\d{2}){5})\.json", ticket_key).group(1)
-
-    def ticket_timestamp_cmp_function(self, ticket1_name, ticket2_name):
-        """
-        Compares the timestamp of the two request tickets
-
-        :param ticket1, ticket2: <dict> S3 object descriptors from s3_client.list_objects
-        :return: <bool>
-        """
-        ticket1_timestamp, ticket2_timestamp = (
-            self.extract_timestamp(ticket1_name),
-            self.extract_timestamp(ticket2_name),
-        )
-        return ticket1_timestamp > ticket2_timestamp
-
     def construct_query_response(self, status, reason=None, queueNum=None):
         """
         Create query response for query_status calls
@@ -157,6 +156,21 @@ class JobRequester:
 
         return query_response
 
+    def construct_folder_response(self, folder, ticket_key):
+        """
+        Create query response for a ticket found in a folder other than the request queue
+
+        :param folder: <string> folder the ticket was found in
+        :param ticket_key: <string> S3 key of the ticket
+        :return: <dict>
+        """
+        suffix_pattern = re.compile(".*-(.*).json")
+        suffix = suffix_pattern.match(ticket_key).group(1)
+        if folder == "dead_letter_queue" or folder == "duplicate_pr_requests":
+            return self.construct_query_response("failed", reason=suffix)
+        else:
+            return self.construct_query_response(suffix)
+
     def search_ticket_folder(self, folder, path):
         """
         Search folder/path on S3 to find the target ticket. If found, return a query response for the search. Otherwise
@@ -170,16 +184,24 @@ class JobRequester:
             Bucket=self.s3_ticket_bucket, Prefix=f"{folder}/{path}"
         )
         if "Contents" in objects:
-            ticket_key = objects["Contents"][0]["Key"]
-            suffix_pattern = re.compile(".*-(.*).json")
-            suffix = suffix_pattern.match(ticket_key).group(1)
-            if folder == "dead_letter_queue" or folder == "duplicate_pr_requests":
-                return self.construct_query_response("failed", reason=suffix)
-            else:
-                return self.construct_query_response(suffix)
+            return self.construct_folder_response(folder, objects["Contents"][0]["Key"])
 
         return None
 
+    def list_ticket_folder(self, folder):
+        """
+        List all tickets of a folder, across pages of the listing
+
+        :param folder: <string> folder to list
+        :return: <list of string> S3 keys of the tickets, in lexicographical order
+        """
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        return [
+            ticket["Key"]
+            for page in paginator.paginate(Bucket=self.s3_ticket_bucket, Prefix=f"{folder}/")
+            for ticket in page.get("Contents", [])
+        ]
+
     def send_request(self, image, build_context, num_of_instances):
         """
         Sending a request to test job executor (place request ticket to S3)
@@ -213,7 +235,8 @@ class JobRequester:
         Requesting for the test logs
 
         :param identifier: <Message object> returned from send_request
-        :return: <json or None> if log received, return the json log. Otherwise return None.
+        :return: <json or None> if log received, return the json log, with the XML report in "XML_REPORT". Otherwise
+                 return None.
         """
         ticket_name_without_extension = identifier.ticket_name.rstrip(".json")
         objects = self.s3_client.list_objects(
@@ -226,11 +249,75 @@ class JobRequester:
             entry = objects["Contents"][0]
             ticket_object = self.s3_client.get_object(Bucket="dlc-test-tickets", Key=entry["Key"])
             ticket_body = json.loads(ticket_object["Body"].read().decode("utf-8"))
+            logs = ticket_body["LOGS"]
+            # the ticket only points to the XML report, the log stream is read with follow_logs
+            if "XML_REPORT_KEY" in logs:
+                report_object = self.s3_client.get_object(
+                    Bucket=self.s3_ticket_bucket, Key=logs["XML_REPORT_KEY"]
+                )
+                logs["XML_REPORT"] = gzip.decompress(report_object["Body"].read()).decode("utf-8")
 
-            return ticket_body["LOGS"]
+            return logs
 
         return None
 
+    def receive_log_chunks(self, identifier, start_after=None):
+        """
+        Download the log chunks streamed by the executor since the last chunk read
+
+        :param identifier: <Message object> returned from send_request
+        :param start_after: <string or None> S3 key of the last chunk read, None to read from the first chunk
+        :return: <tuple> (<list of string> logs of the new chunks, <string or None> S3 key of the last chunk read)
+        """
+        ticket_name_without_extension = identifier.ticket_name.rstrip(".json")
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        # chunk keys are numbered in the order of the chunks, so only the new chunks are listed
+        pagination_args = {"StartAfter": start_after} if start_after else {}
+        chunks = []
+        for page in paginator.paginate(
+            Bucket=self.s3_ticket_bucket,
+            Prefix=f"{LOG_STREAMS_FOLDER}/{ticket_name_without_extension}/chunks/",
+            **pagination_args,
+        ):
+            for chunk in page.get("Contents", []):
+                chunk_object = self.s3_client.get_object(
+                    Bucket=self.s3_ticket_bucket, Key=chunk["Key"]
+                )
+                chunks.append(gzip.decompress(chunk_object["Body"].read()).decode("utf-8"))
+                start_after = chunk["Key"]
+
+        return chunks, start_after
+
+    async def follow_logs(self, identifier, done, on_log_chunk=None):
+        """
+        Pass the logs of the test job to on_log_chunk as the executor streams them, until done is set. The chunks
+        uploaded before done was set are all read.
+
+        :param identifier: <Message object> returned from send_request
+        :param done: <asyncio.Event> set once the test job reached a final status
+        :param on_log_chunk: <function> called with the logs of every chunk, prints them by default
+        """
+        on_log_chunk = on_log_chunk or (lambda log_chunk: print(log_chunk, end=""))
+        loop = asyncio.get_running_loop()
+        last_chunk_key = None
+        while True:
+            finished = done.is_set()
+            try:
+                log_chunks, last_chunk_key = await loop.run_in_executor(
+                    None, self.receive_log_chunks, identifier, last_chunk_key
+                )
+            except Exception as e:
+                LOGGER.error(f"Logs of ticket {identifier.ticket_name} could not be received: {e}")
+                log_chunks = []
+            for log_chunk in log_chunks:
+                on_log_chunk(log_chunk)
+            if finished:
+                return
+            try:
+                await asyncio.wait_for(done.wait(), LOG_FOLLOW_INTERVAL_IN_SEC)
+            except asyncio.TimeoutError:
+                pass
+
     def cancel_request(self, identifier):
         """
         Cancel the test request by removing ticket from the queue.
@@ -263,6 +350,64 @@ class JobRequester:
             f"{identifier.ticket_name} test has begun, test request could not be cancelled."
         )
 
+    def get_ticket_folder_paths(self, identifier):
+        """
+        :param identifier: <Message object> unique identifier returned from call to send_request
+        :return: <list of tuple> (folder, path of the ticket within the folder) of the folders other than the request
+                 queue, in the order they are searched
+        """
+        ticket_without_extension = identifier.ticket_name.rstrip(".json")
+        return [
+            ("dead_letter_queue", ticket_without_extension),
+            ("duplicate_pr_requests", ticket_without_extension),
+            (
+                "resource_pool",
+                f"{identifier.instance_type}-{identifier.job_type}/{ticket_without_extension}",
+            ),
+        ]
+
+    def query_statuses(self, identifiers):
+        """
+        Query the status of multiple requests with one listing per ticket folder. The request queue listing updates
+        self.ticket_index, and the other folders are only listed if a ticket is not on the queue.
+
+        :param identifiers: <list of Message objects> unique identifiers returned from calls to send_request
+        :return: <dict> ticket name -> query response (see query_status), or None if the ticket could not be found
+        """
+        queue_keys = self.list_ticket_folder(self.s3_ticket_bucket_folder)
+        responses = {}
+        with self.ticket_index_lock:
+            self.ticket_index.update(
+                ticket_key.split("/")[-1]
+                for ticket_key in queue_keys
+                if ticket_key.endswith(".json")
+            )
+            for identifier in identifiers:
+                queue_num = self.ticket_index.get_queue_num(identifier.ticket_name)
+                if queue_num is not None:
+                    responses[identifier.ticket_name] = self.construct_query_response(
+                        "queuing", queueNum=queue_num
+                    )
+
+        folder_keys = {}
+        for identifier in identifiers:
+            if identifier.ticket_name in responses:
+                continue
+            responses[identifier.ticket_name] = None
+            for folder, path in self.get_ticket_folder_paths(identifier):
+                if folder not in folder_keys:
+                    folder_keys[folder] = self.list_ticket_folder(folder)
+                # listings are sorted, so the first key with the prefix is the one list_objects would return first
+                keys = folder_keys[folder]
+                index = bisect.bisect_left(keys, f"{folder}/{path}")
+                if index < len(keys) and keys[index].startswith(f"{folder}/{path}"):
+                    responses[identifier.ticket_name] = self.construct_folder_response(
+                        folder, keys[index]
+                    )
+                    break
+
+        return responses
+
     def query_status(self, identifier):
         """
         :param identifier: <Message object> unique identifier returned from call to send_request
@@ -273,48 +418,81 @@ class JobRequester:
         """
         retries = 2
         request_ticket_name = identifier.ticket_name
-        ticket_without_extension = request_ticket_name.rstrip(".json")
-        instance_type = identifier.instance_type
-        job_type = identifier.job_type
 
         for _ in range(retries):
-            # check if ticket is on the queue
-            ticket_objects = self.s3_client.list_objects(
-                Bucket=self.s3_ticket_bucket, Prefix="request_tickets/"
-            )
-            # "Contents" in the API response only if there are objects satisfy the prefix
-            if "Contents" in ticket_objects:
-                ticket_name_pattern = re.compile(".*\/(.*)")
-                ticket_names_list = [
-                    ticket_name_pattern.match(ticket["Key"]).group(1)
-                    for ticket in ticket_objects["Contents"]
-                    if ticket["Key"].endswith(".json")
-                ]
-                # ticket is on the queue, find the queue number
-                if request_ticket_name in ticket_names_list:
-                    ticket_names_list.sort(key=cmp_to_key(self.ticket_timestamp_cmp_function))
-                    queue_num = ticket_names_list.index(request_ticket_name)
-                    return self.construct_query_response("queuing", queueNum=queue_num)
-
-            # check if ticket is on the dead letter queue
-            ticket_in_dead_letter = self.search_ticket_folder(
-                "dead_letter_queue", ticket_without_extension
-            )
-            if ticket_in_dead_letter:
-                return ticket_in_dead_letter
-
-            ticket_in_duplicate = self.search_ticket_folder(
-                "duplicate_pr_requests", ticket_without_extension
-            )
-            if ticket_in_duplicate:
-                return ticket_in_duplicate
-
-            ticket_in_progress = self.search_ticket_folder(
-                "resource_pool", f"{instance_type}-{job_type}/{ticket_without_extension}"
-            )
-            if ticket_in_progress:
-                return ticket_in_progress
+            query_response = self.query_statuses([identifier])[request_ticket_name]
+            if query_response:
+                return query_response
 
             time.sleep(2)
 
         raise AssertionError(f"Request ticket name {request_ticket_name} could not be found.")
+
+    async def wait_for_status(self, identifier, final_statuses=FINAL_STATUSES):
+        """
+        Wait until the request reaches a final status. The requests waited for concurrently in the event loop share a
+        single polling task, which queries all of them at once with query_statuses.
+
+        :param identifier: <Message object> unique identifier returned from call to send_request
+        :param final_statuses: <tuple of string> statuses to wait for
+        :return: <dict> query response of the final status, see query_status
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.status_waiters[identifier.ticket_name] = (identifier, final_statuses, future)
+        if self.status_poll_task is None or self.status_poll_task.done():
+            self.status_poll_task = asyncio.create_task(self.poll_statuses())
+        return await future
+
+    async def poll_statuses(self):
+        """
+        Poll the status of the requests in self.status_waiters until all of them reach a final status, resolving the
+        future of each request once it does.
+        """
+        loop = asyncio.get_running_loop()
+        poll_interval = MIN_POLL_INTERVAL_IN_SEC
+        last_responses = {}
+        not_found_polls = {}
+        while self.status_waiters:
+            identifiers = [identifier for identifier, _, _ in self.status_waiters.values()]
+            try:
+                # boto3 calls are blocking, run them out of the event loop
+                responses = await loop.run_in_executor(None, self.query_statuses, identifiers)
+            except Exception as e:
+                for _, _, future in self.status_waiters.values():
+                    if not future.done():
+                        future.set_exception(e)
+                self.status_waiters = {}
+                return
+
+            status_changed = False
+            for ticket_name, query_response in responses.items():
+                _, final_statuses, future = self.status_waiters[ticket_name]
+                if query_response is None:
+                    not_found_polls[ticket_name] = not_found_polls.get(ticket_name, 0) + 1
+                    if not_found_polls[ticket_name] >= MAX_TICKET_NOT_FOUND_POLLS:
+                        if not future.done():
+                            future.set_exception(
+                                AssertionError(
+                                    f"Request ticket name {ticket_name} could not be found."
+                                )
+                            )
+                        del self.status_waiters[ticket_name]
+                    continue
+                not_found_polls.pop(ticket_name, None)
+                if query_response != last_responses.get(ticket_name):
+                    LOGGER.info(f"Status of ticket {ticket_name}: {query_response}")
+                    last_responses[ticket_name] = query_response
+                    status_changed = True
+                if query_response["status"] in final_statuses:
+                    if not future.done():
+                        future.set_result(query_response)
+                    del self.status_waiters[ticket_name]
+
+            if not self.status_waiters:
+                return
+            poll_interval = (
+                MIN_POLL_INTERVAL_IN_SEC
+                if status_changed
+                else min(poll_interval * 2, MAX_POLL_INTERVAL_IN_SEC)
+            )
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,72 @@
+import bisect
+import logging
+import re
+import sys
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+
+TICKET_TIMESTAMP_PATTERN = re.compile(r".*_(\d{4}(-\d{2}){5})\.json")
+
+
+def extract_timestamp(ticket_name):
+    """
+    extract the timestamp string from a request ticket name
+
+    :param ticket_name: <string> name or S3 key of the request ticket
+    :return: <string or None> timestamp in format "%Y-%m-%d-%H-%M-%S" that is encoded in the ticket name
+    """
+    match = TICKET_TIMESTAMP_PATTERN.match(ticket_name)
+    return match.group(1) if match else None
+
+
+class TicketIndex:
+    """
+    Request tickets on the queue, sorted by the timestamp encoded in their names.
+
+    The index is updated incrementally from listings of the queue: new tickets are inserted with
+    bisect and removed tickets are dropped, instead of parsing and sorting every ticket name on
+    every query. The queue number of a ticket is its position in the index.
+    """
+
+    def __init__(self):
+        # sorted list of (timestamp, ticket name)
+        self._entries = []
+        self._ticket_names = set()
+
+    def update(self, ticket_names):
+        """
+        Replace the content of the index with the tickets currently on the queue
+
+        :param ticket_names: <iterable of string> names of the request tickets on the queue
+        :return: <tuple> (number of added tickets, number of removed tickets)
+        """
+        ticket_names = {
+            ticket_name for ticket_name in ticket_names if extract_timestamp(ticket_name)
+        }
+        removed_ticket_names = self._ticket_names - ticket_names
+        added_ticket_names = ticket_names - self._ticket_names
+        if removed_ticket_names:
+            self._entries = [
+                entry for entry in self._entries if entry[1] not in removed_ticket_names
+            ]
+        for ticket_name in added_ticket_names:
+            bisect.insort(self._entries, (extract_timestamp(ticket_name), ticket_name))
+        self._ticket_names = ticket_names
+        return len(added_ticket_names), len(removed_ticket_names)
+
+    def get_queue_num(self, ticket_name):
+        """
+        :param ticket_name: <string> name of the request ticket
+        :return: <int or None> number of tickets ahead of the ticket on the queue, None if the ticket is not on the queue
+        """
+        if ticket_name not in self._ticket_names:
+            return None
+        return bisect.bisect_left(self._entries, (extract_timestamp(ticket_name), ticket_name))
+
+    def __contains__(self, ticket_name):
+        return ticket_name in self._ticket_names
+
+    def __len__(self):
+        return len(self._entries)
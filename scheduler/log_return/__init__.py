@@ -1,8 +1,10 @@
 import boto3
+import gzip
 import json
 import logging
 import os
 import sys
+import threading
 import xml.etree.ElementTree as ET
 
 
@@ -10,21 +12,151 @@ LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
 LOGGER.addHandler(logging.StreamHandler(sys.stdout))
 
+TICKET_BUCKET = "dlc-test-tickets"
+# log_streams/{ticket name}/chunks/{chunk index}.log.gz and log_streams/{ticket name}/report.xml.gz
+LOG_STREAMS_FOLDER = "log_streams"
+LOG_GROUP_NAME = "/aws/codebuild/DLCTestJobExecutor"
+# seconds between two uploads of the new log events while the test job runs
+LOG_STREAMING_INTERVAL_IN_SEC = 30
+# size of the uncompressed log messages after which a new chunk is started
+MAX_LOG_CHUNK_SIZE = 4 * 1024 * 1024
 
-def construct_log_content(report_path):
+# LogStreamer of the test job run by this executor, started when the job starts running
+LOG_STREAMER = None
+
+
+class LogStreamer:
     """
-    Create message that contains info allowing user to locate the logs
+    Stream the CloudWatch log events of the executor to S3 while the test job runs, as gzip compressed chunks that
+    the requester can follow with JobRequester.follow_logs.
 
-    :return: <json> returned message to SQS for locating the log
+    Every upload only reads the events after the nextForwardToken of the previous one, across all pages of
+    get_log_events.
+    """
+
+    def __init__(self, ticket_name, log_stream_name, log_group_name=LOG_GROUP_NAME):
+        """
+        :param ticket_name: <string> name of the request ticket without extension
+        :param log_stream_name: <string> CloudWatch log stream of the executor
+        :param log_group_name: <string> CloudWatch log group of the executor
+        """
+        self.logs_client = boto3.client("logs")
+        self.s3_client = boto3.client("s3")
+        self.log_group_name = log_group_name
+        self.log_stream_name = log_stream_name
+        self.prefix = f"{LOG_STREAMS_FOLDER}/{ticket_name}"
+        self.next_token = None
+        self.num_of_chunks = 0
+        self.upload_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def get_new_log_messages(self):
+        """
+        Read the log events after the last read one, following nextForwardToken until it stops changing
+
+        :return: <generator of string> messages of the log events
+        """
+        while True:
+            kwargs = {"nextToken": self.next_token} if self.next_token else {"startFromHead": True}
+            log_events = self.logs_client.get_log_events(
+                logGroupName=self.log_group_name, logStreamName=self.log_stream_name, **kwargs
+            )
+            for event in log_events["events"]:
+                yield event["message"]
+            # get_log_events returns the token it was given once there are no newer events
+            if log_events["nextForwardToken"] == self.next_token:
+                return
+            self.next_token = log_events["nextForwardToken"]
+
+    def upload_chunk(self, messages):
+        """
+        :param messages: <list of string> log messages of the chunk
+        """
+        chunk_key = f"{self.prefix}/chunks/{self.num_of_chunks:06d}.log.gz"
+        self.s3_client.put_object(
+            Bucket=TICKET_BUCKET,
+            Key=chunk_key,
+            Body=gzip.compress("".join(messages).encode("utf-8")),
+        )
+        self.num_of_chunks += 1
+
+    def upload_new_logs(self):
+        """
+        Upload the new log events as one or more chunks
+
+        :return: <int> number of log events uploaded
+        """
+        with self.upload_lock:
+            num_of_events = 0
+            messages, chunk_size = [], 0
+            for message in self.get_new_log_messages():
+                messages.append(message)
+                chunk_size += len(message)
+                num_of_events += 1
+                if chunk_size >= MAX_LOG_CHUNK_SIZE:
+                    self.upload_chunk(messages)
+                    messages, chunk_size = [], 0
+            if messages:
+                self.upload_chunk(messages)
+            return num_of_events
+
+    def stream_logs(self):
+        while not self.stop_event.wait(LOG_STREAMING_INTERVAL_IN_SEC):
+            try:
+                self.upload_new_logs()
+            except Exception as e:
+                LOGGER.error(f"Log streaming to {self.prefix} failed: {e}")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.stream_logs, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop streaming, and upload the remaining log events
+
+        :return: <int> number of uploaded chunks
+        """
+        if self.thread:
+            self.stop_event.set()
+            self.thread.join()
+        self.upload_new_logs()
+        return self.num_of_chunks
+
+
+def get_log_streamer():
+    """
+    Create a LogStreamer for the test job of the executor, based on the CODEBUILD_BUILD_ARN and TICKET_KEY
+    environment variables
+
+    :return: <LogStreamer object>
     """
-    logs_client = boto3.client("logs")
     codebuild_arn = os.getenv("CODEBUILD_BUILD_ARN")
-    log_group_name = "/aws/codebuild/DLCTestJobExecutor"
-    log_stream_name = codebuild_arn.split(":")[-1]
-    log_events = logs_client.get_log_events(
-        logGroupName=log_group_name, logStreamName=log_stream_name
-    )
-    log_stream = "".join([event["message"] for event in log_events["events"]])
+    ticket_name = os.getenv("TICKET_KEY").split("/")[-1].split(".")[0]
+    return LogStreamer(ticket_name, codebuild_arn.split(":")[-1])
+
+
+def start_log_streaming():
+    """
+    Start streaming the logs of the test job of the executor to S3, if not started yet
+    """
+    global LOG_STREAMER
+    if LOG_STREAMER is None:
+        LOG_STREAMER = get_log_streamer()
+        LOG_STREAMER.start()
+
+
+def construct_log_content(report_path):
+    """
+    Upload the remaining logs and the XML report, and create message that contains info allowing user to locate them
+
+    :return: <json> pointers to the log chunks and XML report on S3
+    """
+    global LOG_STREAMER
+    log_streamer = LOG_STREAMER or get_log_streamer()
+    LOG_STREAMER = None
+    num_of_chunks = log_streamer.stop()
 
     try:
         with open(report_path) as xml_file:
@@ -34,9 +166,17 @@ def construct_log_content(report_path):
         LOGGER.error(e)
         report_data_in_string = ""
 
+    report_key = f"{log_streamer.prefix}/report.xml.gz"
+    log_streamer.s3_client.put_object(
+        Bucket=TICKET_BUCKET,
+        Key=report_key,
+        Body=gzip.compress(report_data_in_string.encode("utf-8")),
+    )
+
     content = {
-        "LOG_STREAM": log_stream,
-        "XML_REPORT": report_data_in_string,
+        "LOG_STREAM_PREFIX": f"{log_streamer.prefix}/chunks/",
+        "LOG_CHUNKS_NUM": num_of_chunks,
+        "XML_REPORT_KEY": report_key,
     }
 
     return content
@@ -70,6 +210,8 @@ def update_pool(status, instance_type, num_of_instances, job_type, report_path=N
         "INSTANCES_NUM": num_of_instances,
     }
 
+    if status == "running":
+        start_log_streaming()
     if status == "completed" or status == "runtimeError":
         pool_ticket_content["LOGS"] = construct_log_content(report_path)
 
@@ -0,0 +1,109 @@
+import asyncio
+import gzip
+import io
+import json
+
+import log_return
+
+from job_requester import JobRequester
+from job_requester import Message
+from job_requester import requester
+
+
+"""
+How tests are executed:
+- Replace the CloudWatch Logs and S3 clients with in-memory stand-ins. The log stand-in pages its events, and returns
+the token it was given once there are no newer events, like get_log_events.
+- Stream the logs of a test job with a LogStreamer while new events arrive, and check that the JobRequester follows
+the chunks as they are uploaded, and receives the XML report the pool ticket points to.
+"""
+
+TICKET_NAME = "pr00001-tensorflow0_2024-01-01-00-00-00"
+TEST_ECR_URI = "763104351884.dkr.ecr.us-west-2.amazonaws.com/tensorflow-training:2.2.0-gpu-py37-cu101-ubuntu18.04"
+SAMPLE_XML_MESSAGE = (
+    "<note><to>Sample</to><from>XML</from><heading>Report</heading><body>Hello World!</body></note>"
+)
+
+
+class FakeLogsClient:
+    def __init__(self, page_size=2):
+        self.messages = []
+        self.page_size = page_size
+
+    def get_log_events(self, logGroupName, logStreamName, nextToken=None, startFromHead=False):
+        start = int(nextToken) if nextToken else 0
+        end = min(start + self.page_size, len(self.messages))
+        events = [{"message": message} for message in self.messages[start:end]]
+        return {"events": events, "nextForwardToken": str(end)}
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def list_objects(self, Bucket, Prefix, MaxKeys=1000):
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        return {"Contents": [{"Key": key} for key in keys[:MaxKeys]]} if keys else {}
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=""):
+        keys = sorted(key for key in self.objects if key.startswith(Prefix) and key > StartAfter)
+        return [{"Contents": [{"Key": key} for key in keys]}] if keys else [{}]
+
+
+def test_logs_are_streamed_and_followed(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-west-2")
+    monkeypatch.setattr(log_return, "MAX_LOG_CHUNK_SIZE", 30)
+    monkeypatch.setattr(requester, "LOG_FOLLOW_INTERVAL_IN_SEC", 0)
+    logs_client, s3_client = FakeLogsClient(), FakeS3Client()
+    log_streamer = log_return.LogStreamer(TICKET_NAME, "log-stream")
+    log_streamer.logs_client, log_streamer.s3_client = logs_client, s3_client
+    job_requester = JobRequester()
+    job_requester.s3_client = s3_client
+    identifier = Message(
+        "dlc-test-tickets", f"{TICKET_NAME}.json", TEST_ECR_URI, "ml.g5.12xlarge", "training", ""
+    )
+
+    logs_client.messages += ["collecting tests\n", "test_a PASSED\n", "test_b PASSED\n"]
+    assert log_streamer.upload_new_logs() == 3
+    assert log_streamer.num_of_chunks == 2
+    chunks, last_chunk_key = job_requester.receive_log_chunks(identifier)
+    assert "".join(chunks) == "collecting tests\ntest_a PASSED\ntest_b PASSED\n"
+
+    assert log_streamer.upload_new_logs() == 0
+    logs_client.messages += ["1 failed\n"]
+    assert log_streamer.upload_new_logs() == 1
+    assert job_requester.receive_log_chunks(identifier, last_chunk_key)[0] == ["1 failed\n"]
+
+    async def follow_logs():
+        done = asyncio.Event()
+        done.set()
+        followed_chunks = []
+        await job_requester.follow_logs(identifier, done, followed_chunks.append)
+        return followed_chunks
+
+    assert "".join(asyncio.run(follow_logs())) == "".join(logs_client.messages)
+
+    report_path = tmp_path / "report.xml"
+    report_path.write_text(SAMPLE_XML_MESSAGE)
+    monkeypatch.setattr(log_return, "LOG_STREAMER", log_streamer)
+    log_content = log_return.construct_log_content(str(report_path))
+    assert log_content["LOG_CHUNKS_NUM"] == 3
+    assert "LOG_STREAM" not in log_content
+    s3_client.put_object(
+        Bucket="dlc-test-tickets",
+        Key=f"resource_pool/ml.g5.12xlarge-training/{TICKET_NAME}#3-completed.json",
+        Body=json.dumps({"LOGS": log_content}).encode("utf-8"),
+    )
+    assert job_requester.receive_logs(identifier)["XML_REPORT"] == SAMPLE_XML_MESSAGE
+    assert gzip.decompress(s3_client.objects[log_content["XML_REPORT_KEY"]]).decode("utf-8") == (
+        SAMPLE_XML_MESSAGE
+    )
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+
+from job_requester import JobRequester
+from job_requester import Message
+from job_requester import requester
+from job_requester.ticket_index import TicketIndex
+
+
+"""
+How tests are executed:
+- Replace the S3 client of a JobRequester object with an in-memory stand-in of the ticket bucket, which counts the
+listings of each folder.
+- Check the queue numbers of the ticket index, the statuses returned by batched queries, and that wait_for_status
+polls all requests together until they reach a final status.
+"""
+
+BUCKET_NAME = "dlc-test-tickets"
+TEST_ECR_URI = "763104351884.dkr.ecr.us-west-2.amazonaws.com/tensorflow-training:2.2.0-gpu-py37-cu101-ubuntu18.04"
+INSTANCE_TYPE = "ml.g5.12xlarge"
+JOB_TYPE = "training"
+
+
+class FakeS3Client:
+    """
+    In-memory stand-in of the S3 client for the ticket bucket
+    """
+
+    def __init__(self, keys=()):
+        self.keys = set(keys)
+        self.listed_prefixes = []
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        self.listed_prefixes.append(Prefix)
+        keys = sorted(key for key in self.keys if key.startswith(Prefix))
+        # one key per page, to check that all pages are read
+        return [{"Contents": [{"Key": key}]} for key in keys] or [{}]
+
+
+def create_identifier(ticket_prefix, request_time):
+    return Message(
+        BUCKET_NAME,
+        f"{ticket_prefix}_{request_time}.json",
+        TEST_ECR_URI,
+        INSTANCE_TYPE,
+        JOB_TYPE,
+        request_time,
+    )
+
+
+def test_ticket_index_queue_num():
+    ticket_index = TicketIndex()
+    ticket_index.update(
+        ["pr00002-pytorch0_2024-01-01-00-00-02.json", "pr00001-mxnet0_2024-01-01-00-00-01.json"]
+    )
+    assert ticket_index.get_queue_num("pr00001-mxnet0_2024-01-01-00-00-01.json") == 0
+    assert ticket_index.get_queue_num("pr00002-pytorch0_2024-01-01-00-00-02.json") == 1
+
+    added, removed = ticket_index.update(
+        [
+            "pr00002-pytorch0_2024-01-01-00-00-02.json",
+            "pr00003-tensorflow0_2024-01-01-00-00-00.json",
+            "invalid-ticket-name.json",
+        ]
+    )
+    assert (added, removed) == (1, 1)
+    assert len(ticket_index) == 2
+    assert ticket_index.get_queue_num("pr00003-tensorflow0_2024-01-01-00-00-00.json") == 0
+    assert ticket_index.get_queue_num("pr00002-pytorch0_2024-01-01-00-00-02.json") == 1
+    assert ticket_index.get_queue_num("pr00001-mxnet0_2024-01-01-00-00-01.json") is None
+
+
+def test_query_statuses_lists_each_folder_once():
+    queuing = create_identifier("pr00001-tensorflow0", "2024-01-01-00-00-02")
+    first_in_queue = create_identifier("pr00002-tensorflow0", "2024-01-01-00-00-01")
+    running = create_identifier("pr00001-tensorflow1", "2024-01-01-00-00-00")
+    dead_letter = create_identifier("pr00001-tensorflow2", "2024-01-01-00-00-00")
+    missing = create_identifier("pr00001-tensorflow3", "2024-01-01-00-00-00")
+    job_requester = JobRequester()
+    job_requester.s3_client = FakeS3Client(
+        [
+            f"request_tickets/{queuing.ticket_name}",
+            f"request_tickets/{first_in_queue.ticket_name}",
+            f"resource_pool/{INSTANCE_TYPE}-{JOB_TYPE}/pr00001-tensorflow1_2024-01-01-00-00-00#3-running.json",
+            "dead_letter_queue/pr00001-tensorflow2_2024-01-01-00-00-00-timeout.json",
+        ]
+    )
+
+    responses = job_requester.query_statuses(
+        [queuing, first_in_queue, running, dead_letter, missing]
+    )
+
+    assert responses == {
+        queuing.ticket_name: {"status": "queuing", "queueNum": 1},
+        first_in_queue.ticket_name: {"status": "queuing", "queueNum": 0},
+        running.ticket_name: {"status": "running"},
+        dead_letter.ticket_name: {"status": "failed", "reason": "timeout"},
+        missing.ticket_name: None,
+    }
+    assert sorted(job_requester.s3_client.listed_prefixes) == [
+        "dead_letter_queue/",
+        "duplicate_pr_requests/",
+        "request_tickets/",
+        "resource_pool/",
+    ]
+
+
+def test_wait_for_status_polls_requests_together(monkeypatch):
+    monkeypatch.setattr(requester, "MIN_POLL_INTERVAL_IN_SEC", 0)
+    monkeypatch.setattr(requester, "MAX_POLL_INTERVAL_IN_SEC", 0)
+    completed = create_identifier("pr00001-tensorflow0", "2024-01-01-00-00-00")
+    duplicate = create_identifier("pr00001-tensorflow1", "2024-01-01-00-00-00")
+    s3_client = FakeS3Client(
+        [f"request_tickets/{completed.ticket_name}", f"request_tickets/{duplicate.ticket_name}"]
+    )
+    # the tickets move out of the queue after the first poll
+    ticket_moves = [
+        (
+            f"request_tickets/{completed.ticket_name}",
+            f"resource_pool/{INSTANCE_TYPE}-{JOB_TYPE}/pr00001-tensorflow0_2024-01-01-00-00-00#3-completed.json",
+        ),
+        (
+            f"request_tickets/{duplicate.ticket_name}",
+            "duplicate_pr_requests/pr00001-tensorflow1_2024-01-01-00-00-00-duplicatePR.json",
+        ),
+    ]
+    job_requester = JobRequester()
+    job_requester.s3_client = s3_client
+    query_statuses = job_requester.query_statuses
+    polled_identifiers = []
+
+    def query_and_move_tickets(identifiers):
+        polled_identifiers.append(len(identifiers))
+        responses = query_statuses(identifiers)
+        for old_key, new_key in ticket_moves:
+            s3_client.keys.discard(old_key)
+            s3_client.keys.add(new_key)
+        return responses
+
+    job_requester.query_statuses = query_and_move_tickets
+
+    async def wait_for_statuses():
+        return await asyncio.gather(
+            job_requester.wait_for_status(completed), job_requester.wait_for_status(duplicate)
+        )
+
+    completed_response, duplicate_response = asyncio.run(wait_for_statuses())
+
+    assert completed_response == {"status": "completed"}
+    assert duplicate_response == {"status": "failed", "reason": "duplicatePR"}
+    assert polled_identifiers == [2, 2]
+
+
+def test_wait_for_status_fails_for_missing_ticket(monkeypatch):
+    monkeypatch.setattr(requester, "MIN_POLL_INTERVAL_IN_SEC", 0)
+    monkeypatch.setattr(requester, "MAX_POLL_INTERVAL_IN_SEC", 0)
+    job_requester = JobRequester()
+    job_requester.s3_client = FakeS3Client()
+
+    with pytest.raises(AssertionError):
+        asyncio.run(
+            job_requester.wait_for_status(
+                create_identifier("pr00001-tensorflow0", "2024-01-01-00-00-00")
+            )
+        )
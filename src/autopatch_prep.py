@@ -0,0 +1,166 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+
+from collections import defaultdict
+
+from invoke import run
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+class StageGraph:
+    """
+    Runs the preparation stages of one image as a dependency graph. A stage starts as soon as the
+    stages it depends on are done, and is not run at all if one of them failed. Every stage is
+    called with the dict of the results of the stages it depends on.
+    """
+
+    def __init__(self, name, timings=None):
+        """
+        :param name: str, name of the graph used in the logs, e.g. the image name
+        :param timings: dict, optional dict in which the duration of every stage is recorded
+        """
+        self.name = name
+        self.timings = timings if timings is not None else {}
+        self._stages = {}
+
+    def add(self, stage, function, depends_on=()):
+        """
+        :param stage: str, unique name of the stage
+        :param function: callable, dict of dependency results -> result of the stage
+        :param depends_on: iter of str, stages that must be done before this one starts
+        """
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage {stage} depends on unknown stage {dependency}")
+        self._stages[stage] = (function, tuple(depends_on))
+
+    def _run_stage(self, stage, futures):
+        function, depends_on = self._stages[stage]
+        # Raises if a dependency failed, which skips this stage
+        dependency_results = {dependency: futures[dependency].result() for dependency in depends_on}
+        start_time = time.monotonic()
+        try:
+            return function(dependency_results)
+        finally:
+            self.timings[stage] = time.monotonic() - start_time
+            LOGGER.info(f"[{self.name}] {stage} took {self.timings[stage]:.1f}s")
+
+    def run(self):
+        """
+        Runs all stages and waits for them to finish.
+
+        :return: dict, stage -> result
+        """
+        futures = {}
+        # One worker per stage, since stages block while waiting on their dependencies
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(self._stages), 1)
+        ) as executor:
+            for stage in self._stages:
+                futures[stage] = executor.submit(self._run_stage, stage, futures)
+        return {stage: future.result() for stage, future in futures.items()}
+
+
+class ImagePullCache:
+    """
+    Shared by the preparation of all autopatch images, so that an image is pulled and inspected at
+    most once per digest, however many images are based on it or however many tags point to it.
+    """
+
+    def __init__(self, resolve_digest, run_command=run):
+        """
+        :param resolve_digest: callable, image uri -> digest of the image in its repository
+        :param run_command: callable, runs a shell command like invoke.run
+        """
+        self.resolve_digest = resolve_digest
+        self.run_command = run_command
+        self.stage_timings = defaultdict(dict)
+        self._digests = {}
+        self._pulled = set()
+        self._layers = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _get_lock(self, key):
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _get_reference(image_uri, digest):
+        return f"{image_uri.split(':')[0]}@{digest}"
+
+    def get_digest(self, image_uri):
+        """
+        :param image_uri: str, image uri with a tag
+        :return: str, digest of the image, looked up once per uri
+        """
+        with self._get_lock(f"digest:{image_uri}"):
+            if image_uri not in self._digests:
+                self._digests[image_uri] = self.resolve_digest(image_uri)
+            return self._digests[image_uri]
+
+    def pull(self, image_uri, digest=None):
+        """
+        Pulls an image by digest unless it has already been pulled, and tags it locally as image_uri.
+
+        :param image_uri: str, local tag of the image
+        :param digest: str, digest of the image, resolved from image_uri if not given
+        :return: str, digest of the image
+        """
+        if digest is None:
+            digest = self.get_digest(image_uri)
+        reference = self._get_reference(image_uri, digest)
+        with self._get_lock(f"pull:{reference}"):
+            if reference not in self._pulled:
+                self.run_command(f"docker pull {reference}", hide=True)
+                self._pulled.add(reference)
+            else:
+                LOGGER.info(f"Reusing pulled image {reference} for {image_uri}")
+            self.run_command(f"docker tag {reference} {image_uri}", hide=True)
+        return digest
+
+    def get_layers(self, image_uri, digest):
+        """
+        :param image_uri: str, uri of a pulled image
+        :param digest: str, digest of the pulled image
+        :return: list, RootFS layers of the image, inspected once per digest
+        """
+        with self._get_lock(f"layers:{digest}"):
+            if digest not in self._layers:
+                reference = self._get_reference(image_uri, digest)
+                result = self.run_command(
+                    f"docker image inspect --format='{{{{json .RootFS.Layers}}}}' {reference}",
+                    hide=True,
+                )
+                self._layers[digest] = json.loads(result.stdout.strip())
+            return self._layers[digest]
+
+    def get_timing_rows(self):
+        """
+        :return: list[tuple], (image - stage, duration) rows for OutputFormatter.table
+        """
+        return [
+            (f"{image_name} - {stage}", f" {duration:.1f}s")
+            for image_name, timings in self.stage_timings.items()
+            for stage, duration in sorted(timings.items(), key=lambda item: -item[1])
+        ]
@@ -0,0 +1,207 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+import boto3
+
+from botocore.config import Config
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+# Clients retry throttled calls with client side rate limiting, and keep enough connections for
+# the threads that share them. Options passed to get_boto_client take precedence.
+DEFAULT_CLIENT_CONFIG = {
+    "retries": {"mode": "adaptive", "max_attempts": 10},
+    "max_pool_connections": 50,
+}
+# Upper bounds in seconds of the buckets of the API call latency histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# JSON file the API call metrics are written to at the end of a build or test session, if set
+METRICS_PATH = os.environ.get("DLC_BOTO_CLIENT_METRICS_PATH")
+
+
+class BotoClientRegistry:
+    """
+    Thread safe registry of boto3 clients, created lazily once per (service, region, config) and
+    shared afterwards. boto3 clients are thread safe, so every thread reuses the loaded service
+    model, endpoint data and connection pool of the client, instead of creating its own.
+
+    The count, errors and latency histogram of the API calls of every client are recorded through
+    the botocore event hooks.
+    """
+
+    def __init__(self, session_factory=boto3.session.Session):
+        """
+        :param session_factory: callable, returns the boto3 Session the clients are created from
+        """
+        self.session_factory = session_factory
+        self._session = None
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(service_name, region_name, config_options):
+        return (service_name, region_name, json.dumps(config_options, sort_keys=True))
+
+    def get_client(self, service_name, region_name=None, **config_options):
+        """
+        :param service_name: str, e.g. "ec2"
+        :param region_name: str, None for the default region of the session
+        :param config_options: botocore Config options, overriding DEFAULT_CLIENT_CONFIG
+        :return: boto3 client
+        """
+        key = self._get_key(service_name, region_name, config_options)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        # Sessions are not thread safe, so clients are created one at a time
+        with self._lock:
+            if key not in self._clients:
+                if self._session is None:
+                    self._session = self.session_factory()
+                config = Config(**DEFAULT_CLIENT_CONFIG).merge(Config(**config_options))
+                client = self._session.client(service_name, region_name=region_name, config=config)
+                self._register_metrics_hooks(client)
+                self._clients[key] = client
+            return self._clients[key]
+
+    def _register_metrics_hooks(self, client):
+        events = client.meta.events
+        # Handlers of before-call may return a response and stop the event, like botocore's Stubber
+        events.register_first("before-call.*.*", self._on_before_call)
+        events.register("after-call.*.*", self._on_after_call)
+        events.register("after-call-error.*.*", self._on_after_call_error)
+
+    @staticmethod
+    def _on_before_call(model=None, context=None, **kwargs):
+        if model is not None and context is not None:
+            context["dlc_call_start_time"] = time.monotonic()
+            context["dlc_call_api"] = (model.service_model.service_name, model.name)
+
+    def _on_after_call(self, context=None, parsed=None, **kwargs):
+        self._record_context_call(context, error=bool((parsed or {}).get("Error")))
+
+    def _on_after_call_error(self, context=None, **kwargs):
+        self._record_context_call(context, error=True)
+
+    def _record_context_call(self, context, error):
+        context = context or {}
+        if "dlc_call_start_time" not in context:
+            return
+        service_name, operation_name = context["dlc_call_api"]
+        latency = time.monotonic() - context["dlc_call_start_time"]
+        self.record_call(service_name, operation_name, latency, error=error)
+
+    def record_call(self, service_name, operation_name, latency, error=False):
+        """
+        :param service_name: str
+        :param operation_name: str, e.g. "DescribeInstances"
+        :param latency: float, seconds
+        :param error: bool, True if the call failed
+        """
+        with self._metrics_lock:
+            metrics = self._metrics.setdefault(
+                f"{service_name}.{operation_name}",
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "total_latency": 0.0,
+                    "max_latency": 0.0,
+                    "histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+                },
+            )
+            metrics["calls"] += 1
+            metrics["errors"] += int(error)
+            metrics["total_latency"] += latency
+            metrics["max_latency"] = max(metrics["max_latency"], latency)
+            metrics["histogram"][bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def get_metrics(self):
+        """
+        :return: dict, "<service>.<operation>" -> calls, errors, total and max latency, and the
+            number of calls per latency bucket, the last bucket holding the calls slower than all
+            LATENCY_BUCKETS
+        """
+        with self._metrics_lock:
+            return {
+                api: {**metrics, "histogram": list(metrics["histogram"])}
+                for api, metrics in self._metrics.items()
+            }
+
+    def dump_metrics(self, path=None):
+        """
+        Logs the most called APIs and writes all API call metrics as JSON.
+
+        :param path: str, JSON file, METRICS_PATH by default. Nothing is written if neither is set.
+        """
+        metrics = self.get_metrics()
+        for api, api_metrics in sorted(metrics.items(), key=lambda item: -item[1]["calls"])[:10]:
+            LOGGER.info(
+                f"{api}: {api_metrics['calls']} calls, {api_metrics['errors']} errors, "
+                f"{api_metrics['total_latency'] / api_metrics['calls']:.3f}s average latency"
+            )
+        path = path or METRICS_PATH
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as metrics_file:
+            json.dump(
+                {"latency_buckets": list(LATENCY_BUCKETS), "apis": metrics},
+                metrics_file,
+                indent=4,
+                sort_keys=True,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._clients = {}
+            self._session = None
+        with self._metrics_lock:
+            self._metrics = {}
+
+    def reset_after_fork(self):
+        """
+        Drops the clients and metrics inherited from the parent process. The connection pools of the
+        clients are shared with the parent, and the locks may have been held by one of its threads,
+        so they are replaced instead of being acquired.
+        """
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._clients = {}
+        self._session = None
+        self._metrics = {}
+
+
+# Import this module as boto_clients, src being on the PYTHONPATH of the builds and test sessions.
+# Importing it as src.boto_clients as well would create a second registry.
+BOTO_CLIENTS = BotoClientRegistry()
+# Child processes, e.g. of multiprocessing pools, create their own clients
+os.register_at_fork(after_in_child=BOTO_CLIENTS.reset_after_fork)
+
+
+def get_boto_client(service_name, region_name=None, **config_options):
+    """
+    Shared boto3 client of the service in the region, see BotoClientRegistry.get_client.
+    """
+    return BOTO_CLIENTS.get_client(service_name, region_name=region_name, **config_options)
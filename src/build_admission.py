@@ -0,0 +1,236 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from collections import namedtuple
+
+import constants
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+BuildEstimate = namedtuple("BuildEstimate", ["duration", "disk_mb", "memory_mb"])
+HostResources = namedtuple("HostResources", ["free_disk_mb", "available_memory_mb", "cpu_load"])
+
+
+def get_host_resources(docker_root_dir=constants.DOCKER_ROOT_DIR):
+    """
+    Samples the resources of the build host. Values that cannot be read on this host are None.
+
+    :param docker_root_dir: str, directory where docker stores the images and the build cache
+    :return: HostResources, free disk (MB) of the docker root dir, available memory (MB) and load
+        average per CPU core
+    """
+    disk_path = docker_root_dir if os.path.exists(docker_root_dir) else os.sep
+    free_disk_mb = shutil.disk_usage(disk_path).free / (1024 * 1024)
+
+    available_memory_mb = None
+    try:
+        with open("/proc/meminfo", "r") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    available_memory_mb = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+
+    try:
+        cpu_load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        cpu_load = None
+    return HostResources(free_disk_mb, available_memory_mb, cpu_load)
+
+
+class BuildAdmissionController:
+    """
+    Decides when an image build may start. Every image gets a cost estimate (duration from the
+    build history if there is one, otherwise from its image_size_baseline, and the disk and memory
+    its build needs from its image_size_baseline and device type). A build is admitted while the
+    host sampled now still has room for the estimates of the running builds plus its own, and the
+    CPU load is below constants.BUILD_CPU_LOAD_LIMIT. A build is always admitted when none is
+    running, so that an image larger than the host budget is built alone instead of never.
+
+    Waiting builds are admitted by priority, which is the estimated duration of the longest chain
+    of builds that starts with the image, so that the critical path of the build starts first.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_builds=constants.PHASE_CONCURRENCY_LIMITS[constants.BUILD_PHASE],
+        history_path=constants.BUILD_HISTORY_PATH,
+        host_resources=get_host_resources,
+        poll_interval=constants.BUILD_ADMISSION_POLL_INTERVAL,
+    ):
+        """
+        :param max_concurrent_builds: int, upper bound of the number of builds running at once
+        :param history_path: str, JSON file with the build duration of previous builds, None to
+            not use any history
+        :param host_resources: callable, returns the HostResources of the host
+        :param poll_interval: int, seconds after which waiting builds sample the host again
+        """
+        self.max_concurrent_builds = max_concurrent_builds
+        self.history_path = history_path
+        self.host_resources = host_resources
+        self.poll_interval = poll_interval
+        self.history = self._load_history()
+        self._condition = threading.Condition()
+        self._running = {}
+        self._waiting = {}
+        self._priorities = {}
+
+    def _load_history(self):
+        if not self.history_path:
+            return {}
+        try:
+            with open(self.history_path, "r") as history_file:
+                return json.load(history_file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_history(self):
+        """
+        Writes the build durations recorded during this build to the history file.
+        """
+        if not self.history_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.history_path)), exist_ok=True)
+        with self._condition:
+            history = dict(self.history)
+        tmp_path = f"{self.history_path}.{os.getpid()}"
+        with open(tmp_path, "w") as history_file:
+            json.dump(history, history_file, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.history_path)
+
+    def estimate(self, image):
+        """
+        :param image: DockerImage
+        :return: BuildEstimate, estimated duration (seconds), disk (MB) and memory (MB) of the build
+        """
+        image_size_baseline = image.info.get("image_size_baseline") or 0
+        duration = self.history.get(image.name)
+        if duration is None:
+            duration = image_size_baseline * constants.BUILD_SECONDS_PER_BASELINE_MB
+        memory_mb = constants.BUILD_MEMORY_ESTIMATE_MB.get(
+            image.info.get("device_type"), constants.DEFAULT_BUILD_MEMORY_ESTIMATE_MB
+        )
+        return BuildEstimate(
+            duration=duration,
+            disk_mb=image_size_baseline * constants.BUILD_DISK_ESTIMATE_FACTOR,
+            memory_mb=memory_mb,
+        )
+
+    def prioritize(self, images, parents=None):
+        """
+        Sets the priority of every image to the estimated duration of the longest chain of builds
+        that starts with it.
+
+        :param images: list[DockerImage]
+        :param parents: dict, image name -> parent DockerImage, as resolved by BuildScheduler
+        :return: list[DockerImage], the images sorted by decreasing priority
+        """
+        children = {}
+        for child_name, parent in (parents or {}).items():
+            children.setdefault(parent.name, []).append(child_name)
+        durations = {image.name: self.estimate(image).duration for image in images}
+
+        def _get_priority(image_name):
+            if image_name not in self._priorities:
+                self._priorities[image_name] = durations[image_name] + max(
+                    [_get_priority(child_name) for child_name in children.get(image_name, [])],
+                    default=0,
+                )
+            return self._priorities[image_name]
+
+        return sorted(images, key=lambda image: _get_priority(image.name), reverse=True)
+
+    def _fits(self, estimate, host):
+        """
+        Checks if a build with the given estimate fits on the host next to the running builds.
+        """
+        if not self._running:
+            return True
+        if len(self._running) >= self.max_concurrent_builds:
+            return False
+        reserved_disk_mb = sum(running.disk_mb for running in self._running.values())
+        reserved_memory_mb = sum(running.memory_mb for running in self._running.values())
+        if (
+            host.free_disk_mb is not None
+            and host.free_disk_mb - reserved_disk_mb - estimate.disk_mb
+            < constants.BUILD_DISK_HEADROOM_MB
+        ):
+            return False
+        if (
+            host.available_memory_mb is not None
+            and host.available_memory_mb - reserved_memory_mb - estimate.memory_mb
+            < constants.BUILD_MEMORY_HEADROOM_MB
+        ):
+            return False
+        if host.cpu_load is not None and host.cpu_load >= constants.BUILD_CPU_LOAD_LIMIT:
+            return False
+        return True
+
+    def _can_start(self, image_name):
+        host = self.host_resources()
+        by_priority = sorted(
+            self._waiting.items(),
+            key=lambda item: self._priorities.get(item[0], item[1].duration),
+            reverse=True,
+        )
+        # Smaller builds may start ahead of builds with a higher priority that do not fit yet
+        for waiting_image_name, estimate in by_priority:
+            if self._fits(estimate, host):
+                return waiting_image_name == image_name
+        return False
+
+    def build(self, image, build=None):
+        """
+        Waits until the build of the image is admitted and builds it. The duration of successful
+        builds is recorded in the history.
+
+        :param image: DockerImage
+        :param build: callable, runs the build of the image, image.build by default
+        :return: int, build status
+        """
+        estimate = self.estimate(image)
+        with self._condition:
+            self._waiting[image.name] = estimate
+            while not self._can_start(image.name):
+                self._condition.wait(self.poll_interval)
+            del self._waiting[image.name]
+            # The next waiting build in priority order may fit as well, without waiting for a poll
+            self._condition.notify_all()
+            self._running[image.name] = estimate
+            LOGGER.info(
+                f"Admitted build of {image.name} ({len(self._running)} running), estimated "
+                f"{estimate.duration:.0f}s, {estimate.disk_mb:.0f}MB disk, {estimate.memory_mb}MB memory"
+            )
+
+        start_time = time.monotonic()
+        try:
+            status = build() if build is not None else image.build()
+        finally:
+            with self._condition:
+                del self._running[image.name]
+                self._condition.notify_all()
+        if image.to_build and status == constants.SUCCESS:
+            with self._condition:
+                self.history[image.name] = time.monotonic() - start_time
+        return status
@@ -0,0 +1,138 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import constants
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+class BuildEventLog:
+    """
+    Records the phase events of the images of a build (queued, building, common-build, pushing,
+    retagging, done) with their timestamps. Every event is printed, and appended to a JSONL file if
+    an events path is given. A phase of an image lasts until the next event of the same image, which
+    is how the durations written to the OpenMetrics file on close are computed.
+    """
+
+    def __init__(
+        self,
+        events_path=constants.BUILD_EVENTS_PATH,
+        metrics_path=constants.BUILD_METRICS_PATH,
+        clock=time.time,
+    ):
+        """
+        :param events_path: str, JSONL file the events are appended to, None to not write them
+        :param metrics_path: str, OpenMetrics file written on close, None to not write it
+        :param clock: callable, returns the current time in seconds since the epoch
+        """
+        self.events_path = events_path
+        self.metrics_path = metrics_path
+        self.clock = clock
+        self.events = []
+        self._lock = threading.Lock()
+        self._events_file = None
+        if events_path:
+            os.makedirs(os.path.dirname(os.path.abspath(events_path)), exist_ok=True)
+            self._events_file = open(events_path, "a")
+
+    def emit(self, image, event, **fields):
+        """
+        :param image: DockerImage, image the event is about
+        :param event: str, one of constants.QUEUED_EVENT, constants.PHASE_EVENTS or constants.DONE_EVENT
+        :param fields: additional JSON serializable fields of the event, e.g. status
+        :return: dict, the event
+        """
+        record = {
+            "timestamp": self.clock(),
+            "image": image.ecr_url,
+            "name": image.name,
+            "event": event,
+            **fields,
+        }
+        with self._lock:
+            self.events.append(record)
+            if self._events_file is not None:
+                self._events_file.write(f"{json.dumps(record)}\n")
+                self._events_file.flush()
+        LOGGER.info(f"[{record['image']}] {event}")
+        return record
+
+    def get_phase_durations(self):
+        """
+        :return: list[tuple], (image, event, start timestamp, duration in seconds) for every event
+            that is followed by another event of the same image
+        """
+        with self._lock:
+            events = list(self.events)
+        last_events = {}
+        durations = []
+        for record in sorted(events, key=lambda record: record["timestamp"]):
+            previous = last_events.get(record["image"])
+            if previous is not None:
+                durations.append(
+                    (
+                        previous["image"],
+                        previous["event"],
+                        previous["timestamp"],
+                        record["timestamp"] - previous["timestamp"],
+                    )
+                )
+            last_events[record["image"]] = record
+        return durations
+
+    def write_metrics(self, path):
+        """
+        Writes the start timestamp and duration of every phase as OpenMetrics gauges.
+
+        :param path: str, path of the OpenMetrics text file
+        """
+        start_lines = []
+        duration_lines = []
+        for image, event, start_timestamp, duration in self.get_phase_durations():
+            labels = f'image="{image}",phase="{event}"'
+            start_lines.append(
+                f"dlc_build_phase_start_timestamp_seconds{{{labels}}} {start_timestamp}"
+            )
+            duration_lines.append(f"dlc_build_phase_duration_seconds{{{labels}}} {duration}")
+        lines = [
+            "# TYPE dlc_build_phase_start_timestamp_seconds gauge",
+            "# HELP dlc_build_phase_start_timestamp_seconds Time at which an image entered a phase.",
+            *start_lines,
+            "# TYPE dlc_build_phase_duration_seconds gauge",
+            "# HELP dlc_build_phase_duration_seconds Time an image spent in a phase.",
+            *duration_lines,
+            "# EOF",
+        ]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as metrics_file:
+            metrics_file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        """
+        Closes the JSONL file and writes the OpenMetrics file, if their paths are set.
+        """
+        with self._lock:
+            if self._events_file is not None:
+                self._events_file.close()
+                self._events_file = None
+        if self.metrics_path:
+            self.write_metrics(self.metrics_path)
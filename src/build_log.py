@@ -0,0 +1,177 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+from collections import deque
+
+import constants
+
+
+class BuildLog:
+    """
+    Bounded log of an image. Every line is streamed to a log file on disk, while only the last
+    max_lines lines are kept in memory to be displayed in the build output.
+    """
+
+    def __init__(self, log_path, max_lines=constants.BUILD_LOG_BUFFER_LINES):
+        """
+        :param log_path: str, path of the file the log is streamed to
+        :param max_lines: int, number of lines kept in memory
+        """
+        self.log_path = log_path
+        self._buffer = deque(maxlen=max_lines)
+        self._file = None
+        self._file_mode = "w"
+        self._lock = threading.Lock()
+
+    def write(self, line):
+        """
+        Adds a single line to the log.
+
+        :param line: str
+        """
+        line = str(line).rstrip("\n")
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.log_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.log_path, self._file_mode)
+                self._file_mode = "a"
+            self._file.write(f"{line}\n")
+            self._buffer.append(line)
+
+    def append(self, lines):
+        """
+        Adds a block of lines, e.g. the response of a docker command, to the log.
+
+        :param lines: list[str]
+        """
+        for line in lines:
+            self.write(line)
+
+    def tail(self, number_of_lines=10):
+        """
+        :param number_of_lines: int
+        :return: list[str], last number_of_lines lines of the log
+        """
+        with self._lock:
+            return list(self._buffer)[-number_of_lines:]
+
+    def close(self):
+        """
+        Flushes the log file. Writing to the log again reopens the file in append mode.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+
+class BuildTelemetry:
+    """
+    Derives per-step timing of a docker build from the stream of the classic docker builder, i.e.
+    lines like "Step 3/12 : RUN ...", " ---> Using cache", " ---> Running in <id>" and " ---> <id>".
+    """
+
+    STEP_PATTERN = re.compile(r"^Step (\d+)/(\d+) : (.*)$")
+    LAYER_PATTERN = re.compile(r"^ ---> ([0-9a-f]{12})$")
+
+    def __init__(self):
+        self.steps = []
+        self._step_start_time = None
+
+    def _finish_step(self, timestamp):
+        if self.steps and self.steps[-1]["seconds"] is None:
+            self.steps[-1]["seconds"] = round(timestamp - self._step_start_time, 3)
+
+    def observe(self, stream, timestamp=None):
+        """
+        Updates the step telemetry with a chunk of the build stream.
+
+        :param stream: str, "stream" value of a docker build response line
+        :param timestamp: float, time.monotonic() at which the chunk was received
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        for line in stream.splitlines():
+            step_match = self.STEP_PATTERN.match(line)
+            if step_match:
+                self._finish_step(timestamp)
+                self._step_start_time = timestamp
+                self.steps.append(
+                    {
+                        "step": int(step_match.group(1)),
+                        "total_steps": int(step_match.group(2)),
+                        "instruction": step_match.group(3),
+                        "cache_hit": None,
+                        "seconds": None,
+                        "layer_id": None,
+                        "layer_bytes": None,
+                    }
+                )
+                continue
+            if not self.steps:
+                continue
+            if line.startswith(" ---> Using cache"):
+                self.steps[-1]["cache_hit"] = True
+            elif line.startswith(" ---> Running in"):
+                self.steps[-1]["cache_hit"] = False
+            else:
+                layer_match = self.LAYER_PATTERN.match(line.rstrip())
+                if layer_match:
+                    self.steps[-1]["layer_id"] = layer_match.group(1)
+
+    def finish(self, timestamp=None):
+        """
+        Marks the end of the build, closing the timing of the last step.
+        """
+        self._finish_step(time.monotonic() if timestamp is None else timestamp)
+
+    def add_layer_sizes(self, history):
+        """
+        Adds the size of the layer created by each step, using the history of the built image.
+
+        :param history: list[dict], output of docker APIClient.history
+        """
+        sizes = {}
+        for layer in history:
+            layer_id = str(layer.get("Id", "")).replace("sha256:", "")
+            if layer_id and layer_id != "<missing>":
+                sizes[layer_id[:12]] = layer.get("Size")
+        for step in self.steps:
+            if step["layer_id"] in sizes:
+                step["layer_bytes"] = sizes[step["layer_id"]]
+
+    def save(self, path):
+        """
+        Writes the step telemetry to a JSON file.
+
+        :param path: str
+        :return: str, path of the written file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as telemetry_file:
+            json.dump(self.steps, telemetry_file, indent=4)
+        return path
@@ -0,0 +1,201 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import json
+import os
+import threading
+import time
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+import constants
+
+# Spans of the phases an image goes through (build, push, retag), which the critical path is made of
+IMAGE_CATEGORY = "image"
+# Spans of the steps within a phase of an image, e.g. the safety scan of a common stage build
+IMAGE_STEP_CATEGORY = "image-step"
+# Spans of the stages of image_builder itself
+STAGE_CATEGORY = "stage"
+
+Span = namedtuple("Span", ["name", "category", "image", "thread_id", "start", "end", "args"])
+
+
+class BuildProfiler:
+    """
+    Records spans around the stages of image_builder and the phases of every image, and writes them
+    as a Chrome trace (chrome://tracing or https://ui.perfetto.dev), with one track per image.
+
+    The critical path of the build is the chain of images that finished last: the image whose last
+    phase ended last, preceded by the image it is built on top of (base_image_name), and so on.
+    The pre-push and common stage images of a buildspec entry share a name and form one chain.
+    """
+
+    def __init__(self, enabled=False, clock=time.perf_counter):
+        """
+        :param enabled: bool, spans are only recorded if the profiler is enabled
+        :param clock: callable, returns a monotonic time in seconds
+        """
+        self.enabled = enabled
+        self.clock = clock
+        self.origin = clock()
+        self.spans = []
+        self._parents = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category=STAGE_CATEGORY, image=None, **args):
+        """
+        Records the time spent in the block.
+
+        :param name: str, name of the span
+        :param category: str, one of STAGE_CATEGORY, IMAGE_CATEGORY and IMAGE_STEP_CATEGORY
+        :param image: DockerImage, image the span belongs to, if any
+        :param args: JSON serializable details of the span shown in the trace
+        """
+        if not self.enabled:
+            yield
+            return
+        image_name = None
+        if image is not None:
+            image_name = image.name
+            with self._lock:
+                self._parents[image_name] = image.info.get("base_image_name")
+        start = self.clock()
+        try:
+            yield
+        finally:
+            span = Span(
+                name, category, image_name, threading.get_ident(), start, self.clock(), args
+            )
+            with self._lock:
+                self.spans.append(span)
+
+    def get_critical_path(self):
+        """
+        :return: list[Span], image phase spans of the critical path, in chronological order
+        """
+        with self._lock:
+            spans = [span for span in self.spans if span.category == IMAGE_CATEGORY]
+            parents = dict(self._parents)
+        chains = {}
+        for span in spans:
+            chains.setdefault(span.image, []).append(span)
+        if not chains:
+            return []
+
+        image_name = max(chains, key=lambda name: max(span.end for span in chains[name]))
+        critical_path = []
+        cutoff = float("inf")
+        while image_name in chains:
+            # Only the phases of a parent image that were done before its child started are on the path
+            chain = sorted(
+                [span for span in chains[image_name] if span.end <= cutoff],
+                key=lambda span: span.start,
+            )
+            if not chain:
+                break
+            critical_path = chain + critical_path
+            cutoff = chain[0].start
+            image_name = parents.get(image_name)
+        return critical_path
+
+    def get_report_rows(self):
+        """
+        :return: list[tuple], (span, duration) rows of the stages of image_builder and of the
+            critical path, for OutputFormatter.table
+        """
+        with self._lock:
+            stages = [span for span in self.spans if span.category == STAGE_CATEGORY]
+        # Stages run once per image, like the context creation, are summed up
+        stage_durations = {}
+        stage_counts = {}
+        for span in sorted(stages, key=lambda span: span.start):
+            stage_durations[span.name] = stage_durations.get(span.name, 0) + span.end - span.start
+            stage_counts[span.name] = stage_counts.get(span.name, 0) + 1
+        rows = [
+            (
+                name if stage_counts[name] == 1 else f"{name} ({stage_counts[name]}x)",
+                f" {duration:.1f}s",
+            )
+            for name, duration in stage_durations.items()
+        ]
+        critical_path = self.get_critical_path()
+        if critical_path:
+            rows.append(
+                (
+                    "critical path",
+                    f" {critical_path[-1].end - critical_path[0].start:.1f}s",
+                )
+            )
+            rows += [
+                (f"  {span.image} - {span.name}", f" {span.end - span.start:.1f}s")
+                for span in critical_path
+            ]
+        return rows
+
+    def get_chrome_trace(self):
+        """
+        :return: dict, spans in the Chrome trace event format, with timestamps in microseconds
+        """
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        track_ids = {None: 0}
+        trace_events = []
+        for span in sorted(spans, key=lambda span: span.start):
+            if span.image not in track_ids:
+                track_ids[span.image] = len(track_ids)
+            trace_events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": (span.start - self.origin) * 1e6,
+                    "dur": (span.end - span.start) * 1e6,
+                    "pid": pid,
+                    "tid": track_ids[span.image],
+                    "args": {**span.args, "thread_id": span.thread_id},
+                }
+            )
+        for image_name, track_id in track_ids.items():
+            trace_events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": track_id,
+                    "args": {"name": image_name or "image_builder"},
+                }
+            )
+        critical_path = self.get_critical_path()
+        return {
+            "traceEvents": trace_events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "critical_path": [f"{span.image} - {span.name}" for span in critical_path]
+            },
+        }
+
+    def write_chrome_trace(self, path):
+        """
+        :param path: str, path of the JSON trace file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as trace_file:
+            json.dump(self.get_chrome_trace(), trace_file)
+
+
+PROFILER = BuildProfiler(enabled=bool(constants.BUILD_PROFILE_PATH))
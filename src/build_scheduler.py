@@ -0,0 +1,217 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import concurrent.futures
+import logging
+import threading
+
+import constants
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+class BuildScheduler:
+    """
+    Schedules the build -> common stage build -> push -> retag chain of every pre-push image as a
+    dependency graph. The graph is derived from the base_image_name link of each image (a child
+    image waits for its parent image to be built) and the corresponding_common_stage_image link
+    (a common stage image is built right after its pre-push image). Each chain starts as soon as
+    its own dependencies are done, instead of waiting for a whole wave of images to finish.
+
+    The number of images that can be in a given phase at the same time is bounded per phase. With
+    an admission controller, pre-push builds are instead admitted by it, based on the resources of
+    the host and on the estimated cost of each build.
+    """
+
+    def __init__(
+        self,
+        pre_push_images,
+        phase_limits=None,
+        on_push=None,
+        admission_controller=None,
+        event_log=None,
+    ):
+        """
+        :param pre_push_images: list[DockerImage], pre-push stage images to be scheduled
+        :param phase_limits: dict, optional overrides of constants.PHASE_CONCURRENCY_LIMITS
+        :param on_push: callable, optional hook called with an image right before it is pushed
+        :param admission_controller: BuildAdmissionController, optional controller admitting the
+            pre-push builds instead of the BUILD_PHASE limit
+        :param event_log: BuildEventLog, optional log of the phase events of every image
+        """
+        self.images = pre_push_images
+        self.phase_limits = dict(constants.PHASE_CONCURRENCY_LIMITS)
+        self.phase_limits.update(phase_limits or {})
+        self.on_push = on_push
+        self.admission_controller = admission_controller
+        self.event_log = event_log
+
+        self._semaphores = {
+            phase: threading.BoundedSemaphore(limit) for phase, limit in self.phase_limits.items()
+        }
+        self._built_events = {image.name: threading.Event() for image in self.images}
+        self._parents = self._resolve_parents()
+        if self.admission_controller is not None:
+            # Chains are submitted with the longest critical path first
+            self.images = self.admission_controller.prioritize(self.images, self._parents)
+
+    def _resolve_parents(self):
+        """
+        Maps the name of every child image to the image object it is built on top of.
+
+        :return: dict, image name -> parent DockerImage
+        """
+        images_by_name = {image.name: image for image in self.images}
+        parents = {}
+        for image in self.images:
+            base_image_name = image.info.get("base_image_name")
+            if not base_image_name:
+                continue
+            if base_image_name not in images_by_name:
+                raise ValueError(
+                    f"Base image {base_image_name} of {image.name} is not part of this build."
+                )
+            parents[image.name] = images_by_name[base_image_name]
+        return parents
+
+    def _emit(self, image, event, **fields):
+        if self.event_log is not None:
+            self.event_log.emit(image, event, **fields)
+
+    def _with_phase_event(self, phase, image, function):
+        """
+        Wraps the function so that the phase event of the image is emitted right before it runs.
+        """
+
+        def _run():
+            self._emit(image, constants.PHASE_EVENTS[phase])
+            return function()
+
+        return _run
+
+    def _run_phase(self, phase, image, function):
+        """
+        Runs the function while holding one of the slots available for the given phase.
+        """
+        with self._semaphores[phase]:
+            LOGGER.info(f"Starting {phase} phase for {image.ecr_url}")
+            return self._with_phase_event(phase, image, function)()
+
+    def _finish(self, image):
+        self._emit(
+            image,
+            constants.DONE_EVENT,
+            status=constants.STATUS_MESSAGE.get(image.build_status, image.build_status),
+        )
+
+    def _finish_if_not_pushed(self, image):
+        """
+        Emits the done event of an image that goes no further than its build.
+
+        :return: bool, True if the image is done
+        """
+        if image.build_status == constants.FAIL or not (image.to_push and image.to_build):
+            self._finish(image)
+            return True
+        return False
+
+    @staticmethod
+    def _mark_as_skipped(image, reason):
+        """
+        Marks an image which could not be processed because one of its dependencies failed.
+        """
+        image.log.append([f"Skipped {image.ecr_url}: {reason}"])
+        image.build_status = constants.FAIL
+        image.summary["status"] = constants.STATUS_MESSAGE[image.build_status]
+        return image.build_status
+
+    def _run_chain(self, image):
+        """
+        Processes one pre-push image and its common stage image from start to end.
+
+        :param image: DockerImage, pre-push stage image
+        :return: int, FAIL if any image of the chain failed, else status of the last image in it
+        """
+        common_stage_image = image.corresponding_common_stage_image
+        chain = [image] + ([common_stage_image] if common_stage_image is not None else [])
+
+        try:
+            parent = self._parents.get(image.name)
+            if parent is not None:
+                self._built_events[parent.name].wait()
+                if parent.build_status in (None, constants.FAIL):
+                    for chain_image in chain:
+                        self._mark_as_skipped(chain_image, f"base image {parent.name} failed")
+                        self._finish(chain_image)
+                    return constants.FAIL
+            if self.admission_controller is not None:
+                status = self.admission_controller.build(
+                    image, build=self._with_phase_event(constants.BUILD_PHASE, image, image.build)
+                )
+            else:
+                status = self._run_phase(constants.BUILD_PHASE, image, image.build)
+        finally:
+            self._built_events[image.name].set()
+        images_to_push = [] if self._finish_if_not_pushed(image) else [image]
+
+        if common_stage_image is not None:
+            if status == constants.FAIL:
+                self._mark_as_skipped(common_stage_image, f"pre-push image {image.name} failed")
+            else:
+                self._run_phase(
+                    constants.COMMON_BUILD_PHASE, common_stage_image, common_stage_image.build
+                )
+            if not self._finish_if_not_pushed(common_stage_image):
+                images_to_push.append(common_stage_image)
+
+        for chain_image in images_to_push:
+            if self.on_push is not None:
+                self.on_push(chain_image)
+            push_status = self._run_phase(constants.PUSH_PHASE, chain_image, chain_image.push_image)
+            if push_status == constants.SUCCESS:
+                self._run_phase(
+                    constants.RETAG_PHASE, chain_image, chain_image.push_image_with_additional_tags
+                )
+            self._finish(chain_image)
+
+        if any(chain_image.build_status == constants.FAIL for chain_image in chain):
+            return constants.FAIL
+        return chain[-1].build_status
+
+    def submit(self, executor):
+        """
+        Submits the chain of every image to the executor. The executor needs one worker per image,
+        since chains block while waiting on their parents and on the phase limits.
+
+        :param executor: concurrent.futures.Executor
+        :return: dict, image name -> future returning the status of its chain
+        """
+        for image in self.images:
+            self._emit(image, constants.QUEUED_EVENT)
+            if image.corresponding_common_stage_image is not None:
+                self._emit(image.corresponding_common_stage_image, constants.QUEUED_EVENT)
+        return {image.name: executor.submit(self._run_chain, image) for image in self.images}
+
+    def run(self):
+        """
+        Runs the chains of all images and waits for them to finish.
+
+        :return: dict, image name -> status of its chain
+        """
+        max_workers = max(len(self.images), 1)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = self.submit(executor)
+        return {name: future.result() for name, future in futures.items()}
@@ -13,11 +13,186 @@ ANY KIND, either express or implied. See the License for the specific
 language governing permissions and limitations under the License.
 """
 
+import copy
+import hashlib
+import json
 import os
+import tempfile
+import threading
 import warnings
 
 import ruamel.yaml
 
+import constants
+
+# Parsed buildspecs, keyed by the resolved path of the buildspec file. Each entry records the
+# digests of the files it was parsed from and the values of the environment variables used to
+# override its anchors, so that it is only reused while both are unchanged.
+_PARSED_BUILDSPECS = {}
+_PARSED_BUILDSPECS_LOCK = threading.Lock()
+
+# Build plans loaded by load_build_plan, keyed by the resolved path of the buildspec file, with
+# the same validity information as the entries of _PARSED_BUILDSPECS
+_BUILD_PLANS = {}
+
+# Maps (path, size, mtime) of a buildspec file to the sha256 of its contents, so that checking
+# whether a cached buildspec is still valid does not read the file again
+_FILE_DIGESTS = {}
+
+
+def _get_file_digest(path):
+    stat_result = os.stat(path)
+    key = (path, stat_result.st_size, stat_result.st_mtime_ns)
+    with _PARSED_BUILDSPECS_LOCK:
+        digest = _FILE_DIGESTS.get(key)
+    if digest is None:
+        with open(path, "rb") as buildspec_file:
+            digest = hashlib.sha256(buildspec_file.read()).hexdigest()
+        with _PARSED_BUILDSPECS_LOCK:
+            _FILE_DIGESTS[key] = digest
+    return digest
+
+
+def _is_cache_entry_valid(cache_entry):
+    """
+    Checks that neither the files nor the environment variables a parsed buildspec depends
+    on have changed since it was parsed.
+    """
+    for env_var, value in cache_entry["env_vars"].items():
+        if os.getenv(env_var) != value:
+            return False
+    for file_path, digest in cache_entry["file_digests"].items():
+        if not os.path.exists(file_path) or _get_file_digest(file_path) != digest:
+            return False
+    return True
+
+
+def _to_plain_object(yaml_object):
+    """
+    Converts a ruamel round-trip object into plain python dicts, lists and scalars
+    """
+    if isinstance(yaml_object, dict):
+        return {str(key): _to_plain_object(value) for key, value in yaml_object.items()}
+    if isinstance(yaml_object, (list, tuple)):
+        return [_to_plain_object(value) for value in yaml_object]
+    if isinstance(yaml_object, ruamel.yaml.scalarbool.ScalarBoolean):
+        return bool(yaml_object)
+    if isinstance(yaml_object, bool) or yaml_object is None:
+        return yaml_object
+    if isinstance(yaml_object, int):
+        return int(yaml_object)
+    if isinstance(yaml_object, float):
+        return float(yaml_object)
+    return str(yaml_object)
+
+
+def _get_build_plan_file(path, cache_path):
+    return os.path.join(cache_path, f"{hashlib.sha256(path.encode()).hexdigest()}.json")
+
+
+def _write_build_plan_file(plan_file, cache_entry):
+    """
+    Writes a plan file next to its destination and moves it in place once it is complete, so
+    that concurrent readers never observe a partially written plan.
+    """
+    directory = os.path.dirname(plan_file)
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w") as plan_file_handle:
+            json.dump({**cache_entry, "plan": cache_entry["plan"].to_json()}, plan_file_handle)
+        os.replace(temp_path, plan_file)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_build_plan(path, cache_path=None):
+    """
+    Returns the BuildPlan of a buildspec. Plans are cached in memory and as JSON files under
+    cache_path, so that every process that reads the same buildspec, e.g. the xdist workers of a
+    test session, only parses it once. A cached plan is reused as long as the buildspec files and
+    the environment variables it was resolved with are unchanged.
+
+    :param path: str, path to the buildspec file
+    :param cache_path: str, directory of the plan files, defaults to constants.BUILD_PLAN_CACHE_PATH
+    :return: BuildPlan
+    """
+    cache_key = os.path.realpath(path)
+    with _PARSED_BUILDSPECS_LOCK:
+        cache_entry = _BUILD_PLANS.get(cache_key)
+    if cache_entry is not None and _is_cache_entry_valid(cache_entry):
+        return cache_entry["plan"]
+
+    plan_file = _get_build_plan_file(cache_key, cache_path or constants.BUILD_PLAN_CACHE_PATH)
+    try:
+        with open(plan_file, "r") as plan_file_handle:
+            cache_entry = json.load(plan_file_handle)
+        cache_entry["plan"] = BuildPlan.from_json(cache_entry["plan"])
+    except (OSError, ValueError, KeyError):
+        cache_entry = None
+
+    if cache_entry is None or not _is_cache_entry_valid(cache_entry):
+        buildspec = Buildspec()
+        buildspec.load(path)
+        cache_entry = {
+            "file_digests": dict(buildspec._file_digests),
+            "env_vars": dict(buildspec._env_vars),
+            "plan": buildspec.get_plan(),
+        }
+        try:
+            _write_build_plan_file(plan_file, cache_entry)
+        except OSError as e:
+            # The plan is still cached in memory
+            print(f"Failed to write the build plan of {path} to {plan_file}: {e}")
+
+    with _PARSED_BUILDSPECS_LOCK:
+        _BUILD_PLANS[cache_key] = cache_entry
+    return cache_entry["plan"]
+
+
+class BuildPlan:
+    """
+    Immutable, JSON serializable snapshot of a loaded buildspec. The plan is identified by a key
+    derived from the digests of the buildspec files and the environment variables that were used
+    to resolve it, so a serialized plan can be reused as long as its key matches.
+    """
+
+    def __init__(self, buildspec, key):
+        """
+        :param buildspec: dict, buildspec content as plain python objects
+        :param key: str
+        """
+        self._json = json.dumps(buildspec, sort_keys=True)
+        self.key = key
+
+    @property
+    def buildspec(self):
+        """
+        :return: dict, a copy of the buildspec content, so the plan itself cannot be modified
+        """
+        return json.loads(self._json)
+
+    @property
+    def images(self):
+        return self.buildspec.get("images", {})
+
+    def get(self, name, default=None):
+        """
+        :param name: str, top level key of the buildspec
+        :param default: value returned if the buildspec has no such key
+        :return: a copy of the value
+        """
+        return self.buildspec.get(name, default)
+
+    def to_json(self):
+        return json.dumps({"key": self.key, "buildspec": json.loads(self._json)})
+
+    @classmethod
+    def from_json(cls, plan_json):
+        plan = json.loads(plan_json)
+        return cls(plan["buildspec"], plan["key"])
+
 
 class Buildspec:
     """
@@ -29,14 +204,22 @@ class Buildspec:
     def __init__(self):
         self.yaml = ruamel.yaml.YAML()
         self.yaml.allow_duplicate_keys = True
+        # add_constructor registers on the class, so every Buildspec gets its own constructor
+        # class, which resolves !join tags with this object
+        self.yaml.Constructor = type(
+            "BuildspecConstructor", (ruamel.yaml.constructor.RoundTripConstructor,), {}
+        )
         self.yaml.Constructor.add_constructor("!join", self.join)
 
         self._buildspec = None
+        self._file_digests = {}
+        self._env_vars = {}
 
     def load(self, path):
         """
         This function loads the buildspec file and
-        populates the buildspec object.
+        populates the buildspec object. Parsed buildspecs are cached for the lifetime of
+        the process, so loading the same buildspec again only costs a copy.
 
         Parameters:
             path: str
@@ -45,27 +228,71 @@ class Buildspec:
             None
 
         """
+        cache_key = os.path.realpath(path)
+        with _PARSED_BUILDSPECS_LOCK:
+            cache_entry = _PARSED_BUILDSPECS.get(cache_key)
+        if cache_entry is not None and _is_cache_entry_valid(cache_entry):
+            self._buildspec = copy.deepcopy(cache_entry["buildspec"])
+            self._file_digests = dict(cache_entry["file_digests"])
+            self._env_vars = dict(cache_entry["env_vars"])
+            return
+
+        self._file_digests = {}
+        self._env_vars = {"BUILD_CONTEXT": os.getenv("BUILD_CONTEXT")}
+
+        buildspec = self._parse_file(path)
         # Check to see if buildspec file is a pointer
-        with open(path, "r") as bf:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                pointer_check = self.yaml.load(bf)
-                pointer = pointer_check.get("buildspec_pointer")
-                if pointer:
-                    if os.getenv("BUILD_CONTEXT") != "PR":
-                        raise RuntimeError(
-                            f"Detected pointer in buildspec: {path} - this is only supported in PRs"
-                        )
-                    print(f"Buildspec {path} points to another buildspec file {pointer}")
-                    path = os.path.join(os.path.dirname(path), pointer)
-                    print(f"Inferring buildspec path to be {path}")
-
-        with open(path, "r") as buildspec_file:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                self._buildspec = self.yaml.load(buildspec_file)
-
-        self._buildspec = self.override(self._buildspec)
+        pointer = buildspec.get("buildspec_pointer")
+        if pointer:
+            if os.getenv("BUILD_CONTEXT") != "PR":
+                raise RuntimeError(
+                    f"Detected pointer in buildspec: {path} - this is only supported in PRs"
+                )
+            print(f"Buildspec {path} points to another buildspec file {pointer}")
+            path = os.path.join(os.path.dirname(path), pointer)
+            print(f"Inferring buildspec path to be {path}")
+            buildspec = self._parse_file(path)
+
+        self._buildspec = self.override(buildspec)
+
+        with _PARSED_BUILDSPECS_LOCK:
+            _PARSED_BUILDSPECS[cache_key] = {
+                "buildspec": copy.deepcopy(self._buildspec),
+                "file_digests": dict(self._file_digests),
+                "env_vars": dict(self._env_vars),
+            }
+
+    def _parse_file(self, path):
+        """
+        Parses a single buildspec file and records its digest.
+
+        Parameters:
+            path: str
+
+        Returns:
+            ruamel.yaml.comments.CommentedMap
+
+        """
+        with open(path, "rb") as buildspec_file:
+            content = buildspec_file.read()
+        self._file_digests[os.path.realpath(path)] = hashlib.sha256(content).hexdigest()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return self.yaml.load(content)
+
+    def get_plan(self):
+        """
+        Compiles the loaded buildspec into an immutable BuildPlan, keyed by the digests of the
+        buildspec files and the values of the environment variables used to resolve it.
+
+        Returns:
+            BuildPlan
+
+        """
+        key = hashlib.sha256(
+            json.dumps([self._file_digests, self._env_vars], sort_keys=True).encode()
+        ).hexdigest()
+        return BuildPlan(_to_plain_object(self._buildspec), key)
 
     def override(self, yaml_object):
         """
@@ -88,7 +315,9 @@ class Buildspec:
         elif isinstance(yaml_object, scalar_types):
             if yaml_object.anchor is not None:
                 if yaml_object.anchor.value is not None:
-                    yaml_object = os.environ.get(yaml_object.anchor.value, yaml_object)
+                    env_var = yaml_object.anchor.value
+                    self._env_vars[env_var] = os.environ.get(env_var)
+                    yaml_object = os.environ.get(env_var, yaml_object)
 
         # If the yaml object is not a PlainScalarString, does not have an anchor,
         # or it's anchor does not have a value, return
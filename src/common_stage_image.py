@@ -13,6 +13,10 @@ ANY KIND, either express or implied. See the License for the specific
 language governing permissions and limitations under the License.
 """
 
+import constants
+import dry_run
+
+from build_profiler import IMAGE_STEP_CATEGORY, PROFILER
 from codebuild_environment import get_cloned_folder_path
 from context import Context
 from image import DockerImage
@@ -51,12 +55,19 @@ class CommonStageImage(DockerImage):
             "src",
             f"{tarfile_name_for_context}_safety_report.json",
         )
-        generate_safety_report_for_image(
-            pre_push_stage_image_uri, image_info=self.info, storage_file_path=storage_file_path
-        )
-        self.context = self.generate_common_stage_context(
-            storage_file_path, tarfile_name=tarfile_name_for_context
-        )
+        with PROFILER.span("safety scan", category=IMAGE_STEP_CATEGORY, image=self):
+            if constants.DRY_RUN:
+                dry_run.write_stub_safety_report(storage_file_path)
+            else:
+                generate_safety_report_for_image(
+                    pre_push_stage_image_uri,
+                    image_info=self.info,
+                    storage_file_path=storage_file_path,
+                )
+        with PROFILER.span("common stage context", category=IMAGE_STEP_CATEGORY, image=self):
+            self.context = self.generate_common_stage_context(
+                storage_file_path, tarfile_name=tarfile_name_for_context
+            )
 
     def generate_common_stage_context(self, safety_report_path, tarfile_name="common-stage-file"):
         """
@@ -53,13 +53,12 @@ def is_build_enabled():
 
 
 def is_autopatch_build_enabled(buildspec_path=None):
-    from buildspec import Buildspec
+    from buildspec import load_build_plan
 
     if not buildspec_path:
         return False
-    image_buildspec_object = Buildspec()
-    image_buildspec_object.load(buildspec_path)
-    autopatch_build_flag = image_buildspec_object.get("autopatch_build", "False").lower() == "true"
+    build_plan = load_build_plan(buildspec_path)
+    autopatch_build_flag = str(build_plan.get("autopatch_build", "False")).lower() == "true"
     return autopatch_build_flag
 
 
@@ -81,6 +81,20 @@ TEST_TYPE_IMAGES_PATH = os.path.join(os.path.expanduser("~"), "test_type_images.
 # Types of binary links accepted:
 LINK_TYPE = ["s3", "pypi"]
 
+# Build context settings. Compression is one of "none", "fast" or "gz". Since the docker daemon
+# decompresses the context anyway, a fast (or no) compression speeds up creating the context.
+CONTEXT_COMPRESSION = os.environ.get("DLC_CONTEXT_COMPRESSION", "fast")
+CONTEXT_CACHE_PATH = os.environ.get(
+    "DLC_CONTEXT_CACHE_PATH", os.path.join("build", ".context_cache")
+)
+# The least recently used entries of the context cache are evicted at the end of each build,
+# until the cache fits in this size
+CONTEXT_CACHE_MAX_SIZE_MB = int(os.environ.get("DLC_CONTEXT_CACHE_MAX_SIZE_MB", 10 * 1024))
+# Compiled buildspecs, shared by all the processes that load the same buildspec
+BUILD_PLAN_CACHE_PATH = os.environ.get(
+    "DLC_BUILD_PLAN_CACHE_PATH", os.path.join("build", ".build_plans")
+)
+
 ARTIFACT_DOWNLOAD_PATH = os.path.join(os.sep, "docker", "build_artifacts")
 
 # Test types for running code build test jobs
@@ -96,13 +110,99 @@ ECS_TESTS = "ecs"
 EKS_TESTS = "eks"
 ALL_TESTS = ["sagemaker", "ec2", "eks", "ecs"]
 
+# Directory where build logs and build telemetry are written, and the number of lines of the log
+# of each image that are kept in memory
+BUILD_LOGS_PATH = "logs"
+BUILD_LOG_BUFFER_LINES = int(os.environ.get("DLC_BUILD_LOG_BUFFER_LINES", 1000))
+
 # Timeout in seconds for Docker API client.
 API_CLIENT_TIMEOUT = 600
 MAX_WORKER_COUNT_FOR_PUSHING_IMAGES = 3
 
+# Additional tags are written as manifest references straight to the registry in "manifest" mode, and
+# are pushed as a whole image each in "push" mode
+MANIFEST_RETAG_MODE = "manifest"
+PUSH_RETAG_MODE = "push"
+RETAG_MODE = os.environ.get("DLC_RETAG_MODE", MANIFEST_RETAG_MODE)
+# Connect and read timeouts in seconds for requests to the registry API
+REGISTRY_REQUEST_TIMEOUT = (
+    int(os.environ.get("DLC_REGISTRY_CONNECT_TIMEOUT", 10)),
+    int(os.environ.get("DLC_REGISTRY_READ_TIMEOUT", 60)),
+)
+
+# Phases of the image build graph and the max number of images that can be in each phase at once.
+# The limits can be overridden through env variables, e.g. DLC_BUILD_PHASE_CONCURRENCY=4
+BUILD_PHASE = "build"
+COMMON_BUILD_PHASE = "common_build"
+PUSH_PHASE = "push"
+RETAG_PHASE = "retag"
+PHASE_CONCURRENCY_LIMITS = {
+    BUILD_PHASE: int(os.environ.get("DLC_BUILD_PHASE_CONCURRENCY", 10)),
+    COMMON_BUILD_PHASE: int(os.environ.get("DLC_COMMON_BUILD_PHASE_CONCURRENCY", 10)),
+    PUSH_PHASE: int(
+        os.environ.get("DLC_PUSH_PHASE_CONCURRENCY", MAX_WORKER_COUNT_FOR_PUSHING_IMAGES)
+    ),
+    RETAG_PHASE: int(
+        os.environ.get("DLC_RETAG_PHASE_CONCURRENCY", MAX_WORKER_COUNT_FOR_PUSHING_IMAGES)
+    ),
+}
+
+# Builds are admitted by BuildAdmissionController, up to the BUILD_PHASE limit, as long as the host has the disk and
+# memory the already running builds and the next build are estimated to need, and the CPU load per core is below the
+# limit. The disk estimate of a build is its image_size_baseline (MB) times the factor, to account for the build cache
+# and the layers being exported.
+BUILD_HISTORY_PATH = os.environ.get(
+    "DLC_BUILD_HISTORY_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "dlc-build-history.json"),
+)
+DOCKER_ROOT_DIR = os.environ.get("DLC_DOCKER_ROOT_DIR", "/var/lib/docker")
+BUILD_DISK_ESTIMATE_FACTOR = float(os.environ.get("DLC_BUILD_DISK_ESTIMATE_FACTOR", 2))
+BUILD_MEMORY_ESTIMATE_MB = {"cpu": 4096, "gpu": 8192}
+DEFAULT_BUILD_MEMORY_ESTIMATE_MB = 4096
+# Build duration assumed for images without build history, per MB of image_size_baseline
+BUILD_SECONDS_PER_BASELINE_MB = 0.2
+BUILD_DISK_HEADROOM_MB = int(os.environ.get("DLC_BUILD_DISK_HEADROOM_MB", 10240))
+BUILD_MEMORY_HEADROOM_MB = int(os.environ.get("DLC_BUILD_MEMORY_HEADROOM_MB", 2048))
+BUILD_CPU_LOAD_LIMIT = float(os.environ.get("DLC_BUILD_CPU_LOAD_LIMIT", 2))
+BUILD_ADMISSION_POLL_INTERVAL = 10
+
+# Events emitted for every image as it goes through the phases of the build graph. The events are printed, and
+# optionally appended to a JSONL file and summarized as an OpenMetrics file at the end of the build.
+QUEUED_EVENT = "queued"
+DONE_EVENT = "done"
+PHASE_EVENTS = {
+    BUILD_PHASE: "building",
+    COMMON_BUILD_PHASE: "common-build",
+    PUSH_PHASE: "pushing",
+    RETAG_PHASE: "retagging",
+}
+BUILD_EVENTS_PATH = os.environ.get("DLC_BUILD_EVENTS_PATH")
+BUILD_METRICS_PATH = os.environ.get("DLC_BUILD_METRICS_PATH")
+
+# Chrome trace of the stages of image_builder and of the phases of every image, written when the path is set
+BUILD_PROFILE_PATH = os.environ.get("DLC_BUILD_PROFILE_PATH")
+# In dry run mode, image_builder runs against a stub docker client and registry, which simulate build and push
+# durations proportional to the image_size_baseline of each image, and skips ECR logins, autopatch preparation,
+# safety scans and metrics uploads, so that scheduling changes can be tried offline
+DRY_RUN = os.environ.get("DLC_BUILD_DRY_RUN", "false").lower() == "true"
+DRY_RUN_BUILD_SECONDS_PER_BASELINE_MB = float(
+    os.environ.get("DLC_DRY_RUN_BUILD_SECONDS_PER_BASELINE_MB", 0.001)
+)
+DRY_RUN_PUSH_SECONDS_PER_BASELINE_MB = float(
+    os.environ.get("DLC_DRY_RUN_PUSH_SECONDS_PER_BASELINE_MB", 0.0002)
+)
+
 PATCHING_INFO_PATH_WITHIN_DLC = "/opt/aws/dlc/patching-info"
 
 ## TODO: Make this account specific: pr-creation-data-helper-<12_digit_account_id>
 PR_CREATION_DATA_HELPER_BUCKET = "pr-creation-data-helper"
 
 PUBLIC_DLC_REGISTRY = "763104351884"
+
+# Safety is installed once per python version into this directory, which is mounted read-only in the scanned containers
+SAFETY_REQUIREMENT = "safety>=2.2.0,<3"
+SAFETY_INSTALL_CACHE_DIR = os.environ.get(
+    "DLC_SAFETY_INSTALL_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "dlc-safety"),
+)
+SAFETY_INSTALL_MOUNT_PATH = "/opt/dlc-safety"
@@ -13,8 +13,129 @@ ANY KIND, either express or implied. See the License for the specific
 language governing permissions and limitations under the License.
 """
 
+import hashlib
+import json
 import os
+import shutil
 import tarfile
+import tempfile
+import threading
+
+import constants
+
+# Maps (path, size, mtime) of an artifact file to the sha256 of its contents, so that files
+# shared between the contexts of several images are only read and hashed once per process.
+_FILE_DIGESTS = {}
+_FILE_DIGESTS_LOCK = threading.Lock()
+
+# tarfile write modes and file extensions for each supported context compression
+COMPRESSION_MODES = {
+    "none": ("w", ".tar", {}),
+    "fast": ("w:gz", ".tar.gz", {"compresslevel": 1}),
+    "gz": ("w:gz", ".tar.gz", {}),
+}
+
+
+def _get_file_digest(path, stat_result):
+    """
+    Returns the sha256 of the contents of a regular file, memoized on its size and mtime.
+    """
+    key = (path, stat_result.st_size, stat_result.st_mtime_ns)
+    with _FILE_DIGESTS_LOCK:
+        digest = _FILE_DIGESTS.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as file_handle:
+            for chunk in iter(lambda: file_handle.read(1024 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _FILE_DIGESTS_LOCK:
+            _FILE_DIGESTS[key] = digest
+    return digest
+
+
+def get_source_digest(source):
+    """
+    Computes a content address for an artifact source. Files are addressed by their contents and
+    permission bits, symlinks by their target and directories by the addresses of all the entries
+    below them, so that the digest changes whenever the tarred artifact would change.
+
+    :param source: str, path to a file, symlink or directory
+    :return: str, sha256 hex digest
+    """
+    sha = hashlib.sha256()
+    if os.path.isdir(source) and not os.path.islink(source):
+        paths = [source]
+        for dir_path, dir_names, file_names in os.walk(source):
+            dir_names.sort()
+            paths += [os.path.join(dir_path, name) for name in dir_names + sorted(file_names)]
+    else:
+        paths = [source]
+
+    for path in paths:
+        stat_result = os.lstat(path)
+        relative_path = os.path.relpath(path, source)
+        if os.path.islink(path):
+            entry = f"link:{os.readlink(path)}"
+        elif os.path.isdir(path):
+            entry = "dir"
+        else:
+            entry = f"file:{_get_file_digest(path, stat_result)}"
+        sha.update(f"{relative_path}:{stat_result.st_mode & 0o7777}:{entry}\n".encode())
+    return sha.hexdigest()
+
+
+def _atomic_write_tar(destination, mode, write_members, **kwargs):
+    """
+    Writes a tarball next to its destination and moves it in place once it is complete, so
+    that concurrent builders never observe a partially written cache entry.
+    """
+    directory = os.path.dirname(destination) or "."
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(file_descriptor)
+    try:
+        with tarfile.open(temp_path, mode, **kwargs) as tar:
+            write_members(tar)
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def prune_context_cache(cache_path=None, max_size_mb=None):
+    """
+    Evicts the least recently used entries of the context cache, cached contexts and artifact
+    tarballs alike, until the cache fits in max_size_mb. Entries are touched whenever they are
+    reused, so their mtime is the time they were last used. Must not run while contexts are being
+    created, e.g. at the end of the build.
+
+    :param cache_path: str, directory of the cache, defaults to constants.CONTEXT_CACHE_PATH
+    :param max_size_mb: int, defaults to constants.CONTEXT_CACHE_MAX_SIZE_MB
+    :return: int, number of evicted entries
+    """
+    cache_path = cache_path or constants.CONTEXT_CACHE_PATH
+    max_size = (
+        (constants.CONTEXT_CACHE_MAX_SIZE_MB if max_size_mb is None else max_size_mb) * 1024 * 1024
+    )
+    entries = []
+    for directory in (cache_path, os.path.join(cache_path, "members")):
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as dir_entries:
+            for dir_entry in dir_entries:
+                if dir_entry.is_file(follow_symlinks=False):
+                    stat_result = dir_entry.stat(follow_symlinks=False)
+                    entries.append((stat_result.st_mtime, stat_result.st_size, dir_entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        os.remove(path)
+        total_size -= size
+        evicted += 1
+    return evicted
 
 
 class Context:
@@ -23,7 +144,14 @@ class Context:
     preparing, managing and removing the docker build context
     """
 
-    def __init__(self, artifacts=None, context_path="context.tar.gz", artifact_root="./"):
+    def __init__(
+        self,
+        artifacts=None,
+        context_path="context.tar.gz",
+        artifact_root="./",
+        compression=None,
+        cache_path=None,
+    ):
         """
         The constructor for the Context class
 
@@ -31,6 +159,11 @@ class Context:
             artifacts: array of (source, destination) tuples
             context_path: path for the resulting tar.gz file
             artifact_root: root directory for all artifacts
+            compression: one of COMPRESSION_MODES, defaults to constants.CONTEXT_COMPRESSION.
+                The docker daemon detects the compression of the context from its contents,
+                so an uncompressed context can still be written to a .tar.gz path.
+            cache_path: directory of the content addressed cache, defaults to
+                constants.CONTEXT_CACHE_PATH
 
         Returns:
             None
@@ -39,39 +172,109 @@ class Context:
         self.artifacts = {}
         self.context_path = context_path
         self.artifact_root = artifact_root
+        self.compression = compression or constants.CONTEXT_COMPRESSION
+        if self.compression not in COMPRESSION_MODES:
+            raise ValueError(
+                f"Unsupported context compression {self.compression}. "
+                f"Choose one of {list(COMPRESSION_MODES)}"
+            )
+        self.cache_path = cache_path or constants.CONTEXT_CACHE_PATH
+        self.manifest_hash = None
 
         # Check if the context path is just a filename,
         # or includes a directory. If path includes a
         # directory, create directory if it does not exist
         directory = os.path.dirname(context_path)
-        if directory != "" and not os.path.isdir(directory):
-            os.mkdir(directory)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(os.path.join(self.cache_path, "members"), exist_ok=True)
 
         if artifacts is not None:
             self.add(artifacts)
 
+    def get_manifest(self):
+        """
+        Lists the (target, source, digest) entries of all artifacts in the context, in the order in
+        which they are added to the tarball
+
+        Returns:
+            list of tuples
+        """
+        manifest = []
+        # TODO: Use glob to expand
+        for artifact in self.artifacts.values():
+            if "source" not in artifact or "target" not in artifact:
+                continue
+            source = os.path.join(self.artifact_root, artifact["source"])
+            manifest.append((artifact["target"], source, get_source_digest(source)))
+        return manifest
+
+    def _get_cached_member_path(self, target, source, digest):
+        """
+        Returns the path of an uncompressed tarball holding a single artifact tarred under its
+        target name, creating it on a cache miss.
+        """
+        member_key = hashlib.sha256(f"{target}:{digest}".encode()).hexdigest()
+        member_path = os.path.join(self.cache_path, "members", f"{member_key}.tar")
+        if os.path.exists(member_path):
+            os.utime(member_path)
+        else:
+            _atomic_write_tar(member_path, "w", lambda tar: tar.add(source, arcname=target))
+        return member_path
+
+    def _write_context(self, manifest, destination):
+        """
+        Assembles the context tarball from the cached tarballs of its artifacts
+        """
+
+        def write_members(tar):
+            for target, source, digest in manifest:
+                with tarfile.open(self._get_cached_member_path(target, source, digest)) as member:
+                    for tar_info in member:
+                        file_object = member.extractfile(tar_info) if tar_info.isfile() else None
+                        tar.addfile(tar_info, file_object)
+
+        mode, _, kwargs = COMPRESSION_MODES[self.compression]
+        _atomic_write_tar(destination, mode, write_members, **kwargs)
+
     def add(self, artifacts):
         """
-        Adds artifacts to the build context
+        Adds artifacts to the build context. The resulting tarball is content addressed on the
+        digests of all artifacts, so it is only re-created when one of the artifacts changed, and
+        is shared between all contexts made of the same artifacts.
         Parameters:
             artifacts: array of (source, destination) tuples
         """
         self.artifacts.update(artifacts)
 
-        # TODO: Use glob to expand
-        # TODO: Add logic to untar and retar
-        with tarfile.open(self.context_path, "w:gz") as tar:
-            for artifact_name in artifacts:
-                artifact = artifacts[artifact_name]
-                if "source" not in artifact or "target" not in artifact:
-                    continue
-                source = os.path.join(self.artifact_root, artifact["source"])
-                target = artifact["target"]
-                tar.add(source, arcname=target)
+        manifest = self.get_manifest()
+        manifest_hash = hashlib.sha256(
+            json.dumps(
+                [self.compression] + [(target, digest) for target, _, digest in manifest]
+            ).encode()
+        ).hexdigest()
+        if manifest_hash == self.manifest_hash and os.path.exists(self.context_path):
+            return
+
+        _, extension, _ = COMPRESSION_MODES[self.compression]
+        cached_context_path = os.path.join(self.cache_path, f"{manifest_hash}{extension}")
+        if os.path.exists(cached_context_path):
+            os.utime(cached_context_path)
+        else:
+            self._write_context(manifest, cached_context_path)
+
+        if os.path.exists(self.context_path):
+            os.remove(self.context_path)
+        try:
+            os.link(cached_context_path, self.context_path)
+        except OSError:
+            shutil.copyfile(cached_context_path, self.context_path)
+        self.manifest_hash = manifest_hash
 
     def remove(self):
         """
-        Removes the context tar file
+        Removes the context tar file. The cached copy of the context is kept, so that
+        other images using the same artifacts can reuse it, until prune_context_cache evicts it.
 
         Parameters:
             None
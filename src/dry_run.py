@@ -0,0 +1,99 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import json
+import logging
+import time
+
+import constants
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+class StubDockerClient:
+    """
+    Stand-in for docker.APIClient used in dry run mode. Builds and pushes only take time, and the
+    built image is as large as its size baseline.
+    """
+
+    def __init__(self, image_size_mb, build_seconds, push_seconds):
+        """
+        :param image_size_mb: int, size reported for the built image
+        :param build_seconds: float, simulated duration of a build
+        :param push_seconds: float, simulated duration of a push
+        """
+        self.image_size_mb = image_size_mb
+        self.build_seconds = build_seconds
+        self.push_seconds = push_seconds
+
+    def build(self, tag=None, **kwargs):
+        yield {"stream": f"Step 1/1 : dry run build of {tag}\n"}
+        time.sleep(self.build_seconds)
+        yield {"stream": f"Successfully tagged {tag}\n"}
+
+    def history(self, image):
+        return []
+
+    def inspect_image(self, image):
+        return {"Size": self.image_size_mb * 1024 * 1024}
+
+    def push(self, repository, tag=None, **kwargs):
+        time.sleep(self.push_seconds)
+        yield {"status": f"dry run push of {repository}:{tag}"}
+
+    def tag(self, image, repository, tag=None, **kwargs):
+        return True
+
+
+class StubRegistryClient:
+    """
+    Stand-in for RegistryClient used in dry run mode, for which every manifest is complete.
+    """
+
+    @classmethod
+    def from_repository(cls, repository):
+        return cls(), repository.split("/", 1)[-1]
+
+    def retag(self, repository_name, source_tag, target_tags):
+        return []
+
+
+def get_stub_docker_client(image):
+    """
+    :param image: DockerImage
+    :return: StubDockerClient, simulating durations proportional to the image size baseline. Common
+        stage builds only add the safety report on top of the pre-push image, so they are short.
+    """
+    image_size_mb = image.info.get("image_size_baseline") or 0
+    build_seconds = image_size_mb * constants.DRY_RUN_BUILD_SECONDS_PER_BASELINE_MB
+    if image.stage == constants.COMMON_STAGE:
+        build_seconds /= 10
+    return StubDockerClient(
+        image_size_mb=image_size_mb,
+        build_seconds=build_seconds,
+        push_seconds=image_size_mb * constants.DRY_RUN_PUSH_SECONDS_PER_BASELINE_MB,
+    )
+
+
+def write_stub_safety_report(storage_file_path):
+    """
+    Writes an empty safety report in place of the one generated by scanning the pre-push image.
+
+    :param storage_file_path: str, path of the safety report
+    """
+    LOGGER.info(f"Dry run, writing empty safety report to {storage_file_path}")
+    with open(storage_file_path, "w") as report_file:
+        json.dump([], report_file)
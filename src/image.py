@@ -13,6 +13,7 @@ ANY KIND, either express or implied. See the License for the specific
 language governing permissions and limitations under the License.
 """
 
+import os
 from datetime import datetime
 
 from docker import APIClient
@@ -22,6 +23,12 @@ import constants
 import logging
 import json
 
+import dry_run
+
+from build_log import BuildLog, BuildTelemetry
+from build_profiler import IMAGE_CATEGORY, IMAGE_STEP_CATEGORY, PROFILER
+from registry import RegistryClient
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
@@ -70,8 +77,16 @@ class DockerImage:
 
         self.to_build = to_build
         self.build_status = None
-        self.client = APIClient(base_url=constants.DOCKER_URL, timeout=constants.API_CLIENT_TIMEOUT)
-        self.log = []
+        if constants.DRY_RUN:
+            self.client = dry_run.get_stub_docker_client(self)
+        else:
+            self.client = APIClient(
+                base_url=constants.DOCKER_URL, timeout=constants.API_CLIENT_TIMEOUT
+            )
+        self.log = BuildLog(
+            os.path.join(constants.BUILD_LOGS_PATH, f"{self.info.get('name')}-{self.stage}")
+        )
+        self.build_telemetry = BuildTelemetry()
         self._corresponding_common_stage_image = None
         self.target = target
 
@@ -140,7 +155,15 @@ class DockerImage:
         :param number_of_lines: int, number of ending lines to be printed
         :return: str, last number_of_lines of the logs concatenated with a new line
         """
-        return "\n".join(self.log[-1][-number_of_lines:])
+        return "\n".join(self.log.tail(number_of_lines))
+
+    def save_build_telemetry(self):
+        """
+        Writes the per-step build telemetry of the image as JSON next to its build log.
+
+        :return: str, path of the telemetry file
+        """
+        return self.build_telemetry.save(f"{self.log.log_path}.telemetry.json")
 
     def update_pre_build_configuration(self):
         """
@@ -161,22 +184,28 @@ class DockerImage:
 
         :return: int, Build Status
         """
+        with PROFILER.span(f"{self.stage} build", category=IMAGE_CATEGORY, image=self):
+            return self._build()
+
+    def _build(self):
         self.summary["start_time"] = datetime.now()
 
         # Confirm if building the image is required or not
         if not self.to_build:
-            self.log.append(["Not built"])
+            self.log.write("Not built")
             self.build_status = constants.NOT_BUILT
             self.summary["status"] = constants.STATUS_MESSAGE[self.build_status]
             return self.build_status
 
         # Conduct some preprocessing before building the image
-        self.update_pre_build_configuration()
+        with PROFILER.span("pre-build configuration", category=IMAGE_STEP_CATEGORY, image=self):
+            self.update_pre_build_configuration()
 
         # Start building the image
-        with open(self.context.context_path, "rb") as context_file:
-            self.docker_build(fileobj=context_file, custom_context=True)
-            self.context.remove()
+        with PROFILER.span("docker build", category=IMAGE_STEP_CATEGORY, image=self):
+            with open(self.context.context_path, "rb") as context_file:
+                self.docker_build(fileobj=context_file, custom_context=True)
+                self.context.remove()
 
         if self.build_status != constants.SUCCESS:
             LOGGER.info(f"Exiting with image build status {self.build_status} without image check.")
@@ -188,7 +217,8 @@ class DockerImage:
             self.summary["end_time"] = datetime.now()
 
         # check the size after image is built.
-        self.image_size_check()
+        with PROFILER.span("image size check", category=IMAGE_STEP_CATEGORY, image=self):
+            self.image_size_check()
 
         # This return is necessary. Otherwise FORMATTER fails while displaying the status.
         return self.build_status
@@ -201,7 +231,7 @@ class DockerImage:
         :param custom_context: bool
         :return: int, Build Status
         """
-        response = [f"Starting the Build Process for {self.repository}:{self.tag}"]
+        self.log.write(f"Starting the Build Process for {self.repository}:{self.tag}")
         LOGGER.info(f"Starting the Build Process for {self.repository}:{self.tag}")
 
         line_counter = 0
@@ -223,8 +253,8 @@ class DockerImage:
             line_counter += 1
 
             if line.get("error") is not None:
-                response.append(line["error"])
-                self.log.append(response)
+                self.log.write(line["error"])
+                self.build_telemetry.finish()
                 self.build_status = constants.FAIL
                 self.summary["status"] = constants.STATUS_MESSAGE[self.build_status]
                 self.summary["end_time"] = datetime.now()
@@ -238,13 +268,18 @@ class DockerImage:
                 return self.build_status
 
             if line.get("stream") is not None:
-                response.append(line["stream"])
+                self.log.write(line["stream"])
+                self.build_telemetry.observe(line["stream"])
             elif line.get("status") is not None:
-                response.append(line["status"])
+                self.log.write(line["status"])
             else:
-                response.append(str(line))
+                self.log.write(str(line))
 
-        self.log.append(response)
+        self.build_telemetry.finish()
+        try:
+            self.build_telemetry.add_layer_sizes(self.client.history(self.ecr_url))
+        except Exception as e:
+            LOGGER.warning(f"Unable to get layer sizes for {self.ecr_url}: {e}")
 
         LOGGER.info(f"DOCKER BUILD LOGS: \n{self.get_tail_logs_in_pretty_format()}")
         LOGGER.info(f"Completed Build for {self.repository}:{self.tag}")
@@ -291,11 +326,16 @@ class DockerImage:
         if tag_value is None:
             tag = self.tag
 
-        response = [f"Starting image Push for {self.repository}:{tag}"]
+        # Pushes of additional tags are steps of the retag phase
+        category = IMAGE_CATEGORY if tag_value is None else IMAGE_STEP_CATEGORY
+        with PROFILER.span("push", category=category, image=self, tag=tag):
+            return self._push_image(tag)
+
+    def _push_image(self, tag):
+        self.log.write(f"Starting image Push for {self.repository}:{tag}")
         for line in self.client.push(self.repository, tag, stream=True, decode=True):
             if line.get("error") is not None:
-                response.append(line["error"])
-                self.log.append(response)
+                self.log.write(line["error"])
                 self.build_status = constants.FAIL
                 self.summary["status"] = constants.STATUS_MESSAGE[self.build_status]
                 self.summary["end_time"] = datetime.now()
@@ -308,9 +348,9 @@ class DockerImage:
 
                 return self.build_status
             if line.get("stream") is not None:
-                response.append(line["stream"])
+                self.log.write(line["stream"])
             else:
-                response.append(str(line))
+                self.log.write(str(line))
 
         self.summary["status"] = constants.STATUS_MESSAGE[self.build_status]
         self.summary["end_time"] = datetime.now()
@@ -318,19 +358,78 @@ class DockerImage:
         if "pushed_uris" not in self.summary:
             self.summary["pushed_uris"] = []
         self.summary["pushed_uris"].append(f"{self.repository}:{tag}")
-        response.append(f"Completed Push for {self.repository}:{tag}")
-        self.log.append(response)
+        self.log.write(f"Completed Push for {self.repository}:{tag}")
 
         LOGGER.info(f"DOCKER PUSH LOGS: \n {self.get_tail_logs_in_pretty_format(2)}")
         return self.build_status
 
     def push_image_with_additional_tags(self):
         """
-        Pushes an already built Docker image by applying additional tags to it.
+        Pushes an already built Docker image by applying additional tags to it. With the manifest
+        retag mode, the additional tags are written straight to the registry, reusing the manifest
+        of the image that was already pushed. If this is not possible, e.g. because some layers the
+        manifest refers to are missing, the image is tagged locally and pushed for every tag.
+
+        :return: int, states if the Push was successful or not
+        """
+        with PROFILER.span("retag", category=IMAGE_CATEGORY, image=self):
+            if constants.RETAG_MODE == constants.MANIFEST_RETAG_MODE and self.additional_tags:
+                if self.retag_with_registry_manifests():
+                    return self.build_status
+            return self.tag_and_push_additional_tags()
+
+    def retag_with_registry_manifests(self):
+        """
+        Writes the additional tags of the image as new manifest references in the registry,
+        without uploading any layer.
+
+        :return: bool, True if all additional tags were written
+        """
+        self.log.write(f"Started manifest retagging for {self.ecr_url}")
+        try:
+            registry_client_class = (
+                dry_run.StubRegistryClient if constants.DRY_RUN else RegistryClient
+            )
+            registry_client, repository_name = registry_client_class.from_repository(
+                self.repository
+            )
+            missing_references = registry_client.retag(
+                repository_name, self.tag, self.additional_tags
+            )
+        except Exception as e:
+            self.log.write(f"Manifest retagging failed for {self.ecr_url}: {e}")
+            LOGGER.warning(
+                f"Manifest retagging failed for {self.ecr_url}, pushing tags instead: {e}"
+            )
+            return False
+        if missing_references:
+            self.log.write(
+                f"Manifest of {self.ecr_url} refers to missing digests {missing_references}"
+            )
+            LOGGER.warning(f"Manifest of {self.ecr_url} is incomplete, pushing tags instead")
+            return False
+
+        if "pushed_uris" not in self.summary:
+            self.summary["pushed_uris"] = []
+        for additional_tag in self.additional_tags:
+            self.summary["pushed_uris"].append(f"{self.repository}:{additional_tag}")
+            self.log.write(
+                f"Tagged {self.ecr_url} in registry as {self.repository}:{additional_tag}"
+            )
+        self.summary["status"] = constants.STATUS_MESSAGE[self.build_status]
+        self.summary["end_time"] = datetime.now()
+        self.log.write(f"Completed manifest retagging for {self.ecr_url}")
+
+        LOGGER.info(f"MANIFEST RETAG LOGS: \n {self.get_tail_logs_in_pretty_format(5)}")
+        return True
+
+    def tag_and_push_additional_tags(self):
+        """
+        Applies each additional tag to the local image and pushes it.
 
         :return: int, states if the Push was successful or not
         """
-        self.log.append([f"Started Tagging for {self.ecr_url}"])
+        self.log.write(f"Started Tagging for {self.ecr_url}")
         for additional_tag in self.additional_tags:
             response = [f"Tagging {self.ecr_url} as {self.repository}:{additional_tag}"]
             tagging_successful = self.client.tag(self.ecr_url, self.repository, additional_tag)
@@ -353,7 +452,7 @@ class DockerImage:
 
         self.summary["status"] = constants.STATUS_MESSAGE[self.build_status]
         self.summary["end_time"] = datetime.now()
-        self.log.append([f"Completed Tagging for {self.ecr_url}"])
+        self.log.write(f"Completed Tagging for {self.ecr_url}")
 
         LOGGER.info(f"DOCKER TAG and PUSH LOGS: \n {self.get_tail_logs_in_pretty_format(5)}")
         return self.build_status
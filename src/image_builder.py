@@ -23,16 +23,19 @@ from copy import deepcopy
 
 import constants
 import utils
-import itertools
 import patch_helper
 
 from codebuild_environment import get_codebuild_project_name, get_cloned_folder_path
 from config import is_build_enabled, is_autopatch_build_enabled
-from context import Context
+from context import Context, prune_context_cache
 from metrics import Metrics
 from image import DockerImage
 from common_stage_image import CommonStageImage
 from buildspec import Buildspec
+from build_admission import BuildAdmissionController
+from build_events import BuildEventLog
+from build_profiler import PROFILER
+from build_scheduler import BuildScheduler
 from output import OutputFormatter
 from utils import get_dummy_boto_client
 
@@ -67,6 +70,9 @@ def _find_image_object(images_list, image_name):
 
 
 def _login_to_prod_ecr_registry():
+    if constants.DRY_RUN:
+        FORMATTER.print("Dry run, skipping login into public ECR")
+        return
     FORMATTER.print("Logging into public ECR")
     os.system(
         "aws ecr get-login-password --region us-west-2 | docker login --username AWS --password-stdin 763104351884.dkr.ecr.us-west-2.amazonaws.com"
@@ -89,13 +95,14 @@ def image_builder(buildspec, image_types=[], device_types=[]):
     print(f"BUILDSPEC: {BUILDSPEC}")
     PRE_PUSH_STAGE_IMAGES = []
     COMMON_STAGE_IMAGES = []
+    autopatch_build_enabled = is_autopatch_build_enabled(buildspec_path=buildspec)
 
     if (
         "huggingface" in str(BUILDSPEC["framework"])
         or "autogluon" in str(BUILDSPEC["framework"])
         or "stabilityai" in str(BUILDSPEC["framework"])
         or "trcomp" in str(BUILDSPEC["framework"])
-        or is_autopatch_build_enabled(buildspec_path=buildspec)
+        or autopatch_build_enabled
     ):
         _login_to_prod_ecr_registry()
 
@@ -116,7 +123,7 @@ def image_builder(buildspec, image_types=[], device_types=[]):
         tag_override = image_config.get("skip_build", "False").lower() == "true"
 
         prod_repo_uri = ""
-        if is_autopatch_build_enabled(buildspec_path=buildspec) or tag_override:
+        if autopatch_build_enabled or tag_override:
             prod_repo_uri = utils.derive_prod_image_uri_using_image_config_from_buildspec(
                 image_config=image_config,
                 framework=BUILDSPEC["framework"],
@@ -138,7 +145,7 @@ def image_builder(buildspec, image_types=[], device_types=[]):
         else:
             image_tag = image_config["tag"]
 
-        if is_autopatch_build_enabled(buildspec_path=buildspec):
+        if autopatch_build_enabled:
             image_tag = append_tag(image_tag, "autopatch")
 
         additional_image_tags = []
@@ -218,7 +225,7 @@ def image_builder(buildspec, image_types=[], device_types=[]):
         dockerfile = image_config["docker_file"]
         target = image_config.get("target")
         if tag_override and build_context == "PR":
-            if is_autopatch_build_enabled(buildspec_path=buildspec):
+            if autopatch_build_enabled:
                 FORMATTER.print("AUTOPATCH ENABLED IN BUILDSPEC, CANNOT OVERRIDE WITH TAG, SORRY!")
             else:
                 _login_to_prod_ecr_registry()
@@ -266,20 +273,21 @@ def image_builder(buildspec, image_types=[], device_types=[]):
             else str(BUILDSPEC["version"])
         )
         template_fw = str(BUILDSPEC["framework"])
-        sitecustomize_post_template_file = utils.generate_dlc_cmd(
-            template_path=sitecustomize_template_file,
-            output_path=os.path.join(image_config["root"], "out.py"),
-            framework=template_fw,
-            framework_version=template_fw_version,
-            container_type=label_job_type,
-        )
-        bash_post_template_file = utils.generate_dlc_cmd(
-            template_path=bash_template_file,
-            output_path=os.path.join(image_config["root"], "telemetry.sh"),
-            framework=template_fw,
-            framework_version=template_fw_version,
-            container_type=label_job_type,
-        )
+        with PROFILER.span("template generation", image_name=image_name):
+            sitecustomize_post_template_file = utils.generate_dlc_cmd(
+                template_path=sitecustomize_template_file,
+                output_path=os.path.join(image_config["root"], "out.py"),
+                framework=template_fw,
+                framework_version=template_fw_version,
+                container_type=label_job_type,
+            )
+            bash_post_template_file = utils.generate_dlc_cmd(
+                template_path=bash_template_file,
+                output_path=os.path.join(image_config["root"], "telemetry.sh"),
+                framework=template_fw,
+                framework_version=template_fw_version,
+                container_type=label_job_type,
+            )
 
         ARTIFACTS.update(
             {
@@ -291,7 +299,8 @@ def image_builder(buildspec, image_types=[], device_types=[]):
             }
         )
 
-        context = Context(ARTIFACTS, f"build/{image_name}.tar.gz", image_config["root"])
+        with PROFILER.span("context creation", image_name=image_name):
+            context = Context(ARTIFACTS, f"build/{image_name}.tar.gz", image_config["root"])
 
         if "labels" in image_config:
             labels.update(image_config.get("labels"))
@@ -358,6 +367,7 @@ def image_builder(buildspec, image_types=[], device_types=[]):
             "image_type": str(image_config["image_type"]),
             "image_size_baseline": int(image_config["image_size_baseline"]),
             "base_image_uri": base_image_uri,
+            "base_image_name": image_config.get("base_image_name"),
             "enable_test_promotion": image_config.get("enable_test_promotion", True),
             "test_configs": image_config.get("test_configs", None),
             "labels": labels,
@@ -393,24 +403,25 @@ def image_builder(buildspec, image_types=[], device_types=[]):
         PRE_PUSH_STAGE_IMAGES.append(pre_push_stage_image_object)
         FORMATTER.separator()
 
-    if is_autopatch_build_enabled(buildspec_path=buildspec) and is_build_enabled():
+    if autopatch_build_enabled and is_build_enabled() and not constants.DRY_RUN:
         FORMATTER.banner("APATCH-PREP")
-        patch_helper.initiate_multithreaded_autopatch_prep(
-            PRE_PUSH_STAGE_IMAGES, make_dummy_boto_client=True
-        )
+        with PROFILER.span("autopatch prep"):
+            patch_helper.initiate_multithreaded_autopatch_prep(
+                PRE_PUSH_STAGE_IMAGES, make_dummy_boto_client=True
+            )
 
     FORMATTER.banner("DLC")
 
-    # Parent images do not inherit from any containers built in this job
-    # Child images use one of the parent images as their base image
-    parent_images = [image for image in PRE_PUSH_STAGE_IMAGES if not image.is_child_image]
-    child_images = [image for image in PRE_PUSH_STAGE_IMAGES if image.is_child_image]
     ALL_IMAGES = PRE_PUSH_STAGE_IMAGES + COMMON_STAGE_IMAGES
     IMAGES_TO_PUSH = [image for image in ALL_IMAGES if image.to_push and image.to_build]
 
-    pushed_images = []
-    pushed_images += process_images(parent_images, "Parent/Independent", buildspec_path=buildspec)
-    pushed_images += process_images(child_images, "Child/Dependent", buildspec_path=buildspec)
+    with PROFILER.span("build graph"):
+        pushed_images = process_images(PRE_PUSH_STAGE_IMAGES, buildspec_path=buildspec)
+
+    # All contexts are built, so the least recently used ones can be evicted from the cache
+    evicted_entries = prune_context_cache()
+    if evicted_entries:
+        FORMATTER.print(f"Evicted {evicted_entries} entries from the build context cache")
 
     assert all(
         image in pushed_images for image in IMAGES_TO_PUSH
@@ -426,9 +437,12 @@ def image_builder(buildspec, image_types=[], device_types=[]):
     # From all images, filter the images that were supposed to be built and upload their metrics
     BUILT_IMAGES = [image for image in ALL_IMAGES if image.to_build]
 
-    if BUILT_IMAGES:
+    if BUILT_IMAGES and not constants.DRY_RUN:
         FORMATTER.banner("Upload Metrics")
-        upload_metrics(BUILT_IMAGES, BUILDSPEC, is_any_build_failed, is_any_build_failed_size_limit)
+        with PROFILER.span("metrics upload"):
+            upload_metrics(
+                BUILT_IMAGES, BUILDSPEC, is_any_build_failed, is_any_build_failed_size_limit
+            )
 
     # Set environment variables to be consumed by test jobs
     test_trigger_job = get_codebuild_project_name()
@@ -448,45 +462,69 @@ def image_builder(buildspec, image_types=[], device_types=[]):
         )
 
 
+def write_build_profile():
+    """
+    Displays the duration of the stages of image_builder and the critical path of the build, and
+    writes the Chrome trace of the build to constants.BUILD_PROFILE_PATH. Does nothing unless
+    profiling is enabled.
+    """
+    if not PROFILER.enabled:
+        return
+    FORMATTER.banner("Profile")
+    FORMATTER.table(PROFILER.get_report_rows())
+    PROFILER.write_chrome_trace(constants.BUILD_PROFILE_PATH)
+    FORMATTER.print(f"Chrome trace of the build written to {constants.BUILD_PROFILE_PATH}")
+
+
 def process_images(pre_push_image_list, pre_push_image_type="Pre-push", buildspec_path=""):
     """
-    Handles all the tasks related to a particular type of Pre Push images. It takes in the list of
-    pre push images and then builds it. After the pre-push images have been built, it extracts the
-    corresponding common stage images for the pre-push images and builds those common stage images.
-    After the common stage images have been built, it finds outs the docker images that need to be
-    pushed and pushes them accordingly.
+    Handles all the tasks related to the Pre Push images. It takes in the list of pre push images
+    and schedules them as a dependency graph using BuildScheduler. Each pre-push image goes through
+    its own build -> common stage build -> push -> retag chain, which starts as soon as the image it
+    is built on top of (if any) has been built. Images do not wait for unrelated images to finish.
 
-    Note that the common stage images should always be built after the pre-push images of a
-    particular kind. This is because the Common stage images use are built on respective
-    Standard and Example images.
+    Note that the common stage image of a pre-push image is always built after that pre-push image.
+    This is because the Common stage images are built on respective Standard and Example images.
 
     :param pre_push_image_list: list[DockerImage], list of pre-push images
     :param pre_push_image_type: str, used to display the message on the logs
+    :param buildspec_path: str, path of the buildspec used for the build
     :return: list[DockerImage], images that were supposed to be pushed.
     """
-    FORMATTER.banner(f"{pre_push_image_type} Build")
-    build_images(pre_push_image_list)
-
-    FORMATTER.banner(f"{pre_push_image_type} Common Build")
+    FORMATTER.banner(f"{pre_push_image_type} Build Graph")
     common_stage_image_list = [
         image.corresponding_common_stage_image
         for image in pre_push_image_list
         if image.corresponding_common_stage_image is not None
     ]
-    build_images(common_stage_image_list, make_dummy_boto_client=True)
-
-    FORMATTER.banner(f"{pre_push_image_type} Push Images")
     all_images = pre_push_image_list + common_stage_image_list
     images_to_push = [image for image in all_images if image.to_push and image.to_build]
 
-    if is_autopatch_build_enabled(buildspec_path=buildspec_path):
-        for image in images_to_push:
-            patch_helper.retrive_autopatched_image_history_and_upload_to_s3(image_uri=image.ecr_url)
-
-    push_images(images_to_push)
+    def upload_autopatched_image_history(image):
+        patch_helper.retrive_autopatched_image_history_and_upload_to_s3(image_uri=image.ecr_url)
 
-    FORMATTER.banner(f"{pre_push_image_type} Retagging")
-    retag_and_push_images(images_to_push)
+    on_push = None
+    if is_autopatch_build_enabled(buildspec_path=buildspec_path):
+        on_push = upload_autopatched_image_history
+
+    admission_controller = BuildAdmissionController()
+    event_log = BuildEventLog()
+    scheduler = BuildScheduler(
+        pre_push_image_list,
+        on_push=on_push,
+        admission_controller=admission_controller,
+        event_log=event_log,
+    )
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(len(pre_push_image_list), 1)
+    ) as executor:
+        #### TODO: Remove this entire block when get_dummy_boto_client is removed ####
+        get_dummy_boto_client()
+        THREADS = scheduler.submit(executor)
+        # the FORMATTER.progress(THREADS) function call also waits until all threads have completed
+        FORMATTER.progress(THREADS)
+    admission_controller.save_history()
+    event_log.close()
     return images_to_push
 
 
@@ -526,22 +564,18 @@ def show_build_info(images):
     :param images: list[DockerImage]
     """
 
-    if not os.path.isdir("logs"):
-        os.makedirs("logs")
-
     for image in images:
         image_description = f"{image.name}-{image.stage}"
         FORMATTER.title(image_description)
         FORMATTER.table(image.info.items())
 
-        flattened_logs = list(itertools.chain(*image.log))
-        with open(f"logs/{image_description}", "w") as fp:
-            fp.write("/n".join(flattened_logs))
-            image.summary["log"] = f"logs/{image_description}"
+        image.log.close()
+        image.summary["log"] = image.log.log_path
+        image.summary["build_telemetry"] = image.save_build_telemetry()
         FORMATTER.table(image.summary.items())
 
         FORMATTER.title(f"Ending Logs for {image_description}")
-        FORMATTER.print_lines(image.log[-1][-2:])
+        FORMATTER.print_lines(image.log.tail(2))
 
 
 def show_build_errors(images):
@@ -557,7 +591,7 @@ def show_build_errors(images):
     for image in images:
         if image.build_status == constants.FAIL:
             FORMATTER.title(image.name)
-            FORMATTER.print_lines(image.log[-1][-10:])
+            FORMATTER.print_lines(image.log.tail(10))
             is_any_build_failed = True
         else:
             if image.build_status == constants.FAIL_IMAGE_SIZE_LIMIT:
@@ -601,58 +635,6 @@ def upload_metrics(images, BUILDSPEC, is_any_build_failed, is_any_build_failed_s
     FORMATTER.print("Metrics Uploaded")
 
 
-def build_images(images, make_dummy_boto_client=False):
-    """
-    Takes a list of images and executes their build process concurrently.
-
-    :param images: list[DockerImage]
-    :param make_dummy_boto_client: bool, specifies if a dummy client should be declared or not.
-
-    TODO: The parameter make_dummy_boto_client should be removed when get_dummy_boto_client method is removed.
-    """
-    THREADS = {}
-    # In the context of the ThreadPoolExecutor each instance of image.build submitted
-    # to it is executed concurrently in a separate thread.
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        #### TODO: Remove this entire if block when get_dummy_boto_client is removed ####
-        if make_dummy_boto_client:
-            get_dummy_boto_client()
-        for image in images:
-            THREADS[image.name] = executor.submit(image.build)
-    # the FORMATTER.progress(THREADS) function call also waits until all threads have completed
-    FORMATTER.progress(THREADS)
-
-
-def push_images(images):
-    """
-    Takes a list of images and PUSHES them to ECR concurrently.
-
-    :param images: list[DockerImage]
-    """
-    THREADS = {}
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=constants.MAX_WORKER_COUNT_FOR_PUSHING_IMAGES
-    ) as executor:
-        for image in images:
-            THREADS[image.name] = executor.submit(image.push_image)
-    FORMATTER.progress(THREADS)
-
-
-def retag_and_push_images(images):
-    """
-    Takes a list of images, retags them and pushes to the repository
-
-    :param images: list[DockerImage]
-    """
-    THREADS = {}
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=constants.MAX_WORKER_COUNT_FOR_PUSHING_IMAGES
-    ) as executor:
-        for image in images:
-            THREADS[image.name] = executor.submit(image.push_image_with_additional_tags)
-    FORMATTER.progress(THREADS)
-
-
 def tag_image_with_pr_number(image_tag):
     pr_number = os.getenv("PR_NUMBER")
     return f"{image_tag}-pr-{pr_number}"
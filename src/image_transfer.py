@@ -1,7 +1,6 @@
 import os
 import sys
 import json
-import boto3
 import logging
 
 from invoke import run
@@ -12,6 +11,7 @@ LOGGER = logging.getLogger(__name__)
 LOGGER.addHandler(logging.StreamHandler(sys.stdout))
 LOGGER.setLevel(logging.INFO)
 
+from boto_clients import get_boto_client
 from test import test_utils
 
 
@@ -37,7 +37,7 @@ def pull_image_locally_with_all_its_tags_attached(image_uri):
     """
     run(f"docker pull {image_uri}", hide=True)
     image_region = test_utils.get_region_from_image_uri(image_uri=image_uri)
-    ecr_client = boto3.client("ecr", region_name=image_region)
+    ecr_client = get_boto_client("ecr", region_name=image_region)
     image_repo = image_uri.split(":")[0]
     tag_list = test_utils.get_all_the_tags_of_an_image_from_ecr(
         ecr_client=ecr_client, image_uri=image_uri
@@ -57,7 +57,7 @@ def is_latest_benchmark_tested_beta_image_an_autopatch_image_itself(beta_image_u
     :return: boolean, True if beta benchmark image is an autopatch image itself. False otherwise.
     """
     image_region = test_utils.get_region_from_image_uri(image_uri=beta_image_uri)
-    ecr_client = boto3.client("ecr", region_name=image_region)
+    ecr_client = get_boto_client("ecr", region_name=image_region)
     tag_list = test_utils.get_all_the_tags_of_an_image_from_ecr(
         ecr_client=ecr_client, image_uri=beta_image_uri
     )
@@ -102,8 +102,8 @@ def get_image_transfer_override_flags_from_s3():
     :return: dict, Contents of the image_transfer_override_flags.json
     """
     try:
-        s3_client = boto3.client("s3")
-        sts_client = boto3.client("sts")
+        s3_client = get_boto_client("s3")
+        sts_client = get_boto_client("sts")
         account_id = sts_client.get_caller_identity().get("Account")
         result = s3_client.get_object(
             Bucket=f"dlc-cicd-helper-{account_id}", Key="image_transfer_override_flags.json"
@@ -179,7 +179,7 @@ def is_image_transferable(autopatch_image_uri, beta_image_uri, image_transfer_ov
     ):
         return True
     beta_image_region = test_utils.get_region_from_image_uri(image_uri=beta_image_uri)
-    ecr_client = boto3.client("ecr", region_name=beta_image_region)
+    ecr_client = get_boto_client("ecr", region_name=beta_image_region)
     beta_image_push_time = test_utils.get_image_push_time_from_ecr(
         ecr_client=ecr_client, image_uri=beta_image_uri
     )
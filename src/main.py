@@ -7,7 +7,8 @@ import constants
 import utils
 
 from codebuild_environment import get_codebuild_project_name
-from image_builder import image_builder
+from boto_clients import BOTO_CLIENTS
+from image_builder import image_builder, write_build_profile
 
 
 def main():
@@ -133,7 +134,11 @@ def main():
             image_types=image_types,
             py_versions=py_versions,
         )
-        image_builder(buildspec_file, image_types, device_types)
+        try:
+            image_builder(buildspec_file, image_types, device_types)
+        finally:
+            write_build_profile()
+            BOTO_CLIENTS.dump_metrics()
 
 
 if __name__ == "__main__":
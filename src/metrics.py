@@ -1,11 +1,12 @@
-import boto3
 import constants
 import random
 
+from boto_clients import get_boto_client
+
 
 class Metrics(object):
     def __init__(self, context="DEV", region="us-west-2", namespace="dlc-metrics"):
-        self.client = boto3.Session(region_name=region).client("cloudwatch")
+        self.client = get_boto_client("cloudwatch", region_name=region)
         self.context = context
         self.namespace = namespace
 
@@ -13,11 +13,9 @@ ANY KIND, either express or implied. See the License for the specific
 language governing permissions and limitations under the License.
 """
 
-import time
-import sys
+import queue
 import shutil
 import logging
-from collections import defaultdict
 
 import pyfiglet
 import reprint
@@ -84,33 +82,24 @@ class OutputFormatter:
         Note: futures is a dictionary. Keys = Name of the thread,
         Value = concurrent.futures object. The function being executed
         MUST return a dictionary with 'status' key that defines the status code.
-        """
-
-        done = defaultdict(bool)
 
-        isatty = sys.stdout.isatty()
+        The progressbar is redrawn whenever one of the futures completes, which is
+        signaled through a queue filled by the done callbacks of the futures.
+        """
+        done_queue = queue.Queue()
+        line_indices = {name: i for i, name in enumerate(futures)}
 
-        with reprint.output(
-            output_type="list", initial_len=len(futures.items()), interval=0
-        ) as output:
-            num_iterations = 0
+        with reprint.output(output_type="list", initial_len=len(futures), interval=0) as output:
             self.print_lines(output)
-            while True:
-                i = 0
-                num_iterations += 1
-                for image, thread in futures.items():
-                    output[i] = image
-                    if thread.done():
-                        output[i] += "." * 10 + constants.STATUS_MESSAGE[futures[image].result()]
-                        done[image] = True
-                    else:
-                        output[i] += "." * (num_iterations % 10)
-                        done[image] = False
-                    i += 1
-
-                if all(done.values()):
-                    break
-                time.sleep(1)
+            for name, i in line_indices.items():
+                output[i] = f"{name}..."
+            for name, future in futures.items():
+                future.add_done_callback(lambda _, name=name: done_queue.put(name))
+
+            for _ in range(len(futures)):
+                name = done_queue.get()
+                status = futures[name].result()
+                output[line_indices[name]] = name + "." * 10 + constants.STATUS_MESSAGE[status]
 
         self.print_lines(output)
 
@@ -1,5 +1,4 @@
 import os
-import boto3
 import concurrent.futures
 import json
 from datetime import datetime
@@ -18,9 +17,11 @@ from utils import (
     get_overall_history_path,
     get_folder_size_in_bytes,
     check_if_folder_contents_are_valid,
-    verify_if_child_image_is_built_on_top_of_base_image,
+    are_base_image_layers_at_the_bottom_of_child_image_layers,
     remove_repo_root_folder_path_from_the_given_path,
 )
+from autopatch_prep import ImagePullCache, StageGraph
+from boto_clients import get_boto_client
 from codebuild_environment import get_cloned_folder_path
 from context import Context
 
@@ -29,6 +30,22 @@ from src.constants import PATCHING_INFO_PATH_WITHIN_DLC
 FORMATTER = OutputFormatter(constants.PADDING)
 
 
+def get_image_pull_cache():
+    """
+    Creates the ImagePullCache used to share pulls, ECR SHA lookups and layer inspections between the images being prepared.
+
+    :return: ImagePullCache
+    """
+    from test.test_utils import get_sha_of_an_image_from_ecr
+
+    ecr_client = get_boto_client("ecr", region_name=os.getenv("REGION"))
+    return ImagePullCache(
+        resolve_digest=lambda image_uri: get_sha_of_an_image_from_ecr(
+            ecr_client=ecr_client, image_uri=image_uri
+        )
+    )
+
+
 def trigger_language_patching(image_uri, s3_downloaded_path, python_version=None):
     """
     This method initiates the processing for language packages. It creates a patch dump specific for each container that has the
@@ -150,85 +167,147 @@ def trigger_enhanced_scan_patching(image_uri, patch_details_path, python_version
     return constants.SUCCESS
 
 
-def conduct_autopatch_build_setup(pre_push_image_object: DockerImage, download_path: str):
+def conduct_autopatch_build_setup(
+    pre_push_image_object: DockerImage, download_path: str, image_pull_cache: ImagePullCache = None
+):
     """
     This method conducts the setup for the AutoPatch builds. It pulls the already released image and then triggers the autopatching
     procedures on the image to get the packages that need to be modified. Thereafter, it modifies pre_push_image_object to make changes
     to the original build process such that it starts to utilize miscellaneous_dockerfiles/Dockerfile.autopatch Dockerfile for building the image.
 
+    The preparation steps run as a StageGraph, so that the steps which do not depend on each other (e.g. the language patching,
+    the enhanced scan patching and the extraction of the patching-info) run concurrently.
+
     :param pre_push_image_object: Object of type DockerImage, The original DockerImage object that gets modified by this method.
     :param download_path: str, Path of the file where the relevant scripts have alread been downloaded.
+    :param image_pull_cache: ImagePullCache, cache shared by all the images being prepared, a new one is created if not given.
     :return: str, Returns constants.SUCCESS to allow the multi-threaded caller to know that the method has succeeded.
     """
-    from test.test_utils import get_sha_of_an_image_from_ecr
+    if image_pull_cache is None:
+        image_pull_cache = get_image_pull_cache()
 
     info = pre_push_image_object.info
     image_name = info.get("name")
     latest_released_image_uri = info.get("release_image_uri")
+    python_version = info.get("python_version")
 
-    run(f"docker pull {latest_released_image_uri}", hide=True)
-
-    first_image_sha = extract_first_image_sha_using_patching_info_contents_of_given_image(
-        image_uri=latest_released_image_uri
-    )
-    base_image_uri_for_patch_builds = latest_released_image_uri
-    if first_image_sha:
+    def _get_base_image_uri_for_patch_builds(results):
+        first_image_sha = results["extract_first_image_sha"]
+        if not first_image_sha:
+            return latest_released_image_uri
         # In case the latest released image is an autopatched image first_image_sha will not be None
         # In those cases, pull the first image using the SHA and use that as base
-        base_image_uri_for_patch_builds = pull_base_image_uri_for_patch_builds_and_get_the_tag(
-            latest_released_image_uri=latest_released_image_uri, first_image_sha=first_image_sha
+        return pull_base_image_uri_for_patch_builds_and_get_the_tag(
+            latest_released_image_uri=latest_released_image_uri,
+            first_image_sha=first_image_sha,
+            image_pull_cache=image_pull_cache,
         )
 
-    assert verify_if_child_image_is_built_on_top_of_base_image(
-        base_image_uri=base_image_uri_for_patch_builds, child_image_uri=latest_released_image_uri
-    ), f"Child image {latest_released_image_uri} is not built on {base_image_uri_for_patch_builds}"
+    def _verify_base_image(results):
+        base_image_uri_for_patch_builds = results["pull_base_image"]
+        base_image_sha = results["extract_first_image_sha"] or results["pull_released_image"]
+        assert are_base_image_layers_at_the_bottom_of_child_image_layers(
+            base_image_layers=image_pull_cache.get_layers(
+                base_image_uri_for_patch_builds, base_image_sha
+            ),
+            child_image_layers=image_pull_cache.get_layers(
+                latest_released_image_uri, results["pull_released_image"]
+            ),
+        ), f"Child image {latest_released_image_uri} is not built on {base_image_uri_for_patch_builds}"
+
+    def _get_current_patch_details_path(results):
+        current_patch_details_path = os.path.join(
+            os.sep,
+            download_path,
+            results["pull_base_image"].replace("/", "_").replace(":", "_"),
+        )
+        os.makedirs(current_patch_details_path, exist_ok=True)
+        return current_patch_details_path
+
+    def _extract_patching_info(results):
+        complete_patching_info_dump_location = os.path.join(
+            os.sep,
+            get_cloned_folder_path(),
+            f"""{results["pull_base_image"].replace("/", "_").replace(":", "_")}_patch-dump""",
+        )
+        os.makedirs(complete_patching_info_dump_location, exist_ok=True)
+        extract_patching_relevant_data_from_latest_released_image(
+            image_uri=latest_released_image_uri,
+            extraction_location=complete_patching_info_dump_location,
+        )
+        return complete_patching_info_dump_location
 
-    ecr_client = boto3.client("ecr", region_name=os.getenv("REGION"))
-    latest_released_image_sha = get_sha_of_an_image_from_ecr(
-        ecr_client=ecr_client, image_uri=latest_released_image_uri
-    )
+    def _copy_patch_details(results):
+        run(
+            f"cp -r {results['create_patch_details_folder']}/. {results['extract_patching_info']}/patch-details-current"
+        )
 
-    current_patch_details_path = os.path.join(
-        os.sep, download_path, base_image_uri_for_patch_builds.replace("/", "_").replace(":", "_")
+    stage_graph = StageGraph(name=image_name, timings=image_pull_cache.stage_timings[image_name])
+    stage_graph.add(
+        "pull_released_image",
+        lambda results: image_pull_cache.pull(latest_released_image_uri),
     )
-    if not os.path.exists(current_patch_details_path):
-        run(f"mkdir {current_patch_details_path}", hide=True)
-
-    complete_patching_info_dump_location = os.path.join(
-        os.sep,
-        get_cloned_folder_path(),
-        f"""{base_image_uri_for_patch_builds.replace("/", "_").replace(":", "_")}_patch-dump""",
+    stage_graph.add(
+        "extract_first_image_sha",
+        lambda results: extract_first_image_sha_using_patching_info_contents_of_given_image(
+            image_uri=latest_released_image_uri
+        ),
+        depends_on=["pull_released_image"],
     )
-    if not os.path.exists(complete_patching_info_dump_location):
-        run(f"mkdir {complete_patching_info_dump_location}", hide=True)
-
-    extract_patching_relevant_data_from_latest_released_image(
-        image_uri=latest_released_image_uri,
-        extraction_location=complete_patching_info_dump_location,
+    stage_graph.add(
+        "pull_base_image",
+        _get_base_image_uri_for_patch_builds,
+        depends_on=["extract_first_image_sha"],
     )
-
-    THREADS = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        get_dummy_boto_client()
-        THREADS[f"trigger_language_patching-{base_image_uri_for_patch_builds}"] = executor.submit(
-            trigger_language_patching,
-            image_uri=base_image_uri_for_patch_builds,
+    stage_graph.add(
+        "verify_base_image",
+        _verify_base_image,
+        depends_on=["pull_released_image", "extract_first_image_sha", "pull_base_image"],
+    )
+    stage_graph.add(
+        "create_patch_details_folder",
+        _get_current_patch_details_path,
+        depends_on=["pull_base_image"],
+    )
+    stage_graph.add(
+        "extract_patching_info",
+        _extract_patching_info,
+        depends_on=["pull_base_image"],
+    )
+    stage_graph.add(
+        "trigger_language_patching",
+        lambda results: trigger_language_patching(
+            image_uri=results["pull_base_image"],
             s3_downloaded_path=download_path,
-            python_version=info.get("python_version"),
-        )
-        THREADS[f"trigger_enhanced_scan_patching-{base_image_uri_for_patch_builds}"] = (
-            executor.submit(
-                trigger_enhanced_scan_patching,
-                image_uri=base_image_uri_for_patch_builds,
-                patch_details_path=current_patch_details_path,
-                python_version=info.get("python_version"),
-            )
-        )
-    FORMATTER.progress(THREADS)
-
-    run(
-        f"cp -r {current_patch_details_path}/. {complete_patching_info_dump_location}/patch-details-current"
+            python_version=python_version,
+        ),
+        depends_on=["pull_base_image", "verify_base_image"],
     )
+    stage_graph.add(
+        "trigger_enhanced_scan_patching",
+        lambda results: trigger_enhanced_scan_patching(
+            image_uri=results["pull_base_image"],
+            patch_details_path=results["create_patch_details_folder"],
+            python_version=python_version,
+        ),
+        depends_on=["pull_base_image", "verify_base_image", "create_patch_details_folder"],
+    )
+    stage_graph.add(
+        "copy_patch_details",
+        _copy_patch_details,
+        depends_on=[
+            "create_patch_details_folder",
+            "extract_patching_info",
+            "trigger_language_patching",
+            "trigger_enhanced_scan_patching",
+        ],
+    )
+    get_dummy_boto_client()
+    stage_results = stage_graph.run()
+
+    base_image_uri_for_patch_builds = stage_results["pull_base_image"]
+    latest_released_image_sha = stage_results["pull_released_image"]
+    complete_patching_info_dump_location = stage_results["extract_patching_info"]
 
     pre_push_image_object.dockerfile = os.path.join(
         os.sep, get_cloned_folder_path(), "miscellaneous_dockerfiles", "Dockerfile.autopatch"
@@ -365,19 +444,26 @@ def initiate_multithreaded_autopatch_prep(PRE_PUSH_STAGE_IMAGES, make_dummy_boto
         run(f"aws s3 cp s3://patch-dlc {download_path} --recursive", hide=True)
     run(f"bash {download_path}/preprocessing_script.sh {download_path}", hide=True)
 
+    #### TODO: Remove this entire if block when get_dummy_boto_client is removed ####
+    if make_dummy_boto_client:
+        get_dummy_boto_client()
+    image_pull_cache = get_image_pull_cache()
+
     THREADS = {}
     # In the context of the ThreadPoolExecutor each instance of image.build submitted
     # to it is executed concurrently in a separate thread.
     with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        #### TODO: Remove this entire if block when get_dummy_boto_client is removed ####
-        if make_dummy_boto_client:
-            get_dummy_boto_client()
         for pre_push_image_object in PRE_PUSH_STAGE_IMAGES:
             THREADS[pre_push_image_object.name] = executor.submit(
-                conduct_autopatch_build_setup, pre_push_image_object, download_path
+                conduct_autopatch_build_setup,
+                pre_push_image_object,
+                download_path,
+                image_pull_cache,
             )
     # the FORMATTER.progress(THREADS) function call also waits until all threads have completed
     FORMATTER.progress(THREADS)
+    FORMATTER.title("Autopatch Preparation Stage Timings")
+    FORMATTER.table(image_pull_cache.get_timing_rows())
 
 
 def retrive_autopatched_image_history_and_upload_to_s3(image_uri):
@@ -435,7 +521,10 @@ def extract_first_image_sha_using_patching_info_contents_of_given_image(image_ur
     )
     docker_extraction_cmd = f"{docker_exec_cmd} {image_sha_extraction_cmd}"
     FORMATTER.print(f"[extract_sha_cmd] {docker_extraction_cmd}")
-    result = run(docker_extraction_cmd, hide=True)
+    try:
+        result = run(docker_extraction_cmd, hide=True)
+    finally:
+        run(f"docker rm -f {container_id}", hide=True, warn=True)
     first_image_sha = result.stdout.strip()
     return first_image_sha
 
@@ -452,7 +541,10 @@ def extract_patching_relevant_data_from_latest_released_image(image_uri, extract
     docker_exec_cmd = f"docker exec -i {container_id}"
     extraction_cmd = f"""bash -c "if [ -d {PATCHING_INFO_PATH_WITHIN_DLC} ] ; then cp -r {PATCHING_INFO_PATH_WITHIN_DLC}/. /dlc-extraction-folder ; fi" """
     FORMATTER.print(f"Extraction Command: {docker_exec_cmd} {extraction_cmd}")
-    run(f"{docker_exec_cmd} {extraction_cmd}")
+    try:
+        run(f"{docker_exec_cmd} {extraction_cmd}")
+    finally:
+        run(f"docker rm -f {container_id}", hide=True, warn=True)
 
 
 def verify_artifact_contents_for_patch_builds(
@@ -508,22 +600,22 @@ def verify_artifact_contents_for_patch_builds(
 
 
 def pull_base_image_uri_for_patch_builds_and_get_the_tag(
-    latest_released_image_uri, first_image_sha
+    latest_released_image_uri, first_image_sha, image_pull_cache=None
 ):
     """
     Pulls Base image from ECR using the SHA and LOCALLY tags it using the tag of the latest released image uri appended with -FIMG.
 
     :param latest_released_image_uri: str, Image URI of the latest released image.
     :param first_image_sha: str, SHA of the first non-autopatched image that would be used as base.
+    :param image_pull_cache: ImagePullCache, skips the pull if the first image has already been pulled.
     :return: str, Base Image URI that would be used for building the new image.
     """
     FORMATTER.print(
         f"Latest released image is different from the first image that has sha: {first_image_sha}"
     )
-    prod_repo = latest_released_image_uri.split(":")[0]
-    first_image_uri_with_sha = f"{prod_repo}@{first_image_sha}"
     first_image_uri = f"{latest_released_image_uri}-FIMG"
-    run(f"docker pull {first_image_uri_with_sha}")
-    run(f"docker tag {first_image_uri_with_sha} {first_image_uri}")
+    if image_pull_cache is None:
+        image_pull_cache = get_image_pull_cache()
+    image_pull_cache.pull(first_image_uri, digest=first_image_sha)
     FORMATTER.print(f"First Image URI tagged as: {first_image_uri}")
     return first_image_uri
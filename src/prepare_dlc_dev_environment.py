@@ -13,7 +13,7 @@ from config import get_dlc_developer_config_path
 from codebuild_environment import get_cloned_folder_path
 from packaging.version import Version
 from pathlib import Path
-from buildspec import Buildspec
+from buildspec import load_build_plan
 
 
 LOGGER = logging.getLogger(__name__)
@@ -492,9 +492,7 @@ def validate_currency_path(currency_path):
 def create_dockerfile_paths(buildspec_paths, framework, job_type):
     dockerfile_paths = []
     for buildspec_path in buildspec_paths:
-        buildspec_obj = Buildspec()
-        buildspec_obj.load(buildspec_path)
-        images = buildspec_obj.get("images", {})
+        images = load_build_plan(buildspec_path).images
         for _, image_details in images.items():
             docker_file = image_details.get("docker_file")
             if docker_file:
@@ -0,0 +1,177 @@
+"""
+Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License"). You
+may not use this file except in compliance with the License. A copy of
+the License is located at
+
+    http://aws.amazon.com/apache2.0/
+
+or in the "license" file accompanying this file. This file is
+distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+ANY KIND, either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import concurrent.futures
+import json
+import logging
+import re
+
+import requests
+
+import constants
+
+from boto_clients import get_boto_client
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+ECR_REGISTRY_PATTERN = re.compile(r"^(\d{12})\.dkr\.ecr\.([a-z0-9-]+)\.amazonaws\.com")
+
+MANIFEST_LIST_MEDIA_TYPES = (
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+)
+MANIFEST_MEDIA_TYPES = (
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+) + MANIFEST_LIST_MEDIA_TYPES
+
+
+class RegistryClient:
+    """
+    Minimal client for the Docker Registry HTTP API V2, implemented both by ECR and by the
+    registry:2 image. It only deals with manifests and blob existence, so that images which are
+    already in the registry can be given new tags without uploading any layer again.
+    """
+
+    def __init__(
+        self,
+        registry,
+        scheme="https",
+        session=None,
+        max_workers=8,
+        timeout=constants.REGISTRY_REQUEST_TIMEOUT,
+    ):
+        """
+        :param registry: str, registry host, e.g. <account>.dkr.ecr.<region>.amazonaws.com
+        :param scheme: str, http or https
+        :param session: requests.Session, optional session holding the auth headers
+        :param max_workers: int, number of concurrent blob existence checks
+        :param timeout: tuple(int, int), connect and read timeouts in seconds of each request
+        """
+        self.base_url = f"{scheme}://{registry}/v2"
+        self.session = session or requests.Session()
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    @classmethod
+    def from_repository(cls, repository):
+        """
+        Creates a client for the registry hosting a repository. ECR registries are authenticated
+        with a token from ecr:GetAuthorizationToken, and localhost registries are reached over
+        plain http, like a local registry:2 container.
+
+        :param repository: str, e.g. <account>.dkr.ecr.<region>.amazonaws.com/<name>
+        :return: tuple(RegistryClient, str), the client and the repository name in the registry
+        """
+        registry, repository_name = repository.split("/", 1)
+        session = requests.Session()
+        ecr_match = ECR_REGISTRY_PATTERN.match(registry)
+        if ecr_match:
+            account_id, region = ecr_match.groups()
+            ecr_client = get_boto_client("ecr", region_name=region)
+            authorization = ecr_client.get_authorization_token(registryIds=[account_id])
+            token = authorization["authorizationData"][0]["authorizationToken"]
+            session.headers["Authorization"] = f"Basic {token}"
+        scheme = "http" if registry.split(":")[0] in ("localhost", "127.0.0.1") else "https"
+        return cls(registry, scheme=scheme, session=session), repository_name
+
+    def get_manifest(self, repository_name, reference):
+        """
+        Fetches the manifest of an image as raw bytes, so that it can be put under a new tag
+        without changing its digest.
+
+        :param repository_name: str
+        :param reference: str, tag or digest
+        :return: tuple(bytes, str), manifest and its media type
+        """
+        response = self.session.get(
+            f"{self.base_url}/{repository_name}/manifests/{reference}",
+            headers={"Accept": ", ".join(MANIFEST_MEDIA_TYPES)},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.content, response.headers["Content-Type"].split(";")[0]
+
+    def put_manifest(self, repository_name, tag, manifest, media_type):
+        """
+        Points a tag at an existing manifest.
+
+        :param repository_name: str
+        :param tag: str
+        :param manifest: bytes, manifest as returned by get_manifest
+        :param media_type: str
+        """
+        response = self.session.put(
+            f"{self.base_url}/{repository_name}/manifests/{tag}",
+            data=manifest,
+            headers={"Content-Type": media_type},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+    def reference_exists(self, repository_name, kind, digest):
+        """
+        :param kind: str, "blobs" or "manifests"
+        :return: bool, True if the blob or manifest with the given digest is in the repository
+        """
+        response = self.session.head(
+            f"{self.base_url}/{repository_name}/{kind}/{digest}",
+            headers={"Accept": ", ".join(MANIFEST_MEDIA_TYPES)},
+            timeout=self.timeout,
+        )
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def get_missing_references(self, repository_name, manifest, media_type):
+        """
+        Checks, in one concurrent batch, that everything a manifest refers to (config and layer
+        blobs, or the image manifests of a manifest list) exists in the repository.
+
+        :return: list[str], digests of the missing references
+        """
+        manifest_content = json.loads(manifest)
+        if media_type in MANIFEST_LIST_MEDIA_TYPES:
+            references = [("manifests", item["digest"]) for item in manifest_content["manifests"]]
+        else:
+            references = [("blobs", manifest_content["config"]["digest"])]
+            references += [("blobs", layer["digest"]) for layer in manifest_content["layers"]]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            exists = executor.map(
+                lambda reference: self.reference_exists(repository_name, *reference), references
+            )
+            return [digest for (_, digest), found in zip(references, exists) if not found]
+
+    def retag(self, repository_name, source_tag, tags):
+        """
+        Gives additional tags to an image which is already in the repository by only writing new
+        manifest references.
+
+        :param repository_name: str
+        :param source_tag: str, tag of the pushed image
+        :param tags: list[str], tags to be added
+        :return: list[str], digests the manifest refers to that are missing from the repository.
+            The tags are only written if this list is empty.
+        """
+        manifest, media_type = self.get_manifest(repository_name, source_tag)
+        missing_references = self.get_missing_references(repository_name, manifest, media_type)
+        if missing_references:
+            return missing_references
+        for tag in tags:
+            self.put_manifest(repository_name, tag, manifest, media_type)
+        return []
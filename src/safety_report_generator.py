@@ -1,11 +1,40 @@
 from invoke.context import Context
 from datetime import datetime
+from io import StringIO
 
 import json
 import os
+import constants
 import utils
 from config import is_autopatch_build_enabled
 
+# Collects everything the report needs from the container in a single docker exec. The path of the autopatch
+# deactivation data is passed as the first argument.
+CONTAINER_INVENTORY_SCRIPT = """
+import json
+import os
+import sys
+
+import pkg_resources
+
+deactivation_data = {}
+try:
+    with open(sys.argv[1]) as f:
+        deactivation_data = json.load(f)
+except Exception:
+    pass
+print(
+    json.dumps(
+        {
+            "python_version": "{}.{}".format(*sys.version_info[:2]),
+            "path": os.environ.get("PATH", ""),
+            "packages": [{"name": d.key, "version": d.version} for d in pkg_resources.working_set],
+            "deactivation_data": deactivation_data,
+        }
+    )
+)
+"""
+
 
 class SafetyReportGenerator:
     """
@@ -32,7 +61,14 @@ class SafetyReportGenerator:
     ]
     """
 
-    def __init__(self, container_id, ignore_dict={}, image_uri="", image_info=None):
+    def __init__(
+        self, container_id, ignore_dict={}, image_uri="", image_info=None, safety_install_path=None
+    ):
+        """
+        :param container_id: str, container to be scanned. Not used when generate is given scan_results.
+        :param safety_install_path: str, path within the container where safety is installed for each python
+            version. If None, safety is expected to be installed in the container itself.
+        """
         self.container_id = container_id
         self.vulnerability_dict = {}
         self.vulnerability_list = []
@@ -44,6 +80,8 @@ class SafetyReportGenerator:
         self.vulnerabilities_to_be_added_to_ignore_list = {}
         self.image_uri = image_uri
         self.image_info = image_info
+        self.safety_install_path = safety_install_path
+        self.container_inventory = None
 
     def insert_vulnerabilites_into_report(self, scanned_vulnerabilities):
         """
@@ -85,24 +123,47 @@ class SafetyReportGenerator:
             else:
                 self.vulnerability_dict[package]["vulnerabilities"].append(vulnerability_details)
 
+    def get_container_inventory(self):
+        """
+        Extracts the python version, PATH, package set and autopatch deactivation data of the container with a single
+        docker exec.
+
+        :return: dict, with keys "python_version", "path", "packages" and "deactivation_data"
+        """
+        if self.container_inventory is None:
+            deactivation_data_path = f"{constants.PATCHING_INFO_PATH_WITHIN_DLC}/patch-details/vuln_deactivation_data.json"
+            run_output = self.ctx.run(
+                f"{self.docker_exec_cmd} python - {deactivation_data_path}",
+                in_stream=StringIO(CONTAINER_INVENTORY_SCRIPT),
+                hide=True,
+                warn=True,
+            )
+            if run_output.exited != 0:
+                raise Exception("Package set cannot be retrieved from the container.")
+            self.container_inventory = json.loads(run_output.stdout)
+        return self.container_inventory
+
     def get_package_set_from_container(self):
         """
         Extracts package set of a container.
 
         :return: list[dict], each dict is structured like {'name': package_name, 'version':package_version}
         """
+        return self.get_container_inventory()["packages"]
 
-        python_cmd_to_extract_package_set = """ python -c "import pkg_resources; \
-                import json; \
-                print(json.dumps([{'name':d.key, 'version':d.version} for d in pkg_resources.working_set]))" """
-
-        run_output = self.ctx.run(
-            f"{self.docker_exec_cmd} {python_cmd_to_extract_package_set}", hide=True, warn=True
+    def get_safety_exec_cmd(self):
+        """
+        Docker exec command that can run safety in the container, using the cached safety install of the python
+        version of the container if there is one.
+        """
+        if not self.safety_install_path:
+            return self.docker_exec_cmd
+        inventory = self.get_container_inventory()
+        install_path = f"{self.safety_install_path}/{inventory['python_version']}"
+        return (
+            f"docker exec -i -e PYTHONPATH={install_path} "
+            f"-e PATH={install_path}/bin:{inventory['path']} {self.container_id}"
         )
-        if run_output.exited != 0:
-            raise Exception("Package set cannot be retrieved from the container.")
-
-        return json.loads(run_output.stdout)
 
     def insert_safe_packages_into_report(self, packages):
         """
@@ -133,16 +194,7 @@ class SafetyReportGenerator:
         """
         This method extracts the dumped ignore lists within the DLCs that have been dumped by the autopatch procedure.
         """
-        from src import constants
-
-        dumped_ignore_list_command = f"{self.docker_exec_cmd} cat {constants.PATCHING_INFO_PATH_WITHIN_DLC}/patch-details/vuln_deactivation_data.json"
-        return_data = {}
-        try:
-            run_out = self.ctx.run(dumped_ignore_list_command, hide=True)
-            return_data = json.loads(run_out.stdout.strip())
-        except:
-            pass
-        return return_data
+        return self.container_inventory.get("deactivation_data", {})
 
     def process_report(self):
         """
@@ -179,12 +231,20 @@ class SafetyReportGenerator:
 
     def run_safety_check_in_non_cb_context(self):
         """
-        Runs the safety check on the container in Non-CodeBuild Context
+        Runs the safety check on the package set of the container in Non-CodeBuild Context
 
         :return: string, A JSON formatted string containing vulnerabilities found in the container
         """
-        safety_check_command = f"{self.docker_exec_cmd} safety check --output json"
-        run_out = self.ctx.run(safety_check_command, warn=True, hide=True)
+        requirements = "\n".join(
+            f"{package['name']}=={package['version']}"
+            for package in self.get_package_set_from_container()
+        )
+        safety_check_command = (
+            f"{self.get_safety_exec_cmd()} python -m safety check --stdin --output json"
+        )
+        run_out = self.ctx.run(
+            safety_check_command, in_stream=StringIO(requirements), warn=True, hide=True
+        )
         if run_out.return_code != 0:
             print(
                 "safety check command returned non-zero error code. This indicates that vulnerabilities might exist."
@@ -199,20 +259,39 @@ class SafetyReportGenerator:
         """
         from dlc.safety_check import SafetyCheck
 
-        return SafetyCheck().run_safety_check_on_container(self.docker_exec_cmd)
+        return SafetyCheck().run_safety_check_on_container(self.get_safety_exec_cmd())
 
-    def generate(self):
+    def scan(self):
         """
-        Acts as a driver function for this class that initiates the entire process of running safety check and returing
-        the vulnerability_list
+        Runs safety check on the container and collects its inventory. The results only depend on the image of the
+        container, so they can be reused to generate the report of other images with the same digest.
 
-        :return: list[dict], the output follows the same format as mentioned in the description of the class
+        :return: dict, with keys "safety_check_output" and "container_inventory"
         """
-        self.timestamp = datetime.now().strftime("%d-%m-%Y")
+        self.get_container_inventory()
         if os.getenv("IS_CODEBUILD_IMAGE") is None:
             self.safety_check_output = self.run_safety_check_in_non_cb_context()
         elif os.getenv("IS_CODEBUILD_IMAGE").upper() == "TRUE":
             self.safety_check_output = self.run_safety_check_in_cb_context()
+        return {
+            "safety_check_output": self.safety_check_output,
+            "container_inventory": self.container_inventory,
+        }
+
+    def generate(self, scan_results=None):
+        """
+        Acts as a driver function for this class that initiates the entire process of running safety check and returing
+        the vulnerability_list
+
+        :param scan_results: dict, results of a previous call to scan for the same image digest. If None, the
+            container is scanned.
+        :return: list[dict], the output follows the same format as mentioned in the description of the class
+        """
+        self.timestamp = datetime.now().strftime("%d-%m-%Y")
+        if scan_results is None:
+            scan_results = self.scan()
+        self.safety_check_output = scan_results["safety_check_output"]
+        self.container_inventory = scan_results["container_inventory"]
         # In case of errors, json.loads command will fail. We want the failure to occur to ensure that
         # build process fails in case the safety report cannot be generated properly.
         scanned_vulnerabilities = json.loads(self.safety_check_output)
@@ -13,11 +13,14 @@ ANY KIND, either express or implied. See the License for the specific
 language governing permissions and limitations under the License.
 """
 
+import fcntl
 import os
 import re
 import json
 import logging
+import shutil
 import sys
+import threading
 import boto3
 import constants
 
@@ -398,6 +401,83 @@ def derive_future_safety_allowlist_and_upload_to_s3(
         )
 
 
+_SAFETY_SCAN_RESULTS = {}
+_SAFETY_SCAN_LOCKS = {}
+_SAFETY_SCAN_LOCKS_LOCK = threading.Lock()
+
+
+def get_image_id(image_uri):
+    """
+    Get the ID of a local image, i.e. the digest of its config, which is the same for every tag of the image.
+
+    :param image_uri: str, image uri
+    :return: str, image id
+    """
+    ctx = Context()
+    return ctx.run("docker image inspect --format '{{.Id}}' " + image_uri, hide=True).stdout.strip()
+
+
+def install_cached_safety(image_uri, python_version):
+    """
+    Install safety in the cache for the python version of an image, if it is not installed yet. The install is done
+    by the python of the image itself, so that it can be mounted read-only in any container with the same python
+    version.
+
+    :param image_uri: str, image providing the python used to install safety
+    :param python_version: str, like "3.10"
+    :return: str, directory of the install on the host
+    """
+    install_dir = os.path.join(constants.SAFETY_INSTALL_CACHE_DIR, python_version)
+    os.makedirs(constants.SAFETY_INSTALL_CACHE_DIR, exist_ok=True)
+    with open(f"{install_dir}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if not os.path.exists(os.path.join(install_dir, ".complete")):
+            LOGGER.info(f"Installing {constants.SAFETY_REQUIREMENT} for python {python_version}")
+            shutil.rmtree(install_dir, ignore_errors=True)
+            Context().run(
+                f"docker run --rm -v {install_dir}:/safety-install --entrypoint=python {image_uri} "
+                f"-m pip install --no-cache-dir --target /safety-install '{constants.SAFETY_REQUIREMENT}'",
+                hide=True,
+            )
+            open(os.path.join(install_dir, ".complete"), "w").close()
+    return install_dir
+
+
+def get_safety_scan_results(image_uri):
+    """
+    Run safety on an image, at most once per image id. Pre-push and common stage images, or images built with
+    different tags, that share an image id get the results of the first scan.
+
+    :param image_uri: str, image uri
+    :return: dict, results of SafetyReportGenerator.scan
+    """
+    image_id = get_image_id(image_uri)
+    with _SAFETY_SCAN_LOCKS_LOCK:
+        image_lock = _SAFETY_SCAN_LOCKS.setdefault(image_id, threading.Lock())
+    with image_lock:
+        if image_id in _SAFETY_SCAN_RESULTS:
+            LOGGER.info(f"Reusing safety scan results of {image_id} for {image_uri}")
+            return _SAFETY_SCAN_RESULTS[image_id]
+
+        ctx = Context()
+        os.makedirs(constants.SAFETY_INSTALL_CACHE_DIR, exist_ok=True)
+        docker_run_cmd = (
+            f"docker run -id -v {constants.SAFETY_INSTALL_CACHE_DIR}:{constants.SAFETY_INSTALL_MOUNT_PATH}:ro "
+            f"--entrypoint='/bin/bash' {image_uri} "
+        )
+        container_id = ctx.run(f"{docker_run_cmd}", hide=True, warn=True).stdout.strip()
+        try:
+            safety_report_generator_object = SafetyReportGenerator(
+                container_id, safety_install_path=constants.SAFETY_INSTALL_MOUNT_PATH
+            )
+            container_inventory = safety_report_generator_object.get_container_inventory()
+            install_cached_safety(image_uri, container_inventory["python_version"])
+            _SAFETY_SCAN_RESULTS[image_id] = safety_report_generator_object.scan()
+        finally:
+            ctx.run(f"docker rm -f {container_id}", hide=True, warn=True)
+        return _SAFETY_SCAN_RESULTS[image_id]
+
+
 def generate_safety_report_for_image(image_uri, image_info, storage_file_path=None):
     """
     Generate safety scan reports for an image and store it at the location specified
@@ -407,20 +487,14 @@ def generate_safety_report_for_image(image_uri, image_info, storage_file_path=No
     :param storage_file_path: str, looks like "storage_location.json"
     :return: list[dict], safety report generated by SafetyReportGenerator
     """
-    ctx = Context()
-    docker_run_cmd = f"docker run -id --entrypoint='/bin/bash' {image_uri} "
-    container_id = ctx.run(f"{docker_run_cmd}", hide=True, warn=True).stdout.strip()
-    install_safety_cmd = "pip install 'safety>=2.2.0,<3'"
-    docker_exec_cmd = f"docker exec -i {container_id}"
-    ctx.run(f"{docker_exec_cmd} {install_safety_cmd}", hide=True, warn=True)
+    scan_results = get_safety_scan_results(image_uri)
     ignore_dict = get_safety_ignore_dict(
         image_uri, image_info["framework"], image_info["python_version"], image_info["image_type"]
     )
     safety_report_generator_object = SafetyReportGenerator(
-        container_id, ignore_dict=ignore_dict, image_uri=image_uri, image_info=image_info
+        None, ignore_dict=ignore_dict, image_uri=image_uri, image_info=image_info
     )
-    safety_scan_output = safety_report_generator_object.generate()
-    ctx.run(f"docker rm -f {container_id}", hide=True, warn=True)
+    safety_scan_output = safety_report_generator_object.generate(scan_results=scan_results)
     if storage_file_path:
         with open(storage_file_path, "w", encoding="utf-8") as f:
             json.dump(safety_scan_output, f, indent=4)
@@ -664,6 +738,21 @@ def verify_if_child_image_is_built_on_top_of_base_image(base_image_uri, child_im
     """
     base_image_layers = get_image_layers(image_uri=base_image_uri)
     child_image_layers = get_image_layers(image_uri=child_image_uri)
+    return are_base_image_layers_at_the_bottom_of_child_image_layers(
+        base_image_layers=base_image_layers, child_image_layers=child_image_layers
+    )
+
+
+def are_base_image_layers_at_the_bottom_of_child_image_layers(
+    base_image_layers, child_image_layers
+):
+    """
+    Checks that the layers of the base image are the first layers of the child image.
+
+    :param base_image_layers: List, RootFS layers of base image
+    :param child_image_layers: List, RootFS layers of child image
+    :return: boolean, True if child is built on base image. False otherwise.
+    """
     if len(base_image_layers) > len(child_image_layers):
         return False
     for i, base_layer_sha in enumerate(base_image_layers):
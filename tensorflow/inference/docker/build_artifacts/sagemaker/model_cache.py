@@ -0,0 +1,123 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import logging
+import os
+
+import tfs_utils
+from multi_model_utils import MME_REGISTRY_DIR, MODEL_AVAILABLE
+
+log = logging.getLogger(__name__)
+
+MME_ACCESS_DIR = os.path.join(MME_REGISTRY_DIR, "sagemaker-tfs-access")
+
+
+class ModelCacheManager:
+    """Least recently used cache of the models loaded on a multi-model endpoint
+
+    The last access time of a model is the mtime of a file in shared memory, so every gunicorn
+    worker can record an invocation without locking or rewriting the MME registry. Memory use is
+    read from /proc: the resident memory of each TFS process, and the system wide counters of
+    /proc/meminfo.
+    """
+
+    def __init__(self, memory_budget_percent, access_dir=MME_ACCESS_DIR):
+        """
+        :param memory_budget_percent: share of the host memory the loaded models may use
+        :param access_dir: directory holding one access time file per model
+        """
+        self._memory_budget_percent = float(memory_budget_percent)
+        self._access_dir = access_dir
+        os.makedirs(self._access_dir, exist_ok=True)
+
+    def _access_path(self, model_name):
+        return os.path.join(self._access_dir, model_name.replace("/", "_"))
+
+    def touch(self, model_name):
+        path = self._access_path(model_name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            open(path, "a", encoding="utf8").close()
+
+    def forget(self, model_name):
+        try:
+            os.remove(self._access_path(model_name))
+        except FileNotFoundError:
+            pass
+
+    def last_access(self, model_name):
+        try:
+            return os.stat(self._access_path(model_name)).st_mtime
+        except FileNotFoundError:
+            return 0
+
+    def memory_budget_bytes(self, meminfo):
+        return int(meminfo["MemTotal"] * self._memory_budget_percent / 100)
+
+    @staticmethod
+    def model_memory_bytes(entry):
+        return sum(
+            tfs_utils.get_process_memory_bytes(instance["pid"])
+            for instance in entry["instances"]
+            if instance["pid"] is not None
+        )
+
+    @staticmethod
+    def estimate_model_bytes(base_path):
+        """Estimate the memory a TFS instance needs for a model from its size on disk"""
+        size = 0
+        for root, _, files in os.walk(base_path):
+            for name in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return size
+
+    def plan_evictions(self, models, required_bytes, required_instances, available_instances):
+        """Pick the least recently used models to unload so that a new model fits
+
+        :param models: models of the MME registry
+        :param required_bytes: estimated memory of the model to be loaded
+        :param required_instances: number of TFS instances the model to be loaded needs
+        :param available_instances: number of TFS instances the free ports allow
+        :return: names of the models to evict, empty if nothing needs to (or can) be evicted
+        """
+        meminfo = tfs_utils.read_meminfo()
+        excess_bytes = (
+            tfs_utils.get_used_memory_bytes(meminfo)
+            + required_bytes
+            - self.memory_budget_bytes(meminfo)
+        )
+        missing_instances = required_instances - available_instances
+        if excess_bytes <= 0 and missing_instances <= 0:
+            return []
+
+        candidates = sorted(
+            (name for name, entry in models.items() if entry["state"] == MODEL_AVAILABLE),
+            key=self.last_access,
+        )
+        evictions = []
+        for name in candidates:
+            if excess_bytes <= 0 and missing_instances <= 0:
+                break
+            evictions.append(name)
+            excess_bytes -= self.model_memory_bytes(models[name])
+            missing_instances -= len(models[name]["instances"])
+
+        if excess_bytes > 0 or missing_instances > 0:
+            # unloading every model would still not make room, leave them loaded
+            log.info("model does not fit even after evicting every loaded model")
+            return []
+        log.info("evicting least recently used models: {}".format(evictions))
+        return evictions
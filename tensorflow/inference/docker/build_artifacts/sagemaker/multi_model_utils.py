@@ -11,12 +11,22 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 import fcntl
+import json
+import mmap
+import os
 import signal
-import time
+import struct
 from contextlib import contextmanager
 
 MODEL_CONFIG_FILE = "/sagemaker/model-config.cfg"
 DEFAULT_LOCK_FILE = "/sagemaker/lock-file.lock"
+# the registry lives in shared memory so every gunicorn worker sees the same state
+MME_REGISTRY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else "/sagemaker"
+MME_REGISTRY_FILE = os.path.join(MME_REGISTRY_DIR, "sagemaker-tfs-registry.json")
+MME_REGISTRY_GENERATION_FILE = os.path.join(MME_REGISTRY_DIR, "sagemaker-tfs-registry.generation")
+MME_REGISTRY_LOCK_FILE = os.path.join(MME_REGISTRY_DIR, "sagemaker-tfs-registry.lock")
+MODEL_LOADING = "loading"
+MODEL_AVAILABLE = "available"
 
 
 @contextmanager
@@ -28,8 +38,8 @@ def lock(path=DEFAULT_LOCK_FILE):
     try:
         yield
     finally:
-        time.sleep(1)
         fcntl.lockf(fd, fcntl.LOCK_UN)
+        f.close()
 
 
 @contextmanager
@@ -51,3 +61,63 @@ class MultiModelException(Exception):
         self.pid = pid
         self.code = code
         self.msg = msg
+
+
+class MultiModelRegistry:
+    """Registry of the TFS instances started for each model, shared by all gunicorn workers
+
+    Every entry maps a model name to {"state": ..., "instances": [{"rest_port", "grpc_port",
+    "pid"}]}. Loading entries also hold the "owner_pid" of the loading worker and the time they
+    were reserved, "loading_since", so that abandoned loads can be reclaimed, and the pid of each
+    of their instances as soon as it starts. Readers never take a lock: the registry file is
+    replaced atomically on each update, and a generation counter kept in a memory mapped file
+    tells them whether their copy is stale.
+    Writers serialize on a lock that is only held while the registry is rewritten.
+    """
+
+    _GENERATION_FORMAT = "<Q"
+
+    def __init__(
+        self,
+        path=MME_REGISTRY_FILE,
+        generation_path=MME_REGISTRY_GENERATION_FILE,
+        lock_path=MME_REGISTRY_LOCK_FILE,
+    ):
+        self._path = path
+        self._lock_path = lock_path
+        size = struct.calcsize(self._GENERATION_FORMAT)
+        fd = os.open(generation_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._generation = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def generation(self):
+        return struct.unpack_from(self._GENERATION_FORMAT, self._generation)[0]
+
+    def read(self):
+        """Return the generation and the models of the registry, without locking"""
+        try:
+            with open(self._path, "r", encoding="utf8") as f:
+                content = json.load(f)
+        except FileNotFoundError:
+            return 0, {}
+        return content["generation"], content["models"]
+
+    @contextmanager
+    def update(self):
+        """Yield the models of the registry to be modified in place, then publish them"""
+        with lock(self._lock_path):
+            generation, models = self.read()
+            before = json.dumps(models, sort_keys=True)
+            yield models
+            if json.dumps(models, sort_keys=True) == before:
+                return
+            generation = max(generation, self.generation()) + 1
+            tmp_path = "{}.{}".format(self._path, os.getpid())
+            with open(tmp_path, "w", encoding="utf8") as f:
+                json.dump({"generation": generation, "models": models}, f)
+            os.replace(tmp_path, self._path)
+            struct.pack_into(self._GENERATION_FORMAT, self._generation, 0, generation)
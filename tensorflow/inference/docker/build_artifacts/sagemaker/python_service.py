@@ -18,6 +18,7 @@ gevent.monkey.patch_all()
 
 import bisect
 import argparse
+import functools
 import importlib.util
 import json
 import logging
@@ -27,14 +28,19 @@ import subprocess
 import grpc
 import sys
 import shutil
-import copy
-import pickle
+import time
 
 import falcon
 import requests
-import random
 
-from multi_model_utils import MultiModelException, lock
+from model_cache import ModelCacheManager
+from multi_model_utils import (
+    MODEL_AVAILABLE,
+    MODEL_LOADING,
+    MultiModelException,
+    MultiModelRegistry,
+)
+from tfs_router import DEFAULT_ROUTING_POLICY, TfsEndpoint, TfsRouter
 import tfs_utils
 
 SAGEMAKER_MULTI_MODEL_ENABLED = os.environ.get("SAGEMAKER_MULTI_MODEL", "false").lower() == "true"
@@ -50,6 +56,25 @@ TFS_GRPC_PORTS = os.environ.get("TFS_GRPC_PORTS")
 TFS_REST_PORTS = os.environ.get("TFS_REST_PORTS")
 SAGEMAKER_TFS_PORT_RANGE = os.environ.get("SAGEMAKER_SAFE_PORT_RANGE")
 TFS_INSTANCE_COUNT = int(os.environ.get("SAGEMAKER_TFS_INSTANCE_COUNT", "1"))
+# models that are still loading after this many seconds are considered abandoned and reclaimed
+SAGEMAKER_MME_LOADING_TIMEOUT_SECONDS = int(
+    os.environ.get("SAGEMAKER_MME_LOADING_TIMEOUT_SECONDS", "600")
+)
+# least recently used models are evicted to keep loaded models within this share of host memory
+SAGEMAKER_MME_MEMORY_BUDGET_PERCENT = os.environ.get("SAGEMAKER_MME_MEMORY_BUDGET_PERCENT")
+SAGEMAKER_TFS_ROUTING_POLICY = os.environ.get(
+    "SAGEMAKER_TFS_ROUTING_POLICY", DEFAULT_ROUTING_POLICY
+).lower()
+SAGEMAKER_TFS_GRPC_ENABLED = (
+    os.environ.get("SAGEMAKER_TFS_ENABLE_GRPC_DEFAULT_HANDLER", "false").lower() == "true"
+)
+GRPC_CONTENT_TYPES = (tfs_utils.DEFAULT_CONTENT_TYPE, tfs_utils.NPY_CONTENT_TYPE)
+
+if SAGEMAKER_TFS_GRPC_ENABLED:
+    # grpc has to cooperate with the gevent hub, otherwise every call blocks the whole worker
+    from grpc.experimental import gevent as grpc_gevent
+
+    grpc_gevent.init_gevent()
 
 logging.basicConfig(
     format="%(process)d %(asctime)s %(levelname)-8s %(message)s", force=True, level=logging.INFO
@@ -57,7 +82,21 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 CUSTOM_ATTRIBUTES_HEADER = "X-Amzn-SageMaker-Custom-Attributes"
-MME_TFS_INSTANCE_STATUS_FILE = "/sagemaker/tfs_instance.pickle"
+
+# keep-alive sessions, one per TFS rest endpoint, so requests reuse their connections
+_tfs_sessions = {}
+
+
+def tfs_session(rest_uri):
+    """Return the pooled HTTP session for the TFS instance serving rest_uri
+    :param rest_uri: TFS rest uri of the request
+    :return: requests.Session shared by all requests to the same TFS rest port
+    """
+    endpoint = rest_uri.split("/v1/", 1)[0]
+    session = _tfs_sessions.get(endpoint)
+    if session is None:
+        session = _tfs_sessions.setdefault(endpoint, requests.Session())
+    return session
 
 
 def default_handler(data, context):
@@ -67,10 +106,16 @@ def default_handler(data, context):
     :param context: context instance that contains tfs_rest_uri
     :return: inference response from TFS model server
     """
-    data = data.read().decode("utf-8")
-    if not isinstance(data, str):
-        data = json.loads(data)
-    response = requests.post(context.rest_uri, data=data)
+    return rest_handler(data.read(), context)
+
+
+def rest_handler(payload, context):
+    """Send an already read request body to the TFS rest port
+    :param payload: request body
+    :param context: context instance that contains tfs_rest_uri
+    :return: inference response from TFS model server
+    """
+    response = tfs_session(context.rest_uri).post(context.rest_uri, data=payload)
     return response.content, context.accept_header
 
 
@@ -88,16 +133,24 @@ class PythonServiceResource:
     def __init__(self):
         if SAGEMAKER_MULTI_MODEL_ENABLED:
             self._mme_tfs_instances_status: dict[str, [TfsInstanceStatus]] = {}
+            self._mme_registry = MultiModelRegistry()
+            self._mme_registry_generation = None
+            self._model_cache = None
+            if SAGEMAKER_MME_MEMORY_BUDGET_PERCENT:
+                self._model_cache = ModelCacheManager(SAGEMAKER_MME_MEMORY_BUDGET_PERCENT)
             self._tfs_ports = self._parse_sagemaker_port_range_mme(SAGEMAKER_TFS_PORT_RANGE)
-            self._tfs_available_ports = self._parse_sagemaker_port_range_mme(
-                SAGEMAKER_TFS_PORT_RANGE
-            )
             # If Multi-Model mode is enabled, dependencies/handlers will be imported
             # during the _handle_load_model_post()
             self.model_handlers = {}
+            # grpc channels are created on the first invocation of each loaded model
+            self._channels = {}
         else:
             self._tfs_grpc_ports = self._parse_concat_ports(TFS_GRPC_PORTS)
             self._tfs_rest_ports = self._parse_concat_ports(TFS_REST_PORTS)
+            self._tfs_endpoints = [
+                TfsEndpoint(rest_port, grpc_port)
+                for rest_port, grpc_port in zip(self._tfs_rest_ports, self._tfs_grpc_ports)
+            ]
 
             self._channels = {}
             for grpc_port in self._tfs_grpc_ports:
@@ -105,6 +158,8 @@ class PythonServiceResource:
                 # between each grpc port and channel
                 self._setup_channel(grpc_port)
 
+        self._router = TfsRouter(SAGEMAKER_TFS_ROUTING_POLICY)
+
         self._default_handlers_enabled = False
         if os.path.exists(INFERENCE_SCRIPT_PATH):
             # Single-Model Mode & Multi-Model Mode both use one inference.py
@@ -112,6 +167,12 @@ class PythonServiceResource:
             self._handlers = self._make_handler(
                 self._handler, self._input_handler, self._output_handler
             )
+        elif SAGEMAKER_TFS_GRPC_ENABLED:
+            log.info("grpc default handler is enabled")
+            self._prediction_stubs = {}
+            self._signature_inputs = {}
+            self._handlers = self._grpc_default_handler
+            self._default_handlers_enabled = True
         else:
             self._handlers = default_handler
             self._default_handlers_enabled = True
@@ -136,9 +197,6 @@ class PythonServiceResource:
     def _parse_concat_ports(self, concat_ports):
         return concat_ports.split(",")
 
-    def _pick_port(self, ports):
-        return random.choice(ports)
-
     def _parse_sagemaker_port_range_mme(self, port_range):
         lower, upper = port_range.split("-")
         lower = int(lower)
@@ -151,22 +209,55 @@ class PythonServiceResource:
         }
         return tfs_ports
 
-    def _ports_available(self):
-        rest_ports = self._tfs_available_ports["rest_port"]
-        grpc_ports = self._tfs_available_ports["grpc_port"]
-        return len(rest_ports) > 0 and len(grpc_ports) > 0
-
-    def _update_ports_available(self):
-        self._tfs_available_ports = copy.deepcopy(self._tfs_ports)
-        for _, tf_status_list in self._mme_tfs_instances_status.items():
-            for tf_status in tf_status_list:
-                if tf_status.rest_port in self._tfs_available_ports["rest_port"]:
-                    self._tfs_available_ports["rest_port"].remove(tf_status.rest_port)
-                if tf_status.grpc_port in self._tfs_available_ports["grpc_port"]:
-                    self._tfs_available_ports["grpc_port"].remove(tf_status.grpc_port)
-        log.info(f"available ports : {self._tfs_available_ports}")
-
-    def _load_model(self, model_name, base_path, rest_port, grpc_port, model_index):
+    def _reclaim_abandoned_models(self, models):
+        """Remove the loading models whose loading worker died or that have been loading for longer
+        than SAGEMAKER_MME_LOADING_TIMEOUT_SECONDS, and stop their TFS instances"""
+        now = time.time()
+        for model_name, entry in list(models.items()):
+            if entry["state"] != MODEL_LOADING:
+                continue
+            owner_pid = entry.get("owner_pid")
+            is_owner_alive = owner_pid is not None and self._check_pid(owner_pid)
+            is_stale = now - entry.get("loading_since", 0) > SAGEMAKER_MME_LOADING_TIMEOUT_SECONDS
+            if is_owner_alive and not is_stale:
+                continue
+            log.warning(
+                "reclaiming abandoned load of model {} (worker pid: {})".format(
+                    model_name, owner_pid
+                )
+            )
+            del models[model_name]
+            for instance in entry["instances"]:
+                if instance["pid"] is not None:
+                    try:
+                        os.kill(instance["pid"], signal.SIGKILL)
+                    except OSError:
+                        pass
+            self._remove_model_config(model_name)
+
+    def _available_ports(self, models):
+        """Return the ports of the MME port range that no model in the registry is using, after
+        reclaiming the ports of abandoned loads"""
+        self._reclaim_abandoned_models(models)
+        used_rest_ports, used_grpc_ports = set(), set()
+        for entry in models.values():
+            for instance in entry["instances"]:
+                used_rest_ports.add(instance["rest_port"])
+                used_grpc_ports.add(instance["grpc_port"])
+        available_ports = {
+            "rest_port": [p for p in self._tfs_ports["rest_port"] if p not in used_rest_ports],
+            "grpc_port": [p for p in self._tfs_ports["grpc_port"] if p not in used_grpc_ports],
+        }
+        log.info(
+            "available ports : {} rest, {} grpc".format(
+                len(available_ports["rest_port"]), len(available_ports["grpc_port"])
+            )
+        )
+        return available_ports
+
+    def _load_model(
+        self, model_name, base_path, rest_port, grpc_port, model_index, on_started=None
+    ):
         if self.validate_model_dir(base_path):
             try:
                 self._import_custom_modules(model_name)
@@ -196,6 +287,8 @@ class PythonServiceResource:
                 )
                 log.info("MME starts tensorflow serving with command: {}".format(cmd))
                 p = subprocess.Popen(cmd.split())
+                if on_started is not None:
+                    on_started(p.pid)
 
                 tfs_utils.wait_for_model(rest_port, model_name, self._tfs_wait_time_seconds, p.pid)
 
@@ -271,56 +364,157 @@ class PythonServiceResource:
             }
 
     def _handle_load_model_post(self, res, data):  # noqa: C901
-        with lock():
-            model_name = data["model_name"]
-            base_path = data["url"]
-
-            # sync sync_local_mme_instance_status & update available ports
-            self._sync_local_mme_instance_status()
-            self._update_ports_available()
-            self._sync_model_handlers()
-
-            # model is already loaded
-            if model_name in self._mme_tfs_instances_status:
-                res.status = falcon.HTTP_409
-                res.body = json.dumps({"error": "Model {} is already loaded.".format(model_name)})
-                return
-
-            is_load_successful = True
-            response = {}
-            for i in range(self._tfs_instance_count):
-                # check if there are available ports
-                if not self._ports_available():
-                    is_load_successful = False
-                    response["status"] = falcon.HTTP_507
-                    response["body"] = json.dumps(
-                        {"error": "Memory exhausted: no available ports to load the model."}
-                    )
-                    break
-                tfs_rest_port = self._tfs_available_ports["rest_port"].pop()
-                tfs_grpc_port = self._tfs_available_ports["grpc_port"].pop()
+        model_name = data["model_name"]
+        base_path = data["url"]
+
+        if self._model_cache is not None:
+            self._evict_models(model_name, base_path)
+
+        # reserve the model and its ports in the registry, the (slow) load itself runs without
+        # holding any lock so that other models can be loaded at the same time
+        error = None
+        with self._mme_registry.update() as models:
+            available_ports = self._available_ports(models)
+            if model_name in models:
+                error = (
+                    falcon.HTTP_409,
+                    {"error": "Model {} is already loaded.".format(model_name)},
+                )
+            elif (
+                min(len(available_ports["rest_port"]), len(available_ports["grpc_port"]))
+                < self._tfs_instance_count
+            ):
+                error = (
+                    falcon.HTTP_507,
+                    {"error": "Memory exhausted: no available ports to load the model."},
+                )
+            else:
+                instances = [
+                    {
+                        "rest_port": available_ports["rest_port"].pop(),
+                        "grpc_port": available_ports["grpc_port"].pop(),
+                        "pid": None,
+                    }
+                    for _ in range(self._tfs_instance_count)
+                ]
+                loading_since = time.time()
+                models[model_name] = {
+                    "state": MODEL_LOADING,
+                    "instances": instances,
+                    "owner_pid": os.getpid(),
+                    "loading_since": loading_since,
+                }
+        if error:
+            res.status = error[0]
+            res.body = json.dumps(error[1])
+            return
 
-                response = self._load_model(model_name, base_path, tfs_rest_port, tfs_grpc_port, i)
+        def is_reservation_owner(models):
+            # the reservation may have been reclaimed, and the model reserved again by another load
+            entry = models.get(model_name, {})
+            return (
+                entry.get("owner_pid") == os.getpid()
+                and entry.get("loading_since") == loading_since
+            )
 
+        def record_pid(index, pid):
+            # publish the pid as soon as the instance starts, so that the instance can be stopped
+            # if this worker dies while the model is loading
+            instances[index]["pid"] = pid
+            with self._mme_registry.update() as models:
+                if is_reservation_owner(models):
+                    models[model_name]["instances"][index]["pid"] = pid
+
+        # the reservation must not outlive this request, even if the load raises
+        is_load_successful = False
+        response = {}
+        try:
+            for i, instance in enumerate(instances):
+                response = self._load_model(
+                    model_name,
+                    base_path,
+                    instance["rest_port"],
+                    instance["grpc_port"],
+                    i,
+                    on_started=functools.partial(record_pid, i),
+                )
                 if "pid" in response:
-                    self._mme_tfs_instances_status.setdefault(model_name, []).append(
-                        TfsInstanceStatus(tfs_rest_port, tfs_grpc_port, response["pid"])
-                    )
+                    instance["pid"] = response["pid"]
 
                 if response["status"] != falcon.HTTP_200:
                     log.info(f"Failed to load model : {model_name}")
-                    is_load_successful = False
                     break
+            else:
+                is_load_successful = True
+        finally:
+            is_reservation_owned = False
+            with self._mme_registry.update() as models:
+                if is_reservation_owner(models):
+                    is_reservation_owned = True
+                    if is_load_successful:
+                        models[model_name] = {"state": MODEL_AVAILABLE, "instances": instances}
+                    else:
+                        del models[model_name]
+
+            if is_load_successful and not is_reservation_owned:
+                # the ports of the reclaimed reservation may already be allocated to another load
+                log.warning(f"Reservation of model {model_name} was reclaimed while loading")
+                is_load_successful = False
+                response = {
+                    "status": falcon.HTTP_500,
+                    "body": json.dumps({"error": "Loading model {} timed out.".format(model_name)}),
+                }
 
             if not is_load_successful:
                 log.info(f"Failed to load model : {model_name}, Starting to cleanup...")
-                self._delete_model(model_name)
-                self._remove_model_config(model_name)
-            else:
-                self._upload_mme_instance_status()
+                for instance in instances:
+                    if instance["pid"] is not None:
+                        try:
+                            os.kill(instance["pid"], signal.SIGKILL)
+                        except OSError:
+                            pass
+                # the config of a reclaimed reservation was removed when it was reclaimed
+                if is_reservation_owned:
+                    self._remove_model_config(model_name)
+
+        if is_load_successful:
+            self._sync_local_mme_instance_status()
+            if self._model_cache is not None:
+                self._model_cache.touch(model_name)
 
-            res.status = response["status"]
-            res.body = response["body"]
+        res.status = response["status"]
+        res.body = response["body"]
+
+    def _evict_models(self, model_name, base_path):
+        """Unload least recently used models until the model to be loaded fits within the memory
+        budget and the port range"""
+        required_bytes = (
+            self._model_cache.estimate_model_bytes(base_path) * self._tfs_instance_count
+        )
+        evicted = {}
+        with self._mme_registry.update() as models:
+            if model_name in models:
+                return
+            available_ports = self._available_ports(models)
+            for name in self._model_cache.plan_evictions(
+                models,
+                required_bytes,
+                self._tfs_instance_count,
+                min(len(available_ports["rest_port"]), len(available_ports["grpc_port"])),
+            ):
+                evicted[name] = models.pop(name)
+
+        for name, entry in evicted.items():
+            log.info("evicting model {} to load model {}".format(name, model_name))
+            for instance in entry["instances"]:
+                try:
+                    os.kill(instance["pid"], signal.SIGKILL)
+                except OSError:
+                    pass
+            self._remove_model_config(name)
+            self._model_cache.forget(name)
+        if evicted:
+            self._sync_local_mme_instance_status()
 
     def _import_custom_modules(self, model_name):
         inference_script_path = "/opt/ml/models/{}/model/code/inference.py".format(model_name)
@@ -357,13 +551,8 @@ class PythonServiceResource:
     def _handle_invocation_post(self, req, res, model_name=None):
         if SAGEMAKER_MULTI_MODEL_ENABLED:
             if model_name:
-                if self._gunicorn_workers > 1:
-                    if model_name not in self._mme_tfs_instances_status or not self._check_pid(
-                        self._mme_tfs_instances_status[model_name][0].pid
-                    ):
-                        with lock():
-                            self._sync_local_mme_instance_status()
-                        self._sync_model_handlers()
+                if self._sync_local_mme_instance_status():
+                    self._sync_model_handlers()
 
                 if model_name not in self._mme_tfs_instances_status:
                     res.status = falcon.HTTP_404
@@ -371,41 +560,47 @@ class PythonServiceResource:
                         {"error": "Model {} is not loaded yet.".format(model_name)}
                     )
                     return
-                else:
-                    log.info("model name: {}".format(model_name))
-                    rest_ports = [
-                        status.rest_port for status in self._mme_tfs_instances_status[model_name]
-                    ]
-                    rest_port = self._pick_port(rest_ports)
-                    log.info("rest port: {}".format(str(rest_port)))
-                    grpc_ports = [
-                        status.grpc_port for status in self._mme_tfs_instances_status[model_name]
-                    ]
-                    grpc_port = grpc_ports[rest_ports.index(rest_port)]
-                    log.info("grpc port: {}".format(str(grpc_port)))
-                    data, context = tfs_utils.parse_request(
-                        req,
-                        rest_port,
-                        grpc_port,
-                        self._tfs_default_model_name,
-                        model_name=model_name,
-                    )
+                log.info("model name: {}".format(model_name))
+                if self._model_cache is not None:
+                    self._model_cache.touch(model_name)
+                endpoints = self._mme_tfs_instances_status[model_name]
+                routing_key = model_name
             else:
                 res.status = falcon.HTTP_400
                 res.body = json.dumps({"error": "Invocation request does not contain model name."})
                 return
         else:
-            # Randomly pick port used for routing incoming request.
-            grpc_port = self._pick_port(self._tfs_grpc_ports)
-            rest_port = self._pick_port(self._tfs_rest_ports)
-            data, context = tfs_utils.parse_request(
-                req,
-                rest_port,
-                grpc_port,
-                self._tfs_default_model_name,
-                channel=self._channels[grpc_port],
-            )
+            endpoints = self._tfs_endpoints
+            routing_key = tfs_utils.parse_tfs_custom_attributes(req).get("tfs-model-name")
+
+        # the rest and grpc ports picked for a request always belong to the same TFS instance
+        with self._router.route(endpoints, routing_key) as endpoint:
+            rest_port, grpc_port = endpoint.rest_port, endpoint.grpc_port
+            log.info("rest port: {}, grpc port: {}".format(str(rest_port), str(grpc_port)))
+            if SAGEMAKER_MULTI_MODEL_ENABLED:
+                channel = None
+                if SAGEMAKER_TFS_GRPC_ENABLED:
+                    self._setup_channel(grpc_port)
+                    channel = self._channels[grpc_port]
+                data, context = tfs_utils.parse_request(
+                    req,
+                    rest_port,
+                    grpc_port,
+                    self._tfs_default_model_name,
+                    model_name=model_name,
+                    channel=channel,
+                )
+            else:
+                data, context = tfs_utils.parse_request(
+                    req,
+                    rest_port,
+                    grpc_port,
+                    self._tfs_default_model_name,
+                    channel=self._channels[grpc_port],
+                )
+            self._invoke_handlers(res, data, context, model_name)
 
+    def _invoke_handlers(self, res, data, context, model_name=None):
         try:
             res.status = falcon.HTTP_200
             handlers = self._handlers
@@ -437,6 +632,53 @@ class PythonServiceResource:
             log.info("Creating grpc channel for port: %s", grpc_port)
             self._channels[grpc_port] = grpc.insecure_channel("localhost:{}".format(grpc_port))
 
+    def _grpc_default_handler(self, data, context):
+        """A default inference request handler that sends JSON and NPY predict requests to the TFS
+        grpc port over the cached channel, and any other request to the TFS rest port
+        :param data: input data
+        :param context: context instance that contains tfs_rest_uri and the grpc channel
+        :return: inference response from TFS model server, in the TFS rest API format
+        """
+        payload = data.read()
+        if (
+            context.channel is None
+            or context.method not in (None, "predict")
+            or context.request_content_type.split(";")[0] not in GRPC_CONTENT_TYPES
+        ):
+            return rest_handler(payload, context)
+
+        content_type = context.request_content_type.split(";")[0]
+        try:
+            signature_name, inputs, row_format = tfs_utils.parse_predict_payload(
+                payload, content_type
+            )
+        except (ValueError, KeyError, TypeError, AttributeError, IndexError):
+            # leave malformed payloads to TFS so clients get its usual error message
+            return rest_handler(payload, context)
+
+        model_name = context.model_name or self._tfs_default_model_name
+        context = context._replace(model_name=model_name)
+        stub = self._prediction_stub(context.grpc_port, context.channel)
+        signature_key = (context.grpc_port, model_name, context.model_version, signature_name)
+        if signature_key not in self._signature_inputs:
+            self._signature_inputs[signature_key] = tfs_utils.get_signature_inputs(
+                stub, model_name, context.model_version, signature_name
+            )
+        request = tfs_utils.make_predict_request(
+            context, signature_name, inputs, self._signature_inputs[signature_key]
+        )
+        response = stub.Predict(request)
+        return tfs_utils.predict_response_to_json(response, row_format), context.accept_header
+
+    def _prediction_stub(self, grpc_port, channel):
+        if grpc_port not in self._prediction_stubs:
+            from tensorflow_serving.apis import prediction_service_pb2_grpc
+
+            self._prediction_stubs[grpc_port] = prediction_service_pb2_grpc.PredictionServiceStub(
+                channel
+            )
+        return self._prediction_stubs[grpc_port]
+
     def _import_handlers(self, inference_script=INFERENCE_SCRIPT_PATH):
         spec = importlib.util.spec_from_file_location("inference", inference_script)
         inference = importlib.util.module_from_spec(spec)
@@ -459,68 +701,70 @@ class PythonServiceResource:
 
         def handler(data, context):
             processed_input = custom_input_handler(data, context)
-            response = requests.post(context.rest_uri, data=processed_input)
+            response = tfs_session(context.rest_uri).post(context.rest_uri, data=processed_input)
             return custom_output_handler(response, context)
 
         return handler
 
     def on_get(self, req, res, model_name=None):  # pylint: disable=W0613
-        with lock():
-            self._sync_local_mme_instance_status()
-            if model_name is None:
-                models_info = {}
-                uri = "http://localhost:{}/v1/models/{}"
-                for model, tfs_instance_status in self._mme_tfs_instances_status.items():
-                    try:
-                        info = json.loads(
-                            requests.get(
-                                uri.format(tfs_instance_status[0].rest_port, model)
-                            ).content
-                        )
-                        models_info[model] = info
-                    except ValueError as e:
-                        log.exception("exception handling request: {}".format(e))
-                        res.status = falcon.HTTP_500
-                        res.body = json.dumps({"error": str(e)}).encode("utf-8")
-                res.status = falcon.HTTP_200
-                res.body = json.dumps(models_info)
-            else:
-                if model_name not in self._mme_tfs_instances_status:
-                    res.status = falcon.HTTP_404
-                    res.body = json.dumps(
-                        {"error": "Model {} is loaded yet.".format(model_name)}
-                    ).encode("utf-8")
-                else:
-                    port = self._mme_tfs_instances_status[model_name].rest_port
-                    uri = "http://localhost:{}/v1/models/{}".format(port, model_name)
-                    try:
-                        info = requests.get(uri)
-                        res.status = falcon.HTTP_200
-                        res.body = json.dumps({"model": info}).encode("utf-8")
-                    except ValueError as e:
-                        log.exception("exception handling GET models request.")
-                        res.status = falcon.HTTP_500
-                        res.body = json.dumps({"error": str(e)}).encode("utf-8")
-
-    def on_delete(self, req, res, model_name):  # pylint: disable=W0613
-        with lock():
-            self._sync_local_mme_instance_status()
+        self._sync_local_mme_instance_status()
+        if model_name is None:
+            models_info = {}
+            uri = "http://localhost:{}/v1/models/{}"
+            for model, tfs_instance_status in self._mme_tfs_instances_status.items():
+                try:
+                    info = json.loads(
+                        requests.get(uri.format(tfs_instance_status[0].rest_port, model)).content
+                    )
+                    models_info[model] = info
+                except ValueError as e:
+                    log.exception("exception handling request: {}".format(e))
+                    res.status = falcon.HTTP_500
+                    res.body = json.dumps({"error": str(e)}).encode("utf-8")
+            res.status = falcon.HTTP_200
+            res.body = json.dumps(models_info)
+        else:
             if model_name not in self._mme_tfs_instances_status:
                 res.status = falcon.HTTP_404
-                res.body = json.dumps({"error": "Model {} is not loaded yet".format(model_name)})
+                res.body = json.dumps(
+                    {"error": "Model {} is loaded yet.".format(model_name)}
+                ).encode("utf-8")
             else:
+                port = self._mme_tfs_instances_status[model_name].rest_port
+                uri = "http://localhost:{}/v1/models/{}".format(port, model_name)
                 try:
-                    self._delete_model(model_name)
-                    self._remove_model_config(model_name)
-                    del self._mme_tfs_instances_status[model_name]
-                    self._upload_mme_instance_status()
+                    info = requests.get(uri)
                     res.status = falcon.HTTP_200
-                    res.body = json.dumps(
-                        {"success": "Successfully unloaded model {}.".format(model_name)}
-                    )
-                except OSError as error:
+                    res.body = json.dumps({"model": info}).encode("utf-8")
+                except ValueError as e:
+                    log.exception("exception handling GET models request.")
                     res.status = falcon.HTTP_500
-                    res.body = json.dumps({"error": str(error)}).encode("utf-8")
+                    res.body = json.dumps({"error": str(e)}).encode("utf-8")
+
+    def on_delete(self, req, res, model_name):  # pylint: disable=W0613
+        self._sync_local_mme_instance_status()
+        is_loaded = False
+        with self._mme_registry.update() as models:
+            if models.get(model_name, {}).get("state") == MODEL_AVAILABLE:
+                is_loaded = True
+                del models[model_name]
+        if not is_loaded:
+            res.status = falcon.HTTP_404
+            res.body = json.dumps({"error": "Model {} is not loaded yet".format(model_name)})
+        else:
+            try:
+                self._delete_model(model_name)
+                self._remove_model_config(model_name)
+                if self._model_cache is not None:
+                    self._model_cache.forget(model_name)
+                self._sync_local_mme_instance_status()
+                res.status = falcon.HTTP_200
+                res.body = json.dumps(
+                    {"success": "Successfully unloaded model {}.".format(model_name)}
+                )
+            except OSError as error:
+                res.status = falcon.HTTP_500
+                res.body = json.dumps({"error": str(error)}).encode("utf-8")
 
     def _delete_model(self, model_name):
         if model_name not in self._mme_tfs_instances_status:
@@ -554,26 +798,24 @@ class PythonServiceResource:
                 return True
         return False
 
-    def _upload_mme_instance_status(self):
-        log.info(
-            "uploaded mme instance status file with content: {}".format(
-                self._mme_tfs_instances_status
-            )
-        )
-        with open(MME_TFS_INSTANCE_STATUS_FILE, "wb") as handle:
-            pickle.dump(self._mme_tfs_instances_status, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
     def _sync_local_mme_instance_status(self):
-        if not os.path.exists(MME_TFS_INSTANCE_STATUS_FILE):
-            log.info("mme instance status file does not found.")
-            return
-        with open(MME_TFS_INSTANCE_STATUS_FILE, "rb") as handle:
-            self._mme_tfs_instances_status = pickle.load(handle)
+        """Reload the local copy of the MME registry if another worker changed it
+        :return: True if the local copy was reloaded
+        """
+        if self._mme_registry.generation() == self._mme_registry_generation:
+            return False
+        self._mme_registry_generation, models = self._mme_registry.read()
+        self._mme_tfs_instances_status = {
+            model_name: [TfsInstanceStatus(**instance) for instance in entry["instances"]]
+            for model_name, entry in models.items()
+            if entry["state"] == MODEL_AVAILABLE
+        }
         log.info(
             "updated local mme instance status with content: {}".format(
                 self._mme_tfs_instances_status
             )
         )
+        return True
 
     def _sync_model_handlers(self):
         for model_name, _ in self._mme_tfs_instances_status.items():
@@ -663,6 +905,9 @@ if __name__ == "__main__":
             f'SAGEMAKER_TFS_INTRA_OP_PARALLELISM={os.environ.get("SAGEMAKER_TFS_INTRA_OP_PARALLELISM", 0)}',
             f'SAGEMAKER_TFS_INSTANCE_COUNT={os.environ.get("SAGEMAKER_TFS_INSTANCE_COUNT", "1")}',
             f'SAGEMAKER_GUNICORN_WORKERS={os.environ.get("SAGEMAKER_GUNICORN_WORKERS", "1")}',
+            f"SAGEMAKER_TFS_ROUTING_POLICY={SAGEMAKER_TFS_ROUTING_POLICY}",
+            f'SAGEMAKER_MME_MEMORY_BUDGET_PERCENT={SAGEMAKER_MME_MEMORY_BUDGET_PERCENT or ""}',
+            f'SAGEMAKER_TFS_ENABLE_GRPC_DEFAULT_HANDLER={os.environ.get("SAGEMAKER_TFS_ENABLE_GRPC_DEFAULT_HANDLER", "false")}',
         ],
     }
 
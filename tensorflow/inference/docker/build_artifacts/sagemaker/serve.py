@@ -14,10 +14,14 @@ import boto3
 import logging
 import os
 import re
+import requests
 import signal
 import subprocess
+import time
+import tfs_router
 import tfs_utils
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 logging.basicConfig(
@@ -57,6 +61,9 @@ class ServiceManager(object):
         self._gunicorn_threads = os.environ.get("SAGEMAKER_GUNICORN_THREADS", 1)
         self._gunicorn_loglevel = os.environ.get("SAGEMAKER_GUNICORN_LOGLEVEL", "info")
         self._tfs_config_path = "/sagemaker/model-config.cfg"
+        self._tfs_warmup_request_path = os.environ.get("SAGEMAKER_TFS_WARMUP_REQUEST_PATH")
+        self._tfs_warmup_iterations = int(os.environ.get("SAGEMAKER_TFS_WARMUP_ITERATIONS", 1))
+        self._num_gpus = None
         self._tfs_batching_config_path = "/sagemaker/batching-config.cfg"
 
         _enable_batching = os.environ.get("SAGEMAKER_TFS_ENABLE_BATCHING", "false").lower()
@@ -69,6 +76,11 @@ class ServiceManager(object):
         )
         self._tfs_inter_op_parallelism = os.environ.get("SAGEMAKER_TFS_INTER_OP_PARALLELISM", 0)
         self._tfs_intra_op_parallelism = os.environ.get("SAGEMAKER_TFS_INTRA_OP_PARALLELISM", 0)
+        self._tfs_routing_policy = tfs_router.validate_routing_policy(
+            os.environ.get(
+                "SAGEMAKER_TFS_ROUTING_POLICY", tfs_router.DEFAULT_ROUTING_POLICY
+            ).lower()
+        )
         self._gunicorn_worker_class = os.environ.get("SAGEMAKER_GUNICORN_WORKER_CLASS", "gevent")
         self._gunicorn_timeout_seconds = int(
             os.environ.get("SAGEMAKER_GUNICORN_TIMEOUT_SECONDS", 30)
@@ -249,6 +261,7 @@ class ServiceManager(object):
             "SAGEMAKER_TFS_INTER_OP_PARALLELISM": str(self._tfs_inter_op_parallelism),
             "SAGEMAKER_TFS_INTRA_OP_PARALLELISM": str(self._tfs_intra_op_parallelism),
             "SAGEMAKER_TFS_INSTANCE_COUNT": str(self._tfs_instance_count),
+            "SAGEMAKER_TFS_ROUTING_POLICY": self._tfs_routing_policy,
             "PYTHONPATH": ":".join(python_path_content),
             "SAGEMAKER_GUNICORN_WORKERS": str(self._gunicorn_workers),
         }
@@ -279,6 +292,9 @@ class ServiceManager(object):
     def _create_nginx_tfs_upstream(self):
         indentation = "    "
         tfs_upstream = ""
+        directive = tfs_router.nginx_upstream_directive(self._tfs_routing_policy)
+        if directive and len(self._tfs_rest_ports) > 1:
+            tfs_upstream += "{}{};\n".format(indentation, directive)
         for port in self._tfs_rest_ports:
             tfs_upstream += "{}server localhost:{};\n".format(indentation, port)
         tfs_upstream = tfs_upstream[len(indentation) : -2]
@@ -324,12 +340,16 @@ class ServiceManager(object):
         return False
 
     def _get_number_of_gpu_on_host(self):
-        nvidia_smi_exist = os.path.exists("/usr/bin/nvidia-smi")
-        if nvidia_smi_exist:
-            return len(
-                subprocess.check_output(["nvidia-smi", "-L"]).decode("utf-8").strip().split("\n")
-            )
-        return 0
+        if self._num_gpus is None:
+            self._num_gpus = 0
+            if os.path.exists("/usr/bin/nvidia-smi"):
+                self._num_gpus = len(
+                    subprocess.check_output(["nvidia-smi", "-L"])
+                    .decode("utf-8")
+                    .strip()
+                    .split("\n")
+                )
+        return self._num_gpus
 
     def _calculate_per_process_gpu_memory_fraction(self):
         return round((1 - self._tfs_gpu_margin) / float(self._tfs_instance_count), 4)
@@ -389,16 +409,60 @@ class ServiceManager(object):
         log.info("stopped")
 
     def _wait_for_gunicorn(self):
-        while True:
-            if os.path.exists("/tmp/gunicorn.sock"):
-                log.info("gunicorn server is ready!")
-                return
+        delay = 0.01
+        while not os.path.exists("/tmp/gunicorn.sock"):
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        log.info("gunicorn server is ready!")
 
     def _wait_for_tfs(self):
-        for i in range(self._tfs_instance_count):
-            tfs_utils.wait_for_model(
-                self._tfs_rest_ports[i], self._tfs_default_model_name, self._tfs_wait_time_seconds
+        # instances load their models in parallel, so wait for all of them at once
+        with ThreadPoolExecutor(max_workers=self._tfs_instance_count) as executor:
+            futures = [
+                executor.submit(
+                    tfs_utils.wait_for_model,
+                    rest_port,
+                    self._tfs_default_model_name,
+                    self._tfs_wait_time_seconds,
+                )
+                for rest_port in self._tfs_rest_ports
+            ]
+            for future in futures:
+                future.result()
+
+    def _warmup_tfs(self):
+        """Send a sample request to every TFS instance before nginx starts answering /ping
+
+        Warmup records shipped with the model in assets.extra/tf_serving_warmup_requests are
+        already replayed by TFS itself while loading it, this covers user provided samples.
+        """
+        if not self._tfs_warmup_request_path:
+            return
+        if not os.path.exists(self._tfs_warmup_request_path):
+            log.warning("warmup request {} not found".format(self._tfs_warmup_request_path))
+            return
+        with open(self._tfs_warmup_request_path, "rb") as f:
+            warmup_request = f.read()
+
+        def _warmup(rest_port):
+            uri = "http://localhost:{}/v1/models/{}:predict".format(
+                rest_port, self._tfs_default_model_name
             )
+            with requests.Session() as session:
+                for _ in range(self._tfs_warmup_iterations):
+                    response = session.post(uri, data=warmup_request)
+                    if response.status_code != 200:
+                        log.warning(
+                            "warmup request to port {} failed: {}".format(
+                                rest_port, response.content
+                            )
+                        )
+                        return
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self._tfs_instance_count) as executor:
+            list(executor.map(_warmup, self._tfs_rest_ports))
+        log.info("tensorflow serving warmup took {:.2f} seconds".format(time.time() - start))
 
     @contextmanager
     def _timeout(self, seconds):
@@ -501,13 +565,19 @@ class ServiceManager(object):
         else:
             self._create_tfs_config()
             self._start_tfs()
-            self._wait_for_tfs()
 
         self._create_nginx_config()
 
+        # gunicorn (and the requirements it installs) starts while TFS loads the models
         if self._use_gunicorn:
             self._setup_gunicorn()
             self._start_gunicorn()
+
+        if not self._tfs_enable_multi_model_endpoint:
+            self._wait_for_tfs()
+            self._warmup_tfs()
+
+        if self._use_gunicorn:
             # make sure gunicorn is up
             with self._timeout(seconds=self._gunicorn_timeout_seconds):
                 self._wait_for_gunicorn()
@@ -0,0 +1,114 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import hashlib
+import random
+import threading
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+RANDOM_POLICY = "random"
+LEAST_OUTSTANDING_POLICY = "least_outstanding"
+POWER_OF_TWO_POLICY = "power_of_two"
+STICKY_POLICY = "sticky"
+ROUTING_POLICIES = (RANDOM_POLICY, LEAST_OUTSTANDING_POLICY, POWER_OF_TWO_POLICY, STICKY_POLICY)
+DEFAULT_ROUTING_POLICY = LEAST_OUTSTANDING_POLICY
+
+# a TFS instance is always addressed through the rest and grpc ports it was started with
+TfsEndpoint = namedtuple("TfsEndpoint", "rest_port, grpc_port")
+
+
+def validate_routing_policy(policy):
+    if policy not in ROUTING_POLICIES:
+        raise ValueError(
+            "SAGEMAKER_TFS_ROUTING_POLICY must be one of {}, got: {}".format(
+                ", ".join(ROUTING_POLICIES), policy
+            )
+        )
+    return policy
+
+
+def nginx_upstream_directive(policy):
+    """Return the nginx upstream load balancing directive matching a routing policy
+    :param policy: routing policy of the python service
+    :return: directive for the tfs_upstream block, or None for nginx's default round robin
+    """
+    if policy == LEAST_OUTSTANDING_POLICY:
+        return "least_conn"
+    if policy == POWER_OF_TWO_POLICY:
+        return "random two least_conn"
+    if policy == STICKY_POLICY:
+        # the model name is only known from the custom attributes header on this path
+        return "hash $http_x_amzn_sagemaker_custom_attributes consistent"
+    return None
+
+
+class TfsRouter:
+    """Route requests across the TFS instances of a gunicorn worker
+
+    The router counts the requests each instance is currently serving for this worker, and always
+    returns the rest and grpc ports of the same instance.
+    """
+
+    def __init__(self, policy=DEFAULT_ROUTING_POLICY):
+        self._policy = validate_routing_policy(policy)
+        self._outstanding = {}
+        self._lock = threading.Lock()
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def outstanding(self, endpoint):
+        return self._outstanding.get(endpoint.rest_port, 0)
+
+    def _least_outstanding(self, endpoints):
+        least = min(self.outstanding(endpoint) for endpoint in endpoints)
+        return random.choice([e for e in endpoints if self.outstanding(e) == least])
+
+    def _sticky(self, endpoints, key):
+        # rendezvous hashing keeps most keys in place when instances come and go
+        return max(
+            endpoints,
+            key=lambda endpoint: hashlib.md5(
+                "{}:{}".format(key, endpoint.rest_port).encode("utf-8")
+            ).digest(),
+        )
+
+    def pick(self, endpoints, key=None):
+        """Pick the instance a request should be sent to
+        :param endpoints: list of TfsEndpoint, or any objects with rest_port and grpc_port
+        :param key: routing key used by the sticky policy, e.g. the tfs-model-name
+        :return: the chosen endpoint
+        """
+        if len(endpoints) == 1:
+            return endpoints[0]
+        if self._policy == RANDOM_POLICY:
+            return random.choice(endpoints)
+        if self._policy == STICKY_POLICY and key:
+            return self._sticky(endpoints, key)
+        if self._policy == POWER_OF_TWO_POLICY:
+            return self._least_outstanding(random.sample(endpoints, 2))
+        return self._least_outstanding(endpoints)
+
+    @contextmanager
+    def route(self, endpoints, key=None):
+        """Pick an instance and count the request as outstanding on it until the block exits"""
+        with self._lock:
+            endpoint = self.pick(endpoints, key)
+            self._outstanding[endpoint.rest_port] = self.outstanding(endpoint) + 1
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                self._outstanding[endpoint.rest_port] -= 1
@@ -11,6 +11,7 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 
+import io
 import logging
 import multiprocessing
 import os
@@ -20,8 +21,6 @@ import json
 import time
 
 from multi_model_utils import timeout
-from urllib3.util.retry import Retry
-from urllib3.exceptions import NewConnectionError, MaxRetryError
 from collections import namedtuple
 from multi_model_utils import MultiModelException
 
@@ -30,6 +29,8 @@ log = logging.getLogger(__name__)
 
 DEFAULT_CONTENT_TYPE = "application/json"
 DEFAULT_ACCEPT_HEADER = "application/json"
+NPY_CONTENT_TYPE = "application/x-npy"
+DEFAULT_SIGNATURE_NAME = "serving_default"
 CUSTOM_ATTRIBUTES_HEADER = "X-Amzn-SageMaker-Custom-Attributes"
 
 Context = namedtuple(
@@ -63,6 +64,113 @@ def parse_request(req, rest_port, grpc_port, default_model_name, model_name=None
     return data, context
 
 
+def parse_predict_payload(payload, content_type):
+    """Parse a JSON or NPY invocation payload the same way the TFS REST predict API does
+
+    :param payload: raw request body
+    :param content_type: request content type
+    :return: tuple of signature name, inputs (a dict keyed by input name, or a single unnamed
+        value) and whether the payload used the row ("instances") format
+    """
+    if content_type == NPY_CONTENT_TYPE:
+        import numpy as np
+
+        return DEFAULT_SIGNATURE_NAME, np.load(io.BytesIO(payload), allow_pickle=False), True
+
+    body = json.loads(payload)
+    signature_name = body.get("signature_name", DEFAULT_SIGNATURE_NAME)
+    if "instances" not in body:
+        return signature_name, body["inputs"], False
+
+    instances = body["instances"]
+    if instances and isinstance(instances[0], dict):
+        return (
+            signature_name,
+            {name: [instance[name] for instance in instances] for name in instances[0]},
+            True,
+        )
+    return signature_name, instances, True
+
+
+def make_predict_request(context, signature_name, inputs, input_specs):
+    """Build a PredictRequest proto for the TFS gRPC Predict API
+
+    :param context: context instance that contains model_name and model_version
+    :param signature_name: name of the signature to call
+    :param inputs: inputs as returned by parse_predict_payload
+    :param input_specs: dict of input name to TensorInfo of the signature
+    :return: PredictRequest
+    """
+    import tensorflow as tf
+    from tensorflow_serving.apis import predict_pb2
+
+    request = predict_pb2.PredictRequest()
+    request.model_spec.name = context.model_name
+    request.model_spec.signature_name = signature_name
+    if context.model_version:
+        request.model_spec.version.value = int(context.model_version)
+
+    if not isinstance(inputs, dict):
+        if len(input_specs) != 1:
+            raise ValueError(
+                "unnamed inputs require a signature with a single input, got: {}".format(
+                    sorted(input_specs)
+                )
+            )
+        inputs = {next(iter(input_specs)): inputs}
+
+    for name, value in inputs.items():
+        dtype = tf.dtypes.as_dtype(input_specs[name].dtype) if name in input_specs else None
+        request.inputs[name].CopyFrom(tf.make_tensor_proto(value, dtype=dtype))
+    return request
+
+
+def get_signature_inputs(stub, model_name, model_version, signature_name):
+    """Look up the inputs of a model signature through the TFS gRPC GetModelMetadata API
+
+    :param stub: PredictionServiceStub on the channel of the TFS instance serving the model
+    :return: dict of input name to TensorInfo
+    """
+    from tensorflow_serving.apis import get_model_metadata_pb2
+
+    request = get_model_metadata_pb2.GetModelMetadataRequest()
+    request.model_spec.name = model_name
+    if model_version:
+        request.model_spec.version.value = int(model_version)
+    request.metadata_field.append("signature_def")
+    response = stub.GetModelMetadata(request)
+
+    signature_def_map = get_model_metadata_pb2.SignatureDefMap()
+    response.metadata["signature_def"].Unpack(signature_def_map)
+    if signature_name not in signature_def_map.signature_def:
+        raise ValueError("signature {} not found for model {}".format(signature_name, model_name))
+    return dict(signature_def_map.signature_def[signature_name].inputs)
+
+
+def predict_response_to_json(response, row_format):
+    """Convert a PredictResponse proto into the JSON body the TFS REST API would have returned
+
+    :param response: PredictResponse from the TFS gRPC Predict call
+    :param row_format: whether the request used the row ("instances") format
+    :return: JSON string with "predictions" for row format, "outputs" for columnar format
+    """
+    import tensorflow as tf
+
+    def _to_list(tensor_proto):
+        value = tf.make_ndarray(tensor_proto)
+        if value.dtype.kind in ("S", "O"):
+            value = value.astype(str)
+        return value.tolist()
+
+    outputs = {name: _to_list(tensor) for name, tensor in response.outputs.items()}
+    if len(outputs) == 1:
+        outputs = next(iter(outputs.values()))
+    elif row_format:
+        batch_size = len(next(iter(outputs.values())))
+        outputs = [{name: value[i] for name, value in outputs.items()} for i in range(batch_size)]
+    return json.dumps({"predictions" if row_format else "outputs": outputs})
+
+
 def make_tfs_uri(port, attributes, default_model_name, model_name=None):
     log.info("sagemaker tfs attributes: \n{}".format(attributes))
 
@@ -256,44 +364,18 @@ def create_batching_config(batching_config_file):
 
 
 def wait_for_model(rest_port, model_name, timeout_seconds, pid=None):
-    """
-    Notice:
-    The calculation for retry count based on timeout_seconds might introduce a small delta (0.1s) for each retry
-    which might cause total timeout longer than timeout_seconds
+    """Poll the TFS model status API, backing off exponentially, until every version of the model
+    is available or timeout_seconds have passed
     """
     tfs_url = "http://localhost:{}/v1/models/{}".format(rest_port, model_name)
-    start = time.time()
-    try:
-        session = requests.Session()
-        backoff_factor = 0.1
-        # sleep = {backoff factor} * (2 ^ ({number of retries so far} - 1))
-        retry_count = retry_from_timeout(timeout_seconds, backoff_factor)
-        retries = Retry(total=retry_count, backoff_factor=backoff_factor)
-        session.mount("http://", requests.adapters.HTTPAdapter(max_retries=retries))
-        log.info(
-            "Trying to connect with model server: {} with timeout : {} and retry : {}".format(
-                tfs_url, timeout_seconds, retry_count
-            )
-        )
-        response = session.get(tfs_url, timeout=0.1)
-        log.info(
-            f"tfs response status_code: {response.status_code} with content : {json.loads(response.content)}"
-        )
-        end = time.time()
-        if response.status_code == 200:
-            if is_model_ready(response):
-                return
-            elif wait_for_model_ready(tfs_url, timeout_seconds - int(end - start)):
-                return
-
-        raise MultiModelException(408, "Timed out after {} seconds".format(timeout_seconds), pid)
-    except (
-        ConnectionRefusedError,
-        NewConnectionError,
-        MaxRetryError,
-        requests.exceptions.ConnectionError,
-    ):
-        raise MultiModelException(408, "Timed out after {} seconds".format(timeout_seconds), pid)
+    deadline = time.time() + timeout_seconds
+    log.info(
+        "Trying to connect with model server: {} with timeout : {}".format(tfs_url, timeout_seconds)
+    )
+    with requests.Session() as session:
+        if wait_for_model_ready(tfs_url, deadline, session=session):
+            return
+    raise MultiModelException(408, "Timed out after {} seconds".format(timeout_seconds), pid)
 
 
 def is_model_ready(response):
@@ -303,35 +385,61 @@ def is_model_ready(response):
     return False
 
 
-def wait_for_model_ready(url, timeout_seconds):
-    try:
-        while timeout_seconds > 0:
-            response = requests.get(url, timeout=0.1)
-            log.info(
-                f"wait_for_model_ready response status_code : {response.status_code} "
-                f"response : {json.loads(response.content)} timeout in : {timeout_seconds}s"
-            )
+def wait_for_model_ready(url, deadline, session=None, initial_delay=0.05, max_delay=1.0):
+    """
+    :param url: TFS model status url
+    :param deadline: time.time() after which to give up
+    :return: True once the model is ready, False on timeout or if TFS rejects the request
+    """
+    session = session or requests
+    delay = initial_delay
+    while True:
+        try:
+            response = session.get(url, timeout=max(min(deadline - time.time(), 1.0), 0.1))
             if response.status_code != 200:
+                log.info(
+                    f"wait_for_model_ready response status_code : {response.status_code} "
+                    f"response : {response.content}"
+                )
                 return False
             if is_model_ready(response):
+                log.info(f"model is ready: {json.loads(response.content)}")
                 return True
-            timeout_seconds -= 1
-        return False
-    except requests.exceptions.RequestException:
-        return False
-
-
-def retry_from_timeout(timeout_seconds, backoff_factor):
-    retry_count = 1
-    retry_time = 0
-    while retry_time < timeout_seconds:
-        retry_count += 1
-        retry_time += backoff_factor * (2 ** (retry_count + 1))
-    return retry_count
+        except requests.exceptions.RequestException:
+            # the model server is not listening yet
+            pass
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
+def read_meminfo(path="/proc/meminfo"):
+    """Read the system memory counters, in bytes, without spawning `free`"""
+    meminfo = {}
+    with open(path, "r", encoding="utf8") as f:
+        for line in f:
+            name, value = line.split(":", 1)
+            fields = value.split()
+            meminfo[name] = int(fields[0]) * (1024 if fields[1:] == ["kB"] else 1)
+    return meminfo
+
+
+def get_used_memory_bytes(meminfo=None):
+    meminfo = meminfo or read_meminfo()
+    return meminfo["MemTotal"] - meminfo.get("MemAvailable", meminfo["MemFree"])
+
+
+def get_process_memory_bytes(pid):
+    """Resident memory of a process, 0 if it is gone"""
+    try:
+        with open("/proc/{}/statm".format(pid), "r", encoding="utf8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
 
 
 def get_cpu_memory_util():
-    total_memory, used_memory, free_memory = map(
-        int, os.popen("free -t -m").readlines()[-1].split()[1:]
-    )
-    return round((used_memory / total_memory) * 100, 2)
+    meminfo = read_meminfo()
+    return round((get_used_memory_bytes(meminfo) / meminfo["MemTotal"]) * 100, 2)
@@ -14,6 +14,7 @@ from packaging.specifiers import SpecifierSet
 from botocore.config import Config
 from fabric import Connection
 
+import boto_clients
 import test.test_utils.ec2 as ec2_utils
 
 from test import test_utils
@@ -41,15 +42,30 @@ from test.test_utils import (
     is_mainline_context,
     is_pr_context,
 )
-from test.test_utils.imageutils import are_image_labels_matched, are_fixture_labels_enabled
+from test.test_utils.imageutils import (
+    are_image_labels_matched,
+    are_fixture_labels_enabled,
+    prefetch_image_labels,
+)
+from test.test_utils.ec2_pool import Ec2InstancePool
+from test.test_utils.failed_first import FailedFirstOrdering
+from test.test_utils.image_inspector import ImageInspectors
+from test.test_utils.metadata_cache import METADATA_CACHE
 from test.test_utils.test_reporting import TestReportGenerator
 
+# Required to prevent circular dependency while importing
+from test.test_utils import ecr as ecr_utils
+from test.test_utils.security import shutdown_scan_coordinators
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 LOGGER.addHandler(logging.StreamHandler(sys.stderr))
 
 ENABLE_IPV6_TESTING = os.getenv("ENABLE_IPV6_TESTING", "false").lower() == "true"
 
+# Pool of EC2 instances shared by the ec2_instance fixture, set up when DLC_EC2_INSTANCE_POOL_SIZE > 0
+EC2_INSTANCE_POOL = None
+
 # Immutable constant for framework specific image fixtures
 FRAMEWORK_FIXTURES = (
     # ECR repo name fixtures
@@ -596,16 +612,6 @@ def ec2_instance(
 
     ec2_key_name = f"{ec2_key_name}-{str(uuid.uuid4())}"
     print(f"Creating instance: CI-CD {ec2_key_name}")
-    key_filename = test_utils.generate_ssh_keypair(ec2_client, ec2_key_name)
-
-    def delete_ssh_keypair():
-        if test_utils.is_pr_context():
-            test_utils.destroy_ssh_keypair(ec2_client, key_filename)
-        else:
-            with open(KEYS_TO_DESTROY_FILE, "a") as destroy_keys:
-                destroy_keys.write(f"{key_filename}\n")
-
-    request.addfinalizer(delete_ssh_keypair)
     print(f"EC2 instance AMI-ID: {ec2_instance_ami}")
 
     params = {
@@ -723,6 +729,44 @@ def ec2_instance(
             "us-east-1": ["us-east-1a", "us-east-1b", "us-east-1c"],
         }
         availability_zone_options = availability_zones[region]
+
+    # Pooled instances are only cleaned of containers, images and test artifacts between leases, so
+    # only the tests that do not change the host otherwise may share them
+    if EC2_INSTANCE_POOL is not None and request.node.get_closest_marker("ec2_host_safe"):
+
+        def launch_pooled_instance():
+            key_filename = test_utils.generate_ssh_keypair(ec2_client, ec2_key_name)
+            try:
+                instances = ec2_utils.launch_instances_with_retry(
+                    ec2_resource=ec2_resource,
+                    availability_zone_options=availability_zone_options,
+                    ec2_create_instances_definition=params,
+                    ec2_client=ec2_client,
+                    fn_name=request.node.name,
+                )
+            except Exception:
+                _delete_ssh_keypair(ec2_client, key_filename)
+                raise
+            instance_id = instances[0].id
+            try:
+                ec2_utils.check_instance_state(instance_id, state="running", region=region)
+                ec2_utils.check_system_state(
+                    instance_id, system_status="ok", instance_status="ok", region=region
+                )
+            except Exception:
+                _terminate_pooled_instance(
+                    {"instance_id": instance_id, "key_filename": key_filename, "region": region}
+                )
+                raise
+            return instance_id, key_filename
+
+        lease = EC2_INSTANCE_POOL.lease(params, region, launch_pooled_instance)
+        request.addfinalizer(lambda: EC2_INSTANCE_POOL.release(lease))
+        return lease["instance_id"], lease["key_filename"]
+
+    key_filename = test_utils.generate_ssh_keypair(ec2_client, ec2_key_name)
+    request.addfinalizer(lambda: _delete_ssh_keypair(ec2_client, key_filename))
+
     instances = ec2_utils.launch_instances_with_retry(
         ec2_resource=ec2_resource,
         availability_zone_options=availability_zone_options,
@@ -745,6 +789,44 @@ def ec2_instance(
     return instance_id, key_filename
 
 
+def _delete_ssh_keypair(ec2_client, key_filename):
+    if test_utils.is_pr_context():
+        test_utils.destroy_ssh_keypair(ec2_client, key_filename)
+    else:
+        with open(KEYS_TO_DESTROY_FILE, "a") as destroy_keys:
+            destroy_keys.write(f"{key_filename}\n")
+
+
+def _terminate_pooled_instance(entry):
+    ec2_client = ec2_utils.get_ec2_client(entry["region"])
+    ec2_client.terminate_instances(InstanceIds=[entry["instance_id"]])
+    _delete_ssh_keypair(ec2_client, entry["key_filename"])
+
+
+def _is_pooled_instance_healthy(entry):
+    try:
+        return (
+            ec2_utils.get_instance_state(entry["instance_id"], region=entry["region"]) == "running"
+        )
+    except Exception as e:
+        LOGGER.warning(f"Failed to get state of pooled instance {entry['instance_id']}: {e}")
+        return False
+
+
+def _clean_pooled_instance(entry):
+    """
+    Removes the containers, images and test artifacts a test may leave on an instance before it is
+    leased again. Changes to the host itself are not undone, see the ec2_host_safe marker.
+    """
+    conn = ec2_utils.get_ec2_fabric_connection(
+        entry["instance_id"], entry["key_filename"], entry["region"]
+    )
+    conn.run("docker rm -f $(docker ps -aq) || true", hide=True)
+    conn.run("docker system prune -af --volumes", hide=True)
+    # Containers write to the mounted test directory as root
+    conn.run("sudo rm -rf $HOME/container_tests", hide=True)
+
+
 def is_neuron_image(fixtures):
     """
     Returns true if a neuron fixture is present in request.fixturenames
@@ -1159,6 +1241,17 @@ def functionality_sanity():
         )
 
 
+@pytest.fixture(scope="session")
+def image_inspectors():
+    """
+    Shares one container per image, and a snapshot of its state, across the sanity tests of a
+    session. The containers are removed at the end of the session.
+    """
+    inspectors = ImageInspectors()
+    yield inspectors
+    inspectors.close()
+
+
 @pytest.fixture(scope="session")
 def dlc_images(request):
     return request.config.getoption("--images")
@@ -1628,6 +1721,51 @@ def pytest_configure(config):
     config.addinivalue_line(
         "markers", "skip_serialized_release_pt_test(): mark to skip test included in serial testing"
     )
+    config.addinivalue_line(
+        "markers",
+        "ec2_host_safe(): the test only changes its EC2 instance through docker and "
+        "$HOME/container_tests, so the instance may be reused from the pool",
+    )
+
+    # Share remote metadata lookups between the xdist workers of a session
+    if getattr(config, "cache", None) is not None:
+        METADATA_CACHE.configure(config.cache.mkdir("dlc_metadata"))
+        config.pluginmanager.register(FailedFirstOrdering(config), "dlc_failed_first")
+
+    global EC2_INSTANCE_POOL
+    ec2_instance_pool_size = int(os.getenv("DLC_EC2_INSTANCE_POOL_SIZE", "0"))
+    if ec2_instance_pool_size > 0 and getattr(config, "cache", None) is not None:
+        EC2_INSTANCE_POOL = Ec2InstancePool(
+            state_dir=str(config.cache.mkdir("ec2_instance_pool")),
+            max_pool_size=ec2_instance_pool_size,
+            terminate_instance=_terminate_pooled_instance,
+            is_instance_healthy=_is_pooled_instance_healthy,
+            clean_instance=_clean_pooled_instance,
+        )
+
+
+def pytest_sessionstart(session):
+    """
+    Fetch the remote metadata needed during collection and test setup in bulk, instead of once
+    per parametrized test
+    """
+    METADATA_CACHE.prefetch({"remote_override_flags": test_utils._download_remote_override_flags})
+    if is_nightly_context():
+        prefetch_image_labels(session.config.getoption("--images"))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # The xdist controller finishes after every worker, so no test can hold a lease anymore. Workers
+    # leave their idle instances to the tests of the workers that are still running.
+    if EC2_INSTANCE_POOL is not None and not hasattr(session.config, "workerinput"):
+        EC2_INSTANCE_POOL.reap(include_leased=True)
+    # Every xdist worker has its own clients, and writes their API call metrics to its own file
+    metrics_path = boto_clients.METRICS_PATH
+    worker_id = getattr(session.config, "workerinput", {}).get("workerid")
+    if metrics_path and worker_id:
+        metrics_path = f"{metrics_path}.{worker_id}"
+    boto_clients.BOTO_CLIENTS.dump_metrics(metrics_path)
+    shutdown_scan_coordinators()
 
 
 def pytest_runtest_setup(item):
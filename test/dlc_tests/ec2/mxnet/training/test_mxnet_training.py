@@ -29,6 +29,7 @@ MX_EC2_SINGLE_GPU_INSTANCE_TYPE = get_ec2_instance_type(
 
 @pytest.mark.integration("mxnet_sanity_test")
 @pytest.mark.model("N/A")
+@pytest.mark.ec2_host_safe
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_GPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_standalone_gpu(mxnet_training, ec2_connection, gpu_only, ec2_instance_type):
     if test_utils.is_image_incompatible_with_instance_type(mxnet_training, ec2_instance_type):
@@ -40,6 +41,7 @@ def test_mxnet_standalone_gpu(mxnet_training, ec2_connection, gpu_only, ec2_inst
 
 @pytest.mark.integration("mxnet_sanity_test")
 @pytest.mark.model("N/A")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_CPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_standalone_cpu(mxnet_training, ec2_connection, cpu_only):
@@ -47,6 +49,7 @@ def test_mxnet_standalone_cpu(mxnet_training, ec2_connection, cpu_only):
 
 
 @pytest.mark.model("mnist")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_GPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_train_mnist_gpu(mxnet_training, ec2_connection, gpu_only, ec2_instance_type):
@@ -58,6 +61,7 @@ def test_mxnet_train_mnist_gpu(mxnet_training, ec2_connection, gpu_only, ec2_ins
 
 
 @pytest.mark.model("mnist")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_CPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_train_mnist_cpu(mxnet_training, ec2_connection, cpu_only):
@@ -66,6 +70,7 @@ def test_mxnet_train_mnist_cpu(mxnet_training, ec2_connection, cpu_only):
 
 @pytest.mark.integration("keras")
 @pytest.mark.model("resnet")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_GPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_keras_gpu(mxnet_training, ec2_connection, gpu_only, ec2_instance_type):
@@ -81,6 +86,7 @@ def test_mxnet_keras_gpu(mxnet_training, ec2_connection, gpu_only, ec2_instance_
 
 @pytest.mark.integration("keras")
 @pytest.mark.model("resnet")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_CPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_keras_cpu(mxnet_training, ec2_connection, cpu_only):
@@ -92,6 +98,7 @@ def test_mxnet_keras_cpu(mxnet_training, ec2_connection, cpu_only):
 
 @pytest.mark.integration("dgl")
 @pytest.mark.model("gcn")
+@pytest.mark.ec2_host_safe
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_GPU_INSTANCE_TYPE, indirect=True)
 @pytest.mark.team("dgl")
 def test_mxnet_train_dgl_gpu(mxnet_training, ec2_connection, gpu_only, py3_only, ec2_instance_type):
@@ -108,6 +115,7 @@ def test_mxnet_train_dgl_gpu(mxnet_training, ec2_connection, gpu_only, py3_only,
 
 @pytest.mark.integration("dgl")
 @pytest.mark.model("gcn")
+@pytest.mark.ec2_host_safe
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_CPU_INSTANCE_TYPE, indirect=True)
 @pytest.mark.team("dgl")
 def test_mxnet_train_dgl_cpu(mxnet_training, ec2_connection, cpu_only, py3_only):
@@ -120,6 +128,7 @@ def test_mxnet_train_dgl_cpu(mxnet_training, ec2_connection, cpu_only, py3_only)
 
 @pytest.mark.integration("gluonnlp")
 @pytest.mark.model("textCNN")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_GPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_train_nlp_gpu(mxnet_training, ec2_connection, gpu_only, py3_only, ec2_instance_type):
@@ -132,6 +141,7 @@ def test_mxnet_train_nlp_gpu(mxnet_training, ec2_connection, gpu_only, py3_only,
 
 @pytest.mark.integration("gluonnlp")
 @pytest.mark.model("textCNN")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.skip(
     reason="Skip test due to failure on mainline pipeline. See https://github.com/aws/deep-learning-containers/issues/936"
@@ -143,6 +153,7 @@ def test_mxnet_train_nlp_cpu(mxnet_training, ec2_connection, cpu_only, py3_only)
 
 @pytest.mark.integration("horovod")
 @pytest.mark.model("AlexNet")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_GPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_with_horovod_gpu(mxnet_training, ec2_connection, gpu_only, ec2_instance_type):
@@ -155,6 +166,7 @@ def test_mxnet_with_horovod_gpu(mxnet_training, ec2_connection, gpu_only, ec2_in
 
 @pytest.mark.integration("horovod")
 @pytest.mark.model("AlexNet")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_CPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_with_horovod_cpu(mxnet_training, ec2_connection, cpu_only, ec2_instance_type):
@@ -165,6 +177,7 @@ def test_mxnet_with_horovod_cpu(mxnet_training, ec2_connection, cpu_only, ec2_in
 @pytest.mark.usefixtures("sagemaker")
 @pytest.mark.integration("telemetry")
 @pytest.mark.model("N/A")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_SINGLE_GPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_telemetry_gpu(mxnet_training, ec2_connection, gpu_only, ec2_instance_type):
@@ -179,6 +192,7 @@ def test_mxnet_telemetry_gpu(mxnet_training, ec2_connection, gpu_only, ec2_insta
 @pytest.mark.usefixtures("sagemaker")
 @pytest.mark.integration("telemetry")
 @pytest.mark.model("N/A")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("frameworks")
 @pytest.mark.parametrize("ec2_instance_type", MX_EC2_CPU_INSTANCE_TYPE, indirect=True)
 def test_mxnet_telemetry_cpu(mxnet_training, ec2_connection, cpu_only):
@@ -11,6 +11,7 @@ from test.dlc_tests.ec2 import smclarify_cases
 @pytest.mark.usefixtures("sagemaker")
 @pytest.mark.integration("pytorch_gpu_tests")
 @pytest.mark.model("N/A")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("conda")
 @pytest.mark.parametrize(
     "ec2_instance_type, region", common_cases.PT_EC2_GPU_INSTANCE_TYPE_AND_REGION, indirect=True
@@ -110,6 +111,7 @@ def test_pytorch_2_1_gpu_inductor(
 @pytest.mark.usefixtures("sagemaker")
 @pytest.mark.integration("pytorch_cpu_tests")
 @pytest.mark.model("N/A")
+@pytest.mark.ec2_host_safe
 @pytest.mark.team("conda")
 @pytest.mark.parametrize("ec2_instance_type", common_cases.PT_EC2_CPU_INSTANCE_TYPE, indirect=True)
 def test_pytorch_2_1_cpu(pytorch_training___2__1, ec2_connection, cpu_only):
@@ -0,0 +1,96 @@
+import concurrent.futures
+import json
+import threading
+
+import pytest
+
+from src.autopatch_prep import ImagePullCache, StageGraph
+
+
+class FakeRunResult:
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+
+class FakeRun:
+    """
+    Fake invoke run that records the docker commands and serves the layers of inspected images
+    """
+
+    def __init__(self):
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def __call__(self, command, **kwargs):
+        with self._lock:
+            self.commands.append(command)
+        if command.startswith("docker image inspect"):
+            return FakeRunResult(json.dumps([f"layer-of-{command.split('@')[-1]}"]))
+        return FakeRunResult("")
+
+    def count(self, prefix):
+        return len([command for command in self.commands if command.startswith(prefix)])
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("autopatch")
+def test_image_pull_cache_pulls_and_inspects_each_digest_once():
+    fake_run = FakeRun()
+    resolved_uris = []
+
+    def _resolve_digest(image_uri):
+        resolved_uris.append(image_uri)
+        return "sha256:released"
+
+    image_pull_cache = ImagePullCache(resolve_digest=_resolve_digest, run_command=fake_run)
+    image_uris = ["repo:tag-a", "repo:tag-a", "repo:tag-b", "repo:tag-a"]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        digests = list(executor.map(image_pull_cache.pull, image_uris))
+    layers = [image_pull_cache.get_layers(uri, digest) for uri, digest in zip(image_uris, digests)]
+
+    assert set(digests) == {"sha256:released"}
+    assert sorted(set(resolved_uris)) == ["repo:tag-a", "repo:tag-b"]
+    assert len(resolved_uris) == 2
+    assert fake_run.count("docker pull") == 1
+    assert fake_run.count("docker image inspect") == 1
+    assert "docker tag repo@sha256:released repo:tag-b" in fake_run.commands
+    assert layers[0] == ["layer-of-sha256:released"]
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("autopatch")
+def test_stage_graph_runs_independent_stages_concurrently_and_skips_failed_branches():
+    both_patching_stages_started = threading.Barrier(2, timeout=5)
+    ran = []
+
+    def _patching_stage(name):
+        def _run(results):
+            assert results == {"pull": "base-image"}
+            both_patching_stages_started.wait()
+            ran.append(name)
+            return name
+
+        return _run
+
+    def _failing_stage(results):
+        raise ValueError("extraction failed")
+
+    timings = {}
+    stage_graph = StageGraph("image", timings=timings)
+    stage_graph.add("pull", lambda results: "base-image")
+    stage_graph.add("language", _patching_stage("language"), depends_on=["pull"])
+    stage_graph.add("enhanced_scan", _patching_stage("enhanced_scan"), depends_on=["pull"])
+    stage_graph.add("extract", _failing_stage, depends_on=["pull"])
+    stage_graph.add("copy", lambda results: ran.append("copy"), depends_on=["language", "extract"])
+
+    with pytest.raises(ValueError, match="extraction failed"):
+        stage_graph.run()
+
+    assert sorted(ran) == ["enhanced_scan", "language"]
+    assert "copy" not in timings
+    assert set(timings) == {"pull", "language", "enhanced_scan", "extract"}
+
+    with pytest.raises(ValueError):
+        stage_graph.add("verify", lambda results: None, depends_on=["unknown"])
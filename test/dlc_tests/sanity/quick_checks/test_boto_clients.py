@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+
+import boto3
+import pytest
+
+from botocore.stub import Stubber
+
+from boto_clients import BOTO_CLIENTS, BotoClientRegistry, LATENCY_BUCKETS
+
+
+def _create_session():
+    return boto3.session.Session(
+        aws_access_key_id="testing", aws_secret_access_key="testing", region_name="us-west-2"
+    )
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("boto clients")
+def test_boto_clients_are_created_once_per_service_region_and_config():
+    sessions = []
+
+    def session_factory():
+        sessions.append(_create_session())
+        return sessions[-1]
+
+    registry = BotoClientRegistry(session_factory=session_factory)
+    clients = []
+    threads = [
+        threading.Thread(target=lambda: clients.append(registry.get_client("ec2", "us-east-1")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sessions) == 1
+    assert len({id(client) for client in clients}) == 1
+    assert registry.get_client("ec2", "us-east-1") is clients[0]
+    assert registry.get_client("ec2", "us-west-2") is not clients[0]
+    assert registry.get_client("ecr", "us-east-1") is not clients[0]
+    slow_client = registry.get_client("ec2", "us-east-1", read_timeout=300)
+    assert slow_client is not clients[0]
+    assert slow_client.meta.config.read_timeout == 300
+    assert slow_client.meta.config.retries["mode"] == "adaptive"
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("boto clients")
+def test_boto_client_api_calls_are_counted_and_dumped(tmp_path):
+    registry = BotoClientRegistry(session_factory=_create_session)
+    client = registry.get_client("ecr", "us-west-2")
+    with Stubber(client) as stubber:
+        stubber.add_response("describe_repositories", {"repositories": []})
+        stubber.add_response("describe_repositories", {"repositories": []})
+        stubber.add_client_error("describe_images", service_error_code="ImageNotFoundException")
+        client.describe_repositories()
+        client.describe_repositories()
+        with pytest.raises(client.exceptions.ImageNotFoundException):
+            client.describe_images(repositoryName="repo")
+
+    metrics = registry.get_metrics()
+    assert metrics["ecr.DescribeRepositories"]["calls"] == 2
+    assert metrics["ecr.DescribeRepositories"]["errors"] == 0
+    assert sum(metrics["ecr.DescribeRepositories"]["histogram"]) == 2
+    assert metrics["ecr.DescribeImages"]["calls"] == 1
+    assert metrics["ecr.DescribeImages"]["errors"] == 1
+
+    metrics_path = tmp_path / "boto_client_metrics.json"
+    registry.dump_metrics(str(metrics_path))
+    dumped_metrics = json.loads(metrics_path.read_text())
+    assert dumped_metrics["latency_buckets"] == list(LATENCY_BUCKETS)
+    assert dumped_metrics["apis"] == metrics
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("boto clients")
+def test_boto_clients_are_not_inherited_by_forked_processes():
+    BOTO_CLIENTS.session_factory = _create_session
+    try:
+        client = BOTO_CLIENTS.get_client("ecr", "us-west-2")
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if BOTO_CLIENTS.get_client("ecr", "us-west-2") is not client else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert BOTO_CLIENTS.get_client("ecr", "us-west-2") is client
+    finally:
+        BOTO_CLIENTS.session_factory = boto3.session.Session
+        BOTO_CLIENTS.clear()
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src import constants
+from src.build_admission import BuildAdmissionController, HostResources
+from src.build_scheduler import BuildScheduler
+
+
+class FakeImage:
+    """
+    Stand-in for DockerImage that records when its build starts and how many builds run with it.
+    """
+
+    def __init__(self, name, started, image_size_baseline, base_image_name=None, running=None):
+        self.name = name
+        self.ecr_url = f"repo:{name}"
+        self.info = {
+            "base_image_name": base_image_name,
+            "image_size_baseline": image_size_baseline,
+            "device_type": "gpu",
+        }
+        self.log = []
+        self.summary = {}
+        self.to_build = True
+        self.to_push = False
+        self.build_status = None
+        self.corresponding_common_stage_image = None
+        self._started = started
+        self._running = running
+
+    def build(self):
+        self._started.append(self.name)
+        if self._running is not None:
+            with self._running["lock"]:
+                self._running["current"] += 1
+                self._running["max"] = max(self._running["max"], self._running["current"])
+        time.sleep(0.05)
+        if self._running is not None:
+            with self._running["lock"]:
+                self._running["current"] -= 1
+        self.build_status = constants.SUCCESS
+        return self.build_status
+
+
+def _get_host_resources(free_disk_mb):
+    return lambda: HostResources(free_disk_mb=free_disk_mb, available_memory_mb=None, cpu_load=None)
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build admission")
+def test_build_admission_starts_longest_critical_path_first():
+    started = []
+    images = [
+        FakeImage("small", started, image_size_baseline=3000),
+        FakeImage("base", started, image_size_baseline=2000),
+        FakeImage("child", started, image_size_baseline=5000, base_image_name="base"),
+        FakeImage("large", started, image_size_baseline=6000),
+    ]
+    admission_controller = BuildAdmissionController(
+        max_concurrent_builds=1,
+        history_path=None,
+        host_resources=_get_host_resources(10**9),
+        poll_interval=0.01,
+    )
+
+    statuses = BuildScheduler(images, admission_controller=admission_controller).run()
+
+    assert set(statuses.values()) == {constants.SUCCESS}
+    # base + child is a longer chain than large on its own
+    assert started == ["base", "large", "child", "small"]
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build admission")
+def test_build_admission_is_bounded_by_host_disk_and_records_history(tmp_path):
+    history_path = tmp_path / "build_history.json"
+    history_path.write_text(json.dumps({"image-0": 3600}))
+    running = {"lock": threading.Lock(), "current": 0, "max": 0}
+    started = []
+    images = [
+        FakeImage(f"image-{index}", started, image_size_baseline=10000, running=running)
+        for index in range(6)
+    ]
+    # Each build is estimated to need 20000MB of disk, so two of them fit next to the headroom
+    free_disk_mb = 2 * 10000 * constants.BUILD_DISK_ESTIMATE_FACTOR
+    admission_controller = BuildAdmissionController(
+        max_concurrent_builds=10,
+        history_path=str(history_path),
+        host_resources=_get_host_resources(free_disk_mb + constants.BUILD_DISK_HEADROOM_MB),
+        poll_interval=0.01,
+    )
+
+    BuildScheduler(images, admission_controller=admission_controller).run()
+    admission_controller.save_history()
+
+    assert running["max"] == 2
+    assert started[0] == "image-0"
+    history = json.loads(history_path.read_text())
+    assert sorted(history) == [f"image-{index}" for index in range(6)]
+    assert history["image-0"] < 3600
@@ -0,0 +1,131 @@
+import os
+import tarfile
+
+import pytest
+
+from src.context import Context, prune_context_cache
+
+
+def _write_file(path, content):
+    with open(path, "w") as file_handle:
+        file_handle.write(content)
+
+
+def _read_context(context_path):
+    with tarfile.open(context_path) as tar:
+        return {
+            member.name: tar.extractfile(member).read().decode()
+            for member in tar.getmembers()
+            if member.isfile()
+        }
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build context cache")
+@pytest.mark.parametrize("compression", ["none", "fast", "gz"])
+def test_context_is_shared_between_identical_artifacts(tmp_path, compression):
+    _write_file(tmp_path / "Dockerfile", "FROM scratch")
+    os.makedirs(tmp_path / "scripts")
+    _write_file(tmp_path / "scripts" / "setup.sh", "echo setup")
+    artifacts = {
+        "dockerfile": {"source": "Dockerfile", "target": "Dockerfile"},
+        "scripts": {"source": "scripts", "target": "scripts"},
+        "no_target": {"source": "Dockerfile"},
+    }
+    cache_path = str(tmp_path / "cache")
+
+    first = Context(
+        artifacts,
+        str(tmp_path / "build" / "first.tar.gz"),
+        str(tmp_path),
+        compression=compression,
+        cache_path=cache_path,
+    )
+    second = Context(
+        artifacts,
+        str(tmp_path / "build" / "second.tar.gz"),
+        str(tmp_path),
+        compression=compression,
+        cache_path=cache_path,
+    )
+
+    assert first.manifest_hash == second.manifest_hash
+    assert _read_context(first.context_path) == {
+        "Dockerfile": "FROM scratch",
+        "scripts/setup.sh": "echo setup",
+    }
+    assert _read_context(second.context_path) == _read_context(first.context_path)
+
+    first.remove()
+    assert not os.path.exists(first.context_path)
+    assert os.path.exists(second.context_path)
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build context cache")
+def test_context_is_rebuilt_when_an_artifact_changes(tmp_path):
+    _write_file(tmp_path / "Dockerfile", "FROM scratch")
+    artifacts = {"dockerfile": {"source": "Dockerfile", "target": "Dockerfile"}}
+    context_path = str(tmp_path / "context.tar.gz")
+    cache_path = str(tmp_path / "cache")
+
+    context = Context(artifacts, context_path, str(tmp_path), cache_path=cache_path)
+    original_hash = context.manifest_hash
+
+    _write_file(tmp_path / "Dockerfile", "FROM scratch\nLABEL changed=true")
+    context.add({})
+
+    assert context.manifest_hash != original_hash
+    assert _read_context(context_path) == {"Dockerfile": "FROM scratch\nLABEL changed=true"}
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build context cache")
+def test_context_rejects_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        Context(context_path=str(tmp_path / "context.tar"), compression="zstd")
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build context cache")
+def test_context_cache_evicts_least_recently_used_entries(tmp_path):
+    cache_path = str(tmp_path / "cache")
+
+    def create_context(index):
+        return Context(
+            {"dockerfile": {"source": f"Dockerfile.{index}", "target": "Dockerfile"}},
+            str(tmp_path / f"context.{index}.tar"),
+            str(tmp_path),
+            compression="none",
+            cache_path=cache_path,
+        )
+
+    cached_paths = []
+    for index in range(3):
+        _write_file(tmp_path / f"Dockerfile.{index}", str(index) * 1024 * 1024)
+        context = create_context(index)
+        member_paths = [
+            context._get_cached_member_path(target, source, digest)
+            for target, source, digest in context.get_manifest()
+        ]
+        cached_paths.append(
+            [os.path.join(cache_path, f"{context.manifest_hash}.tar")] + member_paths
+        )
+    # The second context is the least recently used
+    for paths, last_used in zip(cached_paths, (3, 1, 2)):
+        for path in paths:
+            os.utime(path, (last_used, last_used))
+
+    # Each context and its member take a little more than 2MB
+    assert prune_context_cache(cache_path, max_size_mb=5) == 2
+    assert all(os.path.exists(path) for path in cached_paths[0] + cached_paths[2])
+    assert not any(os.path.exists(path) for path in cached_paths[1])
+    assert prune_context_cache(cache_path, max_size_mb=5) == 0
+
+    # Reusing a cached context marks it as used
+    create_context(2)
+    assert os.path.getmtime(cached_paths[2][0]) > 3
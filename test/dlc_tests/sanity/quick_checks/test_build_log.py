@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from src.build_log import BuildLog, BuildTelemetry
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build log")
+def test_build_log_keeps_bounded_tail_and_streams_to_disk(tmp_path):
+    log_path = tmp_path / "logs" / "image-pre_push"
+    build_log = BuildLog(str(log_path), max_lines=3)
+
+    build_log.write("Starting the Build Process\n")
+    build_log.append([f"line {index}" for index in range(5)])
+    build_log.close()
+
+    assert len(build_log) == 3
+    assert build_log.tail(2) == ["line 3", "line 4"]
+    assert log_path.read_text().splitlines() == ["Starting the Build Process"] + [
+        f"line {index}" for index in range(5)
+    ]
+
+    build_log.write("Completed Push")
+    build_log.close()
+    assert log_path.read_text().splitlines()[-1] == "Completed Push"
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build log")
+def test_build_telemetry_parses_docker_build_steps(tmp_path):
+    telemetry = BuildTelemetry()
+    stream = [
+        ("Step 1/3 : FROM ubuntu:22.04\n", 0.0),
+        (" ---> 1f6ddc1b2547\n", 0.5),
+        ("Step 2/3 : RUN apt-get update\n", 1.0),
+        (" ---> Running in 0c2e4ba6c5b1\n", 1.0),
+        ("Removing intermediate container 0c2e4ba6c5b1\n ---> 8a2f5e7b9c1d\n", 11.0),
+        ("Step 3/3 : COPY Dockerfile /Dockerfile\n", 12.0),
+        (" ---> Using cache\n", 12.0),
+        (" ---> 3d4c5b6a7f8e\n", 12.5),
+    ]
+    for chunk, timestamp in stream:
+        telemetry.observe(chunk, timestamp=timestamp)
+    telemetry.finish(timestamp=13.0)
+    telemetry.add_layer_sizes(
+        [
+            {"Id": "sha256:3d4c5b6a7f8e0000", "Size": 10},
+            {"Id": "sha256:8a2f5e7b9c1d0000", "Size": 2048},
+            {"Id": "<missing>", "Size": 77},
+        ]
+    )
+
+    assert [step["step"] for step in telemetry.steps] == [1, 2, 3]
+    assert [step["seconds"] for step in telemetry.steps] == [1.0, 11.0, 1.0]
+    assert [step["cache_hit"] for step in telemetry.steps] == [None, False, True]
+    assert [step["layer_bytes"] for step in telemetry.steps] == [None, 2048, 10]
+
+    saved_path = telemetry.save(str(tmp_path / "telemetry.json"))
+    with open(saved_path) as telemetry_file:
+        assert json.load(telemetry_file) == telemetry.steps
@@ -0,0 +1,70 @@
+import json
+import sys
+
+import pytest
+
+from src.build_profiler import BuildProfiler
+from src.build_scheduler import BuildScheduler
+from src.context import Context
+from src.image import DockerImage
+
+
+def _create_image(tmp_path, name, image_size_baseline, base_image_name=None):
+    dockerfile = tmp_path / f"Dockerfile.{name}"
+    dockerfile.write_text("FROM scratch\n")
+    context = Context(
+        {"dockerfile": {"source": str(dockerfile), "target": "Dockerfile"}},
+        context_path=str(tmp_path / f"{name}.tar.gz"),
+        artifact_root=str(tmp_path),
+        cache_path=str(tmp_path / "cache"),
+    )
+    return DockerImage(
+        info={
+            "name": name,
+            "image_size_baseline": image_size_baseline,
+            "base_image_name": base_image_name,
+        },
+        dockerfile=str(dockerfile),
+        repository=f"repo/{name}",
+        tag="pre-push",
+        to_build=True,
+        stage="pre_push",
+        context=context,
+    )
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build profiler")
+def test_dry_run_build_profile_has_critical_path_and_chrome_trace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # The build modules import constants without the src package prefix
+    image_module = sys.modules[DockerImage.__module__]
+    monkeypatch.setattr(image_module.constants, "DRY_RUN", True)
+    monkeypatch.setattr(image_module.constants, "DRY_RUN_BUILD_SECONDS_PER_BASELINE_MB", 0.001)
+    monkeypatch.setattr(image_module.constants, "DRY_RUN_PUSH_SECONDS_PER_BASELINE_MB", 0)
+    profiler = BuildProfiler(enabled=True)
+    monkeypatch.setattr(image_module, "PROFILER", profiler)
+
+    parent = _create_image(tmp_path, "parent", image_size_baseline=50)
+    child = _create_image(tmp_path, "child", image_size_baseline=100, base_image_name="parent")
+    unrelated = _create_image(tmp_path, "unrelated", image_size_baseline=20)
+
+    statuses = BuildScheduler([parent, child, unrelated]).run()
+
+    assert set(statuses.values()) == {image_module.constants.SUCCESS}
+    assert [(span.image, span.name) for span in profiler.get_critical_path()] == [
+        ("parent", "pre_push build"),
+        ("child", "pre_push build"),
+        ("child", "push"),
+        ("child", "retag"),
+    ]
+
+    trace_path = tmp_path / "trace.json"
+    profiler.write_chrome_trace(str(trace_path))
+    trace = json.loads(trace_path.read_text())
+    track_names = {event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+    assert {"parent", "child", "unrelated"} <= track_names
+    docker_builds = [event for event in trace["traceEvents"] if event["name"] == "docker build"]
+    assert len(docker_builds) == 3
+    assert all(event["dur"] > 0 for event in docker_builds)
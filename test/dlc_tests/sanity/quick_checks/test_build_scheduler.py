@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src import constants
+from src.build_events import BuildEventLog
+from src.build_scheduler import BuildScheduler
+
+
+class FakeImage:
+    """
+    Stand-in for DockerImage that records the order in which its phases were run.
+    """
+
+    def __init__(self, name, events, base_image_name=None, build_status=constants.SUCCESS):
+        self.name = name
+        self.ecr_url = f"repo:{name}"
+        self.info = {"base_image_name": base_image_name}
+        self.log = []
+        self.summary = {}
+        self.to_build = True
+        self.to_push = True
+        self.build_status = None
+        self.corresponding_common_stage_image = None
+        self._events = events
+        self._result_status = build_status
+
+    def _record(self, phase):
+        self._events.append((self.name, phase))
+
+    def build(self):
+        self._record("build")
+        time.sleep(0.05)
+        self.build_status = self._result_status
+        return self.build_status
+
+    def push_image(self):
+        self._record("push")
+        return self.build_status
+
+    def push_image_with_additional_tags(self):
+        self._record("retag")
+        return self.build_status
+
+
+def _attach_common_stage_image(image, events):
+    common_stage_image = FakeImage(f"{image.name}-common", events)
+    image.to_push = False
+    image.corresponding_common_stage_image = common_stage_image
+    return common_stage_image
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build scheduler")
+def test_build_scheduler_orders_chain_by_dependencies():
+    events = []
+    parent = FakeImage("parent", events)
+    child = FakeImage("child", events, base_image_name="parent")
+    parent_common = _attach_common_stage_image(parent, events)
+
+    statuses = BuildScheduler([parent, child]).run()
+
+    assert statuses == {"parent": constants.SUCCESS, "child": constants.SUCCESS}
+    assert events.index(("parent", "build")) < events.index(("child", "build"))
+    assert events.index(("parent", "build")) < events.index(("parent-common", "build"))
+    assert events.index(("parent-common", "push")) < events.index(("parent-common", "retag"))
+    assert ("parent", "push") not in events
+    assert parent_common.build_status == constants.SUCCESS
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build scheduler")
+def test_build_scheduler_skips_children_of_failed_images():
+    events = []
+    parent = FakeImage("parent", events, build_status=constants.FAIL)
+    child = FakeImage("child", events, base_image_name="parent")
+    child_common = _attach_common_stage_image(child, events)
+    independent = FakeImage("independent", events)
+
+    statuses = BuildScheduler([parent, child, independent]).run()
+
+    assert statuses["parent"] == constants.FAIL
+    assert statuses["child"] == constants.FAIL
+    assert statuses["independent"] == constants.SUCCESS
+    assert ("child", "build") not in events
+    assert child_common.build_status == constants.FAIL and child_common.log
+    assert ("independent", "retag") in events
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build scheduler")
+def test_build_scheduler_respects_phase_limits():
+    lock = threading.Lock()
+    running = {"current": 0, "max": 0}
+
+    class CountingImage(FakeImage):
+        def build(self):
+            with lock:
+                running["current"] += 1
+                running["max"] = max(running["max"], running["current"])
+            result = super().build()
+            with lock:
+                running["current"] -= 1
+            return result
+
+    images = [CountingImage(f"image-{index}", []) for index in range(6)]
+    BuildScheduler(images, phase_limits={constants.BUILD_PHASE: 2}).run()
+
+    assert running["max"] <= 2
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build scheduler")
+def test_build_scheduler_rejects_unknown_base_image():
+    with pytest.raises(ValueError):
+        BuildScheduler([FakeImage("child", [], base_image_name="missing")])
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build scheduler")
+def test_build_scheduler_emits_phase_events(tmp_path):
+    events_path = tmp_path / "events.jsonl"
+    metrics_path = tmp_path / "metrics.txt"
+    parent = FakeImage("parent", [])
+    parent_common = _attach_common_stage_image(parent, [])
+    event_log = BuildEventLog(events_path=str(events_path), metrics_path=str(metrics_path))
+
+    BuildScheduler([parent], event_log=event_log).run()
+    event_log.close()
+
+    events = [json.loads(line) for line in events_path.read_text().splitlines()]
+    assert [(event["image"], event["event"]) for event in events] == [
+        ("repo:parent", "queued"),
+        ("repo:parent-common", "queued"),
+        ("repo:parent", "building"),
+        ("repo:parent", "done"),
+        ("repo:parent-common", "common-build"),
+        ("repo:parent-common", "pushing"),
+        ("repo:parent-common", "retagging"),
+        ("repo:parent-common", "done"),
+    ]
+    assert events[-1]["status"] == "Success"
+    metrics = metrics_path.read_text()
+    assert 'dlc_build_phase_duration_seconds{image="repo:parent",phase="building"}' in metrics
+    assert metrics.endswith("# EOF\n")
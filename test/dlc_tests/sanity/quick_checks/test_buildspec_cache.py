@@ -0,0 +1,133 @@
+import pytest
+import ruamel.yaml
+
+from src import buildspec as buildspec_module
+from src.buildspec import Buildspec, BuildPlan, load_build_plan
+
+BUILDSPEC_CONTENT = """
+account_id: &ACCOUNT_ID <set-$ACCOUNT_ID-in-environment>
+framework: &FRAMEWORK pytorch
+version: &VERSION 2.3.0
+repository: &REPOSITORY !join [ *ACCOUNT_ID, .dkr.ecr.us-west-2.amazonaws.com/pr-, *FRAMEWORK ]
+
+images:
+  BuildCPUImage:
+    <<: &CPU_IMAGE
+      repository: *REPOSITORY
+      build: &PYTORCH_CPU_TRAINING_PY3 false
+      image_size_baseline: 7200
+"""
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("buildspec cache")
+def test_parsed_buildspec_tracks_file_and_env(tmp_path, monkeypatch):
+    buildspec_path = tmp_path / "buildspec.yml"
+    buildspec_path.write_text(BUILDSPEC_CONTENT)
+    monkeypatch.setenv("ACCOUNT_ID", "123456789012")
+
+    first = Buildspec()
+    first.load(str(buildspec_path))
+    second = Buildspec()
+    second.load(str(buildspec_path))
+
+    assert first["repository"] == "123456789012.dkr.ecr.us-west-2.amazonaws.com/pr-pytorch"
+    assert second["repository"] == first["repository"]
+    assert second["images"]["BuildCPUImage"]["image_size_baseline"] == 7200
+
+    # Loaded buildspecs are copies of the cached one, so changing one does not change the others
+    second["images"]["BuildCPUImage"]["image_size_baseline"] = 8000
+    third = Buildspec()
+    third.load(str(buildspec_path))
+    assert third["images"]["BuildCPUImage"]["image_size_baseline"] == 7200
+
+    monkeypatch.setenv("VERSION", "2.4.0")
+    env_override = Buildspec()
+    env_override.load(str(buildspec_path))
+    assert env_override["version"] == "2.4.0"
+
+    buildspec_path.write_text(BUILDSPEC_CONTENT.replace("7200", "10000"))
+    file_update = Buildspec()
+    file_update.load(str(buildspec_path))
+    assert file_update["images"]["BuildCPUImage"]["image_size_baseline"] == 10000
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("buildspec cache")
+def test_join_constructor_is_registered_per_buildspec():
+    first = Buildspec()
+    second = Buildspec()
+
+    assert first.yaml.Constructor is not second.yaml.Constructor
+    assert "!join" not in ruamel.yaml.constructor.RoundTripConstructor.yaml_constructors
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("buildspec cache")
+def test_build_plan_is_a_serializable_snapshot(tmp_path, monkeypatch):
+    buildspec_path = tmp_path / "buildspec.yml"
+    buildspec_path.write_text(BUILDSPEC_CONTENT)
+    monkeypatch.setenv("ACCOUNT_ID", "123456789012")
+
+    first = Buildspec()
+    first.load(str(buildspec_path))
+    second = Buildspec()
+    second.load(str(buildspec_path))
+    plan = first.get_plan()
+
+    assert plan.key == second.get_plan().key
+    assert plan.images["BuildCPUImage"]["build"] is False
+    assert plan.images["BuildCPUImage"]["image_size_baseline"] == 7200
+    assert BuildPlan.from_json(plan.to_json()).buildspec == plan.buildspec
+
+    # The plan is a snapshot, so changing a copy of it does not change the plan
+    plan.buildspec["version"] = "changed"
+    assert plan.get("version") == "2.3.0"
+
+    monkeypatch.setenv("VERSION", "2.4.0")
+    env_override = Buildspec()
+    env_override.load(str(buildspec_path))
+    assert env_override.get_plan().key != plan.key
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("buildspec cache")
+def test_build_plans_are_shared_between_processes(tmp_path, monkeypatch):
+    buildspec_path = tmp_path / "buildspec.yml"
+    buildspec_path.write_text(BUILDSPEC_CONTENT)
+    cache_path = str(tmp_path / "plans")
+    monkeypatch.setenv("ACCOUNT_ID", "123456789012")
+    monkeypatch.setattr(buildspec_module, "_BUILD_PLANS", {})
+    loads = []
+    original_load = Buildspec.load
+
+    def counting_load(self, path):
+        loads.append(path)
+        return original_load(self, path)
+
+    monkeypatch.setattr(Buildspec, "load", counting_load)
+
+    plan = load_build_plan(str(buildspec_path), cache_path=cache_path)
+    assert load_build_plan(str(buildspec_path), cache_path=cache_path) is plan
+    assert plan.get("repository") == "123456789012.dkr.ecr.us-west-2.amazonaws.com/pr-pytorch"
+
+    # Another process reads the plan file instead of parsing the buildspec
+    monkeypatch.setattr(buildspec_module, "_BUILD_PLANS", {})
+    other_process_plan = load_build_plan(str(buildspec_path), cache_path=cache_path)
+    assert other_process_plan.key == plan.key
+    assert other_process_plan.buildspec == plan.buildspec
+    assert len(loads) == 1
+
+    monkeypatch.setenv("VERSION", "2.4.0")
+    assert load_build_plan(str(buildspec_path), cache_path=cache_path).get("version") == "2.4.0"
+    assert len(loads) == 2
+
+    buildspec_path.write_text(BUILDSPEC_CONTENT.replace("7200", "10000"))
+    monkeypatch.setattr(buildspec_module, "_BUILD_PLANS", {})
+    file_update_plan = load_build_plan(str(buildspec_path), cache_path=cache_path)
+    assert file_update_plan.images["BuildCPUImage"]["image_size_baseline"] == 10000
+    assert len(loads) == 3
@@ -0,0 +1,83 @@
+import pytest
+
+from test.test_utils.ec2_pool import Ec2InstancePool
+
+
+class FakeEc2:
+    """
+    Fake EC2 backend that tracks which instances are running.
+    """
+
+    def __init__(self):
+        self.running = set()
+        self.launched = 0
+        self.cleaned = []
+
+    def launch(self):
+        self.launched += 1
+        instance_id = f"i-{self.launched}"
+        self.running.add(instance_id)
+        return instance_id, f"{instance_id}.pem"
+
+    def terminate(self, entry):
+        self.running.discard(entry["instance_id"])
+
+    def is_healthy(self, entry):
+        return entry["instance_id"] in self.running
+
+    def clean(self, entry):
+        self.cleaned.append(entry["instance_id"])
+
+
+def _create_pool(tmp_path, fake_ec2, max_pool_size=2):
+    return Ec2InstancePool(
+        state_dir=str(tmp_path),
+        max_pool_size=max_pool_size,
+        terminate_instance=fake_ec2.terminate,
+        is_instance_healthy=fake_ec2.is_healthy,
+        clean_instance=fake_ec2.clean,
+    )
+
+
+CPU_DEFINITION = {"InstanceType": "c5.4xlarge", "ImageId": "ami-1", "KeyName": "first"}
+GPU_DEFINITION = {"InstanceType": "g5.4xlarge", "ImageId": "ami-1", "KeyName": "second"}
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("ec2 instance pool")
+def test_ec2_instance_pool_reuses_matching_instances(tmp_path):
+    fake_ec2 = FakeEc2()
+    pool = _create_pool(tmp_path, fake_ec2)
+
+    first_lease = pool.lease(CPU_DEFINITION, "us-west-2", fake_ec2.launch)
+    pool.release(first_lease)
+    second_lease = pool.lease(dict(CPU_DEFINITION, KeyName="other"), "us-west-2", fake_ec2.launch)
+    other_region_lease = pool.lease(CPU_DEFINITION, "us-east-1", fake_ec2.launch)
+
+    assert second_lease["instance_id"] == first_lease["instance_id"]
+    assert other_region_lease["instance_id"] != first_lease["instance_id"]
+    assert fake_ec2.cleaned == [first_lease["instance_id"]]
+    assert fake_ec2.launched == 2
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("ec2 instance pool")
+def test_ec2_instance_pool_replaces_unhealthy_and_reaps(tmp_path):
+    fake_ec2 = FakeEc2()
+    pool = _create_pool(tmp_path, fake_ec2, max_pool_size=1)
+
+    lease = pool.lease(CPU_DEFINITION, "us-west-2", fake_ec2.launch)
+    overflow_lease = pool.lease(GPU_DEFINITION, "us-west-2", fake_ec2.launch)
+    assert not overflow_lease["pooled"]
+    pool.release(overflow_lease)
+    assert overflow_lease["instance_id"] not in fake_ec2.running
+
+    pool.release(lease)
+    fake_ec2.running.discard(lease["instance_id"])
+    new_lease = pool.lease(CPU_DEFINITION, "us-west-2", fake_ec2.launch)
+    assert new_lease["instance_id"] != lease["instance_id"]
+
+    pool.reap(include_leased=True)
+    assert not fake_ec2.running
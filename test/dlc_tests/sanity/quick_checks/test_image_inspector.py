@@ -0,0 +1,96 @@
+import base64
+import re
+
+import pytest
+
+from invoke.runners import Result
+
+from test.test_utils.image_inspector import (
+    SNAPSHOT_SECTION_MARKER,
+    ImageInspectors,
+    parse_snapshot_output,
+)
+
+IMAGE = "123456789012.dkr.ecr.us-west-2.amazonaws.com/pr-pytorch-training:2.6.0-cpu-py312"
+
+SNAPSHOT_OUTPUTS = {
+    "python_version": "Python 3.12.8",
+    "os_release": 'NAME="Ubuntu"\nVERSION_ID="22.04"',
+    "pip_list": '[{"name": "torch", "version": "2.6.0+cpu"}, {"name": "PyYAML", "version": "6.0.2"}]',
+    "apt_list": "Listing...\ncurl/jammy-updates,now 7.81.0-1ubuntu1.16 amd64 [installed]",
+    "env": "PATH=/usr/local/bin:/usr/bin\nLD_LIBRARY_PATH=",
+    "ls /tmp": "hsperfdata_root",
+    "ls /var/tmp": "",
+    "ls ~": ".bashrc\n.profile",
+    "ls /": "bin\netc\nusr",
+}
+
+
+class FakeContext:
+    """
+    Records the commands run, and answers the snapshot script with SNAPSHOT_OUTPUTS.
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def run(self, command, **kwargs):
+        self.commands.append(command)
+        stdout = ""
+        encoded_script = re.search(r"echo (\S+) \| base64 -d", command)
+        if encoded_script:
+            script = base64.b64decode(encoded_script.group(1)).decode("utf-8")
+            for line in script.splitlines():
+                if line.startswith(f"echo '{SNAPSHOT_SECTION_MARKER}"):
+                    name = line.split(SNAPSHOT_SECTION_MARKER)[1].strip(" '")
+                    stdout += f"{SNAPSHOT_SECTION_MARKER} {name}\n{SNAPSHOT_OUTPUTS[name]}\n"
+        return Result(stdout=stdout, command=command, exited=0)
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("image inspector")
+def test_image_inspector_shares_one_container_and_snapshot_per_image():
+    context = FakeContext()
+    inspectors = ImageInspectors(context=context)
+
+    inspector = inspectors.get(IMAGE)
+    assert inspectors.get(IMAGE) is inspector
+    inspector.run("import torch", executable="python")
+    first_snapshot = inspector.get_snapshot()
+    assert inspectors.get(IMAGE).get_snapshot() is first_snapshot
+    assert first_snapshot.python_version == "Python 3.12.8"
+
+    docker_runs = [command for command in context.commands if command.startswith("docker run")]
+    docker_execs = [command for command in context.commands if command.startswith("docker exec")]
+    assert len(docker_runs) == 1
+    assert len(docker_execs) == 2
+    # The snapshot is taken before the commands of the tests
+    assert "base64 -d | bash" in docker_execs[0]
+
+    inspectors.close()
+    assert context.commands[-1] == f"docker rm -f {inspector.container_name}"
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("image inspector")
+def test_parse_snapshot_output():
+    output = "\n".join(
+        f"{SNAPSHOT_SECTION_MARKER} {name}\n{section_output}"
+        for name, section_output in SNAPSHOT_OUTPUTS.items()
+    )
+
+    snapshot = parse_snapshot_output(output)
+
+    assert snapshot.python_version == "Python 3.12.8"
+    assert 'VERSION_ID="22.04"' in snapshot.os_release
+    assert snapshot.python_packages == {"torch": "2.6.0+cpu", "pyyaml": "6.0.2"}
+    assert snapshot.apt_packages == {"curl": "7.81.0-1ubuntu1.16"}
+    assert snapshot.env == {"PATH": "/usr/local/bin:/usr/bin", "LD_LIBRARY_PATH": ""}
+    assert snapshot.directories == {
+        "/tmp": ["hsperfdata_root"],
+        "/var/tmp": [],
+        "~": [".bashrc", ".profile"],
+        "/": ["bin", "etc", "usr"],
+    }
@@ -0,0 +1,45 @@
+import pytest
+
+from test.test_utils.metadata_cache import MetadataCache
+
+
+class CountingFetch:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("metadata cache")
+def test_metadata_cache_is_shared_through_cache_dir(tmp_path):
+    fetch = CountingFetch({"label": "true"})
+    first_worker = MetadataCache(cache_dir=str(tmp_path))
+    second_worker = MetadataCache(cache_dir=str(tmp_path))
+
+    assert first_worker.get("image_labels:image", fetch) == {"label": "true"}
+    assert first_worker.get("image_labels:image", fetch) == {"label": "true"}
+    assert second_worker.get("image_labels:image", fetch) == {"label": "true"}
+    assert fetch.calls == 1
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("metadata cache")
+def test_metadata_cache_expires_and_skips_failures(tmp_path):
+    fetch = CountingFetch("manifest")
+    cache = MetadataCache(cache_dir=str(tmp_path), ttl_seconds=0)
+    cache.get("image_manifest:image", fetch)
+    cache.get("image_manifest:image", fetch)
+    assert fetch.calls == 2
+
+    def _fail():
+        raise ValueError("throttled")
+
+    cache.prefetch({"remote_override_flags": _fail})
+    with pytest.raises(ValueError):
+        cache.get("remote_override_flags", _fail)
@@ -0,0 +1,37 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+from src import constants
+from src.output import OutputFormatter
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build output")
+def test_progress_waits_for_futures_without_polling(capsys):
+    release_slow_build = threading.Event()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {
+            "slow": executor.submit(lambda: release_slow_build.wait(5) and constants.SUCCESS),
+            "fast": executor.submit(lambda: constants.FAIL),
+        }
+        futures["fast"].add_done_callback(lambda _: release_slow_build.set())
+
+        OutputFormatter().progress(futures)
+
+    output = capsys.readouterr().out
+    assert "slow.........." + constants.STATUS_MESSAGE[constants.SUCCESS] in output
+    assert "fast.........." + constants.STATUS_MESSAGE[constants.FAIL] in output
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("build output")
+def test_progress_raises_exceptions_of_futures():
+    future = concurrent.futures.Future()
+    future.set_exception(ValueError("build crashed"))
+
+    with pytest.raises(ValueError, match="build crashed"):
+        OutputFormatter().progress({"image": future})
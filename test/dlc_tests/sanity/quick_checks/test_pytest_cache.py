@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from test.test_utils.failed_first import get_failed_first_sort_key
+from test.test_utils.pytest_cache import (
+    LOG_DIRECTORY_NAME,
+    PytestCache,
+    get_lastfailed_log_entries,
+    merge_lastfailed_logs,
+)
+
+CACHE_PARAMS = {
+    "codebuild_project_name": "dlc-pr-pytorch-test",
+    "commit_id": "0123abc",
+    "framework": "pytorch",
+    "version": "2.6.0",
+    "build_context": "PR",
+    "test_type": "ec2",
+}
+
+
+class FakeS3Client:
+    """
+    Stores the uploaded files in memory
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, local_file, bucket, key):
+        with open(local_file) as f:
+            self.objects[key] = f.read()
+
+    def download_file(self, bucket, key, local_file):
+        if key not in self.objects:
+            raise FileNotFoundError(key)
+        with open(local_file, "w") as f:
+            f.write(self.objects[key])
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        return [{"Contents": [{"Key": key} for key in keys]}]
+
+
+def _run_tests(cache_dir, lastfailed, durations):
+    cache_files = {
+        os.path.join(cache_dir, ".pytest_cache", "v", "cache", "lastfailed"): lastfailed,
+        os.path.join(cache_dir, ".pytest_cache", "v", "dlc", "durations"): durations,
+    }
+    for path, cache_json in cache_files.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(cache_json, f)
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("pytest cache")
+def test_merge_lastfailed_logs_keeps_latest_entry_of_each_test():
+    older_log = [
+        {"nodeid": "test_a", "failed": True, "timestamp": 1, "duration": 10},
+        {"nodeid": "test_b", "failed": True, "timestamp": 1},
+        {"nodeid": "test_c", "failed": False, "timestamp": 1, "duration": 3},
+    ]
+    newer_log = [
+        {"nodeid": "test_a", "failed": False, "timestamp": 2},
+        {"nodeid": "test_c", "failed": True, "timestamp": 2, "duration": 4},
+        {"nodeid": "test_d", "failed": True, "timestamp": 2},
+    ]
+
+    lastfailed, durations = merge_lastfailed_logs([iter(newer_log), iter(older_log)])
+
+    assert lastfailed == {"test_b": True, "test_c": True, "test_d": True}
+    assert durations == {"test_a": 10, "test_c": 4}
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("pytest cache")
+def test_merge_lastfailed_logs_keeps_failures_of_any_execution_of_latest_run():
+    base_lastfailed = {"test_a": True}
+    # Both executions of run 2 ran test_a, which passed on the first image and failed on the second
+    passed_segment = get_lastfailed_log_entries(
+        {}, {}, base_lastfailed, timestamp=3, run_id="run-2"
+    )
+    failed_segment = get_lastfailed_log_entries(
+        {"test_a": True}, {}, base_lastfailed, timestamp=2, run_id="run-2"
+    )
+    assert passed_segment == [
+        {"nodeid": "test_a", "failed": False, "timestamp": 3, "run_id": "run-2"}
+    ]
+    assert failed_segment == [
+        {"nodeid": "test_a", "failed": True, "timestamp": 2, "run_id": "run-2"}
+    ]
+
+    lastfailed, _ = merge_lastfailed_logs([iter(passed_segment), iter(failed_segment)])
+    assert lastfailed == {"test_a": True}
+
+    # A later run in which test_a passes clears the failure
+    next_run_segment = get_lastfailed_log_entries({}, {}, lastfailed, timestamp=4, run_id="run-3")
+    lastfailed, _ = merge_lastfailed_logs(
+        [iter(passed_segment), iter(failed_segment), iter(next_run_segment)]
+    )
+    assert lastfailed == {}
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("pytest cache")
+def test_parallel_executions_upload_their_changes(tmp_path):
+    s3_client = FakeS3Client()
+    pytest_cache = PytestCache(s3_client, "123456789012")
+    s3_dir = os.path.join(*CACHE_PARAMS.values())
+    s3_client.objects[os.path.join(s3_dir, "lastfailed")] = json.dumps(
+        {"test_a": True, "test_b": True}
+    )
+
+    for process_index in ("0", "1"):
+        pytest_cache.download_pytest_cache_from_s3_to_local(
+            str(tmp_path), **CACHE_PARAMS, custom_cache_directory=process_index
+        )
+    # test_a passes in the first process, and fails again with test_c in the second one
+    _run_tests(str(tmp_path / "0"), {"test_b": True}, {"test_a": 5.0})
+    _run_tests(str(tmp_path / "1"), {"test_a": True, "test_b": True, "test_c": True}, {})
+    for process_index in ("0", "1"):
+        pytest_cache.upload_pytest_cache_from_local_to_s3(
+            str(tmp_path), **CACHE_PARAMS, custom_cache_directory=process_index
+        )
+
+    segments = [key for key in s3_client.objects if LOG_DIRECTORY_NAME in key]
+    assert len(segments) == 2
+    shutil.rmtree(tmp_path / "0")
+    pytest_cache.download_pytest_cache_from_s3_to_local(
+        str(tmp_path), **CACHE_PARAMS, custom_cache_directory="0"
+    )
+    cache_dir = tmp_path / "0" / ".pytest_cache" / "v"
+    assert json.loads((cache_dir / "cache" / "lastfailed").read_text()) == {
+        "test_a": True,
+        "test_b": True,
+        "test_c": True,
+    }
+    assert json.loads((cache_dir / "dlc" / "durations").read_text()) == {"test_a": 5.0}
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("pytest cache")
+def test_failed_first_order():
+    nodeids = ["test_fast", "test_new", "test_failed", "test_slow", "test_other_new"]
+    sort_key = get_failed_first_sort_key(
+        {"test_failed": True}, {"test_fast": 1, "test_slow": 30, "test_failed": 2}
+    )
+
+    assert sorted(nodeids, key=sort_key) == [
+        "test_failed",
+        "test_slow",
+        "test_fast",
+        "test_new",
+        "test_other_new",
+    ]
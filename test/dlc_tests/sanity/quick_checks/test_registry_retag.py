@@ -0,0 +1,134 @@
+import hashlib
+import json
+import socket
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.registry import RegistryClient
+
+MANIFEST_MEDIA_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+
+
+class FakeRegistryHandler(BaseHTTPRequestHandler):
+    """
+    Implements the subset of the registry:2 HTTP API V2 used for manifest retagging.
+    Uploading blobs is deliberately not supported.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _parse_path(self):
+        _, _, repository_name, kind, reference = self.path.split("/", 4)
+        return repository_name, kind, reference
+
+    def _respond(self, status, body=b"", content_type=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        repository_name, kind, reference = self._parse_path()
+        manifest = self.server.manifests.get((repository_name, reference))
+        if kind != "manifests" or manifest is None:
+            return self._respond(404)
+        self._respond(200, manifest, MANIFEST_MEDIA_TYPE)
+
+    def do_HEAD(self):
+        repository_name, kind, reference = self._parse_path()
+        if kind == "blobs" and (repository_name, reference) in self.server.blobs:
+            return self._respond(200)
+        self._respond(404)
+
+    def do_PUT(self):
+        repository_name, kind, reference = self._parse_path()
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.manifests[(repository_name, reference)] = body
+        self.server.requests.append(("PUT", kind, reference))
+        self._respond(201)
+
+
+@pytest.fixture
+def fake_registry():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRegistryHandler)
+    server.manifests = {}
+    server.blobs = set()
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def _push_fake_image(registry, repository_name, tag, layers, uploaded_layers):
+    config_digest = f"sha256:{hashlib.sha256(tag.encode()).hexdigest()}"
+    manifest = json.dumps(
+        {
+            "schemaVersion": 2,
+            "mediaType": MANIFEST_MEDIA_TYPE,
+            "config": {"digest": config_digest},
+            "layers": [{"digest": layer} for layer in layers],
+        }
+    ).encode()
+    registry.manifests[(repository_name, tag)] = manifest
+    registry.blobs.update((repository_name, digest) for digest in [config_digest] + uploaded_layers)
+    return manifest
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("manifest retag")
+def test_retag_only_writes_manifest_references(fake_registry):
+    layers = ["sha256:aaa", "sha256:bbb"]
+    manifest = _push_fake_image(fake_registry, "pr-pytorch", "2.3-gpu", layers, layers)
+    registry_client, repository_name = RegistryClient.from_repository(
+        f"localhost:{fake_registry.server_address[1]}/pr-pytorch"
+    )
+
+    missing = registry_client.retag(repository_name, "2.3-gpu", ["2.3-gpu-nightly", "latest"])
+
+    assert missing == []
+    assert fake_registry.requests == [
+        ("PUT", "manifests", "2.3-gpu-nightly"),
+        ("PUT", "manifests", "latest"),
+    ]
+    assert fake_registry.manifests[("pr-pytorch", "latest")] == manifest
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("manifest retag")
+def test_retag_is_skipped_when_layers_are_missing(fake_registry):
+    _push_fake_image(fake_registry, "pr-pytorch", "2.3-gpu", ["sha256:aaa", "sha256:bbb"], [])
+    registry_client, repository_name = RegistryClient.from_repository(
+        f"localhost:{fake_registry.server_address[1]}/pr-pytorch"
+    )
+
+    missing = registry_client.retag(repository_name, "2.3-gpu", ["latest"])
+
+    assert missing == ["sha256:aaa", "sha256:bbb"]
+    assert fake_registry.requests == []
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("manifest retag")
+def test_registry_requests_time_out():
+    # The kernel completes the connection, but nothing ever answers the request
+    with socket.socket() as unresponsive_registry:
+        unresponsive_registry.bind(("127.0.0.1", 0))
+        unresponsive_registry.listen()
+        registry_client = RegistryClient(
+            f"127.0.0.1:{unresponsive_registry.getsockname()[1]}", scheme="http", timeout=(1, 0.2)
+        )
+
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            registry_client.get_manifest("pr-pytorch", "2.3-gpu")
@@ -0,0 +1,111 @@
+import json
+import sys
+
+import pytest
+
+from src import utils
+from src.safety_report_generator import SafetyReportGenerator
+
+
+class FakeRunResult:
+    def __init__(self, stdout, exited=0):
+        self.stdout = stdout
+        self.exited = exited
+        self.return_code = exited
+
+
+class FakeContext:
+    """
+    Fake invoke Context that serves a container inventory and a safety check output
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def run(self, command, in_stream=None, **kwargs):
+        self.commands.append(command)
+        if command.startswith("docker image inspect"):
+            return FakeRunResult("sha256:1234\n")
+        if command.startswith("docker run"):
+            return FakeRunResult("container-id\n")
+        if " python - " in command:
+            return FakeRunResult(
+                json.dumps(
+                    {
+                        "python_version": "3.10",
+                        "path": "/usr/local/bin:/usr/bin",
+                        "packages": [
+                            {"name": "numpy", "version": "1.26.4"},
+                            {"name": "pillow", "version": "9.0.0"},
+                        ],
+                        "deactivation_data": {},
+                    }
+                )
+            )
+        if "safety check" in command:
+            assert in_stream.read().splitlines() == ["numpy==1.26.4", "pillow==9.0.0"]
+            vulnerability = {
+                "package_name": "pillow",
+                "vulnerability_id": "12345",
+                "vulnerable_spec": "<9.0.1",
+                "analyzed_version": "9.0.0",
+                "advisory": "advisory",
+            }
+            return FakeRunResult(json.dumps({"vulnerabilities": [vulnerability]}), exited=64)
+        return FakeRunResult("")
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("safety report")
+def test_safety_report_generator_scans_with_cached_safety_install(monkeypatch):
+    monkeypatch.delenv("IS_CODEBUILD_IMAGE", raising=False)
+    fake_context = FakeContext()
+    safety_report_generator = SafetyReportGenerator(
+        "container-id", ignore_dict={"12345": "not applicable"}, safety_install_path="/opt/safety"
+    )
+    safety_report_generator.ctx = fake_context
+
+    report = safety_report_generator.generate()
+
+    assert len(fake_context.commands) == 2
+    assert fake_context.commands[1].startswith(
+        "docker exec -i -e PYTHONPATH=/opt/safety/3.10 "
+        "-e PATH=/opt/safety/3.10/bin:/usr/local/bin:/usr/bin container-id"
+    )
+    assert {package["package"]: package["scan_status"] for package in report} == {
+        "pillow": "IGNORED",
+        "numpy": "SUCCEEDED",
+    }
+
+
+@pytest.mark.quick_checks
+@pytest.mark.model("N/A")
+@pytest.mark.integration("safety report")
+def test_safety_scan_results_are_memoized_per_image_id(monkeypatch, tmp_path):
+    monkeypatch.delenv("IS_CODEBUILD_IMAGE", raising=False)
+    fake_context = FakeContext()
+    monkeypatch.setattr(utils, "Context", lambda: fake_context)
+    # utils imports the generator module without the src package prefix
+    monkeypatch.setattr(
+        sys.modules[utils.SafetyReportGenerator.__module__], "Context", lambda: fake_context
+    )
+    monkeypatch.setattr(utils, "_SAFETY_SCAN_RESULTS", {})
+    monkeypatch.setattr(utils.constants, "SAFETY_INSTALL_CACHE_DIR", str(tmp_path))
+    installed_python_versions = []
+    monkeypatch.setattr(
+        utils,
+        "install_cached_safety",
+        lambda image_uri, python_version: installed_python_versions.append(python_version),
+    )
+
+    pre_push_results = utils.get_safety_scan_results("repo:tag-pre-push")
+    common_results = utils.get_safety_scan_results("repo:tag")
+
+    assert common_results is pre_push_results
+    assert installed_python_versions == ["3.10"]
+    assert len([command for command in fake_context.commands if "safety check" in command]) == 1
+    assert (
+        len([command for command in fake_context.commands if command.startswith("docker run")]) == 1
+    )
+    assert "docker rm -f container-id" in fake_context.commands
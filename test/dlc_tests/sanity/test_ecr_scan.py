@@ -1,13 +1,11 @@
 import json
 import os
-from time import sleep
 from typing import List
 
 import boto3
 
 import pytest
 import traceback
-import copy
 
 from invoke import run, Context
 from packaging.version import Version
@@ -46,7 +44,7 @@ from test.test_utils.security import (
     process_failure_routine_summary_and_store_data_in_s3,
     run_scan,
     get_target_image_uri_using_current_uri_and_target_repo,
-    wait_for_enhanced_scans_to_complete,
+    get_scan_coordinator,
     extract_non_patchable_vulnerabilities,
     generate_future_allowlist,
     AllowListFormatVulnerabilityForEnhancedScan,
@@ -207,7 +205,7 @@ def remove_allowlisted_image_vulnerabilities(
         return ecr_image_vuln_list - vuln_allowlist
 
     LOGGER.info("Hugging Face image detected — using relaxed allowlist removal by (package, CVE).")
-    new_image_vuln_list = copy.deepcopy(ecr_image_vuln_list)
+    new_image_vuln_list = ecr_image_vuln_list.copy()
 
     for pkg_name, allowed_pkg_vuln_list in vuln_allowlist.vulnerability_list.items():
         if pkg_name not in new_image_vuln_list.vulnerability_list:
@@ -276,22 +274,16 @@ def helper_function_for_leftover_vulnerabilities_from_enhanced_scanning(
     ecr_client_for_enhanced_scanning_repo = boto3.client(
         "ecr", region_name=ECR_ENHANCED_REPO_REGION
     )
-    wait_for_enhanced_scans_to_complete(
-        ecr_client_for_enhanced_scanning_repo, ecr_enhanced_repo_uri
-    )
-    LOGGER.info(f"finished wait_for_enhanced_scans_to_complete, {image}")
-    sleep(1 * 60)
-
-    scan_results = ecr_utils.get_all_ecr_enhanced_scan_findings(
-        ecr_client=ecr_client_for_enhanced_scanning_repo, image_uri=ecr_enhanced_repo_uri
-    )
-    scan_results = json.loads(json.dumps(scan_results, cls=EnhancedJSONEncoder))
-
     minimum_sev_threshold = minimum_sev_threshold or get_minimum_sev_threshold_level(image)
-    ecr_image_vulnerability_list = ECREnhancedScanVulnerabilityList(
-        minimum_severity=CVESeverity[minimum_sev_threshold]
+    ecr_image_vulnerability_list = (
+        get_scan_coordinator(ecr_client_for_enhanced_scanning_repo, ecr_enhanced_repo_uri)
+        .submit_enhanced_scan_findings(
+            ecr_client_for_enhanced_scanning_repo,
+            ecr_enhanced_repo_uri,
+            ECREnhancedScanVulnerabilityList(minimum_severity=CVESeverity[minimum_sev_threshold]),
+        )
+        .result()
     )
-    ecr_image_vulnerability_list.construct_allowlist_from_ecr_scan_result(scan_results)
 
     image_scan_allowlist = ECREnhancedScanVulnerabilityList(
         minimum_severity=CVESeverity[minimum_sev_threshold]
@@ -31,7 +31,6 @@ from test.test_utils import (
     is_dlc_cicd_context,
     run_cmd_on_container,
     start_container,
-    stop_and_remove_container,
     get_repository_local_path,
     get_repository_and_tag_from_image_uri,
     get_python_version_from_image_uri,
@@ -43,12 +42,10 @@ from test.test_utils import (
     is_nightly_context,
     execute_env_variables_test,
     AL2023_BASE_DLAMI_ARM64_US_WEST_2,
-    get_installed_python_packages_with_version,
     login_to_ecr_registry,
     get_account_id_from_image_uri,
     get_region_from_image_uri,
     DockerImagePullException,
-    get_installed_python_packages_with_version,
     get_installed_python_packages_using_image_uri,
     get_image_spec_from_buildspec,
 )
@@ -106,15 +103,13 @@ def derive_regex_for_skipping_tensorflow_inference_tests(
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.canary("Run stray file test regularly on production images")
-def test_stray_files(image):
+def test_stray_files(image, image_inspectors):
     """
     Test to ensure that unnecessary build artifacts are not present in any easily visible or tmp directories
 
     :param image: ECR image URI
     """
-    ctx = Context()
-    container_name = get_container_name("test_tmp_dirs", image)
-    start_container(container_name, image, ctx)
+    directories = image_inspectors.get(image).get_snapshot().directories
 
     # Running list of artifacts/artifact regular expressions we do not want in any of the directories
     stray_artifacts = [r"\.py"]
@@ -127,40 +122,33 @@ def test_stray_files(image):
         allowed_tmp_files.append("cache")
 
     # Ensure stray artifacts are not in the tmp directory
-    tmp = run_cmd_on_container(container_name, ctx, "ls -A /tmp")
-    _assert_artifact_free(tmp, stray_artifacts)
+    _assert_artifact_free(directories, "/tmp", stray_artifacts)
 
     # Ensure tmp dir is empty except for whitelisted files
-    tmp_files = tmp.stdout.split()
+    tmp_files = directories["/tmp"]
     for tmp_file in tmp_files:
         assert (
             tmp_file in allowed_tmp_files
         ), f"Found unexpected file in tmp dir: {tmp_file}. Allowed tmp files: {allowed_tmp_files}"
 
     # We always expect /var/tmp to be empty
-    var_tmp = run_cmd_on_container(container_name, ctx, "ls -A /var/tmp")
-    _assert_artifact_free(var_tmp, stray_artifacts)
-    assert var_tmp.stdout.strip() == ""
+    _assert_artifact_free(directories, "/var/tmp", stray_artifacts)
+    assert directories["/var/tmp"] == []
 
     # Additional check of home and root directories to ensure that stray artifacts are not present
-    home = run_cmd_on_container(container_name, ctx, "ls -A ~")
-    _assert_artifact_free(home, stray_artifacts)
-
-    root = run_cmd_on_container(container_name, ctx, "ls -A /")
-    _assert_artifact_free(root, stray_artifacts)
+    _assert_artifact_free(directories, "~", stray_artifacts)
+    _assert_artifact_free(directories, "/", stray_artifacts)
 
 
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.canary("Run python version test regularly on production images")
-def test_python_version(image):
+def test_python_version(image, image_inspectors):
     """
     Check that the python version in the image tag is the same as the one on a running container.
 
     :param image: ECR image URI
     """
-    ctx = Context()
-
     py_version = ""
     for tag_split in image.split("-"):
         if tag_split.startswith("py"):
@@ -169,36 +157,27 @@ def test_python_version(image):
             else:
                 py_version = f"Python {tag_split[2]}"
 
-    container_name = get_container_name("py-version", image)
-    start_container(container_name, image, ctx)
-    output = run_cmd_on_container(container_name, ctx, "python --version")
-
     # Due to py2 deprecation, Python2 version gets streamed to stderr. Python installed via Conda also appears to
-    # stream to stderr (in some cases).
-    container_py_version = output.stdout + output.stderr
+    # stream to stderr (in some cases), which the snapshot captures as well.
+    container_py_version = image_inspectors.get(image).get_snapshot().python_version
 
     assert py_version in container_py_version, f"Cannot find {py_version} in {container_py_version}"
 
 
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_ubuntu_version(image):
+def test_ubuntu_version(image, image_inspectors):
     """
     Check that the ubuntu version in the image tag is the same as the one on a running container.
 
     :param image: ECR image URI
     """
-    ctx = Context()
-    container_name = get_container_name("ubuntu-version", image)
-
     ubuntu_version = ""
     for tag_split in image.split("-"):
         if tag_split.startswith("ubuntu"):
             ubuntu_version = tag_split.split("ubuntu")[-1]
 
-    start_container(container_name, image, ctx)
-    output = run_cmd_on_container(container_name, ctx, "cat /etc/os-release")
-    container_ubuntu_version = output.stdout
+    container_ubuntu_version = image_inspectors.get(image).get_snapshot().os_release
 
     assert "Ubuntu" in container_ubuntu_version
     assert ubuntu_version in container_ubuntu_version
@@ -214,7 +193,7 @@ def test_image_tags(image, ecr_client):
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.canary("Run non-gpu tf serving version test regularly on production images")
-def test_tf_serving_version_cpu(tensorflow_inference):
+def test_tf_serving_version_cpu(tensorflow_inference, image_inspectors):
     """
     For non-huggingface non-GPU TF inference images, check that the tag version matches the version of TF serving
     in the container.
@@ -251,22 +230,15 @@ def test_tf_serving_version_cpu(tensorflow_inference):
             "Skipping this test for TF 2.6.3 inference as the v2.6.3 version is already on production"
         )
 
-    ctx = Context()
-    container_name = get_container_name("tf-serving-version", image)
-    start_container(container_name, image, ctx)
-    output = run_cmd_on_container(
-        container_name, ctx, "tensorflow_model_server --version", executable="bash"
-    )
+    output = image_inspectors.get(image).run("tensorflow_model_server --version")
     assert re.match(
         rf"TensorFlow ModelServer: {tag_framework_version}(\D+)?", output.stdout
     ), f"Cannot find model server version {tag_framework_version} in {output.stdout}"
 
-    stop_and_remove_container(container_name, ctx)
-
 
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_tf_serving_api_version(tensorflow_inference):
+def test_tf_serving_api_version(tensorflow_inference, image_inspectors):
     """
     For non-huggingface TF inference images, check that the tag version matches the version of TF serving api
     in the container.
@@ -280,9 +252,9 @@ def test_tf_serving_api_version(tensorflow_inference):
     image = tensorflow_inference
 
     if "gpu" in image:
-        cmd = "pip show tensorflow-serving-api-gpu | grep Version"
+        package_name = "tensorflow-serving-api-gpu"
     elif "cpu" in image:
-        cmd = "pip show tensorflow-serving-api | grep Version"
+        package_name = "tensorflow-serving-api"
     else:
         ValueError(
             "Test as of now only covers CPU and GPU type images. If required, please modify this test to accommodate the new image type!"
@@ -290,50 +262,45 @@ def test_tf_serving_api_version(tensorflow_inference):
 
     _, tag_framework_version = get_framework_and_version_from_tag(image)
 
-    ctx = Context()
-    container_name = get_container_name("tf-serving-api-version", image)
-    start_container(container_name, image, ctx)
-    try:
-        output = run_cmd_on_container(container_name, ctx, cmd, executable="bash")
-        str_version_from_output = ((str(output.stdout).split(" "))[1]).strip()
-        assert (
-            tag_framework_version == str_version_from_output
-        ), f"Tensorflow serving API version is {str_version_from_output} while the Tensorflow version is {tag_framework_version}. Both don't match!"
-    except Exception as e:
-        LOGGER.error(f"Unable to execute command on container. Error: {e}")
-        raise
-    finally:
-        stop_and_remove_container(container_name, ctx)
+    python_packages = image_inspectors.get(image).get_snapshot().python_packages
+    str_version_from_output = python_packages.get(package_name)
+    assert (
+        tag_framework_version == str_version_from_output
+    ), f"Tensorflow serving API version is {str_version_from_output} while the Tensorflow version is {tag_framework_version}. Both don't match!"
 
 
 @pytest.mark.usefixtures("sagemaker_only", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_sm_toolkit_and_ts_version_pytorch(pytorch_inference, region):
-    _test_sm_toolkit_and_ts_version(pytorch_inference, region)
+def test_sm_toolkit_and_ts_version_pytorch(pytorch_inference, region, image_inspectors):
+    _test_sm_toolkit_and_ts_version(pytorch_inference, region, image_inspectors)
 
 
 @pytest.mark.usefixtures("sagemaker_only", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_sm_toolkit_and_ts_version_pytorch_graviton(pytorch_inference_graviton, region):
-    _test_sm_toolkit_and_ts_version(pytorch_inference_graviton, region)
+def test_sm_toolkit_and_ts_version_pytorch_graviton(
+    pytorch_inference_graviton, region, image_inspectors
+):
+    _test_sm_toolkit_and_ts_version(pytorch_inference_graviton, region, image_inspectors)
 
 
 @pytest.mark.usefixtures("sagemaker_only", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_sm_toolkit_and_ts_version_pytorch_arm64(pytorch_inference_arm64, region):
-    _test_sm_toolkit_and_ts_version(pytorch_inference_arm64, region)
+def test_sm_toolkit_and_ts_version_pytorch_arm64(pytorch_inference_arm64, region, image_inspectors):
+    _test_sm_toolkit_and_ts_version(pytorch_inference_arm64, region, image_inspectors)
 
 
 @pytest.mark.usefixtures("sagemaker_only", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_sm_toolkit_and_ts_version_pytorch_neuron(pytorch_inference_neuron, region):
-    _test_sm_toolkit_and_ts_version(pytorch_inference_neuron, region)
+def test_sm_toolkit_and_ts_version_pytorch_neuron(
+    pytorch_inference_neuron, region, image_inspectors
+):
+    _test_sm_toolkit_and_ts_version(pytorch_inference_neuron, region, image_inspectors)
 
 
 @pytest.mark.usefixtures("sagemaker", "huggingface", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.canary("Run non-gpu framework version test regularly on production images")
-def test_framework_version_cpu(image):
+def test_framework_version_cpu(image, image_inspectors):
     """
     Check that the framework version in the image tag is the same as the one on a running container.
     This function tests CPU, EIA images.
@@ -371,12 +338,8 @@ def test_framework_version_cpu(image):
         tested_framework = "torch"
     elif tested_framework == "autogluon":
         tested_framework = "autogluon.core"
-    ctx = Context()
-    container_name = get_container_name("framework-version", image)
-    start_container(container_name, image, ctx)
-    output = run_cmd_on_container(
-        container_name,
-        ctx,
+    inspector = image_inspectors.get(image)
+    output = inspector.run(
         f"import {tested_framework}; print({tested_framework}.__version__)",
         executable="python",
     ).stdout.strip()
@@ -406,9 +369,7 @@ def test_framework_version_cpu(image):
                         f"Please specify nightly framework version as X.Y.Z.devYYYYMMDD"
                     )
                 else:
-                    cuda_output = run_cmd_on_container(
-                        container_name,
-                        ctx,
+                    cuda_output = inspector.run(
                         f"import {tested_framework}; print({tested_framework}.version.cuda)",
                         executable="python",
                     ).stdout.strip()
@@ -437,12 +398,11 @@ def test_framework_version_cpu(image):
                 )
             else:
                 assert tag_framework_version == output
-    stop_and_remove_container(container_name, ctx)
 
 
 @pytest.mark.usefixtures("sagemaker", "huggingface", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_framework_and_neuron_sdk_version(neuron):
+def test_framework_and_neuron_sdk_version(neuron, image_inspectors):
     """
     Gets the neuron sdk tag from the image. For that neuron sdk and the frame work version from
     the image, it gets the expected frame work version. Then checks that the expected framework version
@@ -487,22 +447,12 @@ def test_framework_and_neuron_sdk_version(neuron):
     elif tested_framework == "mxnet":
         package_names = {"mxnet_neuron": "mxnet"}
 
-    container_name = None
-    ctx = None
-
     for package_name, framework in package_names.items():
         assert (
             package_name in release_manifest
         ), f"release_manifest does not contain package {package_name}:\n {json.dumps(release_manifest)}"
 
-        if not container_name:
-            container_name = get_container_name("framework-version-neuron", image)
-            ctx = Context()
-            start_container(container_name, image, ctx)
-
-        output = run_cmd_on_container(
-            container_name,
-            ctx,
+        output = image_inspectors.get(image).run(
             f"import {framework}; print({framework}.__version__)",
             executable="python",
         )
@@ -523,8 +473,6 @@ def test_framework_and_neuron_sdk_version(neuron):
             f"not found in released versions for that package: {version_list}"
         )
 
-    stop_and_remove_container(container_name, ctx)
-
 
 @pytest.mark.usefixtures("sagemaker", "huggingface", "functionality_sanity")
 @pytest.mark.model("N/A")
@@ -551,25 +499,21 @@ def test_framework_and_cuda_version_arm64_gpu(gpu, ec2_connection, arm64_compati
 
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
-def test_dataclasses_check(image):
+def test_dataclasses_check(image, image_inspectors):
     """
     Ensure there is no dataclasses pip package is installed for python 3.7 and above version.
     Python version retrieved from the ecr image uri is expected in the format `py<major_version><minor_version>`
     :param image: ECR image URI
     """
-    ctx = Context()
     pip_package = "dataclasses"
 
-    container_name = get_container_name("dataclasses-check", image)
-
     python_version = get_python_version_from_image_uri(image).replace("py", "")
     python_version = int(python_version)
 
     if python_version >= 37:
-        start_container(container_name, image, ctx)
-        output = run_cmd_on_container(container_name, ctx, f"pip show {pip_package}", warn=True)
+        python_packages = image_inspectors.get(image).get_snapshot().python_packages
 
-        if output.return_code == 0:
+        if pip_package in python_packages:
             pytest.fail(
                 f"{pip_package} package exists in the DLC image {image} that has py{python_version} version which is greater than py36 version"
             )
@@ -583,7 +527,7 @@ def test_dataclasses_check(image):
 
 @pytest.mark.usefixtures("sagemaker", "security_sanity")
 @pytest.mark.model("N/A")
-def test_pip_check(image):
+def test_pip_check(image, image_inspectors):
     """
     Ensure there are no broken requirements on the containers by running "pip check"
 
@@ -710,9 +654,8 @@ def test_pip_check(image):
             ]
         )
 
-    # Add null entrypoint to ensure command exits immediately
-    ctx = Context()
-    output = ctx.run(f"docker run --entrypoint='' {image} pip check", hide=True, warn=True)
+    inspector = image_inspectors.get(image)
+    output = inspector.run("pip check", warn=True, timeout=300)
     if output.return_code != 0:
         if not (
             any(
@@ -723,7 +666,7 @@ def test_pip_check(image):
             )
         ):
             # Rerun pip check test if this is an unexpected failure
-            ctx.run(f"docker run --entrypoint='' {image} pip check", hide=True)
+            inspector.run("pip check", timeout=300)
 
 
 @pytest.mark.usefixtures("sagemaker", "huggingface", "functionality_sanity")
@@ -820,40 +763,38 @@ def test_cuda_paths(gpu):
     ), f"Cannot find dockerfile for {image} in {dockerfile_spec_abs_path}"
 
 
-def _assert_artifact_free(output, stray_artifacts):
+def _assert_artifact_free(directories, directory, stray_artifacts):
     """
     Manage looping through assertions to determine that directories don't have known stray files.
 
-    :param output: Invoke result object
+    :param directories: Dict of directory -> files in it, from the snapshot of the image
+    :param directory: Directory to check
     :param stray_artifacts: List of things that should not be present in these directories
     """
+    files = "\n".join(directories[directory])
     for artifact in stray_artifacts:
-        assert not re.search(
-            artifact, output.stdout
-        ), f"Matched {artifact} in {output.stdout} while running {output.command}"
+        assert not re.search(artifact, files), f"Matched {artifact} in {directory}: {files}"
 
 
-def _test_sm_toolkit_and_ts_version(image, region):
+def _test_sm_toolkit_and_ts_version(image, region, image_inspectors):
     """
     @param image: ECR image URI
+    @param image_inspectors: ImageInspectors of the session
     Make sure SM inference toolkit and torchserve versions match docker image label.
     """
-    cmd_smkit = "pip show sagemaker-pytorch-inference | grep -i Version"
     cmd_ts = "torchserve --version"
-    ctx = Context()
-    container_name = get_container_name("pytorch-smtoolkit-ts-check", image)
-    start_container(container_name, image, ctx)
+    inspector = image_inspectors.get(image)
 
-    # Get inference tool kit and torchserve version from bash command.
-    output_smkit = run_cmd_on_container(container_name, ctx, cmd_smkit, executable="bash")
-    tk_match = re.search(r"(\d+\.\d+\.\d+)", str(output_smkit.stdout))
+    # Get inference tool kit version from the snapshot and torchserve version from bash command.
+    toolkit_version = inspector.get_snapshot().python_packages.get("sagemaker-pytorch-inference")
+    tk_match = re.search(r"(\d+\.\d+\.\d+)", str(toolkit_version))
     if tk_match:
         toolkit_version_from_output = tk_match.group(0)
     else:
         raise RuntimeError(
-            f"Can not determine inference tool kit version from container output : {str(output_smkit.stdout)}"
+            f"Can not determine inference tool kit version from container snapshot : {toolkit_version}"
         )
-    output_ts = run_cmd_on_container(container_name, ctx, cmd_ts, executable="bash")
+    output_ts = inspector.run(cmd_ts)
     ts_match = re.search(r"(\d+\.\d+\.\d+)", str(output_ts.stdout))
     if ts_match:
         ts_version_from_output = ts_match.group(0)
@@ -1070,7 +1011,7 @@ def test_oss_compliance(image):
 @pytest.mark.skipif(
     not is_dlc_cicd_context(), reason="We need to test license file only on PRs and pipelines"
 )
-def test_license_file(image):
+def test_license_file(image, image_inspectors):
     """
     Check that license file within the container is readable and valid
     """
@@ -1093,13 +1034,8 @@ def test_license_file(image):
     s3_file_local_path = os.path.join(local_repo_path, s3_filename)
 
     # get license file in container
-    container_name = get_container_name("license_readable", image)
-    context = Context()
-    start_container(container_name, image, context)
-    try:
-        context.run(f"docker cp {container_name}:/license.txt {container_file_local_path}")
-    finally:
-        context.run(f"docker rm -f {container_name}", hide=True)
+    inspector = image_inspectors.get(image)
+    inspector.context.run(f"docker cp {inspector.start()}:/license.txt {container_file_local_path}")
 
     # get license file in s3
     s3_client = boto3.client("s3")
@@ -1182,7 +1118,7 @@ def test_mxnet_training_sm_env_variables(mxnet_training):
 
 @pytest.mark.usefixtures("sagemaker", "security_sanity")
 @pytest.mark.model("N/A")
-def test_core_package_version(image):
+def test_core_package_version(image, image_inspectors):
     """
     In this test, we ensure that if a core_packages.json file exists for an image, the packages installed in the image
     satisfy the version constraints specified in the core_packages.json file.
@@ -1197,11 +1133,7 @@ def test_core_package_version(image):
     with open(core_packages_path, "r") as f:
         core_packages = json.load(f)
 
-    ctx = Context()
-    container_name = get_container_name("test_core_package_version", image)
-    start_container(container_name, image, ctx)
-    docker_exec_command = f"""docker exec --user root {container_name}"""
-    installed_package_version_dict = get_installed_python_packages_with_version(docker_exec_command)
+    installed_package_version_dict = image_inspectors.get(image).get_snapshot().python_packages
 
     violation_data = {}
 
@@ -1222,7 +1154,6 @@ def test_core_package_version(image):
                 f"requirement {specs.get('version_specifier')}"
             )
 
-    stop_and_remove_container(container_name, ctx)
     assert (
         not violation_data
     ), f"Few packages violate the core_package specifications: {violation_data}"
@@ -1230,7 +1161,7 @@ def test_core_package_version(image):
 
 @pytest.mark.usefixtures("security_sanity")
 @pytest.mark.model("N/A")
-def test_package_version_regression_in_image(image):
+def test_package_version_regression_in_image(image, image_inspectors):
     """
     This test verifies if the python package versions in the already released image are not being downgraded/deleted in the
     new released. This test would be skipped for images whose BuildSpec does not have `latest_release_tag` or `release_repository`
@@ -1275,9 +1206,7 @@ def test_package_version_regression_in_image(image):
         )
 
     # Get the installed python package versions and find any regressions
-    current_image_package_version_dict = get_installed_python_packages_using_image_uri(
-        context=ctx, image_uri=image
-    )
+    current_image_package_version_dict = image_inspectors.get(image).get_snapshot().python_packages
     released_image_package_version_dict = get_installed_python_packages_using_image_uri(
         context=ctx, image_uri=previous_released_image_uri
     )
@@ -1,5 +1,6 @@
 import os
 import json
+import time
 
 import pytest
 
@@ -7,10 +8,14 @@ from test.test_utils import LOGGER, EnhancedJSONEncoder, is_huggingface_image
 
 # Required to prevent circular dependency while importing
 from test.test_utils import ecr as ecr_utils
+from test.test_utils import security
 from test.test_utils.security import (
     CVESeverity,
     ECREnhancedScanVulnerabilityList,
+    ECRScanCoordinator,
     generate_future_allowlist,
+    get_scan_coordinator,
+    shutdown_scan_coordinators,
 )
 
 
@@ -304,3 +309,208 @@ def test_future_allowlist_generation():
     assert (
         future_allowlist == stored_future_allowlist_for_comparison
     ), "Incorrect Future Allowlist generated"
+
+
+def get_recorded_scan_results_at_scale(scan_results, copies):
+    """
+    Replicate recorded ECR scan results with unique CVE ids, to get scan results the size of those of large images
+    """
+    scaled_scan_results = []
+    for index in range(copies):
+        for finding in scan_results:
+            scaled_finding = json.loads(json.dumps(finding))
+            details = scaled_finding["packageVulnerabilityDetails"]
+            details["vulnerabilityId"] = f"{details['vulnerabilityId']}-{index}"
+            scaled_scan_results.append(scaled_finding)
+    return scaled_scan_results
+
+
+@pytest.mark.usefixtures("sagemaker", "functionality_sanity")
+@pytest.mark.model("N/A")
+@pytest.mark.integration("Benchmark ECREnhancedScanVulnerabilityList set operations")
+def test_benchmark_vulnerability_list_set_operations():
+    """
+    This method benchmarks subtraction, union and future allowlist generation on recorded scan results scaled up to
+    thousands of findings, where half of the image vulnerabilities are allowlisted, and checks the results.
+    """
+    minimum_sev_threshold = "HIGH"
+    with open("./sanity/resources/ecr_scan_result1.json", "r") as f:
+        scan_results = json.load(f)
+    image_scan_results = get_recorded_scan_results_at_scale(scan_results, copies=1000)
+    allowlisted_scan_results = image_scan_results[::2]
+
+    ecr_image_vulnerability_list = ECREnhancedScanVulnerabilityList(
+        minimum_severity=CVESeverity[minimum_sev_threshold]
+    )
+    ecr_image_vulnerability_list.construct_allowlist_from_ecr_scan_result(image_scan_results)
+    image_scan_allowlist = ECREnhancedScanVulnerabilityList(
+        minimum_severity=CVESeverity[minimum_sev_threshold]
+    )
+    image_scan_allowlist.construct_allowlist_from_ecr_scan_result(allowlisted_scan_results)
+    image_vulnerabilities_count = len(
+        ecr_image_vulnerability_list.get_flattened_vulnerability_list()
+    )
+    allowlisted_vulnerabilities_count = len(image_scan_allowlist.get_flattened_vulnerability_list())
+
+    start_time = time.perf_counter()
+    remaining_vulnerabilities = ecr_image_vulnerability_list - image_scan_allowlist
+    subtraction_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    union = remaining_vulnerabilities + image_scan_allowlist
+    union_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    future_allowlist = generate_future_allowlist(
+        ecr_image_vulnerability_list=ecr_image_vulnerability_list,
+        image_scan_allowlist=image_scan_allowlist,
+        non_patchable_vulnerabilities=remaining_vulnerabilities,
+    )
+    future_allowlist_time = time.perf_counter() - start_time
+
+    LOGGER.info(
+        f"[Benchmark] {image_vulnerabilities_count} image vulnerabilities, "
+        f"{allowlisted_vulnerabilities_count} allowlisted: subtraction {subtraction_time:.3f}s, "
+        f"union {union_time:.3f}s, future allowlist {future_allowlist_time:.3f}s"
+    )
+    assert (
+        len(remaining_vulnerabilities.get_flattened_vulnerability_list())
+        == image_vulnerabilities_count - allowlisted_vulnerabilities_count
+    )
+    image_vulnerability_index = ecr_image_vulnerability_list.get_vulnerability_index()
+    assert (
+        union.get_vulnerability_index() == image_vulnerability_index
+    ), "Union does not match the image vulnerabilities"
+    assert (
+        future_allowlist.get_vulnerability_index() == image_vulnerability_index
+    ), "Future allowlist does not match the image vulnerabilities"
+
+
+class FakeEcrClient:
+    """
+    Fake ECR client that reports enhanced scans as PENDING for a few polls and then serves the findings in pages
+    """
+
+    class exceptions:
+        class ScanNotFoundException(Exception):
+            pass
+
+    class meta:
+        region_name = "us-west-2"
+
+    def __init__(self, findings, pending_polls=2, page_size=2):
+        self.findings = findings
+        self.pending_polls = pending_polls
+        self.page_size = page_size
+        self.polls = {}
+
+    def describe_image_scan_findings(self, repositoryName, imageId, maxResults):
+        image = f"{repositoryName}:{imageId['imageTag']}"
+        self.polls[image] = self.polls.get(image, 0) + 1
+        status = "ACTIVE" if self.polls[image] > self.pending_polls else "PENDING"
+        return {
+            "imageScanStatus": {"status": status, "description": status},
+            "imageScanFindings": {"findingSeverityCounts": {"HIGH": len(self.findings)}},
+        }
+
+    def get_paginator(self, operation_name):
+        fake_client = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                for index in range(0, len(fake_client.findings), fake_client.page_size):
+                    findings = fake_client.findings[index : index + fake_client.page_size]
+                    yield {"imageScanFindings": {"enhancedFindings": findings}}
+
+        return Paginator()
+
+
+@pytest.mark.usefixtures("sagemaker", "functionality_sanity")
+@pytest.mark.model("N/A")
+@pytest.mark.integration("Check if ECR Scan data is read properly")
+def test_scan_coordinator_streams_findings_of_concurrent_scans():
+    """
+    This method tests that the ECRScanCoordinator waits for the enhanced scans of several images concurrently and
+    streams the paginated findings of each of them into an ECREnhancedScanVulnerabilityList, with the same result as
+    reading ecr_scan_result1.json at once.
+    """
+    with open("./sanity/resources/ecr_scan_result1.json", "r") as f:
+        scan_results = json.load(f)
+    coordinator = ECRScanCoordinator(
+        calls_per_second=100,
+        initial_poll_delay=0.01,
+        max_poll_delay=0.05,
+    )
+    images = [
+        f"123456789012.dkr.ecr.us-west-2.amazonaws.com/scan-repo:image-{index}"
+        for index in range(4)
+    ]
+    futures = coordinator.scan_images(
+        FakeEcrClient(scan_results), images, minimum_severity=CVESeverity["HIGH"]
+    )
+
+    with open(f"./sanity/resources/allowlist1.json", "r") as f:
+        expected_result = json.load(f)
+    for image in images:
+        assert expected_result == get_object_after_serialization(
+            futures[image].result(timeout=60).vulnerability_list
+        ), f"Lists do not match for {image}!!"
+    coordinator.shutdown()
+
+
+@pytest.mark.usefixtures("sagemaker", "functionality_sanity")
+@pytest.mark.model("N/A")
+@pytest.mark.integration("Check if ECR Scan data is read properly")
+def test_scan_coordinators_are_shared_per_account_and_region():
+    """
+    This method tests that the ECR clients of the same account and region share a scan coordinator, and that each scan
+    is run with the client it was submitted with.
+    """
+    with open("./sanity/resources/ecr_scan_result1.json", "r") as f:
+        scan_results = json.load(f)
+    first_client = FakeEcrClient(scan_results, pending_polls=0)
+    second_client = FakeEcrClient(scan_results, pending_polls=0)
+    image = "123456789012.dkr.ecr.us-west-2.amazonaws.com/scan-repo:image"
+    other_image = "123456789012.dkr.ecr.us-west-2.amazonaws.com/other-scan-repo:image"
+    other_account_image = "210987654321.dkr.ecr.us-west-2.amazonaws.com/scan-repo:image"
+    try:
+        coordinator = get_scan_coordinator(first_client, image)
+        assert get_scan_coordinator(second_client, other_image) is coordinator
+        assert get_scan_coordinator(first_client, other_account_image) is not coordinator
+
+        coordinator.submit_enhanced_scan(second_client, image, timeout=60).result(timeout=60)
+        assert second_client.polls and not first_client.polls
+    finally:
+        shutdown_scan_coordinators()
+    assert get_scan_coordinator(first_client, image) is not coordinator
+    shutdown_scan_coordinators()
+
+
+@pytest.mark.usefixtures("sagemaker", "functionality_sanity")
+@pytest.mark.model("N/A")
+@pytest.mark.integration("Check if ECR Scan data is read properly")
+def test_scan_coordinator_account_is_looked_up_once_per_client(monkeypatch):
+    """
+    This method tests that without an image URI, the account of an ECR client is looked up with STS only once.
+    """
+    caller_identity_calls = []
+
+    class FakeStsClient:
+        def get_caller_identity(self):
+            caller_identity_calls.append(1)
+            return {"Account": "123456789012"}
+
+    monkeypatch.setattr(security.boto3, "client", lambda service_name, **kwargs: FakeStsClient())
+    ecr_client = FakeEcrClient([])
+    try:
+        coordinator = get_scan_coordinator(ecr_client)
+        assert get_scan_coordinator(ecr_client) is coordinator
+        assert (
+            get_scan_coordinator(
+                ecr_client, "123456789012.dkr.ecr.us-west-2.amazonaws.com/scan-repo:image"
+            )
+            is coordinator
+        )
+        assert len(caller_identity_calls) == 1
+    finally:
+        shutdown_scan_coordinators()
@@ -8,8 +8,6 @@ import time
 
 import os
 
-from invoke.context import Context
-
 from test import test_utils
 
 SM_TRAINING_UTILITY_PACKAGES_IMPORT = [
@@ -49,19 +47,17 @@ TIMEOUT_IMPORT_TEST = 500
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.integration("awscli")
-def test_awscli(mxnet_inference):
+def test_awscli(mxnet_inference, image_inspectors):
     """
     Ensure that boto3 is installed on mxnet inference
 
     :param mxnet_inference: ECR image URI
     """
     image = mxnet_inference
-    ctx = Context()
-    container_name = test_utils.get_container_name("awscli", image)
-    test_utils.start_container(container_name, image, ctx)
+    inspector = image_inspectors.get(image)
 
-    test_utils.run_cmd_on_container(container_name, ctx, "which aws")
-    test_utils.run_cmd_on_container(container_name, ctx, "aws --version")
+    inspector.run("which aws")
+    inspector.run("aws --version")
 
 
 @pytest.mark.usefixtures(
@@ -69,7 +65,7 @@ def test_awscli(mxnet_inference):
 )
 @pytest.mark.model("N/A")
 @pytest.mark.integration("utility pacakges")
-def test_utility_packages_using_import(training):
+def test_utility_packages_using_import(training, image_inspectors):
     """
     Verify that utility packages are installed in the Training DLC image
     :param training: training ECR image URI
@@ -78,9 +74,7 @@ def test_utility_packages_using_import(training):
     if "hpu" in training:
         pytest.skip("Skipping test for Habana images as SM is not yet supported")
 
-    ctx = Context()
-    container_name = test_utils.get_container_name("utility_packages_using_import", training)
-    test_utils.start_container(container_name, training, ctx)
+    inspector = image_inspectors.get(training)
 
     framework, framework_version = test_utils.get_framework_and_version_from_tag(training)
     framework = framework.replace("_trcomp", "")
@@ -104,11 +98,8 @@ def test_utility_packages_using_import(training):
     for package in packages_to_import:
         version = re.search(
             r"\d+(\.\d+)+",
-            test_utils.run_cmd_on_container(
-                container_name,
-                ctx,
-                f"import {package}; print({package}.__version__)",
-                executable="python",
+            inspector.run(
+                f"import {package}; print({package}.__version__)", executable="python"
             ).stdout,
         ).group()
         test_utils.LOGGER.info(f"The {package} Version is {version}")
@@ -121,16 +112,12 @@ def test_utility_packages_using_import(training):
 @pytest.mark.model("N/A")
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.integration("common pytorch training utility packages")
-def test_common_pytorch_utility_packages_using_import(pytorch_training):
+def test_common_pytorch_utility_packages_using_import(pytorch_training, image_inspectors):
     """
     Verify that common utility packages are installed in the Training DLC image
     :param pytorch_training: training ECR image URI
     """
-    ctx = Context()
-    container_name = test_utils.get_container_name(
-        "common_pytorch_utility_packages_using_import", pytorch_training
-    )
-    test_utils.start_container(container_name, pytorch_training, ctx)
+    inspector = image_inspectors.get(pytorch_training)
     packages_to_import = COMMON_PYTORCH_TRAINING_UTILITY_PACKAGES_IMPORT.copy()
 
     # Exceptions for certain types of PyTorch Training DLCs
@@ -151,9 +138,7 @@ def test_common_pytorch_utility_packages_using_import(pytorch_training):
     for package in packages_to_import:
         try:
             start_time = datetime.now()
-            test_utils.run_cmd_on_container(
-                container_name,
-                ctx,
+            inspector.run(
                 f"import {package}; print({package}.__version__)",
                 executable="python",
                 timeout=TIMEOUT_IMPORT_TEST,
@@ -178,74 +163,61 @@ def test_common_pytorch_utility_packages_using_import(pytorch_training):
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.integration("mpi4py-pt-inference")
-def test_mpi4py_for_pytorch_inference(pytorch_inference):
+def test_mpi4py_for_pytorch_inference(pytorch_inference, image_inspectors):
     """
     Ensure mpi4py works on pytorch_inference
 
     :param pytorch_inference: ECR image URI
     """
     if "gpu" in pytorch_inference:
-        _test_mpi4py_import(pytorch_inference, "pytorch_inference")
+        _test_mpi4py_import(pytorch_inference, image_inspectors)
 
 
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.integration("mpi4py-pt-training")
-def test_mpi4py_for_pytorch_training(pytorch_training):
+def test_mpi4py_for_pytorch_training(pytorch_training, image_inspectors):
     """
     Ensure mpi4py works on pytorch_training
 
     :param pytorch_training: ECR image URI
     """
-    _test_mpi4py_import(pytorch_training, "pytorch_training")
+    _test_mpi4py_import(pytorch_training, image_inspectors)
 
 
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.integration("mpi4py-tf-training")
-def test_mpi4py_for_tensorflow_training(tensorflow_training):
+def test_mpi4py_for_tensorflow_training(tensorflow_training, image_inspectors):
     """
     Ensure mpi4py works on tensorflow_training
 
     :param tensorflow_training: ECR image URI
     """
-    _test_mpi4py_import(tensorflow_training, "tensorflow_training")
+    _test_mpi4py_import(tensorflow_training, image_inspectors)
 
 
-def _test_mpi4py_import(image, image_name_suffix):
+def _test_mpi4py_import(image, image_inspectors):
     """
     Helper function to test mpi4py import on a container
 
     :param image: The image fixture (pytorch_inference, etc.)
-    :param image_name_suffix: Suffix for image name
+    :param image_inspectors: ImageInspectors of the session
     """
-    container_name = test_utils.get_container_name(f"test_mpi4py_for_{image_name_suffix}", image)
-    ctx = Context()
-    test_utils.start_container(container_name, image, ctx)
-
-    test_utils.run_cmd_on_container(
-        container_name,
-        ctx,
-        "from mpi4py import MPI",
-        executable="python",
-    )
+    image_inspectors.get(image).run("from mpi4py import MPI", executable="python")
 
 
 @pytest.mark.usefixtures("sagemaker", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.integration("boto3")
-def test_boto3(mxnet_inference):
+def test_boto3(mxnet_inference, image_inspectors):
     """
     Ensure that boto3 is installed on mxnet inference
 
     :param mxnet_inference: ECR image URI
     """
     image = mxnet_inference
-    ctx = Context()
-    container_name = test_utils.get_container_name("boto3", image)
-    test_utils.start_container(container_name, image, ctx)
-
-    test_utils.run_cmd_on_container(container_name, ctx, "import boto3", executable="python")
+    image_inspectors.get(image).run("import boto3", executable="python")
 
 
 @pytest.mark.usefixtures("sagemaker_only", "functionality_sanity")
@@ -260,7 +232,7 @@ def test_boto3(mxnet_inference):
         "sagemaker-studio-analytics-extension",
     ],
 )
-def test_sagemaker_studio_analytics_extension(training, package_name):
+def test_sagemaker_studio_analytics_extension(training, package_name, image_inspectors):
     framework, framework_version = test_utils.get_framework_and_version_from_tag(training)
     utility_package_framework_version_limit = {
         "pytorch": SpecifierSet(">=1.7,<1.9"),
@@ -275,14 +247,11 @@ def test_sagemaker_studio_analytics_extension(training, package_name):
             f"sagemaker_studio_analytics_extension is not installed in {framework} {framework_version} DLCs"
         )
 
-    ctx = Context()
-    container_name = test_utils.get_container_name(
-        f"sagemaker_studio_analytics_extension-{package_name}", training
-    )
-    test_utils.start_container(container_name, training, ctx)
+    inspector = image_inspectors.get(training)
 
     # Optionally add version validation in the following steps, rather than just printing it.
-    test_utils.run_cmd_on_container(container_name, ctx, f"pip list | grep -i {package_name}")
+    python_packages = inspector.get_snapshot().python_packages
+    assert package_name in python_packages, f"{package_name} is not installed in {training}"
     import_package = package_name.replace("-", "_")
     import_test_cmd = (
         f"import {import_package}"
@@ -290,28 +259,22 @@ def test_sagemaker_studio_analytics_extension(training, package_name):
         in ["sagemaker-studio-sparkmagic-lib", "sagemaker-studio-analytics-extension"]
         else f"import {import_package}; print({import_package}.__version__)"
     )
-    test_utils.run_cmd_on_container(container_name, ctx, import_test_cmd, executable="python")
+    inspector.run(import_test_cmd, executable="python")
 
 
 @pytest.mark.usefixtures("sagemaker_only", "functionality_sanity")
 @pytest.mark.model("N/A")
 @pytest.mark.integration("ipykernel")
-def test_ipykernel_presence(tensorflow_training):
+def test_ipykernel_presence(tensorflow_training, image_inspectors):
     """
     ipykernel installed by sagemaker-studio-sparkmagic-lib package should be removed in order to make the DLC compatible with SM studio
     """
-    try:
-        image = tensorflow_training
-        ctx = Context()
-        container_name = test_utils.get_container_name("ipykernel", image)
-        test_utils.start_container(container_name, image, ctx)
-        command = 'SYSTEM_PYTHON_PREFIX=$(python -c "from __future__ import print_function;import sys; print(sys.prefix)") && ls $SYSTEM_PYTHON_PREFIX/share/jupyter/kernels/python3/kernel.json'
-        command_output = test_utils.run_cmd_on_container(container_name, ctx, command, warn=True)
-        command_stdout = command_output.stdout.strip()
-        if command_output.return_code == 0:
-            raise RuntimeError(
-                f"Image {image} contains ipykernel at location: {command_stdout} "
-                f"Please ensure that the ipykernel is removed"
-            )
-    finally:
-        test_utils.stop_and_remove_container(container_name, ctx)
+    image = tensorflow_training
+    command = 'SYSTEM_PYTHON_PREFIX=$(python -c "from __future__ import print_function;import sys; print(sys.prefix)") && ls $SYSTEM_PYTHON_PREFIX/share/jupyter/kernels/python3/kernel.json'
+    command_output = image_inspectors.get(image).run(command, warn=True)
+    command_stdout = command_output.stdout.strip()
+    if command_output.return_code == 0:
+        raise RuntimeError(
+            f"Image {image} contains ipykernel at location: {command_stdout} "
+            f"Please ensure that the ipykernel is removed"
+        )
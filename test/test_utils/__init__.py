@@ -1,3 +1,4 @@
+import copy
 import json
 import logging
 import os
@@ -9,11 +10,8 @@ import pprint
 
 from enum import Enum
 
-import boto3
 import requests
 
-import boto3
-from botocore.config import Config
 from botocore.exceptions import ClientError
 from glob import glob
 from invoke import run
@@ -29,6 +27,8 @@ import uuid
 # from security import EnhancedJSONEncoder
 
 from src import config
+from boto_clients import get_boto_client
+from test.test_utils.metadata_cache import METADATA_CACHE
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
@@ -46,11 +46,7 @@ def get_ami_id_boto3(region_name, ami_name_pattern, IncludeDeprecated=False):
     """
     # Use max_attempts=10 because this function is used in global context, and all test jobs
     # get AMI IDs for tests regardless of whether they are used in that job.
-    ec2_client = boto3.client(
-        "ec2",
-        region_name=region_name,
-        config=Config(retries={"max_attempts": 10, "mode": "standard"}),
-    )
+    ec2_client = get_boto_client("ec2", region_name=region_name)
     ami_list = ec2_client.describe_images(
         Filters=[{"Name": "name", "Values": [ami_name_pattern]}],
         Owners=["amazon"],
@@ -78,11 +74,7 @@ def get_ami_id_ssm(region_name, parameter_path):
     """
     # Use max_attempts=10 because this function is used in global context, and all test jobs
     # get AMI IDs for tests regardless of whether they are used in that job.
-    ssm_client = boto3.client(
-        "ssm",
-        region_name=region_name,
-        config=Config(retries={"max_attempts": 10, "mode": "standard"}),
-    )
+    ssm_client = get_boto_client("ssm", region_name=region_name)
     ami = ssm_client.get_parameter(Name=parameter_path)
 
     # Special case for NVIDIA driver AMI paths
@@ -207,7 +199,7 @@ NEURON_AL2_DLAMI = get_ami_id_boto3(
 )
 
 # Account ID of test executor
-ACCOUNT_ID = boto3.client("sts", region_name=DEFAULT_REGION).get_caller_identity().get("Account")
+ACCOUNT_ID = get_boto_client("sts", region_name=DEFAULT_REGION).get_caller_identity().get("Account")
 
 # S3 bucket for TensorFlow models
 TENSORFLOW_MODELS_BUCKET = "s3://tensoflow-trained-models"
@@ -866,15 +858,19 @@ def is_test_phase():
     return "TEST_TYPE" in os.environ
 
 
+def _download_remote_override_flags():
+    s3_client = get_boto_client("s3")
+    sts_client = get_boto_client("sts")
+    account_id = sts_client.get_caller_identity().get("Account")
+    result = s3_client.get_object(
+        Bucket=f"dlc-cicd-helper-{account_id}", Key="override_tests_flags.json"
+    )
+    return json.loads(result["Body"].read().decode("utf-8"))
+
+
 def _get_remote_override_flags():
     try:
-        s3_client = boto3.client("s3")
-        sts_client = boto3.client("sts")
-        account_id = sts_client.get_caller_identity().get("Account")
-        result = s3_client.get_object(
-            Bucket=f"dlc-cicd-helper-{account_id}", Key="override_tests_flags.json"
-        )
-        json_content = json.loads(result["Body"].read().decode("utf-8"))
+        json_content = METADATA_CACHE.get("remote_override_flags", _download_remote_override_flags)
     except ClientError as e:
         LOGGER.warning("ClientError when performing S3/STS operation: {}".format(e))
         json_content = {}
@@ -1396,7 +1392,7 @@ def get_canary_image_uris_from_bucket():
     :return: list of [str<DLC Image URI>]
     """
     canary_helper_bucket = get_canary_helper_bucket_name()
-    s3_client = boto3.client("s3", region_name=DEFAULT_REGION)
+    s3_client = get_boto_client("s3", region_name=DEFAULT_REGION)
     response = s3_client.get_object(Bucket=canary_helper_bucket, Key="images.json")
     image_uris = json.loads(response["Body"].read().decode("utf-8"))
     return image_uris
@@ -1996,7 +1992,7 @@ def get_cuda_version_from_tag(image_uri):
     cuda_framework_version = None
     cuda_str = ["cu", "gpu"]
     image_region = get_region_from_image_uri(image_uri)
-    ecr_client = boto3.Session(region_name=image_region).client("ecr")
+    ecr_client = get_boto_client("ecr", region_name=image_region)
     _, local_image_tag = get_repository_and_tag_from_image_uri(image_uri)
     all_image_tags = [local_image_tag]
     try:
@@ -2246,15 +2242,14 @@ def uniquify_list_of_complex_datatypes(list_of_complex_datatypes):
         if isinstance(list_of_complex_datatypes[0], dict):
             return uniquify_list_of_dict(list_of_complex_datatypes)
         if dataclasses.is_dataclass(list_of_complex_datatypes[0]):
-            type_of_dataclass = type(list_of_complex_datatypes[0])
-            list_of_dict = json.loads(
-                json.dumps(list_of_complex_datatypes, cls=EnhancedJSONEncoder)
-            )
-            uniquified_list = uniquify_list_of_dict(list_of_dict=list_of_dict)
-            return [
-                type_of_dataclass(**uniquified_list_dict_element)
-                for uniquified_list_dict_element in uniquified_list
-            ]
+            # Same order as uniquify_list_of_dict, but copy the first occurrence of each element instead of
+            # deserializing it back from JSON
+            unique_elements = {}
+            for element in list_of_complex_datatypes:
+                unique_elements.setdefault(
+                    json.dumps(element, cls=EnhancedJSONEncoder, sort_keys=True), element
+                )
+            return [copy.copy(unique_elements[key]) for key in sorted(unique_elements)]
         raise "Not implemented"
     return list_of_complex_datatypes
 
@@ -2389,7 +2384,13 @@ def get_labels_from_ecr_image(image_uri, region):
     @param region: AWS region
     @return: list of labels attached to ECR image URI
     """
-    ecr_client = boto3.client("ecr", region_name=region)
+    return METADATA_CACHE.get(
+        f"image_labels:{image_uri}", lambda: _fetch_labels_from_ecr_image(image_uri, region)
+    )
+
+
+def _fetch_labels_from_ecr_image(image_uri, region):
+    ecr_client = get_boto_client("ecr", region_name=region)
 
     image_repository, image_tag = get_repository_and_tag_from_image_uri(image_uri)
     # Using "acceptedMediaTypes" on the batch_get_image request allows the returned image information to
@@ -2472,12 +2473,19 @@ def get_installed_python_packages_with_version(docker_exec_command: str):
     :param docker_exec_command: str, The Docker exec command for an already running container.
     :return: Dict, Dictionary with key=package_name and value=package_version in str
     """
-    package_version_dict = {}
-
     python_cmd_to_extract_package_set = "pip list --format json"
 
     run_output = run(f"{docker_exec_command} {python_cmd_to_extract_package_set}", hide=True)
-    list_of_package_data_dicts = json.loads(run_output.stdout)
+    return get_python_packages_with_version_from_pip_list(run_output.stdout)
+
+
+def get_python_packages_with_version_from_pip_list(pip_list_output):
+    """
+    :param pip_list_output: str, output of "pip list --format json"
+    :return: Dict, Dictionary with key=package_name and value=package_version in str
+    """
+    package_version_dict = {}
+    list_of_package_data_dicts = json.loads(pip_list_output)
 
     for package_data_dict in list_of_package_data_dicts:
         package_name = package_data_dict["name"].lower().replace("_", "-")
@@ -2522,15 +2530,13 @@ def get_image_spec_from_buildspec(image_uri, dlc_folder_path):
     :param dlc_folder_path: str, Path of the DLC folder on the current host
     :return: dict, the image_spec dictionary corresponding to the given image
     """
-    from src.buildspec import Buildspec
+    from src.buildspec import load_build_plan
 
     _, image_tag = get_repository_and_tag_from_image_uri(image_uri)
     buildspec_path = get_buildspec_path(dlc_folder_path)
-    buildspec_def = Buildspec()
-    buildspec_def.load(buildspec_path)
     matched_image_spec = None
 
-    for _, image_spec in buildspec_def["images"].items():
+    for _, image_spec in load_build_plan(buildspec_path).images.items():
         # If an image_spec in the buildspec matches the input image tag:
         #   - if there is no pre-existing matched image spec, choose the image_spec
         #   - if there is a pre-existing matched image spec, choose the image_spec that has
@@ -12,10 +12,8 @@ from collections import Counter
 
 from inspect import signature
 
-import boto3
 
 from fabric import Connection
-from botocore.config import Config
 from botocore.exceptions import ClientError
 from invoke import run
 from packaging.version import Version
@@ -28,6 +26,7 @@ from tenacity import (
     wait_random_exponential,
 )
 
+from boto_clients import get_boto_client
 from test.test_utils import (
     get_synapseai_version_from_tag,
     is_deep_canary_context,
@@ -248,7 +247,7 @@ def launch_instance(
         raise Exception("No ami_id provided")
     if not ec2_key_name:
         raise Exception("Ec2 Key name must be provided")
-    client = boto3.Session(region_name=region).client("ec2")
+    client = get_boto_client("ec2", region_name=region)
     LOGGER.info(f"Using AMI ID: {ami_id}")
     volume_name = "/dev/sda1" if ami_id in UL_AMI_LIST else "/dev/xvda"
 
@@ -699,7 +698,7 @@ def launch_efa_instances_with_retry(
 
 
 def get_ec2_client(region):
-    return boto3.client("ec2", region_name=region, config=Config(retries={"max_attempts": 10}))
+    return get_boto_client("ec2", region_name=region)
 
 
 def get_instance_from_id(instance_id, region=DEFAULT_REGION):
@@ -711,7 +710,7 @@ def get_instance_from_id(instance_id, region=DEFAULT_REGION):
     """
     if not instance_id:
         raise Exception("No instance id provided")
-    client = boto3.Session(region_name=region).client("ec2")
+    client = get_boto_client("ec2", region_name=region)
     instance = client.describe_instances(InstanceIds=[instance_id])
     if not instance:
         raise Exception(
@@ -757,7 +756,7 @@ def get_public_ip_from_private_dns(private_dns, region=DEFAULT_REGION):
     :param region:
     :return: <str> IP Address of instance with matching private DNS
     """
-    client = boto3.Session(region_name=region).client("ec2")
+    client = get_boto_client("ec2", region_name=region)
     response = client.describe_instances(
         Filters={"Name": "private-dns-name", "Value": [private_dns]}
     )
@@ -813,7 +812,7 @@ def get_system_state(instance_id, region=DEFAULT_REGION):
     """
     if not instance_id:
         raise Exception("No instance id provided")
-    client = boto3.Session(region_name=region).client("ec2")
+    client = get_boto_client("ec2", region_name=region)
     response = client.describe_instance_status(InstanceIds=[instance_id])
     if not response:
         raise Exception(
@@ -873,7 +872,7 @@ def terminate_instance(instance_id, region=DEFAULT_REGION):
     """
     if not instance_id:
         raise Exception("No instance id provided")
-    client = boto3.Session(region_name=region).client("ec2")
+    client = get_boto_client("ec2", region_name=region)
     response = client.terminate_instances(InstanceIds=[instance_id])
     if not response:
         raise Exception("Unable to terminate instance. No response received.")
@@ -891,7 +890,7 @@ def get_instance_type_details(instance_type, region=DEFAULT_REGION):
     :param region: Region where query will be performed
     :return: <dict> Information about instance type
     """
-    client = boto3.client("ec2", region_name=region)
+    client = get_boto_client("ec2", region_name=region)
     response = client.describe_instance_types(InstanceTypes=[instance_type])
     if not response or not response["InstanceTypes"]:
         raise Exception("Unable to get instance details. No response received.")
@@ -1130,7 +1129,7 @@ def execute_asynchronus_testing_using_s3_bucket(
     :param s3_uri_for_saving_permanent_logs: Location where permanent s3 logs could be saved.
     :param hang_detection_window: int, This method detects a hang if length of log file does not change for hang_detection_window number of iterations.
     """
-    account_id = os.getenv("ACCOUNT_ID", boto3.client("sts").get_caller_identity()["Account"])
+    account_id = os.getenv("ACCOUNT_ID", get_boto_client("sts").get_caller_identity()["Account"])
     s3_bucket_name = f"dlc-async-test-{account_id}"
     if not s3_uri_for_saving_permanent_logs:
         unique_id = str(uuid.uuid4())
@@ -1262,7 +1261,7 @@ def execute_ec2_training_test(
         )
         test_type = "ec2"
         account_id_prefix = os.getenv(
-            "ACCOUNT_ID", boto3.client("sts").get_caller_identity()["Account"]
+            "ACCOUNT_ID", get_boto_client("sts").get_caller_identity()["Account"]
         )[:3]
         s3_bucket_for_permanent_logs = f"dlinfra-habana-tests-{account_id_prefix}"
         s3_uri_permanent_logs = get_s3_uri_for_saving_permanent_logs(
@@ -1506,7 +1505,7 @@ def execute_ec2_habana_training_performance_test(
         "tensorflow" if "tensorflow" in ecr_uri else "pytorch" if "pytorch" in ecr_uri else None
     )
     account_id_prefix = os.getenv(
-        "ACCOUNT_ID", boto3.client("sts").get_caller_identity()["Account"]
+        "ACCOUNT_ID", get_boto_client("sts").get_caller_identity()["Account"]
     )[:3]
     s3_bucket_for_permanent_logs = f"dlinfra-habana-tests-{account_id_prefix}"
     test_type = "benchmark"
@@ -1690,13 +1689,11 @@ def post_process_mxnet_ec2_performance(connection, log_location):
         raise ValueError("total: {}; n: {} -- something went wrong".format(total, n))
 
 
-def install_python_in_instance(context, python_version="3.9"):
+def configure_pyenv_in_instance(context):
     """
-    Install python on DLAMI EC2 instances to create a consistent test environment that is agnostic to AMI used for test.
-    This helper function assumes that the EC2 instance uses a DLAMI. The /etc/profile.d/dlami.sh file doesn't exist
-    in other AMIs. If support for other AMIs is needed, this function will need to be updated.
+    Clone pyenv, unless ~/.pyenv already exists, and add it to the PATH of login shells through
+    /etc/profile.d/dlami.sh. Does nothing if pyenv is already available.
     :param context: Invoke Context / Fabric Connection object
-    :param python_version: str python version to install, such as 3.8, 3.9, etc.
     :return: None
     """
     if context.run("pyenv --version", warn=True, hide=True).failed:
@@ -1725,6 +1722,18 @@ def install_python_in_instance(context, python_version="3.9"):
         )
         context.run("""echo 'eval "$(pyenv init -)"' >> /etc/profile.d/dlami.sh""", hide=True)
         context.run("sudo chmod 644 /etc/profile.d/dlami.sh", hide=True)
+
+
+def install_python_in_instance(context, python_version="3.9"):
+    """
+    Install python on DLAMI EC2 instances to create a consistent test environment that is agnostic to AMI used for test.
+    This helper function assumes that the EC2 instance uses a DLAMI. The /etc/profile.d/dlami.sh file doesn't exist
+    in other AMIs. If support for other AMIs is needed, this function will need to be updated.
+    :param context: Invoke Context / Fabric Connection object
+    :param python_version: str python version to install, such as 3.8, 3.9, etc.
+    :return: None
+    """
+    configure_pyenv_in_instance(context)
     context.run("sudo dnf update -y", hide=True)
     context.run(
         (
@@ -2091,7 +2100,7 @@ def attach_elastic_ip(network_interface_id, region="us-east-1", is_ipv6=False):
     attached to a p4d instance. Having multiple network devices prevents automatic
     public ip address assignment, so we must do it manually.
     """
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = get_boto_client("ec2", region_name=region)
     arguments_dict = {
         "Domain": "vpc",
         "TagSpecifications": [
@@ -2140,7 +2149,7 @@ def create_name_tags_for_instance(instance_id, name_tag, region):
     :param name_tag: str Name tag to be applied
     :param region: str Region in which instance is running
     """
-    ec2_client = boto3.client("ec2", region_name=region)
+    ec2_client = get_boto_client("ec2", region_name=region)
     response = ec2_client.create_tags(
         Resources=[instance_id],
         Tags=[{"Key": "Name", "Value": name_tag}],
@@ -0,0 +1,206 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+from contextlib import contextmanager
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+
+# Launch parameters that are unique per launch and do not change what a test gets
+POOL_KEY_IGNORED_PARAMETERS = ("KeyName", "TagSpecifications", "MinCount", "MaxCount")
+
+LEASED = "leased"
+IDLE = "idle"
+
+
+def get_pool_key(region, ec2_create_instances_definition):
+    """
+    Key of the instances a test can share, derived from everything that defines them: instance
+    type, AMI, block devices (volume size), instance role, user data, accelerators and region.
+
+    :param region: str, region the instance is launched in
+    :param ec2_create_instances_definition: dict, ec2_resource.create_instances parameters
+    :return: str
+    """
+    definition = {
+        key: value
+        for key, value in ec2_create_instances_definition.items()
+        if key not in POOL_KEY_IGNORED_PARAMETERS
+    }
+    definition["Region"] = region
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Ec2InstancePool:
+    """
+    Pool of warm EC2 instances that tests lease instead of launching and terminating one each.
+
+    The pool state is a JSON file guarded by a file lock, so that all xdist workers of a session
+    running on the same host share the pool. Instances are matched by get_pool_key. Between two
+    leases an instance is cleaned (containers, images, test artifacts) and health checked, and
+    anything that fails either step is terminated instead of being reused.
+    """
+
+    def __init__(
+        self,
+        state_dir,
+        max_pool_size,
+        terminate_instance,
+        is_instance_healthy,
+        clean_instance,
+    ):
+        """
+        :param state_dir: str, directory shared by the xdist workers, e.g. from config.cache.mkdir
+        :param max_pool_size: int, maximum number of instances kept by the pool
+        :param terminate_instance: callable, pool entry -> None
+        :param is_instance_healthy: callable, pool entry -> bool
+        :param clean_instance: callable, pool entry -> None, raises if the instance is unusable
+        """
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_path = os.path.join(state_dir, "ec2_instance_pool.json")
+        self.lock_path = f"{self.state_path}.lock"
+        self.max_pool_size = max_pool_size
+        self.terminate_instance = terminate_instance
+        self.is_instance_healthy = is_instance_healthy
+        self.clean_instance = clean_instance
+
+    @contextmanager
+    def _locked_state(self):
+        """
+        Yields the list of pool entries, which is saved when the block exits
+        """
+        with open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.state_path, "r") as state_file:
+                    entries = json.load(state_file)
+            except (OSError, ValueError):
+                entries = []
+            yield entries
+            tmp_path = f"{self.state_path}.{os.getpid()}"
+            with open(tmp_path, "w") as state_file:
+                json.dump(entries, state_file, indent=4)
+            os.replace(tmp_path, self.state_path)
+
+    def _claim(self, pool_key):
+        """
+        Marks an idle instance with a matching key as leased, or reserves a slot for a new one.
+
+        :return: tuple(dict, list[dict]), the claimed entry (None if a new instance must be
+            launched) and the idle entries evicted to make room for it
+        """
+        with self._locked_state() as entries:
+            for entry in entries:
+                if entry["pool_key"] == pool_key and entry["state"] == IDLE:
+                    entry["state"] = LEASED
+                    entry["leased_by"] = os.getpid()
+                    return entry, []
+
+            evicted = []
+            while len(entries) >= self.max_pool_size:
+                idle_entries = [entry for entry in entries if entry["state"] == IDLE]
+                if not idle_entries:
+                    break
+                oldest = min(idle_entries, key=lambda entry: entry["released_at"])
+                entries.remove(oldest)
+                evicted.append(oldest)
+            return None, evicted
+
+    def _add(self, entry):
+        with self._locked_state() as entries:
+            if len(entries) < self.max_pool_size:
+                entries.append(entry)
+                return True
+        return False
+
+    def _remove(self, instance_id):
+        with self._locked_state() as entries:
+            entries[:] = [entry for entry in entries if entry["instance_id"] != instance_id]
+
+    def _terminate(self, entry):
+        try:
+            self.terminate_instance(entry)
+        except Exception as e:
+            LOGGER.warning(f"Failed to terminate pooled instance {entry['instance_id']}: {e}")
+
+    def lease(self, ec2_create_instances_definition, region, launch_instance):
+        """
+        Leases a healthy instance matching the definition, launching one if none is idle.
+
+        :param ec2_create_instances_definition: dict, ec2_resource.create_instances parameters
+        :param region: str
+        :param launch_instance: callable, launches a running instance from the definition and
+            returns tuple(instance_id, key_filename)
+        :return: dict, pool entry with instance_id, key_filename, region and pooled. Instances
+            that did not fit in the pool have pooled=False and are terminated on release.
+        """
+        pool_key = get_pool_key(region, ec2_create_instances_definition)
+        while True:
+            entry, evicted = self._claim(pool_key)
+            for evicted_entry in evicted:
+                LOGGER.info(f"Evicting idle pooled instance {evicted_entry['instance_id']}")
+                self._terminate(evicted_entry)
+            if entry is None:
+                break
+            if self.is_instance_healthy(entry):
+                LOGGER.info(f"Reusing pooled instance {entry['instance_id']}")
+                return entry
+            LOGGER.info(f"Pooled instance {entry['instance_id']} is unhealthy, terminating it")
+            self._remove(entry["instance_id"])
+            self._terminate(entry)
+
+        instance_id, key_filename = launch_instance()
+        entry = {
+            "instance_id": instance_id,
+            "key_filename": key_filename,
+            "region": region,
+            "pool_key": pool_key,
+            "state": LEASED,
+            "leased_by": os.getpid(),
+            "released_at": None,
+        }
+        entry["pooled"] = self._add(entry)
+        return entry
+
+    def release(self, entry):
+        """
+        Returns a leased instance to the pool, after cleaning it up for the next test.
+
+        :param entry: dict, pool entry returned by lease
+        """
+        if not entry.get("pooled", True):
+            self._terminate(entry)
+            return
+        try:
+            self.clean_instance(entry)
+        except Exception as e:
+            LOGGER.warning(f"Failed to clean pooled instance {entry['instance_id']}: {e}")
+            self._remove(entry["instance_id"])
+            self._terminate(entry)
+            return
+        with self._locked_state() as entries:
+            for pooled_entry in entries:
+                if pooled_entry["instance_id"] == entry["instance_id"]:
+                    pooled_entry["state"] = IDLE
+                    pooled_entry["leased_by"] = None
+                    pooled_entry["released_at"] = time.time()
+
+    def reap(self, include_leased=False):
+        """
+        Terminates the instances of the pool.
+
+        :param include_leased: bool, also terminate leased instances. Only safe once no test can
+            be running anymore, e.g. on the xdist controller at the end of the session.
+        """
+        with self._locked_state() as entries:
+            reaped = [entry for entry in entries if include_leased or entry["state"] == IDLE]
+            entries[:] = [entry for entry in entries if entry not in reaped]
+        for entry in reaped:
+            LOGGER.info(f"Reaping pooled instance {entry['instance_id']}")
+            self._terminate(entry)
@@ -4,7 +4,6 @@ import subprocess
 
 from base64 import b64decode
 
-import boto3
 import botocore
 
 from test.test_utils import (
@@ -15,6 +14,7 @@ from test.test_utils import (
     get_repository_local_path,
     LOGGER,
 )
+from boto_clients import get_boto_client
 from test.test_utils.security import CVESeverity
 
 
@@ -110,11 +110,28 @@ def get_ecr_image_enhanced_scan_status(ecr_client, image_uri):
     :param image_uri: image URI for image to be checked
     :return: tuple<str, str> Scan Status, Status Description
     """
+    scan_status, scan_status_description, _ = get_ecr_image_enhanced_scan_summary(
+        ecr_client, image_uri
+    )
+    return scan_status, scan_status_description
+
+
+def get_ecr_image_enhanced_scan_summary(ecr_client, image_uri):
+    """
+    Get status and finding counts of an ECR Enhanced image scan with a single API call.
+    :param ecr_client: boto3 client for ECR
+    :param image_uri: image URI for image to be checked
+    :return: tuple<str, str, dict> Scan Status, Status Description, Finding Severity Counts
+    """
     repository, tag = get_repository_and_tag_from_image_uri(image_uri)
     scan_info = ecr_client.describe_image_scan_findings(
         repositoryName=repository, imageId={"imageTag": tag}, maxResults=1
     )
-    return scan_info["imageScanStatus"]["status"], scan_info["imageScanStatus"]["description"]
+    return (
+        scan_info["imageScanStatus"]["status"],
+        scan_info["imageScanStatus"]["description"],
+        scan_info.get("imageScanFindings", {}).get("findingSeverityCounts", {}),
+    )
 
 
 def get_ecr_image_scan_severity_count(ecr_client, image_uri):
@@ -132,14 +149,17 @@ def get_ecr_image_scan_severity_count(ecr_client, image_uri):
     return severity_counts
 
 
-def get_all_ecr_image_scan_results(ecr_client, image_uri, scan_info_finding_key="enhancedFindings"):
+def iter_ecr_image_scan_findings_pages(
+    ecr_client, image_uri, scan_info_finding_key="enhancedFindings"
+):
     """
-    Get list of All vulnerabilities from ECR image scan results using pagination
+    Lazily page through the vulnerabilities of an ECR image scan, so that callers can consume each page as soon
+    as it is fetched instead of waiting for the whole result set
     :param ecr_client: boto3 ecr client
     :param image_uri: str, image uri
-    :return: list<dict> Scan results
+    :param scan_info_finding_key: str, "enhancedFindings" or "findings"
+    :return: generator<list<dict>> Scan results of each page
     """
-    scan_info_findings = []
     registry_id = get_account_id_from_image_uri(image_uri)
     repository, tag = get_repository_and_tag_from_image_uri(image_uri)
     paginator = ecr_client.get_paginator("describe_image_scan_findings")
@@ -152,8 +172,21 @@ def get_all_ecr_image_scan_results(ecr_client, image_uri, scan_info_finding_key=
         },
     )
     for page in response_iterator:
-        if scan_info_finding_key in page["imageScanFindings"]:
-            scan_info_findings += page["imageScanFindings"][scan_info_finding_key]
+        yield page["imageScanFindings"].get(scan_info_finding_key, [])
+
+
+def get_all_ecr_image_scan_results(ecr_client, image_uri, scan_info_finding_key="enhancedFindings"):
+    """
+    Get list of All vulnerabilities from ECR image scan results using pagination
+    :param ecr_client: boto3 ecr client
+    :param image_uri: str, image uri
+    :return: list<dict> Scan results
+    """
+    scan_info_findings = []
+    for page_findings in iter_ecr_image_scan_findings_pages(
+        ecr_client, image_uri, scan_info_finding_key=scan_info_finding_key
+    ):
+        scan_info_findings += page_findings
     LOGGER.info(
         f"[TotalVulnsFound] For image_uri: {image_uri} {len(scan_info_findings)} vulnerabilities found in total."
     )
@@ -247,8 +280,8 @@ def reupload_image_to_test_ecr(
     ECR_PASSWORD_FILE_PATH = os.path.join(
         "/tmp", f"{get_unique_name_from_tag(source_image_uri)}.txt"
     )
-    sts_client = boto3.client("sts", region_name=target_region)
-    target_ecr_client = boto3.client("ecr", region_name=target_region)
+    sts_client = get_boto_client("sts", region_name=target_region)
+    target_ecr_client = get_boto_client("ecr", region_name=target_region)
     target_account_id = sts_client.get_caller_identity().get("Account")
     image_account_id = get_account_id_from_image_uri(source_image_uri)
     image_region = get_region_from_image_uri(source_image_uri)
@@ -265,7 +298,7 @@ def reupload_image_to_test_ecr(
         .replace(image_account_id, target_account_id)
     )
 
-    client = boto3.client("ecr", region_name=image_region)
+    client = get_boto_client("ecr", region_name=image_region)
     username, password = get_ecr_login_boto3(client, image_account_id, image_region)
     save_credentials_to_file(ECR_PASSWORD_FILE_PATH, password)
 
@@ -0,0 +1,71 @@
+import logging
+import sys
+
+import pytest
+
+from test.test_utils.pytest_cache import DURATIONS_CACHE_KEY
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+
+
+def get_failed_first_sort_key(lastfailed, durations):
+    """
+    :param lastfailed: dict, nodeids of the tests that failed in the previous executions
+    :param durations: dict, nodeid -> duration in seconds in the previous executions
+    :return: function, nodeid -> sort key which orders previously failed tests first, and then the
+        other tests slowest first. Tests without a duration sort after the timed tests, and a
+        stable sort keeps their collection order.
+    """
+
+    def sort_key(nodeid):
+        return (nodeid not in lastfailed, nodeid not in durations, -durations.get(nodeid, 0))
+
+    return sort_key
+
+
+class FailedFirstOrdering:
+    """
+    pytest plugin which runs the previously failed tests first, and then the historically slow
+    tests, to shorten the time to the first failure of reruns and the tail of xdist executions.
+
+    The durations of the tests are recorded by the xdist controller, which receives the reports of
+    all workers, and stored in the pytest cache under DURATIONS_CACHE_KEY, where PytestCache syncs
+    them with s3. The order is deterministic, so all xdist workers collect the tests in the same
+    order.
+    """
+
+    def __init__(self, config):
+        """
+        :param config: pytest Config
+        """
+        self.config = config
+        self.durations = dict(config.cache.get(DURATIONS_CACHE_KEY, {}))
+        self._session_durations = {}
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, session, config, items):
+        lastfailed = config.cache.get("cache/lastfailed", {})
+        if not lastfailed and not self.durations:
+            return
+        sort_key = get_failed_first_sort_key(lastfailed, self.durations)
+        items.sort(key=lambda item: sort_key(item.nodeid))
+
+    def pytest_runtest_logreport(self, report):
+        # Reruns replace the durations of the previous attempts
+        if report.when == "setup":
+            self._session_durations[report.nodeid] = 0
+        self._session_durations[report.nodeid] = (
+            self._session_durations.get(report.nodeid, 0) + report.duration
+        )
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, "workerinput") or not self._session_durations:
+            return
+        durations = {
+            **self.durations,
+            **{nodeid: round(duration, 3) for nodeid, duration in self._session_durations.items()},
+        }
+        self.config.cache.set(DURATIONS_CACHE_KEY, durations)
+        LOGGER.info(f"Recorded the durations of {len(self._session_durations)} tests")
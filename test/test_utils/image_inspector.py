@@ -0,0 +1,205 @@
+import base64
+import dataclasses
+import logging
+import os
+import sys
+
+from invoke.context import Context
+
+from test.test_utils import (
+    get_container_name,
+    get_python_packages_with_version_from_pip_list,
+    run_cmd_on_container,
+    start_container,
+)
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+
+# Directories whose contents are listed in the snapshot, "~" being the home directory of root
+SNAPSHOT_DIRECTORIES = ("/tmp", "/var/tmp", "~", "/")
+SNAPSHOT_COMMANDS = {
+    # Python 2, and Python installed with Conda, print their version to stderr
+    "python_version": "python --version 2>&1",
+    "os_release": "cat /etc/os-release",
+    "pip_list": "pip list --format json 2>/dev/null",
+    "apt_list": "apt list --installed 2>/dev/null",
+    "env": "env",
+    **{f"ls {directory}": f"ls -A {directory}" for directory in SNAPSHOT_DIRECTORIES},
+}
+SNAPSHOT_SECTION_MARKER = "##### dlc-image-snapshot"
+
+
+@dataclasses.dataclass
+class ImageSnapshot:
+    """
+    State of a container of an image, as captured by ImageInspector.get_snapshot
+    """
+
+    python_version: str
+    os_release: str
+    # Package name, lower case with "-" instead of "_" -> version
+    python_packages: dict
+    # Package name -> version
+    apt_packages: dict
+    # Directory in SNAPSHOT_DIRECTORIES -> names of the files in it, including hidden ones
+    directories: dict
+    env: dict
+
+
+def parse_snapshot_output(output):
+    """
+    :param output: str, output of the snapshot script, with one section per SNAPSHOT_COMMANDS entry
+    :return: ImageSnapshot
+    """
+    sections = {}
+    section_lines = None
+    for line in output.splitlines():
+        if line.startswith(SNAPSHOT_SECTION_MARKER):
+            section_lines = sections.setdefault(line[len(SNAPSHOT_SECTION_MARKER) :].strip(), [])
+        elif section_lines is not None:
+            section_lines.append(line)
+    sections = {name: "\n".join(lines) for name, lines in sections.items()}
+
+    apt_packages = {}
+    for line in sections.get("apt_list", "").splitlines():
+        # e.g. "curl/jammy-updates,now 7.81.0-1ubuntu1.16 amd64 [installed]"
+        fields = line.split()
+        if "/" in line and len(fields) > 1:
+            apt_packages[fields[0].split("/")[0]] = fields[1]
+    env = dict(line.split("=", 1) for line in sections.get("env", "").splitlines() if "=" in line)
+    return ImageSnapshot(
+        python_version=sections.get("python_version", "").strip(),
+        os_release=sections.get("os_release", ""),
+        python_packages=get_python_packages_with_version_from_pip_list(
+            sections.get("pip_list") or "[]"
+        ),
+        apt_packages=apt_packages,
+        directories={
+            directory: sections.get(f"ls {directory}", "").split()
+            for directory in SNAPSHOT_DIRECTORIES
+        },
+        env=env,
+    )
+
+
+class ImageInspector:
+    """
+    Runs the commands of the sanity tests of an image in a single long running container, instead of
+    starting a container per test. The state most tests assert on (python version, OS release, pip
+    and apt packages, stray files, environment) is captured once by a single docker exec running a
+    batched script, see get_snapshot.
+
+    Tests must not change the container, as it is shared by every test of the image. Tests that
+    install packages or write files should start their own container.
+    """
+
+    def __init__(self, image_uri, context=None):
+        """
+        :param image_uri: str, ECR image URI
+        :param context: invoke Context, a new one by default
+        """
+        self.image_uri = image_uri
+        self.context = context or Context()
+        # Every xdist worker starts its own container
+        self.container_name = get_container_name(
+            f"image-inspector{os.getenv('PYTEST_XDIST_WORKER', '')}", image_uri
+        )
+        self._started = False
+        self._snapshot = None
+
+    def start(self):
+        """
+        Starts the container of the image, if it is not running yet, and captures its snapshot
+        before any test runs a command in it.
+
+        :return: str, name of the container
+        """
+        if self._started:
+            return self.container_name
+        # Remove the container left behind by an interrupted session, if any
+        self.context.run(f"docker rm -f {self.container_name}", hide=True, warn=True)
+        start_container(self.container_name, self.image_uri, self.context)
+        self._started = True
+        self._snapshot = self._take_snapshot()
+        return self.container_name
+
+    def run(self, cmd, executable="bash", warn=False, timeout=60):
+        """
+        Runs a command on the container of the image, see run_cmd_on_container.
+
+        :param cmd: str, command to run
+        :param executable: str, bash or python
+        :param warn: bool, whether to only warn as opposed to raise if the command fails
+        :param timeout: int, timeout in seconds
+        :return: invoke Result
+        """
+        self.start()
+        return run_cmd_on_container(
+            self.container_name,
+            self.context,
+            cmd,
+            executable=executable,
+            warn=warn,
+            timeout=timeout,
+        )
+
+    def _take_snapshot(self):
+        script = "\n".join(
+            f"echo '{SNAPSHOT_SECTION_MARKER} {name}'\n{command}"
+            for name, command in SNAPSHOT_COMMANDS.items()
+        )
+        # The script is passed encoded, as run_cmd_on_container quotes commands with '
+        encoded_script = base64.b64encode(script.encode("utf-8")).decode("utf-8")
+        output = run_cmd_on_container(
+            self.container_name,
+            self.context,
+            f"echo {encoded_script} | base64 -d | bash",
+            timeout=300,
+        )
+        return parse_snapshot_output(output.stdout)
+
+    def get_snapshot(self):
+        """
+        :return: ImageSnapshot, captured when the container started, so that it does not depend on
+            the commands run by the tests
+        """
+        self.start()
+        return self._snapshot
+
+    def close(self):
+        if self._started:
+            self.context.run(f"docker rm -f {self.container_name}", hide=True, warn=True)
+            self._started = False
+
+
+class ImageInspectors:
+    """
+    ImageInspector of every image used in a test session, created on first use
+    """
+
+    def __init__(self, context=None):
+        """
+        :param context: invoke Context shared by the inspectors, a new one by default
+        """
+        self.context = context or Context()
+        self._inspectors = {}
+
+    def get(self, image_uri):
+        """
+        :param image_uri: str, ECR image URI
+        :return: ImageInspector
+        """
+        if image_uri not in self._inspectors:
+            self._inspectors[image_uri] = ImageInspector(image_uri, context=self.context)
+        return self._inspectors[image_uri]
+
+    def close(self):
+        """
+        Removes the containers of all images
+        """
+        for inspector in self._inspectors.values():
+            LOGGER.info(f"Removing container {inspector.container_name}")
+            inspector.close()
+        self._inspectors = {}
@@ -1,7 +1,9 @@
 import re
-import boto3
 import json
 
+from boto_clients import get_boto_client
+from test.test_utils.metadata_cache import METADATA_CACHE
+
 
 def get_image_account_id(image_uri):
     """
@@ -42,12 +44,18 @@ def get_image_labels(image_uri, client=None):
     :param ecr_client: boto3 ECR Client object in the same region as the image URI
     :return: dict All Docker Image Labels applied on the image
     """
+    return METADATA_CACHE.get(
+        f"image_labels:{image_uri}", lambda: _fetch_image_labels(image_uri, client=client)
+    )
+
+
+def _fetch_image_labels(image_uri, client=None):
     account_id = get_image_account_id(image_uri)
     repo = get_image_repository_name(image_uri)
     tag = get_image_tag_name(image_uri)
     region = get_image_region(image_uri)
     if not client:
-        client = boto3.client("ecr", region_name=region)
+        client = get_boto_client("ecr", region_name=region)
 
     labels = get_image_labels_with_manifest(client, repo, tag, account_id=account_id)
     return labels
@@ -89,6 +97,15 @@ def get_image_manifest(repository, tag, client, **kwargs):
     :param ecr_client: <boto3.client> ECR client object to be used for query
     :return: ECR image manifest as dict, or requested format if mentioned in kwargs.
     """
+    cache_key = "image_manifest:" + json.dumps(
+        [client.meta.region_name, repository, tag, kwargs], sort_keys=True
+    )
+    return METADATA_CACHE.get(
+        cache_key, lambda: _fetch_image_manifest(repository, tag, client, **kwargs)
+    )
+
+
+def _fetch_image_manifest(repository, tag, client, **kwargs):
     response = client.batch_get_image(
         repositoryName=repository, imageIds=[{"imageTag": tag}], **kwargs
     )
@@ -103,6 +120,19 @@ def get_image_manifest(repository, tag, client, **kwargs):
     return response["images"][0]["imageManifest"]
 
 
+def prefetch_image_labels(image_uris):
+    """
+    Fetches the labels of all images concurrently, so that later label lookups hit the cache.
+    :param image_uris: list of ECR image URIs
+    """
+    METADATA_CACHE.prefetch(
+        {
+            f"image_labels:{image_uri}": lambda image_uri=image_uri: _fetch_image_labels(image_uri)
+            for image_uri in image_uris
+        }
+    )
+
+
 def are_fixture_labels_enabled(image_uri, labels):
     """
     Returns False if a fixture label in the given image has value other than true
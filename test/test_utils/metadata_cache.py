@@ -0,0 +1,125 @@
+import concurrent.futures
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.DEBUG)
+LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+
+DEFAULT_TTL_SECONDS = int(os.getenv("DLC_TEST_METADATA_CACHE_TTL_SECONDS", "1800"))
+
+
+class MetadataCache:
+    """
+    TTL bounded cache for remote metadata (remote override flags, image manifests and labels)
+    that does not change during a test session.
+
+    Values are memoized in memory, and once a cache directory is configured they are also stored
+    as JSON files in it, so that all xdist workers of a session share a single fetch per key.
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, cache_dir=None, ttl_seconds=DEFAULT_TTL_SECONDS):
+        """
+        :param cache_dir: str, directory for the file backed cache, None to only cache in memory
+        :param ttl_seconds: int, seconds after which a cached value is fetched again
+        """
+        self.cache_dir = None
+        self.ttl_seconds = ttl_seconds
+        self._memory = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            self.configure(cache_dir)
+
+    def configure(self, cache_dir):
+        """
+        :param cache_dir: str, directory for the file backed cache, e.g. from config.cache.mkdir
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = str(cache_dir)
+
+    def _is_fresh(self, timestamp):
+        return time.time() - timestamp < self.ttl_seconds
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _read_file(self, path):
+        try:
+            with open(path, "r") as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        return entry if self._is_fresh(entry["timestamp"]) else None
+
+    def _write_file(self, path, entry):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "w") as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(tmp_path, path)
+
+    def get(self, key, fetch):
+        """
+        Returns the cached value of a key, calling fetch to get it if it is missing or expired.
+        Exceptions raised by fetch are not cached.
+
+        :param key: str, unique key of the value, e.g. "image_labels:<image uri>"
+        :param fetch: callable, returns the value of the key
+        :return: value of the key
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry and self._is_fresh(entry["timestamp"]):
+            return entry["value"]
+
+        if not self.cache_dir:
+            entry = {"timestamp": time.time(), "value": fetch()}
+        else:
+            path = self._get_path(key)
+            entry = self._read_file(path)
+            if entry is None:
+                # Lock per key, so that concurrent xdist workers wait for one fetch
+                with open(f"{path}.lock", "w") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    entry = self._read_file(path)
+                    if entry is None:
+                        entry = {"timestamp": time.time(), "value": fetch()}
+                        self._write_file(path, entry)
+
+        with self._lock:
+            self._memory[key] = entry
+        return entry["value"]
+
+    def prefetch(self, fetches, max_workers=8):
+        """
+        Fills the cache for several keys concurrently. Failed fetches are logged and skipped, so
+        that they are retried (and raise) where the value is actually needed.
+
+        :param fetches: dict, key -> fetch callable
+        :param max_workers: int
+        """
+        if not fetches:
+            return
+
+        def _prefetch(item):
+            key, fetch = item
+            try:
+                self.get(key, fetch)
+            except Exception as e:
+                LOGGER.warning(f"Failed to prefetch {key}: {e}")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_prefetch, fetches.items()))
+
+    def clear(self):
+        with self._lock:
+            self._memory = {}
+
+
+METADATA_CACHE = MetadataCache()
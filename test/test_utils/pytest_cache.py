@@ -1,22 +1,151 @@
+import heapq
+import itertools
 import json
 import os
 import logging
+import shutil
 import sys
+import tempfile
+import time
+import uuid
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
 LOGGER.addHandler(logging.StreamHandler(sys.stdout))
 
+# Key of the test durations in the pytest cache, written by the failed first plugin, see
+# test_utils.failed_first
+DURATIONS_CACHE_KEY = "dlc/durations"
+# Directory of the lastfailed log segments, next to the lastfailed file of older executions
+LOG_DIRECTORY_NAME = "lastfailed.jsonl.d"
+# Identifier of the entries of the current run, shared by the processes of a CodeBuild build
+RUN_ID = os.getenv("CODEBUILD_BUILD_ID") or uuid.uuid4().hex
+
+
+def get_lastfailed_log_entries(
+    lastfailed,
+    durations,
+    base_lastfailed=None,
+    base_durations=None,
+    timestamp=None,
+    run_id=RUN_ID,
+):
+    """
+    Lastfailed log entries of the failed tests, and of the tests whose state changed since the
+    cache was downloaded. Failures are always written, as other executions of the same run may
+    write that the test passed, see merge_lastfailed_logs.
+
+    :param lastfailed: dict, nodeid -> True, lastfailed of the pytest cache after the execution
+    :param durations: dict, nodeid -> duration in seconds after the execution
+    :param base_lastfailed: dict, lastfailed of the pytest cache before the execution
+    :param base_durations: dict, durations before the execution
+    :param timestamp: float, time of the entries, now by default
+    :param run_id: str, identifier of the run of the execution
+    :return: list of dict, entries sorted by nodeid
+    """
+    base_lastfailed = base_lastfailed or {}
+    base_durations = base_durations or {}
+    timestamp = time.time() if timestamp is None else timestamp
+    entries = []
+    for nodeid in sorted(set(lastfailed) | set(base_lastfailed) | set(durations)):
+        failed = nodeid in lastfailed
+        duration = durations.get(nodeid)
+        duration_changed = duration is not None and duration != base_durations.get(nodeid)
+        if not failed and nodeid not in base_lastfailed and not duration_changed:
+            continue
+        entry = {"nodeid": nodeid, "failed": failed, "timestamp": timestamp, "run_id": run_id}
+        if duration_changed:
+            entry["duration"] = duration
+        entries.append(entry)
+    return entries
+
+
+def write_lastfailed_log(entries, log_file):
+    """
+    :param entries: iterable of dict, lastfailed log entries sorted by nodeid
+    :param log_file: str, path of the JSONL file
+    """
+    with open(log_file, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+
+def read_lastfailed_log(log_file):
+    """
+    :param log_file: str, path of a JSONL file written by write_lastfailed_log
+    :return: generator of dict, lastfailed log entries in the order of the file
+    """
+    with open(log_file) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Partially written segment
+                LOGGER.info(f"Skipping invalid line of {log_file}: {line!r}")
+                continue
+            if isinstance(entry, dict) and "nodeid" in entry:
+                yield entry
+
+
+def merge_lastfailed_logs(logs):
+    """
+    Merges lastfailed logs with a streaming k-way merge on nodeid, so that only one entry per log
+    is held in memory besides the result. For every test, the latest run decides whether it
+    failed: the test failed if any execution of that run failed it, as parallel executions of a
+    run, e.g. one per image, share the cache. The latest entry with a duration decides its
+    duration.
+
+    :param logs: list of iterables of dict, lastfailed log entries sorted by nodeid
+    :return: tuple of dict, (nodeid -> True for failed tests, nodeid -> duration in seconds)
+    """
+    lastfailed = {}
+    durations = {}
+    merged_entries = heapq.merge(*logs, key=lambda entry: entry["nodeid"])
+    for nodeid, entries in itertools.groupby(merged_entries, key=lambda entry: entry["nodeid"]):
+        entries = sorted(entries, key=lambda entry: entry.get("timestamp", 0))
+        latest_run_id = entries[-1].get("run_id")
+        if latest_run_id is None:
+            latest_run_entries = entries[-1:]
+        else:
+            latest_run_entries = [
+                entry for entry in entries if entry.get("run_id") == latest_run_id
+            ]
+        if any(entry.get("failed") for entry in latest_run_entries):
+            lastfailed[nodeid] = True
+        timed_entries = [entry for entry in entries if entry.get("duration") is not None]
+        if timed_entries:
+            durations[nodeid] = timed_entries[-1]["duration"]
+    return lastfailed, durations
+
+
+def convert_lastfailed_to_log(lastfailed, timestamp=0):
+    """
+    :param lastfailed: dict, lastfailed of a pytest cache
+    :param timestamp: float, time of the entries, older than any log entry by default
+    :return: list of dict, lastfailed log entries sorted by nodeid
+    """
+    return [
+        {"nodeid": nodeid, "failed": True, "timestamp": timestamp} for nodeid in sorted(lastfailed)
+    ]
+
 
 class PytestCache:
     """
     A handler for pytest cache
     Contains methods for uploading/downloading pytest cache file to/from ec2 instances and s3 buckets
+
+    In s3, the cache of an execution is stored as an append only log of JSONL segments, one per
+    upload, which hold the entries of the failed tests and of the tests whose state changed during
+    the execution.
+    Parallel executions upload their own segments instead of overwriting each other's cache, and
+    downloads merge the segments, see merge_lastfailed_logs.
     """
 
     def __init__(self, s3_client, account_id):
         self.s3_client = s3_client
         self.bucket_name = f"dlc-test-execution-results-{account_id}"
+        # Cache directory -> (lastfailed, durations) as downloaded, to upload only the changes
+        self._base_caches = {}
 
     def download_pytest_cache_from_s3_to_local(
         self,
@@ -43,21 +172,16 @@ class PytestCache:
         :param test_type
         :param custom_cache_directory - the prefix used to create custom pytest cache directories.
         """
-
         if custom_cache_directory:
             current_dir = os.path.join(current_dir, custom_cache_directory)
-        local_file_dir = os.path.join(current_dir, ".pytest_cache", "v", "cache")
-        local_file_path = os.path.join(local_file_dir, "lastfailed")
+        cache_dir = os.path.join(current_dir, ".pytest_cache")
         s3_file_dir = self.__make_s3_path(
             codebuild_project_name, commit_id, framework, version, build_context, test_type
         )
-        s3_file_path = os.path.join(s3_file_dir, "lastfailed")
 
-        if os.path.exists(local_file_path):
-            os.remove(local_file_path)
-        else:
-            os.makedirs(local_file_dir, exist_ok=True)
-        self.__download_cache_from_s3(s3_file_path, local_file_path)
+        lastfailed, durations = self.__download_cache_from_s3(s3_file_dir)
+        self.__write_cache_files(cache_dir, lastfailed, durations)
+        self._base_caches[cache_dir] = (lastfailed, durations)
 
     def download_pytest_cache_from_s3_to_ec2(
         self,
@@ -83,16 +207,26 @@ class PytestCache:
         :param build_context
         :param test_type
         """
-        local_file_dir = os.path.join(path, ".pytest_cache", "v", "cache")
-        local_file_path = os.path.join(local_file_dir, "lastfailed")
+        ec2_cache_dir = os.path.join(path, ".pytest_cache")
         s3_file_dir = self.__make_s3_path(
             codebuild_project_name, commit_id, framework, version, build_context, test_type
         )
-        s3_file_path = os.path.join(s3_file_dir, "lastfailed")
-        self.__delete_file_on_ec2(ec2_connection, local_file_path)
+        for ec2_file_path in self.__get_cache_file_paths(ec2_cache_dir):
+            self.__delete_file_on_ec2(ec2_connection, ec2_file_path)
 
-        self.__download_cache_from_s3(s3_file_path, "lastfailed")
-        self.__upload_cache_to_ec2(ec2_connection, "lastfailed", local_file_dir)
+        lastfailed, durations = self.__download_cache_from_s3(s3_file_dir)
+        local_cache_dir = tempfile.mkdtemp()
+        try:
+            self.__write_cache_files(local_cache_dir, lastfailed, durations)
+            for local_file_path, ec2_file_path in zip(
+                self.__get_cache_file_paths(local_cache_dir),
+                self.__get_cache_file_paths(ec2_cache_dir),
+            ):
+                if os.path.exists(local_file_path):
+                    self.__upload_cache_to_ec2(ec2_connection, local_file_path, ec2_file_path)
+        finally:
+            shutil.rmtree(local_cache_dir, ignore_errors=True)
+        self._base_caches[f"{ec2_connection.host}:{ec2_cache_dir}"] = (lastfailed, durations)
 
     def upload_pytest_cache_from_ec2_to_s3(
         self,
@@ -119,20 +253,29 @@ class PytestCache:
         :param test_type
 
         """
-        ec2_dir = os.path.join(path, ".pytest_cache", "v", "cache")
-        ec2_file_path = os.path.join(ec2_dir, "lastfailed")
+        ec2_cache_dir = os.path.join(path, ".pytest_cache")
         s3_file_dir = self.__make_s3_path(
             codebuild_project_name, commit_id, framework, version, build_context, test_type
         )
-        s3_file_path = os.path.join(s3_file_dir, "lastfailed")
 
-        # Since we run tests in parallel files from latests executions will overwrite existing file.
-        # So put the latest file into tmp, add it to local lastfailed and upload to s3.
-        # At the end of current execution there will be full file in s3
-        tmp_file_name = "tmp"
-        self.__download_cache_from_ec2(ec2_connection, ec2_file_path, tmp_file_name)
-        self.__merge_2_execution_caches_and_save(tmp_file_name, "lastfailed", "lastfailed")
-        self.__upload_cache_to_s3("lastfailed", s3_file_path)
+        local_cache_dir = tempfile.mkdtemp()
+        try:
+            for ec2_file_path, local_file_path in zip(
+                self.__get_cache_file_paths(ec2_cache_dir),
+                self.__get_cache_file_paths(local_cache_dir),
+            ):
+                os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+                self.__download_cache_from_ec2(ec2_connection, ec2_file_path, local_file_path)
+            lastfailed, durations = self.__read_cache_files(local_cache_dir)
+        finally:
+            shutil.rmtree(local_cache_dir, ignore_errors=True)
+        base_lastfailed, base_durations = self._base_caches.pop(
+            f"{ec2_connection.host}:{ec2_cache_dir}", ({}, {})
+        )
+        self.__upload_log_to_s3(
+            get_lastfailed_log_entries(lastfailed, durations, base_lastfailed, base_durations),
+            s3_file_dir,
+        )
 
     def upload_pytest_cache_from_local_to_s3(
         self,
@@ -143,6 +286,7 @@ class PytestCache:
         version,
         build_context,
         test_type,
+        custom_cache_directory="",
     ):
         """
         Copy pytest cache file from local box to directory in s3. .pytest_cache directory will be copied from
@@ -156,56 +300,21 @@ class PytestCache:
         :param version
         :param build_context
         :param test_type
+        :param custom_cache_directory - the prefix used to create custom pytest cache directories.
 
         """
-        local_file_dir = os.path.join(current_dir, ".pytest_cache", "v", "cache")
-        local_file_path = os.path.join(local_file_dir, "lastfailed")
+        if custom_cache_directory:
+            current_dir = os.path.join(current_dir, custom_cache_directory)
+        cache_dir = os.path.join(current_dir, ".pytest_cache")
         s3_file_dir = self.__make_s3_path(
             codebuild_project_name, commit_id, framework, version, build_context, test_type
         )
-        s3_file_path = os.path.join(s3_file_dir, "lastfailed")
-        self.__upload_cache_to_s3(local_file_path, s3_file_path)
-
-    def convert_cache_json_and_upload_to_s3(
-        self,
-        cache_json,
-        codebuild_project_name,
-        commit_id,
-        framework,
-        version,
-        build_context,
-        test_type,
-    ):
-        """
-        Copy pytest cache from json and send to directory in s3.
-        :param cache_json - json object with pytest cache
-                Following parameters are required to create a path to cache file in s3:
-        :param codebuild_project_name
-        :param commit_id
-        :param framework
-        :param version
-        :param build_context
-        :param test_type
-
-        """
-        if not cache_json:
-            LOGGER.info("No cache was generated. Skip uploading.")
-            return
-        s3_file_dir = self.__make_s3_path(
-            codebuild_project_name, commit_id, framework, version, build_context, test_type
+        lastfailed, durations = self.__read_cache_files(cache_dir)
+        base_lastfailed, base_durations = self._base_caches.pop(cache_dir, ({}, {}))
+        self.__upload_log_to_s3(
+            get_lastfailed_log_entries(lastfailed, durations, base_lastfailed, base_durations),
+            s3_file_dir,
         )
-        s3_file_path = os.path.join(s3_file_dir, "lastfailed")
-        tmp_file_for_cache_json = "tmp_file_for_cache_json"
-        with open(tmp_file_for_cache_json, "w") as f:
-            json.dump(dict(cache_json), f)
-        self.__upload_cache_to_s3(tmp_file_for_cache_json, s3_file_path)
-
-    def convert_pytest_cache_file_to_json(self, current_dir, custom_cache_directory=""):
-        if custom_cache_directory:
-            current_dir = os.path.join(current_dir, custom_cache_directory)
-        local_file_dir = os.path.join(current_dir, ".pytest_cache", "v", "cache")
-        local_file_path = os.path.join(local_file_dir, "lastfailed")
-        return self.get_json_from_file(local_file_path)
 
     def __make_s3_path(
         self, codebuild_project_name, commit_id, framework, version, build_context, test_type
@@ -214,6 +323,52 @@ class PytestCache:
             codebuild_project_name, commit_id, framework, version, build_context, test_type
         )
 
+    def __get_cache_file_paths(self, cache_dir):
+        """
+        :param cache_dir: str, pytest cache directory
+        :return: tuple of str, paths of the lastfailed and durations files
+        """
+        return (
+            os.path.join(cache_dir, "v", "cache", "lastfailed"),
+            os.path.join(cache_dir, "v", *DURATIONS_CACHE_KEY.split("/")),
+        )
+
+    def __write_cache_files(self, cache_dir, lastfailed, durations):
+        for file_path, cache_json in zip(
+            self.__get_cache_file_paths(cache_dir), (lastfailed, durations)
+        ):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            else:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            if cache_json:
+                with open(file_path, "w") as f:
+                    json.dump(cache_json, f)
+
+    def __read_cache_files(self, cache_dir):
+        lastfailed_path, durations_path = self.__get_cache_file_paths(cache_dir)
+        return self.get_json_from_file(lastfailed_path), self.get_json_from_file(durations_path)
+
+    def __upload_log_to_s3(self, entries, s3_file_dir):
+        """
+        Uploads the entries as a new segment of the lastfailed log
+
+        :param entries: list of dict, lastfailed log entries sorted by nodeid
+        :param s3_file_dir: str, s3 directory of the cache
+        """
+        if not entries:
+            LOGGER.info("No cache changes in current execution. Skip uploading.")
+            return
+        segment_name = f"{int(time.time() * 1000)}-{uuid.uuid4().hex}.jsonl"
+        s3_file_path = os.path.join(s3_file_dir, LOG_DIRECTORY_NAME, segment_name)
+        local_cache_dir = tempfile.mkdtemp()
+        try:
+            local_file_path = os.path.join(local_cache_dir, segment_name)
+            write_lastfailed_log(entries, local_file_path)
+            self.__upload_cache_to_s3(local_file_path, s3_file_path)
+        finally:
+            shutil.rmtree(local_cache_dir, ignore_errors=True)
+
     def __upload_cache_to_s3(self, local_file, s3_file):
         if os.path.exists(f"{local_file}"):
             LOGGER.info(f"Uploading current execution result to {s3_file}")
@@ -225,34 +380,60 @@ class PytestCache:
         else:
             LOGGER.info(f"No cache file was created")
 
-    def __merge_2_execution_caches_and_save(self, cache_file_1, cache_file_2, save_to):
-        """
-        Merges 2 JSON objects into one and safe on disk
+    def __is_file_exist_and_not_empty(self, file_path):
+        return os.path.exists(file_path) and os.stat(file_path).st_size != 0
 
-        :param cache_file_1
-        :param cache_file_2
-        :param save_to: filename where to save result JSON
+    def __download_cache_from_s3(self, s3_file_dir):
         """
-        json1 = self.get_json_from_file(cache_file_1)
-        json2 = self.get_json_from_file(cache_file_2)
+        Downloads the lastfailed file of older executions and the segments of the lastfailed log,
+        and merges them.
 
-        merged_json = {**json1, **json2}
-        if len(merged_json) != 0:
-            with open(save_to, "w") as f:
-                f.write(json.dumps(merged_json))
+        :param s3_file_dir: str, s3 directory of the cache
+        :return: tuple of dict, (lastfailed, durations), see merge_lastfailed_logs
+        """
+        LOGGER.info(f"Downloading previous executions cache: {s3_file_dir}")
+        local_cache_dir = tempfile.mkdtemp()
+        try:
+            legacy_file_path = os.path.join(local_cache_dir, "lastfailed")
+            self.__download_file_from_s3(os.path.join(s3_file_dir, "lastfailed"), legacy_file_path)
+            logs = [convert_lastfailed_to_log(self.get_json_from_file(legacy_file_path))]
+            for index, s3_file in enumerate(self.__list_log_segments(s3_file_dir)):
+                local_file_path = os.path.join(local_cache_dir, f"{index}.jsonl")
+                if self.__download_file_from_s3(s3_file, local_file_path):
+                    logs.append(read_lastfailed_log(local_file_path))
+            lastfailed, durations = merge_lastfailed_logs(logs)
+        finally:
+            shutil.rmtree(local_cache_dir, ignore_errors=True)
+        LOGGER.info(
+            f"Merged {len(logs) - 1} cache log segments: "
+            f"{len(lastfailed)} failed tests, {len(durations)} test durations"
+        )
+        return lastfailed, durations
 
-    def __is_file_exist_and_not_empty(self, file_path):
-        return os.path.exists(file_path) and os.stat(file_path).st_size != 0
+    def __list_log_segments(self, s3_file_dir):
+        prefix = os.path.join(s3_file_dir, LOG_DIRECTORY_NAME, "")
+        try:
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            return [
+                s3_object["Key"]
+                for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+                for s3_object in page.get("Contents", [])
+            ]
+        except Exception as e:
+            LOGGER.info(f"Cache log segments weren't listed: {e}")
+            return []
 
-    def __download_cache_from_s3(self, s3_file, local_file):
-        LOGGER.info(f"Downloading previous executions cache: {s3_file}")
+    def __download_file_from_s3(self, s3_file, local_file):
         try:
             self.s3_client.download_file(self.bucket_name, f"{s3_file}", f"{local_file}")
+            return True
         except Exception as e:
-            LOGGER.info(f"Cache file wasn't downloaded: {e}")
+            LOGGER.info(f"Cache file {s3_file} wasn't downloaded: {e}")
+            return False
 
     def __upload_cache_to_ec2(self, ec2_connection, local_file, ec2_file):
         try:
+            ec2_connection.run(f"mkdir -p {os.path.dirname(ec2_file)}")
             ec2_connection.put(local_file, f"{ec2_file}")
         except Exception as e:
             LOGGER.info(f"Cache file wasn't uploaded: {e}")
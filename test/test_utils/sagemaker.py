@@ -36,6 +36,7 @@ from test_utils import (
     login_to_ecr_registry,
 )
 from test_utils.pytest_cache import PytestCache
+from test_utils.sagemaker_local_env import SageMakerLocalEnvironment
 
 
 class DLCSageMakerRemoteTestFailure(Exception):
@@ -288,6 +289,34 @@ def generate_sagemaker_pytest_cmd(image, sagemaker_test_type):
     )
 
 
+def get_sagemaker_local_test_requirements_path(image):
+    """
+    :param image: ECR url
+    :return: str, path of the requirements file of the local tests of the image
+    """
+    _, path, _, _ = generate_sagemaker_pytest_cmd(image, SAGEMAKER_LOCAL_TEST_TYPE)
+    return os.path.join(path, "requirements.txt")
+
+
+def get_sagemaker_local_test_image_groups(images, region):
+    """
+    Groups the images whose local tests run on the same instance type and AMI, and install the same
+    requirements file, so that they can share an instance and its python environment
+    :param images: list of ECR urls
+    :param region: str
+    :return: list of lists of ECR urls, in the order of images
+    """
+    groups = {}
+    for image in images:
+        key = (
+            assign_sagemaker_local_job_instance_type(image),
+            assign_sagemaker_local_test_ami(image, region),
+            get_sagemaker_local_test_requirements_path(image),
+        )
+        groups.setdefault(key, []).append(image)
+    return list(groups.values())
+
+
 def execute_local_tests(image, pytest_cache_params):
     """
     Run the sagemaker local tests in ec2 instance for the image
@@ -295,56 +324,123 @@ def execute_local_tests(image, pytest_cache_params):
     :param pytest_cache_params: parameters required for :param pytest_cache_util
     :return: True if test execution was successful, else False
     """
-    test_success = False
+    return execute_local_tests_on_instance([image], pytest_cache_params)[0]
+
+
+def execute_local_tests_on_instance(images, pytest_cache_params):
+    """
+    Run the sagemaker local tests of images that share an instance type, AMI and requirements file,
+    one image after the other, on a single ec2 instance. All images are pulled in the background
+    while the test environment is set up on the instance.
+    :param images: list of ECR urls, see get_sagemaker_local_test_image_groups
+    :param pytest_cache_params: parameters required for :param pytest_cache_util
+    :return: list of bool, True for each image whose test execution was successful
+    """
+    test_results = {image: False for image in images}
     account_id = os.getenv("ACCOUNT_ID", boto3.client("sts").get_caller_identity()["Account"])
     pytest_cache_util = PytestCache(boto3.client("s3"), account_id)
     ec2_client = boto3.client(
         "ec2", config=Config(retries={"max_attempts": 10}), region_name=DEFAULT_REGION
     )
-    pytest_command, path, tag, job_type = generate_sagemaker_pytest_cmd(
-        image, SAGEMAKER_LOCAL_TEST_TYPE
-    )
-    pytest_command += " --last-failed --last-failed-no-failures all "
-    print(pytest_command)
-    framework, _ = get_framework_and_version_from_tag(image)
-    framework = framework.replace("_trcomp", "")
+    _, _, tag, job_type = generate_sagemaker_pytest_cmd(images[0], SAGEMAKER_LOCAL_TEST_TYPE)
     random.seed(f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}")
     ec2_key_name = f"{job_type}_{tag}_sagemaker_{random.randint(1, 1000)}"
     region = os.getenv("AWS_REGION", DEFAULT_REGION)
     sm_tests_tar_name = "sagemaker_tests.tar.gz"
-    ec2_test_report_path = os.path.join(AL2023_HOME_DIR, "test", f"{job_type}_{tag}_sm_local.xml")
 
     instance_id = ""
     ec2_conn = None
     try:
         key_file = generate_ssh_keypair(ec2_client, ec2_key_name)
-        print(f"Launching new Instance for image: {image}")
+        print(f"Launching new Instance for images: {images}")
         instance_id, ip_address = launch_sagemaker_local_ec2_instance(
-            image,
+            images[0],
             ec2_key_name,
             region,
         )
         ec2_conn = ec2_utils.get_ec2_fabric_connection(instance_id, key_file, region)
-        ec2_conn.put(sm_tests_tar_name, f"{AL2023_HOME_DIR}")
-        ec2_utils.install_python_in_instance(ec2_conn, python_version="3.9")
         login_to_ecr_registry(ec2_conn, account_id, region)
-        try:
-            ec2_conn.run(f"docker pull {image}", timeout=600)
-        except invoke.exceptions.CommandTimedOut as e:
-            output = ec2_conn.run(
-                f"docker images {image} --format '{{.Repository}}:{{.Tag}}'"
-            ).stdout.strip("\n")
-            if output != image:
-                raise DLCSageMakerLocalTestFailure(
-                    f"Image pull for {image} failed.\ndocker images output = {output}"
-                ) from e
+        image_pulls = {
+            image: ec2_conn.run(f"docker pull {image}", hide=True, timeout=600, asynchronous=True)
+            for image in images
+        }
+        ec2_conn.put(sm_tests_tar_name, f"{AL2023_HOME_DIR}")
         ec2_conn.run(f"tar -xzf {sm_tests_tar_name}")
-        ec2_conn.run(
-            "sudo curl -L https://github.com/docker/compose/releases/latest/download/docker-compose-$(uname -s)-$(uname -m) -o /usr/local/bin/docker-compose"
+        # All images of a group install the same requirements, see get_sagemaker_local_test_image_groups
+        SageMakerLocalEnvironment().prepare(
+            ec2_conn,
+            assign_sagemaker_local_test_ami(images[0], region),
+            get_sagemaker_local_test_requirements_path(images[0]),
         )
-        ec2_conn.run("sudo chmod +x /usr/local/bin/docker-compose")
+        for image in images:
+            try:
+                _wait_for_image_pull(ec2_conn, image, image_pulls[image])
+                ec2_conn = _run_local_tests_of_image(
+                    ec2_conn,
+                    instance_id,
+                    key_file,
+                    region,
+                    image,
+                    pytest_cache_util,
+                    pytest_cache_params,
+                )
+                test_results[image] = True
+            except Exception as e:
+                print(f"{type(e)} thrown for image {image}: {str(e)}")
+            finally:
+                # Make room for the tests of the next image
+                ec2_conn.run("docker rm -f $(docker ps -aq)", hide=True, warn=True)
+                ec2_conn.run(f"docker rmi -f {image}", hide=True, warn=True)
+    except Exception as e:
+        print(f"{type(e)} thrown : {str(e)}")
+    finally:
+        if instance_id:
+            print(f"Terminating Instances for images: {images}")
+            ec2_utils.terminate_instance(instance_id, region)
+
+        if ec2_client and ec2_key_name:
+            print(f"Destroying ssh Key_pair for images: {images}")
+            destroy_ssh_keypair(ec2_client, ec2_key_name)
+
+    return [test_results[image] for image in images]
+
+
+def _wait_for_image_pull(ec2_conn, image, image_pull):
+    """
+    :param ec2_conn: fabric Connection to the instance
+    :param image: ECR url
+    :param image_pull: invoke Promise of the docker pull of the image
+    """
+    try:
+        image_pull.join()
+    except (invoke.exceptions.CommandTimedOut, invoke.exceptions.UnexpectedExit) as e:
+        output = ec2_conn.run(
+            f"docker images {image} --format '{{.Repository}}:{{.Tag}}'"
+        ).stdout.strip("\n")
+        if output != image:
+            raise DLCSageMakerLocalTestFailure(
+                f"Image pull for {image} failed.\ndocker images output = {output}"
+            ) from e
+
+
+def _run_local_tests_of_image(
+    ec2_conn, instance_id, key_file, region, image, pytest_cache_util, pytest_cache_params
+):
+    """
+    Run the sagemaker local tests of an image on an instance set up by execute_local_tests_on_instance
+    :return: fabric Connection to the instance, which is replaced when the tests break the connection
+    """
+    pytest_command, path, tag, job_type = generate_sagemaker_pytest_cmd(
+        image, SAGEMAKER_LOCAL_TEST_TYPE
+    )
+    pytest_command += " --last-failed --last-failed-no-failures all "
+    print(pytest_command)
+    framework, _ = get_framework_and_version_from_tag(image)
+    framework = framework.replace("_trcomp", "")
+    ec2_test_report_path = os.path.join(AL2023_HOME_DIR, "test", f"{job_type}_{tag}_sm_local.xml")
+
+    try:
         with ec2_conn.cd(path):
-            ec2_conn.run(f"pip install -r requirements.txt")
             pytest_cache_util.download_pytest_cache_from_s3_to_ec2(
                 ec2_conn, path, **pytest_cache_params
             )
@@ -358,10 +454,8 @@ def execute_local_tests(image, pytest_cache_params):
                 finally:
                     print(f"Downloading Test reports for image: {image}")
                     ec2_conn.close()
-                    ec2_conn_new = ec2_utils.get_ec2_fabric_connection(
-                        instance_id, key_file, region
-                    )
-                    ec2_conn_new.get(
+                    ec2_conn = ec2_utils.get_ec2_fabric_connection(instance_id, key_file, region)
+                    ec2_conn.get(
                         ec2_test_report_path, os.path.join("test", f"{job_type}_{tag}_sm_local.xml")
                     )
                     output = subprocess.check_output(
@@ -369,9 +463,6 @@ def execute_local_tests(image, pytest_cache_params):
                         shell=True,
                         executable="/bin/bash",
                     )
-                    pytest_cache_util.upload_pytest_cache_from_ec2_to_s3(
-                        ec2_conn_new, path, **pytest_cache_params
-                    )
                     if 'failures="0"' not in str(output):
                         if is_nightly_context():
                             print(f"\nSuppressed Failed Nightly Sagemaker Local Tests")
@@ -393,34 +484,21 @@ def execute_local_tests(image, pytest_cache_params):
                             f"{pytest_command} failed with error code: {res.return_code}\n"
                             f"Traceback:\n{res.stdout}"
                         )
-        test_success = True
-    except Exception as e:
-        print(f"{type(e)} thrown : {str(e)}")
     finally:
-        if ec2_conn:
-            with ec2_conn.cd(path):
-                pytest_cache_util.upload_pytest_cache_from_ec2_to_s3(
-                    ec2_conn, path, **pytest_cache_params
-                )
-        if instance_id:
-            print(f"Terminating Instances for image: {image}")
-            ec2_utils.terminate_instance(instance_id, region)
-
-        if ec2_client and ec2_key_name:
-            print(f"Destroying ssh Key_pair for image: {image}")
-            destroy_ssh_keypair(ec2_client, ec2_key_name)
-
-    return test_success
+        with ec2_conn.cd(path):
+            pytest_cache_util.upload_pytest_cache_from_ec2_to_s3(
+                ec2_conn, path, **pytest_cache_params
+            )
+    return ec2_conn
 
 
-def execute_sagemaker_remote_tests(process_index, image, global_pytest_cache, pytest_cache_params):
+def execute_sagemaker_remote_tests(process_index, image, pytest_cache_params):
     """
     Run pytest in a virtual env for a particular image. Creates a custom directory for each thread for pytest cache file.
-    Stores pytest cache in a shared dict.
+    Uploads the changes of the pytest cache to s3, where they are merged with the ones of the other processes.
     Expected to run via multiprocessing
     :param process_index - id for process. Used to create a custom cache dir
     :param image - ECR url
-    :param global_pytest_cache - shared Manager().dict() for cache merging
     :param pytest_cache_params - parameters required for s3 file path building
     """
     account_id = os.getenv("ACCOUNT_ID", boto3.client("sts").get_caller_identity()["Account"])
@@ -440,10 +518,9 @@ def execute_sagemaker_remote_tests(process_index, image, global_pytest_cache, py
             pytest_command += f" -o cache_dir={os.path.join(str(process_index), '.pytest_cache')}"
             res = context.run(pytest_command, warn=True)
             metrics_utils.send_test_result_metrics(res.return_code)
-            cache_json = pytest_cache_util.convert_pytest_cache_file_to_json(
-                path, custom_cache_directory=str(process_index)
+            pytest_cache_util.upload_pytest_cache_from_local_to_s3(
+                path, **pytest_cache_params, custom_cache_directory=str(process_index)
             )
-            global_pytest_cache.update(cache_json)
             if res.failed:
                 if is_nightly_context():
                     print(f"Suppressed Failed Nightly Sagemaker Tests")
@@ -0,0 +1,134 @@
+import fcntl
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+
+from contextlib import contextmanager
+
+from invoke import run
+
+from test_utils import ec2 as ec2_utils
+from test_utils import AL2023_HOME_DIR
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+
+DOCKER_COMPOSE_URL = (
+    "https://github.com/docker/compose/releases/latest/download/docker-compose-Linux-{arch}"
+)
+# Directory of the test runner where the environment artifacts are cached, shared by the processes
+# that run the local tests of different instances
+DEFAULT_CACHE_DIR = os.getenv(
+    "DLC_SM_LOCAL_ENV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dlc-sm-local-env")
+)
+
+
+class SageMakerLocalEnvironment:
+    """
+    Sets up the environment of the SageMaker local tests on EC2 instances: a pyenv python with the
+    requirements of the tests installed, and docker-compose.
+
+    The environment is only built from scratch on the first instance of an AMI and requirements
+    file. It is then stored as a tarball of ~/.pyenv in the cache directory of the test runner, and
+    pushed over the fabric connection to the next instances of the AMI and requirements file,
+    which skip the python build and pip installs.
+    docker-compose is downloaded once per architecture, instead of from every instance.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, python_version="3.9"):
+        """
+        :param cache_dir: str, directory of the test runner the artifacts are cached in
+        :param python_version: str, python version the tests run with
+        """
+        self.cache_dir = cache_dir
+        self.python_version = python_version
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @contextmanager
+    def _lock(self, name):
+        # Processes building the same artifact wait for the first one, and then reuse it
+        with open(os.path.join(self.cache_dir, f"{name}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_python_environment_key(self, ami_id, requirements_path):
+        """
+        :param ami_id: str, AMI of the instance
+        :param requirements_path: str, local path of the requirements file of the tests
+        :return: str, key of the python environment tarball, which changes with the path and the
+            content of the requirements file
+        """
+        key = hashlib.sha256(f"{ami_id} {self.python_version} {requirements_path}".encode("utf-8"))
+        with open(requirements_path, "rb") as requirements_file:
+            key.update(requirements_file.read())
+        return key.hexdigest()[:16]
+
+    def get_docker_compose_binary(self, arch):
+        """
+        :param arch: str, output of uname -m on the instance, e.g. x86_64 or aarch64
+        :return: str, local path of the docker-compose binary of the architecture
+        """
+        binary_path = os.path.join(self.cache_dir, f"docker-compose-{arch}")
+        with self._lock(f"docker-compose-{arch}"):
+            if not os.path.exists(binary_path):
+                run(
+                    f"curl -sfL {DOCKER_COMPOSE_URL.format(arch=arch)} -o {binary_path}.tmp",
+                    hide=True,
+                )
+                os.rename(f"{binary_path}.tmp", binary_path)
+        return binary_path
+
+    def install_docker_compose(self, ec2_conn):
+        """
+        :param ec2_conn: fabric Connection to the instance
+        """
+        arch = ec2_conn.run("uname -m", hide=True).stdout.strip()
+        ec2_conn.put(self.get_docker_compose_binary(arch), "/tmp/docker-compose")
+        ec2_conn.run("sudo mv /tmp/docker-compose /usr/local/bin/docker-compose")
+        ec2_conn.run("sudo chmod +x /usr/local/bin/docker-compose")
+
+    def install_python_environment(self, ec2_conn, ami_id, requirements_path):
+        """
+        Installs python and the requirements of the tests on the instance, from the cached tarball
+        of the AMI and requirements file if there is one.
+
+        :param ec2_conn: fabric Connection to the instance
+        :param ami_id: str, AMI of the instance
+        :param requirements_path: str, path of the requirements file of the tests, which is the
+            same on the test runner and relative to the home directory of the instance. Images
+            with different requirements files must not share an environment, as their pins
+            conflict.
+        """
+        key = self.get_python_environment_key(ami_id, requirements_path)
+        tarball_path = os.path.join(self.cache_dir, f"python-environment-{key}.tar.gz")
+        remote_tarball_path = f"/tmp/python-environment-{key}.tar.gz"
+        with self._lock(f"python-environment-{key}"):
+            if os.path.exists(tarball_path):
+                LOGGER.info(f"Restoring python environment {key} on {ec2_conn.host}")
+                ec2_conn.put(tarball_path, remote_tarball_path)
+                ec2_conn.run(f"tar -xzf {remote_tarball_path} -C {AL2023_HOME_DIR}", hide=True)
+                ec2_utils.configure_pyenv_in_instance(ec2_conn)
+                ec2_conn.run(f"pyenv global {self.python_version}", hide=True)
+                return
+
+            LOGGER.info(f"Building python environment {key} on {ec2_conn.host}")
+            ec2_utils.install_python_in_instance(ec2_conn, python_version=self.python_version)
+            ec2_conn.run(f"pip install -r {requirements_path}")
+            ec2_conn.run(f"tar -czf {remote_tarball_path} -C {AL2023_HOME_DIR} .pyenv", hide=True)
+            ec2_conn.get(remote_tarball_path, f"{tarball_path}.tmp")
+            os.rename(f"{tarball_path}.tmp", tarball_path)
+
+    def prepare(self, ec2_conn, ami_id, requirements_path):
+        """
+        :param ec2_conn: fabric Connection to the instance
+        :param ami_id: str, AMI of the instance
+        :param requirements_path: str, path of the requirements file of the tests
+        """
+        self.install_docker_compose(ec2_conn)
+        self.install_python_environment(ec2_conn, ami_id, requirements_path)
@@ -2,12 +2,16 @@ from abc import abstractmethod
 import os
 import json
 import copy, collections
+import concurrent.futures
+import random
+import threading
+import weakref
 import boto3
 import json
 import requests
 
 from invoke import run, Context
-from time import sleep, time
+from time import monotonic, sleep
 from enum import IntEnum
 from test import test_utils
 from test.test_utils import (
@@ -17,7 +21,6 @@ from test.test_utils import (
     get_installed_python_packages_with_version,
     is_huggingface_image,
 )
-import dataclasses
 from dataclasses import dataclass
 from typing import Any, List, Set
 from packaging.version import Version
@@ -29,6 +32,20 @@ from tenacity import (
 )
 
 
+def get_hashable_value(value):
+    """
+    Convert a JSON like value into a hashable one, so that dicts and lists compare the same way once converted.
+
+    :param value: dict, list or scalar
+    :return: hashable equivalent of the value
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, get_hashable_value(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(get_hashable_value(item) for item in value)
+    return value
+
+
 @dataclass
 class VulnerablePackageDetails:
     """
@@ -36,6 +53,8 @@ class VulnerablePackageDetails:
     a single vulnerability in Allowlist format.
     """
 
+    __slots__ = ("file_path", "name", "package_manager", "version", "release")
+
     file_path: str
     name: str
     package_manager: str
@@ -84,6 +103,27 @@ class AllowListFormatVulnerabilityForEnhancedScan:
     title: str
     reason_to_ignore: str
 
+    # Scans of large images hold thousands of these records, keep them compact
+    __slots__ = (
+        "description",
+        "vulnerability_id",
+        "name",
+        "package_name",
+        "package_details",
+        "remediation",
+        "cvss_v3_score",
+        "cvss_v30_score",
+        "cvss_v31_score",
+        "cvss_v2_score",
+        "cvss_v3_severity",
+        "source_url",
+        "source",
+        "severity",
+        "status",
+        "title",
+        "reason_to_ignore",
+    )
+
     def __init__(
         self,
         description: str,
@@ -149,26 +189,43 @@ class AllowListFormatVulnerabilityForEnhancedScan:
         )
         self.reason_to_ignore = kwargs.get("reason_to_ignore", "N/A")
 
+    def get_comparison_key(self):
+        """
+        Hashable key of the vulnerability, two vulnerabilities are equal if and only if their keys are equal.
+
+        Ignore version and file_path in package_details as they might represent the version of the package existing in
+        the image and might differ from image to image, even when the vulnerability is same.
+        Also ignore the title key of the vulnerablitiy, because, sometimes, 1 vulnerability impacts multiple packages.
+        In that case, the title key is generated by ECR scans by mentioning the name of all packages in a random order.
+
+        :return: tuple
+        """
+        return (
+            self.package_details.name,
+            self.package_details.package_manager,
+            self.package_details.release,
+            self.vulnerability_id,
+            self.name,
+            self.package_name,
+            self.status,
+            self.severity,
+            self.cvss_v3_severity,
+            self.cvss_v3_score,
+            self.cvss_v30_score,
+            self.cvss_v31_score,
+            self.cvss_v2_score,
+            self.source,
+            self.source_url,
+            get_hashable_value(self.remediation),
+            None if is_huggingface_image() else self.description,
+        )
+
     def __eq__(self, other):
         assert type(self) == type(other), f"Types {type(self)} and {type(other)} mismatch!!"
-        ## Ignore version key in package_details as it might represent the version of the package existing in the image
-        ## and might differ from  image to image, even when the vulnerability is same.
-        ## Also ignore the title key of the vulnerablitiy, because, sometimes, 1 vulnerability impacts multiple packages.
-        ## In that case, the title key is generated by ECR scans by mentioning the name of all packages in a random order. This fails during comparison.
-        if test_utils.check_if_two_dictionaries_are_equal(
-            dataclasses.asdict(self.package_details),
-            dataclasses.asdict(other.package_details),
-            ignore_keys=["version", "file_path"],
-        ):
-            ignore_keys = ["package_details", "title", "reason_to_ignore"]
-            if is_huggingface_image():
-                ignore_keys.extend(["description"])
-            return test_utils.check_if_two_dictionaries_are_equal(
-                dataclasses.asdict(self),
-                dataclasses.asdict(other),
-                ignore_keys=ignore_keys,
-            )
-        return False
+        return self.get_comparison_key() == other.get_comparison_key()
+
+    def __hash__(self):
+        return hash(self.get_comparison_key())
 
     def get_cvss_score(self, packageVulnerabilityDetails: dict, score_version: str = "3.1"):
         """
@@ -261,6 +318,43 @@ class ScanVulnerabilityList:
     ):
         pass
 
+    def get_vulnerability_key(self, vulnerability):
+        """
+        Hashable key of a vulnerability, such that two vulnerabilities are equivalent if and only if their keys are equal.
+        Child classes whose equivalence cannot be expressed as a key return None, and are compared pairwise.
+
+        :param vulnerability: vulnerability in the Allowlist format
+        :return: hashable key or None
+        """
+        return None
+
+    def get_vulnerability_index(self):
+        """
+        Index of the keys of all the vulnerabilities in the list, used to check for membership in constant time.
+
+        :return: set of keys, or None if the vulnerabilities of this class do not have keys
+        """
+        index = set()
+        for vulnerability in self.get_flattened_vulnerability_list():
+            key = self.get_vulnerability_key(vulnerability)
+            if key is None:
+                return None
+            index.add(key)
+        return index
+
+    def copy(self):
+        """
+        Copy the list, with copies of the vulnerabilities it holds so that they can be modified independently.
+
+        :return: ScanVulnerabilityList of the same type
+        """
+        list_copy = type(self)(minimum_severity=self.minimum_severity)
+        list_copy.vulnerability_list = {
+            package_name: [copy.copy(vulnerability) for vulnerability in package_vulnerabilities]
+            for package_name, package_vulnerabilities in self.vulnerability_list.items()
+        }
+        return list_copy
+
     def get_flattened_vulnerability_list(self):
         """
         Returns the vulnerability list in the flattened format. For eg., if a vulnerability list looks like
@@ -291,20 +385,15 @@ class ScanVulnerabilityList:
                 {"name":"cve-id2", "uri":"http.." ..}
             ]
         }
-        We want to first sort the innermost list of dicts based on the "name" of each dict and then we sort the
-        outermost dict based on keys i.e. package_name1 and package_name2.
+        The outermost dict is sorted based on keys i.e. package_name1 and package_name2, while the innermost lists keep
+        the order in which the vulnerabilities were added.
         Note: We do not change the actual vulnerability list.
         :return: dict, sorted vulnerability list
         """
-        copy_dict = copy.deepcopy(self.vulnerability_list)
-        for key, list_of_complex_types in copy_dict.items():
-            uniquified_list = test_utils.uniquify_list_of_complex_datatypes(list_of_complex_types)
-            uniquified_list.sort(
-                key=lambda dict_element: (
-                    dict_element["name"] if isinstance(dict_element, dict) else dict_element.name
-                )
-            )
-        return dict(sorted(copy_dict.items()))
+        return {
+            package_name: list(package_vulnerabilities)
+            for package_name, package_vulnerabilities in sorted(self.vulnerability_list.items())
+        }
 
     def save_vulnerability_list(self, path):
         if self.vulnerability_list:
@@ -327,8 +416,12 @@ class ScanVulnerabilityList:
         )
         if package_name not in self.vulnerability_list:
             return False
+        key = self.get_vulnerability_key(vulnerability)
         for allowed_vulnerability in self.vulnerability_list[package_name]:
-            if self.are_vulnerabilities_equivalent(vulnerability, allowed_vulnerability):
+            if key is not None:
+                if key == self.get_vulnerability_key(allowed_vulnerability):
+                    return True
+            elif self.are_vulnerabilities_equivalent(vulnerability, allowed_vulnerability):
                 return True
         return False
 
@@ -350,10 +443,7 @@ class ScanVulnerabilityList:
                 other.vulnerability_list[package_name]
             ):
                 return False
-            for v1, v2 in zip(
-                self.get_sorted_vulnerability_list()[package_name],
-                other.get_sorted_vulnerability_list()[package_name],
-            ):
+            for v1, v2 in zip(package_vulnerabilities, other.vulnerability_list[package_name]):
                 if not self.are_vulnerabilities_equivalent(v1, v2):
                     return False
         return True
@@ -386,14 +476,21 @@ class ScanVulnerabilityList:
         if not self.vulnerability_list:
             return None
         if not other or not other.vulnerability_list:
-            return copy.deepcopy(self)
+            return self.copy()
 
-        missing_vulnerabilities = [
-            vulnerability
-            for package_vulnerabilities in self.vulnerability_list.values()
-            for vulnerability in package_vulnerabilities
-            if vulnerability not in other
-        ]
+        other_index = other.get_vulnerability_index()
+        if other_index is None:
+            missing_vulnerabilities = [
+                vulnerability
+                for vulnerability in self.get_flattened_vulnerability_list()
+                if vulnerability not in other
+            ]
+        else:
+            missing_vulnerabilities = [
+                vulnerability
+                for vulnerability in self.get_flattened_vulnerability_list()
+                if other.get_vulnerability_key(vulnerability) not in other_index
+            ]
         if not missing_vulnerabilities:
             return None
 
@@ -536,6 +633,15 @@ class ECREnhancedScanVulnerabilityList(ScanVulnerabilityList):
         """
         return vulnerability.package_name
 
+    def get_vulnerability_key(self, vulnerability: AllowListFormatVulnerabilityForEnhancedScan):
+        """
+        Key of a vulnerability in the Allowlist Format, see AllowListFormatVulnerabilityForEnhancedScan.get_comparison_key
+
+        :param vulnerability: AllowListFormatVulnerabilityForEnhancedScan
+        :return: tuple
+        """
+        return vulnerability.get_comparison_key()
+
     def construct_allowlist_from_file(self, file_path):
         """
         Read JSON file that has the vulnerability data saved in the Allowlist format itself and prepare the object with
@@ -1019,23 +1125,313 @@ def process_failure_routine_summary_and_store_data_in_s3(failure_routine_summary
     return s3_filename_for_fixable_list, s3_filename_for_non_fixable_list
 
 
-def run_scan(ecr_client, image):
-    scan_status = None
-    start_time = time()
-    ecr_utils.start_ecr_image_scan(ecr_client, image)
-    while (time() - start_time) <= 600:
-        scan_status, scan_status_description = ecr_utils.get_ecr_image_scan_status(
-            ecr_client, image
+class ApiRateBudget:
+    """
+    Token bucket shared by every thread polling the same AWS API, so that scanning many images at once does not get
+    the whole job throttled.
+    """
+
+    def __init__(self, calls_per_second, burst=None):
+        """
+        :param calls_per_second: float, sustained rate of API calls
+        :param burst: int, number of calls that can be made back to back, defaults to calls_per_second
+        """
+        self.calls_per_second = calls_per_second
+        self.burst = burst or max(1, int(calls_per_second))
+        self._tokens = float(self.burst)
+        self._updated_at = monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a call can be made within the budget
+        """
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated_at) * self.calls_per_second
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.calls_per_second
+            sleep(wait_time)
+
+
+class ECRScanCoordinator:
+    """
+    Runs the ECR scans of many images concurrently. Every image is polled on its own schedule with jittered
+    exponential backoff, all polls share one API rate budget, and results are handed back through futures as soon as
+    each image finishes, so the wall time of a job is that of its slowest scan instead of the sum of all of them.
+    """
+
+    def __init__(
+        self,
+        max_workers=32,
+        calls_per_second=5,
+        initial_poll_delay=5,
+        max_poll_delay=60,
+    ):
+        """
+        :param max_workers: int, maximum number of images polled concurrently
+        :param calls_per_second: float, ECR API calls allowed per second across all images
+        :param initial_poll_delay: float, seconds before the first status poll of a scan
+        :param max_poll_delay: float, upper bound of the delay between two status polls
+        """
+        self.rate_budget = ApiRateBudget(calls_per_second)
+        self.initial_poll_delay = initial_poll_delay
+        self.max_poll_delay = max_poll_delay
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ecr-scan"
+        )
+
+    def _call(self, ecr_client, function, *args, **kwargs):
+        self.rate_budget.acquire()
+        return function(ecr_client, *args, **kwargs)
+
+    def _poll(self, get_status, timeout, initial_delay=None):
+        """
+        Call get_status with jittered exponential backoff until it returns a result
+
+        :param get_status: callable, returns (True, result) when done or (False, last state) to keep polling
+        :param timeout: float, seconds after which a TimeoutError is raised
+        :param initial_delay: float, seconds before the first poll, defaults to initial_poll_delay
+        :return: result of get_status
+        """
+        delay = self.initial_poll_delay if initial_delay is None else initial_delay
+        deadline = monotonic() + timeout
+        while True:
+            done, result = get_status()
+            if done:
+                return result
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise TimeoutError(result)
+            # Full jitter keeps the polls of images that were submitted together from staying in lock step
+            sleep(min(remaining, random.uniform(delay / 2, delay)))
+            delay = min(self.max_poll_delay, delay * 2)
+
+    def _wait_for_basic_scan(self, ecr_client, image, timeout):
+        self._call(ecr_client, ecr_utils.start_ecr_image_scan, image)
+
+        def get_status():
+            scan_status, scan_status_description = self._call(
+                ecr_client, ecr_utils.get_ecr_image_scan_status, image
+            )
+            if scan_status == "FAILED" or scan_status not in [None, "IN_PROGRESS", "COMPLETE"]:
+                raise ECRScanFailureException(
+                    f"ECR Scan failed for {image} with description: {scan_status_description}"
+                )
+            return scan_status == "COMPLETE", f"ECR Scan is still in {scan_status} state. Exiting."
+
+        self._poll(get_status, timeout, initial_delay=1)
+
+    def _wait_for_enhanced_scan(self, ecr_client, image, timeout):
+        def get_status():
+            try:
+                scan_status, scan_status_description, severity_counts = self._call(
+                    ecr_client, ecr_utils.get_ecr_image_enhanced_scan_summary, image
+                )
+            except ecr_client.exceptions.ScanNotFoundException as e:
+                LOGGER.info(e.response)
+                LOGGER.info(
+                    "It takes sometime for the newly uploaded image to show its scan status, hence the error handling"
+                )
+                return False, f"ECR Scan of {image} is not found yet. Exiting."
+            return scan_status == "ACTIVE", (
+                severity_counts
+                if scan_status == "ACTIVE"
+                else f"ECR Scan is still in {scan_status} state with description: {scan_status_description}. Exiting."
+            )
+
+        return self._poll(get_status, timeout)
+
+    def _wait_for_findings_to_settle(self, ecr_client, image, severity_counts, timeout):
+        """
+        Findings keep being published for a short while after a scan turns ACTIVE. Instead of a fixed sleep, poll the
+        finding counts until two consecutive polls agree, or the timeout elapses.
+        """
+        last_counts = [severity_counts]
+
+        def get_status():
+            _, _, counts = self._call(
+                ecr_client, ecr_utils.get_ecr_image_enhanced_scan_summary, image
+            )
+            settled = counts == last_counts[0]
+            last_counts[0] = counts
+            return settled, counts
+
+        try:
+            self._poll(get_status, timeout)
+        except TimeoutError:
+            LOGGER.info(f"Finding counts of {image} are still changing, reading them as they are")
+
+    def _stream_findings(self, ecr_client, image, vulnerability_list):
+        """
+        Feed the paginated findings of an image into the vulnerability list page by page, without holding the full
+        scan result in memory
+
+        :param ecr_client: boto3 Client for ECR
+        :param image: str, Image URI
+        :param vulnerability_list: ECREnhancedScanVulnerabilityList, list to be filled
+        :return: ECREnhancedScanVulnerabilityList
+        """
+        pages = ecr_utils.iter_ecr_image_scan_findings_pages(ecr_client, image)
+        findings_count = 0
+
+        def findings():
+            nonlocal findings_count
+            while True:
+                self.rate_budget.acquire()
+                page_findings = next(pages, None)
+                if page_findings is None:
+                    return
+                findings_count += len(page_findings)
+                yield from json.loads(json.dumps(page_findings, cls=EnhancedJSONEncoder))
+
+        vulnerability_list.construct_allowlist_from_ecr_scan_result(findings())
+        LOGGER.info(
+            f"[TotalVulnsFound] For image_uri: {image} {findings_count} vulnerabilities found in total."
+        )
+        return vulnerability_list
+
+    def _enhanced_scan_findings(
+        self, ecr_client, image, vulnerability_list, timeout, settle_timeout
+    ):
+        severity_counts = self._wait_for_enhanced_scan(ecr_client, image, timeout)
+        LOGGER.info(f"finished wait_for_enhanced_scans_to_complete, {image}")
+        self._wait_for_findings_to_settle(ecr_client, image, severity_counts, settle_timeout)
+        return self._stream_findings(ecr_client, image, vulnerability_list)
+
+    def submit_basic_scan(self, ecr_client, image, timeout=600):
+        """
+        Start a basic ECR scan and wait for it to complete in the background
+
+        :param ecr_client: boto3 Client for ECR
+        :param image: str, Image URI
+        :param timeout: float, seconds to wait for the scan to complete
+        :return: concurrent.futures.Future, resolved once the scan is COMPLETE
+        """
+        return self._executor.submit(self._wait_for_basic_scan, ecr_client, image, timeout)
+
+    def submit_enhanced_scan(self, ecr_client, image, timeout=45 * 60):
+        """
+        Wait for the continuous enhanced scan of an image to turn ACTIVE in the background
+
+        :param ecr_client: boto3 Client for ECR
+        :param image: str, Image URI
+        :param timeout: float, seconds to wait for the scan to turn ACTIVE
+        :return: concurrent.futures.Future, resolved with the finding severity counts
+        """
+        return self._executor.submit(self._wait_for_enhanced_scan, ecr_client, image, timeout)
+
+    def submit_enhanced_scan_findings(
+        self, ecr_client, image, vulnerability_list, timeout=45 * 60, settle_timeout=60
+    ):
+        """
+        Wait for the enhanced scan of an image and read its findings into a vulnerability list in the background
+
+        :param ecr_client: boto3 Client for ECR
+        :param image: str, Image URI
+        :param vulnerability_list: ECREnhancedScanVulnerabilityList, list to be filled with the findings
+        :param timeout: float, seconds to wait for the scan to turn ACTIVE
+        :param settle_timeout: float, seconds to wait for the findings to stop changing once the scan is ACTIVE
+        :return: concurrent.futures.Future, resolved with the filled vulnerability list
+        """
+        return self._executor.submit(
+            self._enhanced_scan_findings,
+            ecr_client,
+            image,
+            vulnerability_list,
+            timeout,
+            settle_timeout,
         )
-        if scan_status == "FAILED" or scan_status not in [None, "IN_PROGRESS", "COMPLETE"]:
-            raise ECRScanFailureException(
-                f"ECR Scan failed for {image} with description: {scan_status_description}"
+
+    def scan_images(self, ecr_client, images, minimum_severity=CVESeverity["MEDIUM"], **kwargs):
+        """
+        Submit the enhanced scans of all the images of a job at once
+
+        :param ecr_client: boto3 Client for ECR
+        :param images: list<str>, Image URIs
+        :param minimum_severity: CVESeverity, minimum severity of the vulnerabilities to collect
+        :return: dict<str, concurrent.futures.Future>, image -> future of its ECREnhancedScanVulnerabilityList. Use
+            concurrent.futures.as_completed to handle the images as they finish.
+        """
+        return {
+            image: self.submit_enhanced_scan_findings(
+                ecr_client,
+                image,
+                ECREnhancedScanVulnerabilityList(minimum_severity=minimum_severity),
+                **kwargs,
             )
-        if scan_status == "COMPLETE":
-            break
-        sleep(1)
-    if scan_status != "COMPLETE":
-        raise TimeoutError(f"ECR Scan is still in {scan_status} state. Exiting.")
+            for image in images
+        }
+
+    def shutdown(self):
+        """
+        Stop the polling threads of the coordinator. Scans that did not start yet are cancelled.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_SCAN_COORDINATORS = {}
+_SCAN_COORDINATORS_LOCK = threading.Lock()
+_ECR_CLIENT_ACCOUNT_IDS = weakref.WeakKeyDictionary()
+
+
+def _get_ecr_client_account_id(ecr_client):
+    """
+    Get the account ID of an ECR client from STS, which needs no IAM permission. It is cached per client, since the
+    clients are created with the default credentials and do not change account.
+
+    :param ecr_client: boto3 Client for ECR
+    :return: str, AWS Account ID
+    """
+    with _SCAN_COORDINATORS_LOCK:
+        account_id = _ECR_CLIENT_ACCOUNT_IDS.get(ecr_client)
+    if account_id is None:
+        sts_client = boto3.client("sts", region_name=ecr_client.meta.region_name)
+        account_id = sts_client.get_caller_identity()["Account"]
+        with _SCAN_COORDINATORS_LOCK:
+            _ECR_CLIENT_ACCOUNT_IDS[ecr_client] = account_id
+    return account_id
+
+
+def get_scan_coordinator(ecr_client, image=None):
+    """
+    Get the scan coordinator of the account and region of an ECR client. ECR throttles API calls per account and
+    region, so all the scans of an account and region share a coordinator and its rate budget. The coordinator does
+    not hold a client, every scan is submitted with the client of its caller.
+
+    :param ecr_client: boto3 Client for ECR
+    :param image: str, optional ECR image URI to be scanned, from which the account ID is read
+    :return: ECRScanCoordinator
+    """
+    if image:
+        account_id = test_utils.get_account_id_from_image_uri(image)
+    else:
+        account_id = _get_ecr_client_account_id(ecr_client)
+    key = (account_id, ecr_client.meta.region_name)
+    with _SCAN_COORDINATORS_LOCK:
+        if key not in _SCAN_COORDINATORS:
+            _SCAN_COORDINATORS[key] = ECRScanCoordinator()
+        return _SCAN_COORDINATORS[key]
+
+
+def shutdown_scan_coordinators():
+    """
+    Shut down the scan coordinators created in this process, at the end of a test session
+    """
+    with _SCAN_COORDINATORS_LOCK:
+        for coordinator in _SCAN_COORDINATORS.values():
+            coordinator.shutdown()
+        _SCAN_COORDINATORS.clear()
+
+
+def run_scan(ecr_client, image):
+    get_scan_coordinator(ecr_client, image).submit_basic_scan(ecr_client, image).result()
 
 
 def wait_for_enhanced_scans_to_complete(ecr_client, image):
@@ -1047,26 +1443,7 @@ def wait_for_enhanced_scans_to_complete(ecr_client, image):
     :param ecr_client: boto3 Client for ECR
     :param image: str, Image URI for image being scanned
     """
-    scan_status = None
-    scan_status_description = ""
-    start_time = time()
-    while (time() - start_time) <= 45 * 60:
-        try:
-            scan_status, scan_status_description = ecr_utils.get_ecr_image_enhanced_scan_status(
-                ecr_client, image
-            )
-        except ecr_client.exceptions.ScanNotFoundException as e:
-            LOGGER.info(e.response)
-            LOGGER.info(
-                "It takes sometime for the newly uploaded image to show its scan status, hence the error handling"
-            )
-        if scan_status == "ACTIVE":
-            break
-        sleep(1 * 60)
-    if scan_status != "ACTIVE":
-        raise TimeoutError(
-            f"ECR Scan is still in {scan_status} state with description: {scan_status_description}. Exiting."
-        )
+    get_scan_coordinator(ecr_client).submit_enhanced_scan(ecr_client, image).result()
 
 
 def generate_future_allowlist(
@@ -1091,7 +1468,7 @@ def generate_future_allowlist(
     if future_allowlist:
         future_allowlist = future_allowlist + non_patchable_vulnerabilities
     else:
-        future_allowlist = copy.deepcopy(non_patchable_vulnerabilities)
+        future_allowlist = non_patchable_vulnerabilities.copy()
     return future_allowlist
 
 
@@ -1324,7 +1701,7 @@ def extract_non_patchable_vulnerabilities(
         docker_exec_command=docker_exec_cmd
     )
 
-    non_patchable_vulnerabilities_with_reason = copy.deepcopy(vulnerability_list_object)
+    non_patchable_vulnerabilities_with_reason = vulnerability_list_object.copy()
     print(non_patchable_vulnerabilities_with_reason.vulnerability_list)
     patchable_packages = []
     for (
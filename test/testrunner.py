@@ -1,10 +1,11 @@
+import asyncio
 import json
 import os
 import sys
 import logging
 import re
 
-from multiprocessing import Pool, Manager
+from multiprocessing import Pool
 from datetime import datetime
 
 import boto3
@@ -29,6 +30,7 @@ from test_utils import (
     get_build_context,
     is_nightly_context,
     generate_unique_dlc_name,
+    DEFAULT_REGION,
 )
 from test_utils import KEYS_TO_DESTROY_FILE
 from test_utils.pytest_cache import PytestCache
@@ -64,13 +66,24 @@ def run_sagemaker_local_tests(images, pytest_cache_params):
         f"tar -cz --exclude='*.pytest_cache' --exclude='__pycache__' -f {sm_tests_tar_name} {sm_tests_path}"
     )
 
-    pool_number = len(images)
+    # Images that run on the same instance type and AMI, and install the same requirements file,
+    # share an instance
+    image_groups = sm_utils.get_sagemaker_local_test_image_groups(
+        images, os.getenv("AWS_REGION", DEFAULT_REGION)
+    )
+    pool_number = len(image_groups)
     with Pool(pool_number) as p:
-        test_results = p.starmap(
-            sm_utils.execute_local_tests, [[image, pytest_cache_params] for image in images]
+        group_results = p.starmap(
+            sm_utils.execute_local_tests_on_instance,
+            [[image_group, pytest_cache_params] for image_group in image_groups],
         )
-    if not all(test_results):
-        failed_images = [images[index] for index, result in enumerate(test_results) if not result]
+    test_results = {
+        image: result
+        for image_group, results in zip(image_groups, group_results)
+        for image, result in zip(image_group, results)
+    }
+    if not all(test_results.values()):
+        failed_images = [image for image in images if not test_results[image]]
         raise RuntimeError(
             f"SageMaker Local tests failed on the following DLCs:\n"
             f"{json.dumps(failed_images, indent=4)}"
@@ -114,12 +127,15 @@ def print_log_stream(logs):
     print the log stream from Job Executor
     :param logs: <dict> the returned dict from JobRequester.receive_logs
     """
+    if "LOG_STREAM" not in logs:
+        # the log stream was printed while the test ran, see JobRequester.follow_logs
+        return
     LOGGER.info("Log stream from Job Executor.....")
     print(logs["LOG_STREAM"])
     LOGGER.info("Print log stream complete.")
 
 
-def send_scheduler_requests(requester, image):
+async def send_scheduler_requests(requester, image):
     """
     Send a PR test request through the requester, and wait for the response.
     If test completed or encountered runtime error, create local XML reports.
@@ -128,40 +144,59 @@ def send_scheduler_requests(requester, image):
     :param requester: JobRequester object
     :param image: <string> ECR URI
     """
+    loop = asyncio.get_running_loop()
     # Note: 3 is the max number of instances required for any tests. Here we schedule tests conservatively.
-    identifier = requester.send_request(image, "PR", 3)
+    identifier = await loop.run_in_executor(None, requester.send_request, image, "PR", 3)
     image_tag = image.split(":")[-1]
     report_path = os.path.join(os.getcwd(), "test", f"{image_tag}.xml")
-    while True:
-        query_status_response = requester.query_status(identifier)
-        test_status = query_status_response["status"]
-        if test_status == "completed":
-            LOGGER.info(f"Test for image {image} completed.")
-            logs_response = requester.receive_logs(identifier)
-            LOGGER.info(
-                f"Receive logs success for ticket {identifier.ticket_name}, report path: {report_path}"
-            )
-            print_log_stream(logs_response)
-            metrics_utils.send_test_result_metrics(0)
-            with open(report_path, "w") as xml_report:
-                xml_report.write(logs_response["XML_REPORT"])
-            break
-
-        elif test_status == "runtimeError":
-            logs_response = requester.receive_logs(identifier)
-            with open(report_path, "w") as xml_report:
-                xml_report.write(logs_response["XML_REPORT"])
-            print_log_stream(logs_response)
-            metrics_utils.send_test_result_metrics(1)
-            raise Exception(f"Test for image {image} ran into runtime error.")
-            break
-
-        elif test_status == "failed":
-            metrics_utils.send_test_result_metrics(1)
-            raise Exception(
-                f"Scheduling failed for image {image}. Reason: {query_status_response['reason']}"
-            )
-            break
+    logs_done = asyncio.Event()
+    follow_logs_task = asyncio.create_task(requester.follow_logs(identifier, logs_done))
+    try:
+        query_status_response = await requester.wait_for_status(identifier)
+    finally:
+        logs_done.set()
+        await follow_logs_task
+    test_status = query_status_response["status"]
+    if test_status == "completed":
+        LOGGER.info(f"Test for image {image} completed.")
+        logs_response = await loop.run_in_executor(None, requester.receive_logs, identifier)
+        LOGGER.info(
+            f"Receive logs success for ticket {identifier.ticket_name}, report path: {report_path}"
+        )
+        print_log_stream(logs_response)
+        metrics_utils.send_test_result_metrics(0)
+        with open(report_path, "w") as xml_report:
+            xml_report.write(logs_response["XML_REPORT"])
+
+    elif test_status == "runtimeError":
+        logs_response = await loop.run_in_executor(None, requester.receive_logs, identifier)
+        with open(report_path, "w") as xml_report:
+            xml_report.write(logs_response["XML_REPORT"])
+        print_log_stream(logs_response)
+        metrics_utils.send_test_result_metrics(1)
+        raise Exception(f"Test for image {image} ran into runtime error.")
+
+    elif test_status == "failed":
+        metrics_utils.send_test_result_metrics(1)
+        raise Exception(
+            f"Scheduling failed for image {image}. Reason: {query_status_response['reason']}"
+        )
+
+
+async def send_all_scheduler_requests(requester, images):
+    """
+    Send the test requests of all images, and wait for all of them to finish.
+    The statuses of the requests are polled together, see JobRequester.wait_for_status.
+
+    :param requester: JobRequester object
+    :param images: <list> ECR URIs
+    """
+    results = await asyncio.gather(
+        *[send_scheduler_requests(requester, image) for image in images], return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
 
 
 def run_sagemaker_remote_tests(images, pytest_cache_params):
@@ -198,34 +233,19 @@ def run_sagemaker_remote_tests(images, pytest_cache_params):
 
     elif use_scheduler:
         LOGGER.info("entered scheduler mode.")
-        import concurrent.futures
         from job_requester import JobRequester
 
         job_requester = JobRequester()
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(images)) as executor:
-            futures = [
-                executor.submit(send_scheduler_requests, job_requester, image) for image in images
-            ]
-            for future in futures:
-                future.result()
+        asyncio.run(send_all_scheduler_requests(job_requester, images))
     else:
         if not images:
             return
         pool_number = len(images)
-        # Using Manager().dict() since it's a thread safe dictionary
-        global_pytest_cache = Manager().dict()
-        try:
-            with Pool(pool_number) as p:
-                p.starmap(
-                    sm_utils.execute_sagemaker_remote_tests,
-                    [
-                        [i, images[i], global_pytest_cache, pytest_cache_params]
-                        for i in range(pool_number)
-                    ],
-                )
-        finally:
-            pytest_cache_util.convert_cache_json_and_upload_to_s3(
-                global_pytest_cache, **pytest_cache_params
+        # Every process uploads the changes of its own pytest cache
+        with Pool(pool_number) as p:
+            p.starmap(
+                sm_utils.execute_sagemaker_remote_tests,
+                [[i, images[i], pytest_cache_params] for i in range(pool_number)],
             )
 
 